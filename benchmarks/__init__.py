@@ -0,0 +1 @@
+"""Performance benchmarks for the historic station data pipeline."""
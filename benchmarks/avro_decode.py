@@ -0,0 +1,85 @@
+"""
+Benchmark decoding an Avro file with several numbers of worker processes.
+
+Writes an Avro file of synthetic stations, then reads it as Arrow record batches (as the
+conversion tasks do) with each number of workers.  Reports the seconds taken and the records
+decoded per second for each, as JSON.  Decoding only gets faster with workers if there are
+cores for them, so the number of CPUs is reported too.
+
+Usage: python -m benchmarks.avro_decode [--stations N] [--months N] [--workers N [N ...]] [--batch-size N]
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from benchmarks.synthetic import write_avro_file
+from historical.convert import read_avro_batches
+
+
+def benchmark(station_count: int, months: int, worker_counts: list, batch_size: int) -> dict:
+    """
+    Time reading an Avro file of synthetic stations with several numbers of workers.
+
+    Parameters
+    ----------
+    station_count : int
+        The number of stations.
+    months : int
+        The number of observations of each station.
+    worker_counts : list of int
+        The numbers of worker processes.
+    batch_size : int
+        The number of records in each batch.
+
+    Returns
+    -------
+    dict
+        The benchmark results.
+    """
+    directory = tempfile.mkdtemp()
+    avro_file_name = os.path.join(directory, 'observations.avro')
+    results = []
+
+    try:
+        write_avro_file(avro_file_name, station_count, months)
+
+        for workers in worker_counts:
+            start = time.perf_counter()
+            batches = read_avro_batches(avro_file_name, batch_size, workers=workers)
+            record_count = sum(batch.num_rows for batch in batches)
+            seconds = time.perf_counter() - start
+            results.append({
+                'workers': workers,
+                'seconds': round(seconds, 3),
+                'records_per_second': round(record_count / seconds)
+            })
+    finally:
+        shutil.rmtree(directory)
+
+    return {'records': station_count * months, 'batch_size': batch_size, 'cpus': os.cpu_count(), 'results': results}
+
+
+def main(args: list = sys.argv[1:]) -> None:
+    """
+    Run the benchmark and print the results as JSON.
+
+    Parameters
+    ----------
+    args : list of str
+        The command line arguments.
+    """
+    parser = ArgumentParser(description='Benchmark decoding an Avro file with several numbers of worker processes.')
+    parser.add_argument('--stations', help='The number of stations.', type=int, default=500)
+    parser.add_argument('--months', help='The number of observations of each station.', type=int, default=2000)
+    parser.add_argument('--workers', help='The numbers of worker processes.', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--batch-size', help='The number of records in each batch.', type=int, default=65536)
+    args = parser.parse_args(args)
+    print(json.dumps(benchmark(args.stations, args.months, args.workers, args.batch_size), indent=2))
+
+
+if __name__ == '__main__':
+    main()
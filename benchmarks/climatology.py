@@ -0,0 +1,113 @@
+"""
+Benchmark updating the climatology rollups against computing them from scratch.
+
+Writes synthetic stations to a Parquet file and computes the climatology tables from scratch.
+The tables are then updated with the observations unchanged and again with the observations of
+one station revised, so only the fingerprints (and the one station's rollups) are computed.
+Reports the seconds taken by each, and by the fingerprints alone, as JSON.
+
+Usage: python -m benchmarks.climatology [--stations N] [--months N]
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from argparse import ArgumentParser
+from benchmarks.synthetic import station_text
+from historical.batch import parse_observation_batch
+from historical.climatology import read_observations, station_fingerprints, update_climatology
+
+
+def timed(function, *args) -> tuple:
+    """
+    Time a call of a function.
+
+    Parameters
+    ----------
+    function : callable
+        The function.
+    *args
+        The arguments of the call.
+
+    Returns
+    -------
+    tuple of (object, float)
+        The result of the call and the seconds it took.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return (result, round(time.perf_counter() - start, 3))
+
+
+def benchmark(station_count: int, months: int) -> dict:
+    """
+    Compare updating the climatology rollups with computing them from scratch.
+
+    Parameters
+    ----------
+    station_count : int
+        The number of stations.
+    months : int
+        The number of observations of each station.
+
+    Returns
+    -------
+    dict
+        The benchmark results.
+    """
+    directory = tempfile.mkdtemp()
+    parquet_file_name = os.path.join(directory, 'observations.parquet')
+    climatology_directory = os.path.join(directory, 'climatology')
+    results = {}
+
+    try:
+        table = pa.Table.from_batches([
+            parse_observation_batch(station_text(f'Station {index}', months, index), f'Station {index}')
+            for index in range(station_count)
+        ])
+        pq.write_table(table, parquet_file_name)
+        _, results['fingerprints_seconds'] = timed(station_fingerprints, read_observations(parquet_file_name))
+        recomputed, results['scratch_seconds'] = timed(update_climatology, parquet_file_name, climatology_directory)
+        assert len(recomputed) == station_count
+        recomputed, results['unchanged_seconds'] = timed(update_climatology, parquet_file_name, climatology_directory)
+        assert recomputed == []
+        revised = pc.equal(table['station'], 'Station 0')
+        rain = pc.if_else(revised, pc.add(table['rain'], 1.0), table['rain'])
+        pq.write_table(table.set_column(table.schema.get_field_index('rain'), 'rain', rain), parquet_file_name)
+        recomputed, results['one_changed_seconds'] = timed(
+            update_climatology,
+            parquet_file_name,
+            climatology_directory
+        )
+        assert recomputed == ['Station 0']
+    finally:
+        shutil.rmtree(directory)
+
+    return {'stations': station_count, 'rows': station_count * months, **results}
+
+
+def main(args: list = sys.argv[1:]) -> None:
+    """
+    Run the benchmark and print the results as JSON.
+
+    Parameters
+    ----------
+    args : list of str
+        The command line arguments.
+    """
+    parser = ArgumentParser(description='Benchmark updating the climatology rollups against recomputing them.')
+    parser.add_argument('--stations', help='The number of stations.', type=int, default=300)
+    parser.add_argument('--months', help='The number of observations of each station.', type=int, default=2000)
+    args = parser.parse_args(args)
+    print(json.dumps(benchmark(args.stations, args.months), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark the vectorized CSV export against writing each record with csv.DictWriter.
+
+Reports the rows written per second by each method, and by each compression of the vectorized
+method, as JSON.  Reading the Avro file is common to both methods, so the rate of formatting
+rows that have already been read is reported separately.  The uncompressed outputs are checked
+to be byte for byte the same.
+
+Usage: python -m benchmarks.csv_export [--stations N] [--months N]
+"""
+import csv
+import filecmp
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from benchmarks.synthetic import write_avro_file
+from fastavro import reader
+from historical.convert import CSV_COMPRESSION, avro_to_csv, format_csv_rows, read_avro_batches
+
+
+def dict_writer_export(avro_file_name: str, csv_file_name: str) -> int:
+    """
+    Export an Avro file to CSV one record at a time, as generate_csv_file used to.
+
+    Parameters
+    ----------
+    avro_file_name : str
+        The full path to the Avro file.
+    csv_file_name : str
+        The full path to the CSV file.
+
+    Returns
+    -------
+    int
+        The number of records written.
+    """
+    record_count = 0
+
+    with open(avro_file_name, 'rb') as avro_file_stream:
+        avro_reader = reader(avro_file_stream)
+        fieldnames = [field['name'] for field in avro_reader.writer_schema['fields']]
+
+        with open(csv_file_name, 'w') as csv_file_stream:
+            csv_writer = csv.DictWriter(csv_file_stream, fieldnames=fieldnames)
+            csv_writer.writeheader()
+
+            for record in avro_reader:
+                record_count += 1
+                csv_writer.writerow(record)
+
+    return record_count
+
+
+def format_only(avro_file_name: str) -> dict:
+    """
+    Time the formatting of rows that have already been read from the Avro file.
+
+    Parameters
+    ----------
+    avro_file_name : str
+        The full path to the Avro file.
+
+    Returns
+    -------
+    dict
+        The rows formatted per second by each method.
+    """
+    batches = list(read_avro_batches(avro_file_name))
+    records = [record for batch in batches for record in batch.to_pylist()]
+    csv_writer = csv.DictWriter(io.StringIO(), fieldnames=batches[0].schema.names)
+    start = time.perf_counter()
+    csv_writer.writerows(records)
+    dict_writer_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+
+    for batch in batches:
+        format_csv_rows(batch)
+
+    vectorized_seconds = time.perf_counter() - start
+    return {
+        'dict_writer_format_rows_per_second': round(len(records) / dict_writer_seconds),
+        'vectorized_format_rows_per_second': round(len(records) / vectorized_seconds)
+    }
+
+
+def rows_per_second(method, *args, **kwargs) -> int:
+    """
+    Time an export method.
+
+    Parameters
+    ----------
+    method : callable
+        The export method, returning the number of rows written.
+    *args, **kwargs
+        The arguments of the method.
+
+    Returns
+    -------
+    int
+        The rows written per second.
+    """
+    start = time.perf_counter()
+    row_count = method(*args, **kwargs)
+    return round(row_count / (time.perf_counter() - start))
+
+
+def main(args: list = sys.argv[1:]) -> None:
+    """
+    Run the benchmark and print the results as JSON.
+
+    Parameters
+    ----------
+    args : list of str
+        The command line arguments.
+    """
+    parser = ArgumentParser(description='Benchmark the CSV export.')
+    parser.add_argument('--stations', help='The number of stations.', type=int, default=1000)
+    parser.add_argument('--months', help='The number of months for each station.', type=int, default=2000)
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory() as directory:
+        avro_file_name = os.path.join(directory, 'observations.avro')
+        write_avro_file(avro_file_name, args.stations, args.months)
+        dict_writer_file_name = os.path.join(directory, 'dict-writer.csv')
+        results = {
+            'rows': args.stations * args.months,
+            'dict_writer_rows_per_second': rows_per_second(dict_writer_export, avro_file_name, dict_writer_file_name)
+        }
+
+        for compression, suffix in CSV_COMPRESSION.items():
+            csv_file_name = os.path.join(directory, f'vectorized{suffix}')
+            results[f'vectorized_{compression}_rows_per_second'] = rows_per_second(
+                avro_to_csv,
+                avro_file_name,
+                csv_file_name,
+                compression=compression
+            )
+            results[f'vectorized_{compression}_bytes'] = os.path.getsize(csv_file_name)
+
+        results.update(format_only(avro_file_name))
+
+        results['identical'] = filecmp.cmp(
+            dict_writer_file_name,
+            os.path.join(directory, f'vectorized{CSV_COMPRESSION["none"]}'),
+            shallow=False
+        )
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
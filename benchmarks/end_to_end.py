@@ -0,0 +1,205 @@
+"""
+Load test the whole workflow against a simulated Met Office site.
+
+Starts a FakeMetOffice serving synthetic stations, writes a stations.yml listing them and runs
+historic-met-station-data.py with it in a fresh process (so the Met Office is never contacted).
+For each number of stations, reports the wall time, the peak RSS of the workflow process, the
+requests and bytes served by the site (and the most it served at the same time), the bytes of
+each output (from its manifest) and the seconds of each stage (from its metrics), as JSON.
+
+Usage: python -m benchmarks.end_to_end [--stations N [N ...]] [--months N] [--latency SECONDS]
+       [--jitter SECONDS] [--failure-every N] [--single-pass] [--workers N] [--partitioned]
+"""
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from benchmarks.fake_met_office import FakeMetOffice
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'historic-met-station-data.py')
+
+
+def run_workflow(directory: str, options: list) -> tuple:
+    """
+    Run the workflow in a fresh process with the stations.yml of a directory.
+
+    Parameters
+    ----------
+    directory : str
+        The working directory of the workflow, holding its stations.yml.  The outputs are written
+        to its out subdirectory.
+    options : list of str
+        The command line options of the workflow.
+
+    Returns
+    -------
+    tuple of (int, float, int)
+        The exit code, the wall time in seconds and the peak RSS in bytes of the process.
+    """
+    output_directory = os.path.join(directory, 'out')
+    os.makedirs(output_directory, exist_ok=True)
+    environment = {**os.environ, 'TMPDIR': output_directory}
+    start = time.perf_counter()
+    process = subprocess.Popen(  # nosec B603
+        [sys.executable, SCRIPT, *options],
+        cwd=directory,
+        env=environment,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    # wait4 gives the resource usage of this process alone, rather than of all the children so far.
+    _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux.
+    return (process.returncode, seconds, usage.ru_maxrss * 1024)
+
+
+def output_summary(output_directory: str) -> dict:
+    """
+    Summarise the outputs of a run from its manifest and metrics files.
+
+    Parameters
+    ----------
+    output_directory : str
+        The directory the workflow wrote its outputs to.
+
+    Returns
+    -------
+    dict
+        The bytes of each output and the seconds of each stage.
+    """
+    summary = {'output_bytes': {}, 'stage_seconds': {}}
+
+    for file_name in glob.glob(os.path.join(output_directory, 'historic-station-data-*.manifest.json')):
+        with open(file_name) as stream:
+            outputs = json.load(stream)['outputs']
+
+        for name, output in outputs.items():
+            summary['output_bytes'][name] = sum(file['bytes'] for file in output['files'].values())
+
+    for file_name in glob.glob(os.path.join(output_directory, 'historic-station-data-*.metrics.json')):
+        with open(file_name) as stream:
+            stages = json.load(stream)['summary']
+
+        for name, stage in stages.items():
+            summary['stage_seconds'][name] = round(stage['seconds'], 3)
+
+    return summary
+
+
+def benchmark(
+    station_counts: list,
+    months: int,
+    latency: float,
+    jitter: float,
+    failure_every: int,
+    options: list
+) -> dict:
+    """
+    Run the workflow against a simulated Met Office site with several numbers of stations.
+
+    Parameters
+    ----------
+    station_counts : list of int
+        The numbers of stations.
+    months : int
+        The number of observations of each station.
+    latency : float
+        The seconds each response of the site is delayed by.
+    jitter : float
+        Each response is delayed by up to this many seconds more.
+    failure_every : int
+        Fail one in every N requests with a 503 response (0 for never).
+    options : list of str
+        The command line options of the workflow.
+
+    Returns
+    -------
+    dict
+        The benchmark results.
+    """
+    results = []
+
+    for station_count in station_counts:
+        directory = tempfile.mkdtemp()
+
+        try:
+            with FakeMetOffice(months, latency, jitter, failure_every) as site:
+                with open(os.path.join(directory, 'stations.yml'), 'w') as stream:
+                    stream.write(site.stations_yaml(station_count))
+
+                returncode, seconds, peak_rss = run_workflow(directory, options)
+
+            results.append({
+                'stations': station_count,
+                'returncode': returncode,
+                'wall_seconds': round(seconds, 3),
+                'peak_rss_bytes': peak_rss,
+                'requests': site.stats['requests'],
+                'failed_requests': site.stats['failures'],
+                'bytes_transferred': site.stats['bytes_sent'],
+                'max_concurrent_requests': site.stats['max_in_flight'],
+                **output_summary(os.path.join(directory, 'out'))
+            })
+        finally:
+            shutil.rmtree(directory)
+
+    return {
+        'months': months,
+        'latency': latency,
+        'jitter': jitter,
+        'failure_every': failure_every,
+        'options': options,
+        'results': results
+    }
+
+
+def main(args: list = sys.argv[1:]) -> None:
+    """
+    Run the benchmark and print the results as JSON.
+
+    Parameters
+    ----------
+    args : list of str
+        The command line arguments.
+    """
+    parser = ArgumentParser(description='Load test the workflow against a simulated Met Office site.')
+    parser.add_argument('--stations', help='The numbers of stations.', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--months', help='The number of observations of each station.', type=int, default=1200)
+    parser.add_argument('--latency', help='The seconds each response is delayed by.', type=float, default=0.0)
+    parser.add_argument(
+        '--jitter',
+        help='Delay each response by up to this many seconds more.',
+        type=float,
+        default=0.0
+    )
+    parser.add_argument('--failure-every', help='Fail one in every N requests with a 503.', type=int, default=0)
+    parser.add_argument('--single-pass', help='Run the single pass workflow.', action='store_true')
+    parser.add_argument('--workers', help='The number of stations downloaded concurrently.', type=int, default=4)
+    parser.add_argument('--partitioned', help='Write a partitioned Parquet dataset.', action='store_true')
+    args = parser.parse_args(args)
+    options = ['-v', '--workers', str(args.workers)]
+
+    if args.single_pass:
+        options.append('--single-pass')
+
+    if args.partitioned:
+        options.append('--partitioned')
+
+    print(
+        json.dumps(
+            benchmark(args.stations, args.months, args.latency, args.jitter, args.failure_every, options),
+            indent=2
+        )
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+"""
+A local stand in for the Met Office station data site, for load tests.
+
+Serves synthetic station data files (see benchmarks.synthetic) of a configurable size, after a
+configurable latency, and can fail one in every N requests with a 503 (starting with the first)
+so that the retries of the transport are exercised.  Responses are gzip compressed when the
+client accepts it, as the Met Office's are.  The bytes sent, the number of requests and the most
+requests answered at the same time are counted.
+
+Usage: python -m benchmarks.fake_met_office [--stations N] [--months N] [--latency SECONDS] [--port N]
+       [--stations-file FILE]
+"""
+import gzip
+import sys
+import threading
+import time
+
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from argparse import ArgumentParser
+from benchmarks.synthetic import station_text
+
+
+class FakeMetOffice:
+    """Synthetic station data files served over HTTP from a background thread."""
+
+    def __init__(
+        self,
+        months: int = 1200,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_every: int = 0,
+        host: str = '127.0.0.1',
+        port: int = 0
+    ) -> None:
+        """
+        Create a FakeMetOffice object.
+
+        Parameters
+        ----------
+        months : int, optional
+            The number of observations in each station's file, by default 1200.
+        latency : float, optional
+            The seconds each response is delayed by, by default 0.
+        jitter : float, optional
+            Each response is delayed by up to this many seconds more, by default 0.
+        failure_every : int, optional
+            Fail one in every N requests (the first, N + 1th, ...) with a 503 response, by default
+            0 (never).
+        host : str, optional
+            The address to listen on, by default '127.0.0.1'.
+        port : int, optional
+            The port to listen on, by default 0 (any free port).
+        """
+        self.months = months
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_every = failure_every
+        self.stats = {'requests': 0, 'failures': 0, 'bytes_sent': 0, 'in_flight': 0, 'max_in_flight': 0}
+        self._lock = threading.Lock()
+        self._bodies = {}
+        handler = type('FakeMetOfficeRequestHandler', (_FakeMetOfficeRequestHandler,), {'site': self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """
+        Get the URL of the site.
+
+        Returns
+        -------
+        str
+            The URL, without a trailing slash.
+        """
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def station_url(self, index: int) -> str:
+        """
+        Get the URL of a station's data file.
+
+        Parameters
+        ----------
+        index : int
+            The index of the station.
+
+        Returns
+        -------
+        str
+            The URL of the file.
+        """
+        return f'{self.url}/stationdata/station{index}data.txt'
+
+    def stations_yaml(self, station_count: int) -> str:
+        """
+        Generate a station list, in the format of stations.yml, of the site's stations.
+
+        Parameters
+        ----------
+        station_count : int
+            The number of stations.
+
+        Returns
+        -------
+        str
+            The YAML text.
+        """
+        lines = ['---', 'stations:']
+
+        for index in range(station_count):
+            lines.append(f'  - name: Station {index}')
+            lines.append(f'    url: {self.station_url(index)}')
+
+        return '\n'.join(lines) + '\n'
+
+    def body(self, index: int, compressed: bool) -> bytes:
+        """
+        Get the body of a station's data file, generating it the first time.
+
+        Parameters
+        ----------
+        index : int
+            The index of the station.
+        compressed : bool
+            Compress the body with gzip.
+
+        Returns
+        -------
+        bytes
+            The body.
+        """
+        key = (index, compressed)
+
+        if key not in self._bodies:
+            body = station_text(f'Station {index}', self.months, index).encode('utf-8')
+            self._bodies[key] = gzip.compress(body, mtime=0) if compressed else body
+
+        return self._bodies[key]
+
+    def delay(self) -> float:
+        """
+        Get the delay of a response.
+
+        Returns
+        -------
+        float
+            The latency plus a jitter that varies from request to request.
+        """
+        with self._lock:
+            requests = self.stats['requests']
+
+        return self.latency + self.jitter * ((requests * 7919) % 101) / 100
+
+    def count(self, bytes_sent: int = 0) -> bool:
+        """
+        Count a request and decide if it fails.
+
+        Parameters
+        ----------
+        bytes_sent : int, optional
+            The bytes of the response body, by default 0.
+
+        Returns
+        -------
+        bool
+            True if the request is to fail, otherwise False.
+        """
+        with self._lock:
+            self.stats['requests'] += 1
+            failed = bool(self.failure_every) and (self.stats['requests'] - 1) % self.failure_every == 0
+
+            if failed:
+                self.stats['failures'] += 1
+            else:
+                self.stats['bytes_sent'] += bytes_sent
+
+        return failed
+
+    def track(self, change: int) -> None:
+        """
+        Track the number of requests being answered at the same time.
+
+        Parameters
+        ----------
+        change : int
+            1 when a request is started and -1 when it is answered.
+        """
+        with self._lock:
+            self.stats['in_flight'] += change
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+
+    def start(self) -> 'FakeMetOffice':
+        """
+        Start serving from a background thread.
+
+        Returns
+        -------
+        FakeMetOffice
+            This site.
+        """
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'FakeMetOffice':
+        """
+        Start serving from a background thread.
+
+        Returns
+        -------
+        FakeMetOffice
+            This site.
+        """
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Stop serving."""
+        self.stop()
+
+
+class _FakeMetOfficeRequestHandler(BaseHTTPRequestHandler):
+    """Answer GET /stationdata/station<index>data.txt with a synthetic station data file."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    site = None
+
+    def do_GET(self) -> None:
+        """Answer a GET request."""
+        name = self.path.rsplit('/', 1)[-1]
+        index = name[len('station'):-len('data.txt')]
+
+        if not (self.path.startswith('/stationdata/') and name.startswith('station') and index.isdigit()):
+            self._send(HTTPStatus.NOT_FOUND, b'Not found')
+            return
+
+        self.site.track(1)
+
+        try:
+            time.sleep(self.site.delay())
+        finally:
+            self.site.track(-1)
+
+        compressed = 'gzip' in self.headers.get('Accept-Encoding', '')
+        body = self.site.body(int(index), compressed)
+
+        if self.site.count(len(body)):
+            self._send(HTTPStatus.SERVICE_UNAVAILABLE, b'Service unavailable')
+            return
+
+        self._send(HTTPStatus.OK, body, 'gzip' if compressed else None)
+
+    def _send(self, status: HTTPStatus, body: bytes, content_encoding: str = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+
+        if content_encoding:
+            self.send_header('Content-Encoding', content_encoding)
+
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        """Do not log the requests."""
+
+
+def main(args: list = sys.argv[1:]) -> None:
+    """
+    Serve the fake site until interrupted, after writing its station list.
+
+    Parameters
+    ----------
+    args : list of str
+        The command line arguments.
+    """
+    parser = ArgumentParser(description='Serve synthetic station data files in place of the Met Office.')
+    parser.add_argument('--stations', help='The number of stations.', type=int, default=100)
+    parser.add_argument('--months', help='The number of observations of each station.', type=int, default=1200)
+    parser.add_argument('--latency', help='The seconds each response is delayed by.', type=float, default=0.0)
+    parser.add_argument(
+        '--jitter',
+        help='Delay each response by up to this many seconds more.',
+        type=float,
+        default=0.0
+    )
+    parser.add_argument('--failure-every', help='Fail one in every N requests with a 503.', type=int, default=0)
+    parser.add_argument('--port', help='The port to listen on.', type=int, default=8765)
+    parser.add_argument('--stations-file', help='The station list to write.', default='stations.yml')
+    args = parser.parse_args(args)
+    site = FakeMetOffice(args.months, args.latency, args.jitter, args.failure_every, port=args.port)
+
+    with open(args.stations_file, 'w') as stream:
+        stream.write(site.stations_yaml(args.stations))
+
+    print(f'Serving {args.stations} stations on {site.url}, listed in {args.stations_file}.', flush=True)
+
+    try:
+        site.server.serve_forever()
+    except KeyboardInterrupt:
+        site.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
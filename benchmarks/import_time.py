@@ -0,0 +1,170 @@
+"""
+Benchmark the import time of the command line and of the modules used by each task.
+
+Each entry point is run in a fresh interpreter with python -X importtime, and the total of the
+cumulative times of its top level imports is compared with its budget.  The budgets are multiples
+of the time taken by a bare import of pyarrow, measured in the same way, so they scale with the
+speed of the machine and can be asserted by the test suite.  Modules that an entry point must not
+import (e.g. Flyte for --help) are checked too.
+
+Usage: python -m benchmarks.import_time [--output FILE]
+"""
+import functools
+import json
+import os
+import subprocess
+import sys
+
+from argparse import ArgumentParser
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT_DIRECTORY, 'historic-met-station-data.py')
+HEAVY_MODULES = ['fastavro', 'flytekit', 'pandas', 'pyarrow', 'requests', 'smart_open', 'yaml']
+REFERENCE = ['-c', 'import pyarrow']
+# The best of several runs is taken, as the first import after a change may be slowed by compiling bytecode.
+REPEAT = 3
+# The arguments of each entry point, its budget as a multiple of the reference import time and the
+# heavy modules it may import.  The budgets are generous (the entry points without pyarrow take under
+# half of the reference and those with it under twice), so only a real regression fails them.
+ENTRY_POINTS = {
+    'help': ([SCRIPT, '--help'], 1.0, []),
+    'utils': (['-c', 'import historical.utils'], 1.0, []),
+    'metrics': (['-c', 'import historical.metrics'], 1.0, []),
+    'station': (['-c', 'import historical.station'], 3.0, ['pyarrow']),
+    'convert': (['-c', 'import historical.convert'], 3.0, ['fastavro', 'pyarrow']),
+    'query': (['-c', 'import historical.query'], 3.0, ['fastavro', 'pyarrow']),
+    'climatology': (['-c', 'import historical.climatology'], 3.0, ['fastavro', 'pyarrow']),
+    'manifest': (['-c', 'import historical.manifest'], 3.0, ['pyarrow']),
+    'validation': (['-c', 'import historical.validation'], 3.0, ['pyarrow']),
+    'upsert': (['-c', 'import historical.upsert'], 3.0, ['fastavro', 'pyarrow']),
+    'service': (['-c', 'import historical.service'], 3.0, ['fastavro', 'pyarrow'])
+}
+
+
+def import_times(args: list) -> tuple:
+    """
+    Run Python with -X importtime and get the cumulative import time of each top level module.
+
+    Parameters
+    ----------
+    args : list of str
+        The arguments to run Python with (e.g. ['-c', 'import historical.query']).
+
+    Returns
+    -------
+    tuple of (dict, set)
+        The cumulative import time in seconds of each module imported at the top level, and the
+        names of all of the modules imported.
+    """
+    process = subprocess.run(  # nosec B603
+        [sys.executable, '-X', 'importtime', *args],
+        capture_output=True,
+        check=True,
+        cwd=ROOT_DIRECTORY,
+        env={**os.environ, 'PYTHONPATH': os.pathsep.join([ROOT_DIRECTORY, os.environ.get('PYTHONPATH', '')])},
+        text=True
+    )
+    times = {}
+    modules = set()
+
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip())
+
+        # Nested imports are indented and are already counted in the cumulative time of their parent.
+        if not name.startswith('  '):
+            times[name.strip()] = times.get(name.strip(), 0) + int(cumulative) / 1e6
+
+    return (times, modules)
+
+
+def best_import_time(args: list) -> tuple:
+    """
+    Get the best total import time of several runs of Python with -X importtime.
+
+    Parameters
+    ----------
+    args : list of str
+        The arguments to run Python with.
+
+    Returns
+    -------
+    tuple of (float, set)
+        The best total import time in seconds and the names of all of the modules imported.
+    """
+    runs = [import_times(args) for _ in range(REPEAT)]
+    return (min(sum(times.values()) for times, _ in runs), runs[0][1])
+
+
+@functools.lru_cache(maxsize=None)
+def reference_seconds() -> float:
+    """
+    Get the import time of pyarrow on its own, which the budgets are multiples of.
+
+    It is only measured once by each process.
+
+    Returns
+    -------
+    float
+        The best total import time in seconds.
+    """
+    return best_import_time(REFERENCE)[0]
+
+
+def check_entry_point(name: str) -> dict:
+    """
+    Measure the imports of an entry point and check them against its budget.
+
+    Parameters
+    ----------
+    name : str
+        The name of the entry point in ENTRY_POINTS.
+
+    Returns
+    -------
+    dict
+        The total import time in seconds, the budget in seconds, the heavy modules imported that
+        are not allowed and whether the entry point is within its budget.
+    """
+    args, factor, allowed = ENTRY_POINTS[name]
+    seconds, modules = best_import_time(args)
+    seconds = round(seconds, 6)
+    budget = round(factor * reference_seconds(), 6)
+    unexpected = sorted(
+        module for module in HEAVY_MODULES
+        if module not in allowed and any(imported.split('.')[0] == module for imported in modules)
+    )
+    return {
+        'seconds': seconds,
+        'budget': budget,
+        'unexpected_modules': unexpected,
+        'within_budget': seconds <= budget and not unexpected
+    }
+
+
+def main(args: list = sys.argv[1:]) -> None:
+    """
+    Measure the import time of each entry point and print the results as JSON.
+
+    Parameters
+    ----------
+    args : list of str
+        The command line arguments.
+    """
+    parser = ArgumentParser(description='Benchmark the import time of each entry point.')
+    parser.add_argument('--output', help='A file to write the results to as well.')
+    args = parser.parse_args(args)
+    results = {name: check_entry_point(name) for name in ENTRY_POINTS}
+
+    if args.output:
+        with open(args.output, 'w') as stream:
+            json.dump(results, stream, indent=2)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
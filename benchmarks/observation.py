@@ -0,0 +1,90 @@
+"""
+Benchmark the parsing of lines into Observation objects and into an Arrow record batch.
+
+Reports the lines parsed per second, the records converted per second and the memory
+used by each Observation as JSON.  The lines are also parsed at once by the bulk parser, and
+its speedup is reported against parsing each line, without and with converting the records.
+
+Usage: python -m benchmarks.observation [--lines N]
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from argparse import ArgumentParser
+from benchmarks.synthetic import STATION_HEADER, observation_lines
+from historical.batch import parse_observation_batch
+from historical.observation import Observation
+
+
+def benchmark(lines: list) -> dict:
+    """
+    Time the parsing and conversion of lines and measure the memory of the parsed objects.
+
+    Parameters
+    ----------
+    lines : list of str
+        The observation lines to be parsed.
+
+    Returns
+    -------
+    dict
+        The benchmark results.
+    """
+    start = time.perf_counter()
+    observations = [Observation(line) for line in lines]
+    parse_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+
+    for observation in observations:
+        observation.station_name('Fulchester')
+        observation.to_dict()
+
+    to_dict_seconds = time.perf_counter() - start
+    del observations
+
+    tracemalloc.start()
+    observations = [Observation(line) for line in lines]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    header = STATION_HEADER.format(name='Fulchester')
+    text = header + ''.join(f'{line}\n' for line in lines)
+    # The first batch imports pandas (once for each process), so it is not timed.
+    parse_observation_batch(header + ''.join(f'{line}\n' for line in lines[:100]), 'Fulchester')
+    start = time.perf_counter()
+    batch = parse_observation_batch(text, 'Fulchester')
+    batch_seconds = time.perf_counter() - start
+    assert batch.num_rows == len(lines)
+
+    return {
+        'lines': len(lines),
+        'parse_lines_per_second': round(len(lines) / parse_seconds),
+        'to_dict_records_per_second': round(len(lines) / to_dict_seconds),
+        'bytes_per_observation': round(allocated / len(observations)),
+        'batch_lines_per_second': round(len(lines) / batch_seconds),
+        'batch_speedup': round(parse_seconds / batch_seconds, 1),
+        'batch_speedup_with_to_dict': round((parse_seconds + to_dict_seconds) / batch_seconds, 1)
+    }
+
+
+def main(args: list = sys.argv[1:]) -> None:
+    """
+    Run the benchmark and print the results as JSON.
+
+    Parameters
+    ----------
+    args : list of str
+        The command line arguments.
+    """
+    parser = ArgumentParser(description='Benchmark the parsing of observations.')
+    parser.add_argument('--lines', help='The number of lines to parse.', type=int, default=200000)
+    args = parser.parse_args(args)
+    lines = [line.strip() for line in observation_lines(args.lines)]
+    print(json.dumps(benchmark(lines), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark the compact Parquet schema against the standard one.
+
+Writes synthetic stations to Parquet files with the standard schema (arrow_schema), the compact
+schema (compact_arrow_schema) and the compact schema with 32 bit floats, then reads each file
+back.  Reports the file sizes, the bytes of the tables read back and the seconds taken to write
+and read each file, as JSON.  Parquet already dictionary encodes the pages of a file, so the
+savings are mostly in the memory of the tables rather than the size of the files.
+
+Usage: python -m benchmarks.parquet_schema [--stations N] [--months N] [--compression CODEC]
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from argparse import ArgumentParser
+from benchmarks.synthetic import station_text
+from historical.arrow import arrow_schema, cast_batch, compact_arrow_schema
+from historical.batch import parse_observation_batch
+
+
+def measure(batches: list, schema: pa.Schema, file_name: str, compression: str) -> dict:
+    """
+    Write observations to a Parquet file with a schema and read them back.
+
+    Parameters
+    ----------
+    batches : list of pyarrow.RecordBatch
+        The observations of each station.
+    schema : pyarrow.Schema
+        The schema of the file.
+    file_name : str
+        The name of the Parquet file to be written.
+    compression : str
+        The Parquet compression codec.
+
+    Returns
+    -------
+    dict
+        The file size, the bytes of the table read back and the seconds taken to write and read.
+    """
+    start = time.perf_counter()
+    table = pa.Table.from_batches([cast_batch(batch, schema) for batch in batches], schema).unify_dictionaries()
+    pq.write_table(table, file_name, compression=compression)
+    write_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    table = pq.read_table(file_name)
+    read_seconds = time.perf_counter() - start
+    return {
+        'file_bytes': os.path.getsize(file_name),
+        'table_bytes': table.nbytes,
+        'write_seconds': round(write_seconds, 4),
+        'read_seconds': round(read_seconds, 4)
+    }
+
+
+def benchmark(station_count: int, months: int, compression: str) -> dict:
+    """
+    Compare the Parquet schemas.
+
+    Parameters
+    ----------
+    station_count : int
+        The number of stations.
+    months : int
+        The number of observations of each station.
+    compression : str
+        The Parquet compression codec.
+
+    Returns
+    -------
+    dict
+        The benchmark results.
+    """
+    batches = [
+        parse_observation_batch(station_text(f'Station {index}', months, index), f'Station {index}')
+        for index in range(station_count)
+    ]
+    schemas = {
+        'standard': arrow_schema(),
+        'compact': compact_arrow_schema(),
+        'compact_float32': compact_arrow_schema(float32=True)
+    }
+    directory = tempfile.mkdtemp()
+
+    try:
+        results = {
+            name: measure(batches, schema, os.path.join(directory, f'{name}.parquet'), compression)
+            for name, schema in schemas.items()
+        }
+    finally:
+        shutil.rmtree(directory)
+
+    return {'rows': station_count * months, 'compression': compression, 'results': results}
+
+
+def main(args: list = sys.argv[1:]) -> None:
+    """
+    Run the benchmark and print the results as JSON.
+
+    Parameters
+    ----------
+    args : list of str
+        The command line arguments.
+    """
+    parser = ArgumentParser(description='Benchmark the compact Parquet schema against the standard one.')
+    parser.add_argument('--stations', help='The number of stations.', type=int, default=200)
+    parser.add_argument('--months', help='The number of observations of each station.', type=int, default=1200)
+    parser.add_argument('--compression', help='The Parquet compression codec.', default='snappy')
+    args = parser.parse_args(args)
+    print(json.dumps(benchmark(args.stations, args.months, args.compression), indent=2))
+
+
+if __name__ == '__main__':
+    main()
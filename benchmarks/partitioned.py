@@ -0,0 +1,96 @@
+"""
+Benchmark filtered reads of the single Parquet file against the partitioned Parquet dataset.
+
+Reports the median latency of reading one station over a ten year range as JSON, both when
+the dataset is opened for every read (cold) and when an opened dataset is reused (warm).  Both
+reads must return the same rows.
+
+Usage: python -m benchmarks.partitioned [--stations N] [--months N] [--repeats N]
+"""
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import pyarrow.dataset as ds
+
+from argparse import ArgumentParser
+from benchmarks.synthetic import write_avro_file
+from historical.convert import avro_to_parquet, avro_to_parquet_dataset
+
+
+def read_latency(path: str, station: str, repeats: int) -> dict:
+    """
+    Measure the median latency of filtered reads.
+
+    Parameters
+    ----------
+    path : str
+        The Parquet file or dataset directory.
+    station : str
+        The station to be read.
+    repeats : int
+        The number of times to repeat the read.
+
+    Returns
+    -------
+    dict
+        The median cold and warm latencies in milliseconds, and the number of rows read.
+    """
+    cold_timings = []
+    warm_timings = []
+    expression = (ds.field('station') == station) & (ds.field('year') >= 1990) & (ds.field('year') < 2000)
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        table = ds.dataset(path, format='parquet', partitioning='hive').to_table(filter=expression)
+        cold_timings.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        table = dataset.to_table(filter=expression)
+        warm_timings.append(time.perf_counter() - start)
+
+    return {
+        'cold_ms': round(statistics.median(cold_timings) * 1000, 3),
+        'warm_ms': round(statistics.median(warm_timings) * 1000, 3),
+        'rows': table.num_rows
+    }
+
+
+def main(args: list = sys.argv[1:]) -> None:
+    """
+    Run the benchmark and print the results as JSON.
+
+    Parameters
+    ----------
+    args : list of str
+        The command line arguments.
+    """
+    parser = ArgumentParser(description='Benchmark filtered reads of the Parquet output.')
+    parser.add_argument('--stations', help='The number of stations.', type=int, default=500)
+    parser.add_argument('--months', help='The number of months for each station.', type=int, default=2000)
+    parser.add_argument('--repeats', help='The number of times to repeat each read.', type=int, default=20)
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory() as directory:
+        avro_file_name = os.path.join(directory, 'observations.avro')
+        write_avro_file(avro_file_name, args.stations, args.months)
+        single_file_name = os.path.join(directory, 'observations.parquet')
+        dataset_directory = os.path.join(directory, 'dataset')
+        avro_to_parquet(avro_file_name, single_file_name)
+        avro_to_parquet_dataset(avro_file_name, dataset_directory)
+        station = f'Station {args.stations // 2}'
+        results = {
+            'records': args.stations * args.months,
+            'single_file': read_latency(single_file_name, station, args.repeats),
+            'partitioned_dataset': read_latency(dataset_directory, station, args.repeats)
+        }
+        assert results['partitioned_dataset']['rows'] == results['single_file']['rows']
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""
+Load test the HTTP read service.
+
+Sends station and date range queries from several client threads, each over its own keep-alive
+connection, and reports the p50 and p99 latency (in milliseconds) and the requests per second,
+as JSON.  The queries are drawn from a pool with a Zipf-like skew, so a few are hot, as they are
+for dashboards showing the same stations.
+
+Without --url, a partitioned dataset of synthetic stations is written and served in this process,
+once with the LRU cache and once without it, for comparison.  With --url, a running service
+(python historic-met-station-data.py serve) is tested instead.
+
+Usage: python -m benchmarks.service_load [--url URL] [--requests N] [--concurrency N] [--format FORMAT]
+"""
+import http.client
+import json
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.synthetic import station_text
+from historical.batch import parse_observation_batch
+from historical.convert import write_station_partition
+from historical.service import ObservationService, make_server
+
+
+def query_paths(stations: list, query_count: int, output_format: str, seed: int = 0) -> list:
+    """
+    Generate a pool of station and date range queries.
+
+    Parameters
+    ----------
+    stations : list of str
+        The names of the stations.
+    query_count : int
+        The number of distinct queries.
+    output_format : str
+        The format of the responses (json, csv or arrow).
+    seed : int, optional
+        The seed for the random number generator, by default 0.
+
+    Returns
+    -------
+    list of str
+        The paths of the queries.
+    """
+    rng = random.Random(seed)  # nosec B311
+    paths = []
+
+    for _ in range(query_count):
+        start = rng.randint(1900, 2000)
+        parameters = {'start': start, 'end': start + rng.choice([1, 10, 30]), 'format': output_format}
+        station = urllib.parse.quote(rng.choice(stations), safe='')
+        paths.append(f'/stations/{station}?{urllib.parse.urlencode(parameters)}')
+
+    return paths
+
+
+def run_client(host: str, port: int, paths: list) -> list:
+    """
+    Send queries over a keep-alive connection and time each of them.
+
+    Parameters
+    ----------
+    host : str
+        The host of the service.
+    port : int
+        The port of the service.
+    paths : list of str
+        The paths of the queries.
+
+    Returns
+    -------
+    list of float
+        The seconds taken by each query, or None where it failed.
+    """
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    latencies = []
+
+    try:
+        for path in paths:
+            start = time.perf_counter()
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            latencies.append(time.perf_counter() - start if response.status == 200 else None)
+    finally:
+        connection.close()
+
+    return latencies
+
+
+def load_test(url: str, requests: int, concurrency: int, output_format: str, query_count: int) -> dict:
+    """
+    Load test a running service.
+
+    Parameters
+    ----------
+    url : str
+        The URL of the service (e.g. http://127.0.0.1:8080).
+    requests : int
+        The total number of requests.
+    concurrency : int
+        The number of client threads.
+    output_format : str
+        The format of the responses (json, csv or arrow).
+    query_count : int
+        The number of distinct queries the requests are drawn from.
+
+    Returns
+    -------
+    dict
+        The latency percentiles, the requests per second and the statistics of the service.
+    """
+    url = urllib.parse.urlsplit(url)
+    connection = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+    connection.request('GET', '/stations')
+    stations = json.loads(connection.getresponse().read())
+    connection.close()
+    pool = query_paths(stations, query_count, output_format)
+    # A Zipf-like skew, so the first queries of the pool are requested the most.
+    ranks = np.random.default_rng(0).zipf(1.2, requests) % len(pool)
+    paths = [pool[rank] for rank in ranks]
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        futures = [
+            executor.submit(run_client, url.hostname, url.port, paths[index::concurrency])
+            for index in range(concurrency)
+        ]
+        latencies = [latency for future in futures for latency in future.result()]
+
+    seconds = time.perf_counter() - start
+    succeeded = np.array([latency for latency in latencies if latency is not None])
+    connection = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+    connection.request('GET', '/health')
+    stats = json.loads(connection.getresponse().read())
+    connection.close()
+    return {
+        'requests': requests,
+        'errors': len(latencies) - len(succeeded),
+        'p50_ms': round(float(np.percentile(succeeded, 50)) * 1000, 3) if len(succeeded) else None,
+        'p99_ms': round(float(np.percentile(succeeded, 99)) * 1000, 3) if len(succeeded) else None,
+        'requests_per_second': round(requests / seconds, 1),
+        'cache_hits': stats['cache_hits'],
+        'cache_misses': stats['cache_misses']
+    }
+
+
+def benchmark(
+    station_count: int,
+    months: int,
+    requests: int,
+    concurrency: int,
+    output_format: str,
+    query_count: int,
+    cache_size: int
+) -> dict:
+    """
+    Load test a service of synthetic stations, with and without the LRU cache.
+
+    Parameters
+    ----------
+    station_count : int
+        The number of stations.
+    months : int
+        The number of observations of each station.
+    requests : int
+        The total number of requests of each load test.
+    concurrency : int
+        The number of client threads.
+    output_format : str
+        The format of the responses (json, csv or arrow).
+    query_count : int
+        The number of distinct queries the requests are drawn from.
+    cache_size : int
+        The size of the LRU cache.
+
+    Returns
+    -------
+    dict
+        The results of the load tests.
+    """
+    directory = tempfile.mkdtemp()
+    dataset_directory = f'{directory}/historic-station-data.parquet'
+    part_numbers = {}
+    results = {}
+
+    try:
+        for index in range(station_count):
+            batch = parse_observation_batch(station_text(f'Station {index}', months, index), f'Station {index}')
+            write_station_partition([batch], dataset_directory, part_numbers, 'snappy')
+
+        for name, size in [('cached', cache_size), ('uncached', 0)]:
+            server = make_server(ObservationService(directory, cache_size=size), port=0)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+
+            try:
+                results[name] = load_test(
+                    f'http://127.0.0.1:{server.server_port}',
+                    requests,
+                    concurrency,
+                    output_format,
+                    query_count
+                )
+            finally:
+                server.shutdown()
+                server.server_close()
+    finally:
+        shutil.rmtree(directory)
+
+    return {
+        'stations': station_count,
+        'months': months,
+        'concurrency': concurrency,
+        'format': output_format,
+        'results': results
+    }
+
+
+def main(args: list = sys.argv[1:]) -> None:
+    """
+    Run the load test and print the results as JSON.
+
+    Parameters
+    ----------
+    args : list of str
+        The command line arguments.
+    """
+    parser = ArgumentParser(description='Load test the HTTP read service.')
+    parser.add_argument('--url', help='The URL of a running service (by default one is started on synthetic data).')
+    parser.add_argument('--stations', help='The number of synthetic stations.', type=int, default=50)
+    parser.add_argument('--months', help='The number of observations of each station.', type=int, default=1200)
+    parser.add_argument('--requests', help='The total number of requests.', type=int, default=5000)
+    parser.add_argument('--concurrency', help='The number of client threads.', type=int, default=8)
+    parser.add_argument('--format', help='The response format.', choices=['json', 'csv', 'arrow'], default='json')
+    parser.add_argument('--queries', help='The number of distinct queries.', type=int, default=500)
+    parser.add_argument('--cache-size', help='The size of the LRU cache.', type=int, default=256)
+    args = parser.parse_args(args)
+
+    if args.url:
+        results = load_test(args.url, args.requests, args.concurrency, args.format, args.queries)
+    else:
+        results = benchmark(
+            args.stations,
+            args.months,
+            args.requests,
+            args.concurrency,
+            args.format,
+            args.queries,
+            args.cache_size
+        )
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""
+Run the benchmark suite over synthetic station files.
+
+Times Observation parsing, Station.get_observations, Station.get_observation_batch, Avro
+writing and the Parquet and CSV conversions (as run by generate_parquet_file and
+generate_csv_file).  Each stage runs in a fresh process so that its peak resident memory
+can be measured.  The records per second and peak memory of each stage are printed as
+JSON, and optionally written to a file, so that runs can be compared over time.
+
+Usage: python -m benchmarks.suite [--stations N] [--months N] [--stages STAGE ...] [--output FILE]
+"""
+import concurrent.futures
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+import fastavro
+import pyarrow as pa
+
+from argparse import ArgumentParser
+from benchmarks.synthetic import station_text
+from historical.avro import AvroWriter
+from historical.convert import avro_to_csv, avro_to_parquet
+from historical.observation import Observation
+from historical.station import Station
+
+
+def read_stations(directory: str) -> list:
+    """
+    Read the synthetic stations of a benchmark directory.
+
+    Parameters
+    ----------
+    directory : str
+        The benchmark directory.
+
+    Returns
+    -------
+    list of Station
+        The stations.
+    """
+    with open(os.path.join(directory, 'stations.json')) as stream:
+        return [Station(station['name'], station['url']) for station in json.load(stream)]
+
+
+def observation_parse(directory: str) -> tuple:
+    """Time the parsing of observation lines into Observation objects."""
+    lines = []
+
+    for station in read_stations(directory):
+        with open(station.url) as stream:
+            lines.extend(line.strip() for line in stream if line.strip()[:1].isdigit())
+
+    start = time.perf_counter()
+
+    for line in lines:
+        Observation(line)
+
+    return (len(lines), time.perf_counter() - start)
+
+
+def station_get_observations(directory: str) -> tuple:
+    """Time the reading of station files into Observation objects."""
+    record_count = 0
+    start = time.perf_counter()
+
+    for station in read_stations(directory):
+        for observation in station.get_observations():
+            observation.station_name(station.name)
+            record_count += 1
+
+    return (record_count, time.perf_counter() - start)
+
+
+def station_get_observation_batch(directory: str) -> tuple:
+    """Time the reading of station files into columnar batches."""
+    record_count = 0
+    start = time.perf_counter()
+
+    for station in read_stations(directory):
+        record_count += station.get_observation_batch().num_rows
+
+    return (record_count, time.perf_counter() - start)
+
+
+def avro_write(directory: str) -> tuple:
+    """Time the writing of observation records to an Avro file."""
+    records = []
+
+    for station in read_stations(directory):
+        records.extend(station.get_observation_batch().to_pylist())
+
+    start = time.perf_counter()
+
+    with AvroWriter(os.path.join(directory, 'written.avro')) as avro_writer:
+        avro_writer.write_many(records)
+
+    return (len(records), time.perf_counter() - start)
+
+
+def parquet_convert(directory: str) -> tuple:
+    """Time the conversion of the Avro file to a Parquet file."""
+    start = time.perf_counter()
+    record_count = avro_to_parquet(
+        os.path.join(directory, 'observations.avro'),
+        os.path.join(directory, 'observations.parquet')
+    )
+    return (record_count, time.perf_counter() - start)
+
+
+def csv_convert(directory: str) -> tuple:
+    """Time the conversion of the Avro file to a CSV file."""
+    start = time.perf_counter()
+    record_count = avro_to_csv(
+        os.path.join(directory, 'observations.avro'),
+        os.path.join(directory, 'observations.csv')
+    )
+    return (record_count, time.perf_counter() - start)
+
+
+STAGES = {
+    'observation_parse': observation_parse,
+    'station_get_observations': station_get_observations,
+    'station_get_observation_batch': station_get_observation_batch,
+    'avro_write': avro_write,
+    'parquet_convert': parquet_convert,
+    'csv_convert': csv_convert
+}
+
+
+def peak_rss_bytes() -> int:
+    """
+    Get the peak resident memory of this process.
+
+    Returns
+    -------
+    int
+        The peak resident set size in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_stage(name: str, directory: str) -> dict:
+    """
+    Run a stage of the benchmark.  This is intended to run in a fresh process.
+
+    Parameters
+    ----------
+    name : str
+        The name of the stage.
+    directory : str
+        The benchmark directory.
+
+    Returns
+    -------
+    dict
+        The records processed, seconds taken, records per second and peak memory of the stage.  The
+        peak memory is also given less the memory of the interpreter and imported modules.
+    """
+    baseline = peak_rss_bytes()
+    record_count, seconds = STAGES[name](directory)
+    peak = peak_rss_bytes()
+    return {
+        'records': record_count,
+        'seconds': round(seconds, 3),
+        'records_per_second': round(record_count / seconds),
+        'peak_rss_bytes': peak,
+        'peak_rss_increase_bytes': peak - baseline
+    }
+
+
+def prepare(directory: str, stations: int, months: int) -> None:
+    """
+    Write the synthetic station files and the Avro file that the stages read.
+
+    Parameters
+    ----------
+    directory : str
+        The benchmark directory.
+    stations : int
+        The number of stations.
+    months : int
+        The number of monthly observations for each station.
+    """
+    stations_data = []
+
+    for index in range(stations):
+        name = f'Station {index}'
+        file_name = os.path.join(directory, f'station{index}data.txt')
+
+        with open(file_name, 'w') as stream:
+            stream.write(station_text(name, months, index))
+
+        stations_data.append({'name': name, 'url': file_name})
+
+    with open(os.path.join(directory, 'stations.json'), 'w') as stream:
+        json.dump(stations_data, stream)
+
+    with AvroWriter(os.path.join(directory, 'observations.avro')) as avro_writer:
+        for station in read_stations(directory):
+            avro_writer.write_many(station.get_observation_batch().to_pylist())
+
+
+def main(args: list = sys.argv[1:]) -> None:
+    """
+    Run the benchmark suite and print the results as JSON.
+
+    Parameters
+    ----------
+    args : list of str
+        The command line arguments.
+    """
+    parser = ArgumentParser(description='Run the benchmark suite.')
+    parser.add_argument('--stations', help='The number of stations.', type=int, default=50)
+    parser.add_argument('--months', help='The number of months for each station.', type=int, default=2000)
+    parser.add_argument('--stages', help='The stages to run.', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--output', help='A file to write the results to as well.')
+    args = parser.parse_args(args)
+    results = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pyarrow': pa.__version__,
+            'fastavro': fastavro.__version__
+        },
+        'stations': args.stations,
+        'months': args.months,
+        'stages': {}
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        prepare(directory, args.stations, args.months)
+
+        for name in args.stages:
+            # A fresh process for each stage, so that the peak memory is only of that stage.
+            with concurrent.futures.ProcessPoolExecutor(1, multiprocessing.get_context('spawn')) as executor:
+                results['stages'][name] = executor.submit(run_stage, name, directory).result()
+
+    if args.output:
+        with open(args.output, 'w') as stream:
+            json.dump(results, stream, indent=2)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Generate synthetic station data for benchmarks.
+
+Methods
+-------
+observation_lines - Generate synthetic observation lines.
+station_text - Generate the text of a synthetic station data file.
+write_avro_file - Write an Avro file of synthetic observations.
+"""
+import random
+
+from historical.avro import AvroWriter
+from historical.batch import parse_observation_batch
+
+STATION_HEADER = """{name}
+Location: 224100E 252100N, Lat 52.139 Lon -4.570, 133 metres amsl
+Estimated data is marked with a * after the value.
+Missing data (more than 2 days missing in month) is marked by  ---.
+Sunshine data taken from an automatic Kipp & Zonen sensor marked with a #, otherwise sunshine data taken from a \
+Campbell Stokes recorder.
+   yyyy  mm   tmax    tmin      af    rain     sun
+              degC    degC    days      mm   hours
+"""
+
+
+def amount(rng: random.Random, low: float, high: float, decimals: int = 1) -> str:
+    """
+    Generate a field that may be missing or estimated.
+
+    Parameters
+    ----------
+    rng : random.Random
+        The random number generator.
+    low : float
+        The lowest value.
+    high : float
+        The highest value.
+    decimals : int, optional
+        The number of decimal places, by default 1.
+
+    Returns
+    -------
+    str
+        A field in the format provided by the Met Office.
+    """
+    chance = rng.random()
+
+    if chance < 0.02:
+        return '---'
+
+    value = f'{rng.uniform(low, high):.{decimals}f}'
+    return f'{value}*' if chance < 0.05 else value
+
+
+def observation_lines(count: int, seed: int = 0, start_year: int = 1853):
+    """
+    Generate synthetic observation lines.
+
+    The lines cover the patterns found in the real data: estimated values (*), Kipp & Zonen
+    sun values (#), missing values (---), missing sun columns, provisional data and the odd
+    patterns removed by Observation.remove_illegal_patterns.
+
+    Parameters
+    ----------
+    count : int
+        The number of lines to generate.
+    seed : int, optional
+        The seed for the random number generator, by default 0.
+    start_year : int, optional
+        The year of the first observation, by default 1853.
+
+    Yields
+    ------
+    str
+        A line of observation data.
+    """
+    rng = random.Random(seed)  # nosec B311
+    provisional_from = count - min(count, 6)
+
+    for index in range(count):
+        year = start_year + index // 12
+        month = index % 12 + 1
+        fields = [
+            f'{year:7}',
+            f'{month:3}',
+            # The ranges do not overlap, so that tmin is never above tmax.
+            f'{amount(rng, 8.0, 28.0):>7}',
+            f'{amount(rng, -8.0, 8.0):>7}',
+            f'{amount(rng, 0, 25, 0):>7}',
+            f'{amount(rng, 0.0, 250.0):>7}'
+        ]
+
+        # The provisional rows always have a sun field, so that "Provisional" is never read as the sun.
+        if index >= 600 or index >= provisional_from:
+            sun = amount(rng, 10.0, 280.0)
+            fields.append(f'{sun}#' if index > count // 2 and sun[-1].isdigit() else sun)
+
+        if index >= provisional_from:
+            fields.append('  Provisional')
+        elif rng.random() < 0.001:
+            fields.append(rng.choice(['  $', '  all data from Whitby', '  Change to Monckton Ave']))
+
+        yield ' '.join(fields)
+
+
+def station_text(name: str, count: int, seed: int = 0) -> str:
+    """
+    Generate the text of a synthetic station data file.
+
+    Parameters
+    ----------
+    name : str
+        The name of the station.
+    count : int
+        The number of observations in the file.
+    seed : int, optional
+        The seed for the random number generator, by default 0.
+
+    Returns
+    -------
+    str
+        The contents of a station data file.
+    """
+    lines = [STATION_HEADER.format(name=name)]
+    lines.extend(f'{line}\n' for line in observation_lines(count, seed))
+    return ''.join(lines)
+
+
+def write_avro_file(avro_file_name: str, stations: int, months: int) -> None:
+    """
+    Write an Avro file of synthetic observations.
+
+    Parameters
+    ----------
+    avro_file_name : str
+        The name of the Avro file.
+    stations : int
+        The number of stations.
+    months : int
+        The number of monthly observations for each station.
+    """
+    with AvroWriter(avro_file_name) as avro_writer:
+        for index in range(stations):
+            name = f'Station {index}'
+            avro_writer.write_many(parse_observation_batch(station_text(name, months, index), name).to_pylist())
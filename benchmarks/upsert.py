@@ -0,0 +1,189 @@
+"""
+Benchmark upserting the changes of an incremental run into a station partitioned Parquet dataset.
+
+Writes an Avro file and a dataset of synthetic stations of several sizes, then revises the
+provisional observations of some of the stations (making them final).  As in an incremental run,
+the revised observations are appended to the Avro file and written to a changes file, and the
+dataset is upserted from the changes file (as generate_parquet_file does with --incremental
+--partitioned).  Reports the seconds taken by each upsert as JSON, with the seconds taken to
+upsert from the whole Avro file instead and to write the whole dataset again for comparison.
+The cost of an upsert should grow with the number of changed stations and not with the size of
+the dataset.
+
+Usage: python -m benchmarks.upsert [--stations N [N ...]] [--changed N [N ...]] [--months N]
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from argparse import ArgumentParser
+from benchmarks.synthetic import station_text
+from historical.avro import AvroWriter
+from historical.batch import parse_observation_batch
+from historical.convert import read_avro_batches
+from historical.upsert import upsert_avro_changes, upsert_parquet_dataset
+
+
+def revise(batch: pa.RecordBatch) -> pa.RecordBatch:
+    """
+    Revise the provisional observations of a station, making them final with a little more rain.
+
+    Parameters
+    ----------
+    batch : pyarrow.RecordBatch
+        The observations of a station.
+
+    Returns
+    -------
+    pyarrow.RecordBatch
+        The revised observations, which are those an incremental run would accept.
+    """
+    provisional = batch['isProvisional']
+    rain = pc.if_else(provisional, pc.add(batch['rain'], 1.0), batch['rain'])
+    columns = [
+        rain if name == 'rain' else pc.and_not(provisional, provisional) if name == 'isProvisional' else batch[name]
+        for name in batch.schema.names
+    ]
+    return pa.RecordBatch.from_arrays(columns, schema=batch.schema).filter(provisional)
+
+
+def timed(function, *args) -> tuple:
+    """
+    Time a call of a function.
+
+    Parameters
+    ----------
+    function : callable
+        The function.
+    *args
+        The arguments of the call.
+
+    Returns
+    -------
+    tuple of (float, object)
+        The seconds taken and the result of the call.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return (time.perf_counter() - start, result)
+
+
+def write_avro(avro_file_name: str, batches: list) -> None:
+    """
+    Append observations to an Avro file.
+
+    Parameters
+    ----------
+    avro_file_name : str
+        The full path to the Avro file, which is created if it does not exist.
+    batches : list of pyarrow.RecordBatch
+        The observations.
+    """
+    with AvroWriter(avro_file_name, append=True) as avro_writer:
+        for batch in batches:
+            avro_writer.write_many(batch.to_pylist())
+
+
+def benchmark(station_counts: list, changed_counts: list, months: int) -> dict:
+    """
+    Time upserts of the changes of incremental runs into datasets of several sizes.
+
+    Parameters
+    ----------
+    station_counts : list of int
+        The number of stations in each dataset.
+    changed_counts : list of int
+        The numbers of stations revised.
+    months : int
+        The number of observations of each station.
+
+    Returns
+    -------
+    dict
+        The benchmark results.
+    """
+    batches = [
+        parse_observation_batch(station_text(f'Station {index}', months, index), f'Station {index}')
+        for index in range(max(station_counts))
+    ]
+    results = []
+
+    for station_count in station_counts:
+        directory = tempfile.mkdtemp()
+
+        try:
+            avro_file_name = os.path.join(directory, 'full.avro')
+            write_avro(avro_file_name, batches[:station_count])
+            # Without a dataset, it is built from the whole Avro file.
+            write_seconds, _ = timed(
+                upsert_avro_changes,
+                os.path.join(directory, 'full.parquet'),
+                avro_file_name,
+                os.path.join(directory, 'full.changes.avro')
+            )
+
+            for changed_count in changed_counts:
+                base_name = os.path.join(directory, f'upserted-{changed_count}')
+                shutil.copytree(os.path.join(directory, 'full.parquet'), f'{base_name}.parquet')
+                shutil.copytree(os.path.join(directory, 'full.parquet'), f'{base_name}-whole.parquet')
+                shutil.copyfile(avro_file_name, f'{base_name}.avro')
+                revised = [revise(batch) for batch in batches[:min(changed_count, station_count)]]
+                write_avro(f'{base_name}.avro', revised)
+                write_avro(f'{base_name}.changes.avro', revised)
+                seconds, stats = timed(
+                    upsert_avro_changes,
+                    f'{base_name}.parquet',
+                    f'{base_name}.avro',
+                    f'{base_name}.changes.avro'
+                )
+                whole_seconds, whole_stats = timed(
+                    upsert_parquet_dataset,
+                    f'{base_name}-whole.parquet',
+                    read_avro_batches(f'{base_name}.avro')
+                )
+                assert stats['changed_rows'] == whole_stats['changed_rows']
+                results.append({
+                    'dataset_rows': station_count * months,
+                    'changed_stations': stats['stations_rewritten'],
+                    'changed_rows': stats['changed_rows'],
+                    'upsert_seconds': round(seconds, 4),
+                    'whole_avro_upsert_seconds': round(whole_seconds, 4),
+                    'full_write_seconds': round(write_seconds, 4)
+                })
+        finally:
+            shutil.rmtree(directory)
+
+    return {'months': months, 'results': results}
+
+
+def main(args: list = sys.argv[1:]) -> None:
+    """
+    Run the benchmark and print the results as JSON.
+
+    Parameters
+    ----------
+    args : list of str
+        The command line arguments.
+    """
+    parser = ArgumentParser(description='Benchmark upserting the changes of an incremental run into a Parquet dataset.')
+    parser.add_argument(
+        '--stations',
+        help='The number of stations in each dataset.',
+        type=int,
+        nargs='+',
+        default=[50, 400]
+    )
+    parser.add_argument('--changed', help='The numbers of stations revised.', type=int, nargs='+', default=[1, 10])
+    parser.add_argument('--months', help='The number of observations of each station.', type=int, default=1200)
+    args = parser.parse_args(args)
+    print(json.dumps(benchmark(args.stations, args.changed, args.months), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark the cost of validating station data as it is parsed.
+
+Parses synthetic station files into batches with and without a quarantine, and reports the
+rows parsed per second of each and the time spent validating as a fraction of the parse time,
+as JSON.  Each is timed several times and the quickest is reported, so other work on the
+machine does not skew the fraction.  The time spent in the checks themselves (as measured by
+the quarantine) is reported as a fraction of the parse time too.
+
+Usage: python -m benchmarks.validation [--stations N] [--months N] [--repeat N]
+"""
+import json
+import sys
+import time
+
+from argparse import ArgumentParser
+from benchmarks.synthetic import station_text
+from historical.batch import parse_observation_batch
+from historical.validation import Quarantine
+
+
+def parse_seconds(texts: list, quarantine: Quarantine = None) -> float:
+    """
+    Time the parsing of station files.
+
+    Parameters
+    ----------
+    texts : list of str
+        The text of each station file.
+    quarantine : historical.validation.Quarantine, optional
+        Validate the rows with this quarantine, by default they are not validated.
+
+    Returns
+    -------
+    float
+        The seconds taken.
+    """
+    start = time.perf_counter()
+
+    for index, text in enumerate(texts):
+        parse_observation_batch(text, f'Station {index}', quarantine)
+
+    return time.perf_counter() - start
+
+
+def benchmark(stations: int, months: int, repeat: int) -> dict:
+    """
+    Time the parsing of synthetic station files with and without validation.
+
+    Parameters
+    ----------
+    stations : int
+        The number of station files.
+    months : int
+        The number of observations in each file.
+    repeat : int
+        The number of times each is timed.
+
+    Returns
+    -------
+    dict
+        The benchmark results.
+    """
+    texts = [station_text(f'Station {index}', months, index) for index in range(stations)]
+    parse_observation_batch(texts[0], 'Station 0', Quarantine())
+    unvalidated = []
+    validated = []
+    checked = []
+
+    for _ in range(repeat):
+        unvalidated.append(parse_seconds(texts))
+        quarantine = Quarantine()
+        validated.append(parse_seconds(texts, quarantine))
+        checked.append(quarantine.stats['seconds'])
+
+    rows = stations * months
+    return {
+        'rows': rows,
+        'quarantined_rows': quarantine.stats['rejected'],
+        'parse_rows_per_second': round(rows / min(unvalidated)),
+        'validated_parse_rows_per_second': round(rows / min(validated)),
+        'validation_fraction_of_parse': round(min(validated) / min(unvalidated) - 1, 3),
+        'checks_fraction_of_parse': round(min(checked) / min(unvalidated), 3)
+    }
+
+
+def main(args: list = sys.argv[1:]) -> None:
+    """
+    Run the benchmark and print the results as JSON.
+
+    Parameters
+    ----------
+    args : list of str
+        The command line arguments.
+    """
+    parser = ArgumentParser(description='Benchmark the validation of station data.')
+    parser.add_argument('--stations', help='The number of station files.', type=int, default=50)
+    parser.add_argument('--months', help='The number of observations in each file.', type=int, default=2000)
+    parser.add_argument('--repeat', help='The number of times each is timed.', type=int, default=9)
+    args = parser.parse_args(args)
+    print(json.dumps(benchmark(args.stations, args.months, args.repeat), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,21 +3,21 @@
 Extract the historical station data from the Met Office and export to various file formats.
 
 Initially the data is exported to an Avro file.  In turn, this file is extracted to Parquet and CSV.
+
+The station sources are snapshotted first, and the outputs are named after a hash of their
+contents.  The other tasks are cached with a key that is reused while the manifest of the
+previous outputs of the same sources still verifies, so a rerun with unchanged sources returns
+the previous outputs without running them again.
 """
-import csv
-import datetime
+import json
 import os
-import pandas as pd
-import pyarrow as pa
-import pyarrow.parquet as pq
+import sys
 import tempfile
 import typing
-import yaml
+import urllib.parse
+import uuid
 
-from fastavro import writer, parse_schema, reader
-from flytekit import task, workflow
-from historical.avsc import OBSERVATION_AVRO_SCHEMA
-from historical.station import Station
+from historical.metrics import PROFILE_VARIABLE, TRACE_MEMORY_VARIABLE, Metrics, merge_metrics, profiled
 from historical.utils import command_line_interface
 from historical.utils import get_logger
 
@@ -26,174 +26,1240 @@ if 'TMPDIR' in os.environ:
 else:
     TMPDIR = tempfile.gettempdir()
 
+# The maximum number of station shards extracted at the same time (0 is unbounded).
+MAX_CONCURRENCY = int(os.environ.get('HISTORICAL_MAX_CONCURRENCY', '0'))
+# Increment this when a change to the tasks changes their outputs, so that cached results are not reused.
+CACHE_VERSION = '3'
 
-@task
-def generate_avro_file(temporary_directory: str, log_level: str = 'WARN') -> str:
+if __name__ == '__main__':
+    # The command line is parsed before Flyte is imported, so that --help, argument errors and
+    # queries do not wait for it.  The data libraries are imported by the tasks that use them.
+    ARGS = command_line_interface()
+
+    if ARGS.command == 'query':
+        from historical.query import ObservationQuery, latest_parquet, write_table
+
+        observation_query = ObservationQuery(ARGS.parquet or latest_parquet(TMPDIR))
+        write_table(
+            observation_query.query(ARGS.station, ARGS.start, ARGS.end, ARGS.columns),
+            sys.stdout.buffer,
+            ARGS.format
+        )
+        sys.exit(0)
+
+    if ARGS.command == 'serve':
+        from historical.service import ObservationService, make_server
+
+        service = ObservationService(
+            TMPDIR,
+            ARGS.parquet,
+            ARGS.cache_size,
+            ARGS.reload_interval,
+            'DEBUG' if ARGS.debug else 'INFO' if ARGS.verbose else 'WARN'
+        )
+        service.refresh()
+        server = make_server(service, ARGS.host, ARGS.port)
+        service.logger.info(f'Serving {service.path} on http://{ARGS.host}:{server.server_port}.')
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+
+        sys.exit(0)
+
+from flytekit import map_task, task, workflow  # noqa: E402
+
+
+def path_size(path: str) -> int:
+    """
+    Get the size of a file, or the total size of the files in a directory.
+
+    Parameters
+    ----------
+    path : str
+        The path to the file or directory.
+
+    Returns
+    -------
+    int
+        The size in bytes.
     """
-    Extract the data from the Met Office website and write it to an Avro file.
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+
+    return sum(
+        os.path.getsize(os.path.join(directory, file_name))
+        for directory, _, file_names in os.walk(path)
+        for file_name in file_names
+    )
+
+
+def output_base_name(temporary_directory: str, content_hash: str) -> str:
+    """
+    Get the name of the outputs of a snapshot of the sources, without an extension.
 
     Parameters
     ----------
     temporary_directory : str
         The path to the temporary directory.
-    log_level : str
-        The log level for logging.
+    content_hash : str
+        The content hash of the sources.
 
     Returns
     -------
     str
-        The name of the Avro file generated.
+        The full path of the outputs without an extension.
     """
-    today = datetime.datetime.now()
-    avro_file_name = f'{temporary_directory}{os.sep}historic-station-data-{today.year}-{today.month}-{today.day}.avro'
-    logger = get_logger('avro-generator', log_level)
-    logger.debug(f'Avro file name is {avro_file_name}.')
-    parsed_schema = parse_schema(OBSERVATION_AVRO_SCHEMA)
-    total_records_written = 0
+    return f'{temporary_directory}{os.sep}historic-station-data-{content_hash[:16]}'
 
-    with open('stations.yml') as stream:
+
+def quarantine_file_name(avro_file_name: str) -> str:
+    """
+    Get the name of the file of the rows quarantined from an Avro file.
+
+    Parameters
+    ----------
+    avro_file_name : str
+        The full path to the Avro file.
+
+    Returns
+    -------
+    str
+        The full path to the quarantine file (e.g. /tmp/historic-station-data-<hash>.quarantine.csv).
+    """
+    return f'{os.path.splitext(avro_file_name)[0]}.quarantine.csv'
+
+
+def changes_file_name(avro_file_name: str) -> str:
+    """
+    Get the name of the file of the observations accepted by incremental runs since the last upsert.
+
+    Parameters
+    ----------
+    avro_file_name : str
+        The full path to the incremental Avro file.
+
+    Returns
+    -------
+    str
+        The full path to the changes file (e.g. /tmp/historic-station-data.changes.avro).
+    """
+    return f'{os.path.splitext(avro_file_name)[0]}.changes.avro'
+
+
+def run_options(codec: str, incremental: bool, partitioned: bool) -> dict:
+    """
+    Get the options of a run that its cache key is only reused with.
+
+    These change which files the tasks write or remove (e.g. merge_shards removes the shards that
+    extract_station_shard returns), so a task could return a cached result naming a file that is
+    gone if the key of a run with other options was reused.
+
+    Parameters
+    ----------
+    codec : str
+        The Avro compression codec.
+    incremental : bool
+        Whether only new or revised observations are appended to the Avro file.
+    partitioned : bool
+        Whether the Parquet output is a dataset partitioned by station.
+
+    Returns
+    -------
+    dict
+        The options, as recorded in the manifest of the outputs.
+    """
+    return {'codec': codec, 'incremental': incremental, 'partitioned': partitioned}
+
+
+def read_snapshot(snapshot_file_name: str) -> list:
+    """
+    Read the stations of a snapshot of the sources, with the snapshot file of each as its URL.
+
+    Parameters
+    ----------
+    snapshot_file_name : str
+        The name of the snapshot file (as returned by snapshot_station_sources).
+
+    Returns
+    -------
+    list of dict
+        The name and url of each station.
+    """
+    with open(snapshot_file_name) as stream:
+        return [{'name': station['name'], 'url': station['source_file_name']} for station in json.load(stream)]
+
+
+@task
+def snapshot_station_sources(
+    temporary_directory: str,
+    log_level: str = 'WARN',
+    cache_directory: str = '',
+    stations_file: str = 'stations.yml',
+    max_workers: int = 1,
+    codec: str = 'null',
+    incremental: bool = False,
+    partitioned: bool = False
+) -> typing.Tuple[str, str, str]:
+    """
+    Snapshot the station sources and get the content hash and cache key of the run.
+
+    The sources are fetched into content addressed files in the sources subdirectory of the
+    temporary directory, so the other tasks read them from there rather than downloading them
+    again.  This task is never cached, as it is the one that finds out if the sources changed.
+    The cache key of the previous run is only reused if it had the same codec, incremental and
+    partitioned options.
+
+    Parameters
+    ----------
+    temporary_directory : str
+        The path to the temporary directory.
+    log_level : str, optional
+        The log level for logging, by default 'WARN'.
+    cache_directory : str, optional
+        The directory of the source file cache.  By default ('') the source files are not cached.
+    stations_file : str, optional
+        The name of the YAML file listing the stations, by default 'stations.yml'.
+    max_workers : int, optional
+        The maximum number of sources to fetch concurrently, by default 1.
+    codec : str, optional
+        The Avro compression codec (null, deflate, snappy or zstd), by default 'null'.
+    incremental : bool, optional
+        Whether only new or revised observations are appended to the Avro file, by default False.
+    partitioned : bool, optional
+        Whether the Parquet output is a dataset partitioned by station, by default False.
+
+    Returns
+    -------
+    Tuple[str, str, str]
+        The content hash of the station list and sources, the key to cache the other tasks with
+        and the name of the snapshot file.
+    """
+    import yaml
+    from historical.cache import SourceCache
+    from historical.manifest import reusable_cache_key, snapshot_sources
+    from historical.transport import default_transport
+
+    with open(stations_file) as stream:
         stations_data = yaml.safe_load(stream)['stations']
 
-    # Write the initial schema to the Avro file.
-    avro_file = open(avro_file_name, 'wb')
-    writer(avro_file, parsed_schema, [])
+    logger = get_logger('source-snapshot', log_level)
+    cache = SourceCache(cache_directory, log_level=log_level) if cache_directory else None
+    metrics = Metrics()
+
+    with profiled('snapshot', temporary_directory):
+        content_hash, snapshot_file_name = snapshot_sources(
+            stations_data,
+            f'{temporary_directory}{os.sep}sources',
+            log_level,
+            cache,
+            metrics,
+            max_workers
+        )
+
+    metrics.save(f'{snapshot_file_name}.metrics.json')
+    logger.info(default_transport().report())
+
+    if cache is not None:
+        # Pruned once all of the sources have been fetched, so no fetch reads an evicted body.
+        cache.prune()
+        logger.info(cache.report())
+
+    key = reusable_cache_key(
+        f'{output_base_name(temporary_directory, content_hash)}.manifest.json',
+        content_hash,
+        run_options(codec, incremental, partitioned)
+    )
+
+    if key is None:
+        # A new key, so that none of the cached results of earlier runs are used.
+        key = f'{content_hash}-{uuid.uuid4().hex}'
+        logger.info(f'Generating the outputs of sources {content_hash}.')
+    else:
+        logger.info(f'Reusing the outputs of sources {content_hash}.')
+
+    return (content_hash, key, snapshot_file_name)
+
+
+@task(cache=True, cache_version=CACHE_VERSION)
+def plan_station_shards(
+    snapshot_file_name: str,
+    cache_key: str,
+    temporary_directory: str,
+    log_level: str = 'WARN',
+    codec: str = 'null'
+) -> typing.List[str]:
+    """
+    Plan an Avro shard for each of the stations to be extracted.
+
+    Each shard is planned as a self contained JSON object, so that it can be the only input of
+    the mapped extract_station_shard task.
+
+    Parameters
+    ----------
+    snapshot_file_name : str
+        The name of the snapshot of the sources (as returned by snapshot_station_sources).
+    cache_key : str
+        The key the task is cached with (as returned by snapshot_station_sources).
+    temporary_directory : str
+        The path to the temporary directory.  The shards are written to its shards subdirectory.
+    log_level : str, optional
+        The log level for logging, by default 'WARN'.
+    codec : str, optional
+        The Avro compression codec (null, deflate, snappy or zstd), by default 'null'.
+
+    Returns
+    -------
+    List[str]
+        The plan of each shard as a JSON object.
+    """
+    shard_directory = f'{temporary_directory}{os.sep}shards'
+    return [
+        json.dumps({
+            'name': station['name'],
+            'url': station['url'],
+            'shard_file_name': f'{shard_directory}{os.sep}{urllib.parse.quote(station["name"], safe="")}.avro',
+            'log_level': log_level,
+            'codec': codec,
+            'cache_key': cache_key
+        })
+        for station in read_snapshot(snapshot_file_name)
+    ]
+
+
+@task(cache=True, cache_version=CACHE_VERSION)
+def extract_station_shard(shard: str) -> str:
+    """
+    Extract the data of a single station from its snapshot and write it to an Avro shard.
+
+    Rows that fail validation are written to <shard>.quarantine.csv rather than the shard.
+
+    Parameters
+    ----------
+    shard : str
+        The plan of the shard as a JSON object (as returned by plan_station_shards).
 
-    # New reopen the file to write the data to it.
-    avro_file.close()
-    avro_file = open(avro_file_name, 'a+b')
+    Returns
+    -------
+    str
+        The name of the Avro shard generated.
+    """
+    from historical.avro import AvroWriter
+    from historical.station import Station
+    from historical.validation import Quarantine
+
+    plan = json.loads(shard)
+    logger = get_logger('shard-extractor', plan['log_level'])
+    shard_directory = os.path.dirname(plan['shard_file_name'])
+    os.makedirs(shard_directory, exist_ok=True)
+    metrics = Metrics()
+    quarantine = Quarantine()
 
-    for station in stations_data:
-        logger.debug(station)
-        station = Station(station['name'], station['url'], log_level)
-        observations = station.get_observations()
-        observation_count = 0
+    with profiled(os.path.basename(plan['shard_file_name']), shard_directory):
+        station = Station(plan['name'], plan['url'], plan['log_level'], metrics=metrics, quarantine=quarantine)
+        batch = station.get_observation_batch()
 
-        for observation in observations:
-            observation.station_name(station.name)
-            logger.debug(observation)
+        with metrics.stage('avro', plan['name']) as avro_metrics:
+            with AvroWriter(plan['shard_file_name'], codec=plan['codec']) as avro_writer:
+                avro_writer.write_many(batch.to_pylist())
 
-            if not observation_count:
-                start_date = f'{observation.year}-{observation.month:02}'
+            avro_metrics['records'] = batch.num_rows
+            avro_metrics['bytes'] = os.path.getsize(plan['shard_file_name'])
 
-            observation_count += 1
-            total_records_written += 1
-            writer(avro_file, parsed_schema, [observation.to_dict()])
+    metrics.save(f'{plan["shard_file_name"]}.metrics.json')
+    quarantine.write(f'{plan["shard_file_name"]}.quarantine.csv')
+    logger.debug(quarantine.report())
 
-        end_date = f'{observation.year}-{observation.month:02}'
+    if batch.num_rows:
         logger.info(
-            f'Gathered {observation_count:,} observations from {station.name} between {start_date} and {end_date:02}.'
+            f'Gathered {batch.num_rows:,} observations from {plan["name"]} between '
+            f'{batch["year"][0].as_py()}-{batch["month"][0].as_py():02} and '
+            f'{batch["year"][-1].as_py()}-{batch["month"][-1].as_py():02}.'
         )
+    else:
+        logger.info(f'No observations from {plan["name"]}.')
+
+    return plan['shard_file_name']
+
+
+@task(cache=True, cache_version=CACHE_VERSION)
+def merge_shards(
+    shards: typing.List[str],
+    content_hash: str,
+    cache_key: str,
+    temporary_directory: str,
+    log_level: str = 'WARN',
+    codec: str = 'null',
+    incremental: bool = False
+) -> str:
+    """
+    Merge the Avro shards of each station into a single Avro file, in the order of the stations.
+
+    The blocks of each shard are copied without decoding their records, unless only new or revised
+    observations are to be appended, and the shards are then removed.  Revised observations
+    replace the rows they supersede, so the Avro file has one row for each station and month.  Only
+    the blocks from the first superseded row are written again, and only when there are revisions.
+    The new and revised observations are appended to a changes file as well, so that only they are
+    upserted into a partitioned Parquet dataset.
+    The metrics of the shards are merged into <Avro file>.metrics.json and the rows they
+    quarantined into <Avro file without extension>.quarantine.csv.
+
+    Parameters
+    ----------
+    shards : List[str]
+        The names of the Avro shards.
+    content_hash : str
+        The content hash of the sources (as returned by snapshot_station_sources).
+    cache_key : str
+        The key the task is cached with (as returned by snapshot_station_sources).
+    temporary_directory : str
+        The path to the temporary directory.
+    log_level : str, optional
+        The log level for logging, by default 'WARN'.
+    codec : str, optional
+        The Avro compression codec (null, deflate, snappy or zstd), by default 'null'.
+    incremental : bool, optional
+        Only append observations that are new or revised since the last incremental run to the
+        Avro file, by default False.  Per station watermarks are kept in a state file in the
+        temporary directory.
+
+    Returns
+    -------
+    str
+        The name of the Avro file generated.
+    """
+    from fastavro import block_reader, reader
+    from historical.avro import AvroWriter, replace_revised_records
+    from historical.state import Watermarks
+    from historical.validation import merge_quarantines
+
+    logger = get_logger('shard-merger', log_level)
+    watermarks = None
 
-    avro_file.close()
-    logger.info(f'Wrote {total_records_written:,} to {avro_file_name}.')
+    if incremental:
+        avro_file_name = f'{temporary_directory}{os.sep}historic-station-data.avro'
+        watermarks = Watermarks(f'{temporary_directory}{os.sep}historic-station-data.state.json')
+    else:
+        avro_file_name = f'{output_base_name(temporary_directory, content_hash)}.avro'
+
+    logger.debug(f'Avro file name is {avro_file_name}.')
+    metrics = Metrics()
+
+    with profiled('merge', temporary_directory), metrics.stage('merge') as merge_stage:
+        with AvroWriter(avro_file_name, codec=codec, append=incremental) as avro_writer:
+            for shard_file_name in shards:
+                with open(shard_file_name, 'rb') as stream:
+                    if watermarks is None:
+                        for block in block_reader(stream):
+                            avro_writer.write_block(block)
+                    else:
+                        accepted = [record for record in reader(stream) if watermarks.accept(record)]
+                        avro_writer.write_many(accepted)
+
+                        # Appended to any changes that were not upserted by an earlier run.
+                        with AvroWriter(changes_file_name(avro_file_name), codec=codec, append=True) as changes_writer:
+                            changes_writer.write_many(accepted)
+
+                os.remove(shard_file_name)
+
+        if watermarks is not None and watermarks.revisions:
+            dropped = replace_revised_records(avro_file_name, watermarks.revisions)
+            logger.info(f'Replaced {dropped:,} rows with the observations revising them.')
+
+        merge_stage['records'] = avro_writer.records_written
+        merge_stage['bytes'] = os.path.getsize(avro_file_name)
+
+    if watermarks is not None:
+        watermarks.save()
+
+    merge_metrics(
+        [f'{shard_file_name}.metrics.json' for shard_file_name in shards],
+        f'{avro_file_name}.metrics.json',
+        metrics
+    )
+    quarantined = merge_quarantines(
+        [f'{shard_file_name}.quarantine.csv' for shard_file_name in shards],
+        quarantine_file_name(avro_file_name)
+    )
+
+    logger.info(f'Wrote {avro_writer.records_written:,} to {avro_file_name} and quarantined {quarantined:,} rows.')
     return avro_file_name
 
 
-@task
-def generate_csv_file(avro_file_name: str, log_level: str = 'WARN') -> str:
+@task(cache=True, cache_version=CACHE_VERSION)
+def generate_csv_file(
+    avro_file_name: str,
+    cache_key: str,
+    log_level: str = 'WARN',
+    compression: str = 'none',
+    workers: int = 1
+) -> str:
     """
     Generate a CSV file from an Avro file.
 
+    The records are formatted a batch at a time with Arrow compute functions rather than one
+    at a time with csv.DictWriter, but the uncompressed file is byte for byte the same.
+
     Parameters
     ----------
     avro_file_name : str
         The full path to the Avro file.
+    cache_key : str
+        The key the task is cached with (as returned by snapshot_station_sources).
     log_level : str, optional
         The log level (e.g. INFO), by default 'WARN'.
+    compression : str, optional
+        Stream the CSV file through a compressor (none, gzip or zstd), by default 'none'.
+    workers : int, optional
+        The number of processes decoding the Avro file, by default 1.
 
     Returns
     -------
     str
         The full path to the CSV file.
     """
-    csv_file_name = avro_file_name.replace('.avro', '.csv')
+    from historical.convert import CSV_COMPRESSION, avro_to_csv
+
+    csv_file_name = avro_file_name.replace('.avro', CSV_COMPRESSION.get(compression, '.csv'))
     logger = get_logger('csv-generator', log_level)
-    record_count = 0
-    fieldnames = []
+    metrics = Metrics()
 
-    with open(avro_file_name, 'rb') as avro_file_stream:
-        avro_reader = reader(avro_file_stream)
-        schema = avro_reader.writer_schema
+    with profiled('csv', os.path.dirname(csv_file_name)), metrics.stage('csv') as csv_metrics:
+        record_count = avro_to_csv(avro_file_name, csv_file_name, compression=compression, workers=workers)
+        csv_metrics['records'] = record_count
+        csv_metrics['bytes'] = os.path.getsize(csv_file_name)
 
-        for field in schema['fields']:
-            fieldnames.append(field['name'])
+    metrics.save(f'{csv_file_name}.metrics.json')
+    logger.info(f'Wrote {record_count:,} to {csv_file_name}.')
+    return csv_file_name
 
-        logger.debug(f'Schema fieldnames are {",".join(fieldnames)}.')
 
-        with open(csv_file_name, 'w') as csv_file_stream:
-            csv_writer = csv.DictWriter(csv_file_stream, fieldnames=fieldnames)
-            csv_writer.writeheader()
+@task(cache=True, cache_version=CACHE_VERSION)
+def generate_feather_file(
+    avro_file_name: str,
+    cache_key: str,
+    log_level: str = 'WARN',
+    compression: str = 'uncompressed',
+    workers: int = 1
+) -> str:
+    """
+    Generate an Arrow IPC (Feather v2) file from an Avro file.
 
-            for record in avro_reader:
-                record_count += 1
-                csv_writer.writerow(record)
+    Consumers can memory map an uncompressed file and use its columns without decoding or
+    copying them, so it is the quickest of the outputs to load.
 
-    logger.info(f'Wrote {record_count:,} to {csv_file_name}.')
-    return csv_file_name
+    Parameters
+    ----------
+    avro_file_name : str
+        The full path to the Avro file.
+    cache_key : str
+        The key the task is cached with (as returned by snapshot_station_sources).
+    log_level : str, optional
+        The log level (e.g. INFO), by default 'WARN'.
+    compression : str, optional
+        The compression of the record batches (uncompressed, lz4 or zstd), by default 'uncompressed'.
+    workers : int, optional
+        The number of processes decoding the Avro file, by default 1.
+
+    Returns
+    -------
+    str
+        The full path to the Feather file.
+    """
+    from historical.convert import avro_to_feather
 
+    feather_file_name = avro_file_name.replace('.avro', '.arrow')
+    logger = get_logger('feather-generator', log_level)
+    metrics = Metrics()
 
-@task
-def generate_parquet_file(avro_file_name: str, log_level: str = 'WARN') -> str:
+    with profiled('feather', os.path.dirname(feather_file_name)), metrics.stage('feather') as feather_metrics:
+        record_count = avro_to_feather(avro_file_name, feather_file_name, compression=compression, workers=workers)
+        feather_metrics['records'] = record_count
+        feather_metrics['bytes'] = os.path.getsize(feather_file_name)
+
+    metrics.save(f'{feather_file_name}.metrics.json')
+    logger.info(f'Wrote {record_count:,} to {feather_file_name}.')
+    return feather_file_name
+
+
+@task(cache=True, cache_version=CACHE_VERSION)
+def generate_parquet_file(
+    avro_file_name: str,
+    cache_key: str,
+    log_level: str = 'WARN',
+    row_group_size: int = 65536,
+    compression: str = 'snappy',
+    partitioned: bool = False,
+    incremental: bool = False,
+    float32: bool = False,
+    workers: int = 1
+) -> str:
     """
     Create a Parquet file from an Avro file.
 
+    The Avro file is streamed into the Parquet file one row group at a time, so memory use
+    does not grow with the size of the Avro file.  Optionally, a Hive partitioned dataset
+    (station=...) is written instead of a single file.  An incremental, partitioned dataset is
+    kept between runs, and only the new and revised observations of the runs since the last upsert
+    (from the changes file of merge_shards) are read and upserted into it, rewriting only the files
+    of the stations they are of.
+
     Parameters
     ----------
     avro_file_name : str
         The full path to the Avro file.
+    cache_key : str
+        The key the task is cached with (as returned by snapshot_station_sources).
     log_level : str, optional
         The log level (e.g. INFO), by default 'WARN'.
+    row_group_size : int, optional
+        The maximum number of records in each row group, by default 65536.  A partitioned dataset
+        has a row group for each decade instead.
+    compression : str, optional
+        The Parquet compression codec (e.g. snappy, zstd or none), by default 'snappy'.
+    partitioned : bool, optional
+        Write a partitioned dataset directory rather than a single file, by default False.
+    incremental : bool, optional
+        Upsert the observations into the existing partitioned dataset, rather than writing it
+        again, by default False.
+    float32 : bool, optional
+        Store the measurements as 32 bit floats, by default False.
+    workers : int, optional
+        The number of processes decoding the Avro file, by default 1.
 
     Returns
     -------
     str
-        The full path to the Parquet file.
+        The full path to the Parquet file (or dataset directory).
     """
+    from historical.convert import avro_to_parquet, avro_to_parquet_dataset, remove_output
+    from historical.upsert import upsert_avro_changes
+
     parquet_file_name = avro_file_name.replace('.avro', '.parquet')
     logger = get_logger('parquet-generator', log_level)
+    metrics = Metrics()
 
-    with open(avro_file_name, 'rb') as avro_file_stream:
-        avro_reader = reader(avro_file_stream)
-        df = pd.DataFrame.from_records(avro_reader)
+    with profiled('parquet', os.path.dirname(parquet_file_name)), metrics.stage('parquet') as parquet_metrics:
+        if partitioned and incremental:
+            stats = upsert_avro_changes(
+                parquet_file_name,
+                avro_file_name,
+                changes_file_name(avro_file_name),
+                compression,
+                float32,
+                workers
+            )
+            record_count = stats['rows_rewritten']
+            logger.info(
+                f'Upserted {stats["changed_rows"]:,} new or revised observations of {stats["rows"]:,}, rewriting '
+                f'{stats["stations_rewritten"]:,} stations.'
+            )
+        elif partitioned:
+            record_count = avro_to_parquet_dataset(
+                avro_file_name,
+                parquet_file_name,
+                row_group_size,
+                compression,
+                float32,
+                workers
+            )
+        else:
+            record_count = avro_to_parquet(
+                avro_file_name,
+                parquet_file_name,
+                row_group_size,
+                compression,
+                float32,
+                workers
+            )
+
+            if incremental:
+                # The dataset the changes would be upserted into has been replaced by this file.
+                remove_output(changes_file_name(avro_file_name))
+
+        parquet_metrics['records'] = record_count
+        parquet_metrics['bytes'] = path_size(parquet_file_name)
+
+    metrics.save(f'{parquet_file_name}.metrics.json')
 
-    record_count = len(df)
-    table = pa.Table.from_pandas(df)
-    pq.write_table(table, parquet_file_name)
     logger.info(f'Wrote {record_count:,} records to {parquet_file_name}.')
     return parquet_file_name
 
 
+@task(cache=True, cache_version=CACHE_VERSION)
+def generate_climatology(
+    parquet_file_name: str,
+    cache_key: str,
+    temporary_directory: str,
+    log_level: str = 'WARN'
+) -> str:
+    """
+    Update the climatology rollups (annual, decadal, normals and anomalies) from the Parquet output.
+
+    The rollups are kept in a directory that is the same from run to run, so only the stations
+    whose observations have changed since the last run are recomputed.
+
+    Parameters
+    ----------
+    parquet_file_name : str
+        The full path to the Parquet file (or dataset directory).
+    cache_key : str
+        The key the task is cached with (as returned by snapshot_station_sources).
+    temporary_directory : str
+        The path to the temporary directory.
+    log_level : str, optional
+        The log level (e.g. INFO), by default 'WARN'.
+
+    Returns
+    -------
+    str
+        The full path to the directory of the climatology Parquet files.
+    """
+    from historical.climatology import update_climatology
+
+    climatology_directory = f'{temporary_directory}{os.sep}historic-station-climatology'
+    logger = get_logger('climatology-generator', log_level)
+    metrics = Metrics()
+
+    with profiled('climatology', temporary_directory), metrics.stage('climatology') as climatology_metrics:
+        stations = update_climatology(parquet_file_name, climatology_directory)
+        climatology_metrics['records'] = len(stations)
+        climatology_metrics['bytes'] = path_size(climatology_directory)
+
+    metrics.save(f'{climatology_directory}.metrics.json')
+
+    logger.info(f'Recomputed the climatology of {len(stations):,} stations in {climatology_directory}.')
+    return climatology_directory
+
+
+@task(cache=True, cache_version=CACHE_VERSION)
+def collect_metrics(
+    snapshot_file_name: str,
+    cache_key: str,
+    avro_file_name: str,
+    parquet_file_name: str,
+    csv_file_name: str,
+    feather_file_name: str,
+    climatology_directory: str,
+    log_level: str = 'WARN'
+) -> str:
+    """
+    Collect the metrics of each task of a run into a single metrics file next to the outputs.
+
+    Parameters
+    ----------
+    snapshot_file_name : str
+        The name of the snapshot of the sources (as returned by snapshot_station_sources).
+    cache_key : str
+        The key the task is cached with (as returned by snapshot_station_sources).
+    avro_file_name : str
+        The full path to the Avro file.
+    parquet_file_name : str
+        The full path to the Parquet file (or dataset directory).
+    csv_file_name : str
+        The full path to the CSV file.
+    feather_file_name : str
+        The full path to the Feather file.
+    climatology_directory : str
+        The full path to the directory of the climatology Parquet files.
+    log_level : str, optional
+        The log level (e.g. INFO), by default 'WARN'.
+
+    Returns
+    -------
+    str
+        The full path to the metrics file.
+    """
+    logger = get_logger('metrics-collector', log_level)
+    metrics_file_name = f'{os.path.splitext(avro_file_name)[0]}.metrics.json'
+    output_file_names = (
+        snapshot_file_name,
+        avro_file_name,
+        parquet_file_name,
+        csv_file_name,
+        feather_file_name,
+        climatology_directory
+    )
+    metrics = merge_metrics([f'{file_name}.metrics.json' for file_name in output_file_names], metrics_file_name)
+
+    for stage, summary in metrics.summary().items():
+        logger.info(
+            f'{stage} took {summary["seconds"]:,.3f}s for {summary["records"]:,} records '
+            f'({summary["records_per_second"]:,}/s) and {summary["bytes"]:,} bytes.'
+        )
+
+    return metrics_file_name
+
+
+@task(cache=True, cache_version=CACHE_VERSION)
+def generate_all_files(
+    snapshot_file_name: str,
+    content_hash: str,
+    cache_key: str,
+    temporary_directory: str,
+    log_level: str = 'WARN',
+    max_workers: int = 1,
+    codec: str = 'null',
+    partitioned: bool = False,
+    csv_compression: str = 'none',
+    feather_compression: str = 'uncompressed',
+    parquet_float32: bool = False
+) -> typing.Tuple[str, str, str, str]:
+    """
+    Extract the data from the source snapshot and write the Avro, Parquet, CSV and Feather files in a single pass.
+
+    Each station's data is parsed once into a columnar batch, which is streamed to all four
+    files at the same time, so the Avro file is never read back and decoded.  The files (and the
+    quarantine file of the rows that fail validation) are the same as those from merge_shards,
+    generate_parquet_file, generate_csv_file and generate_feather_file.
+
+    Parameters
+    ----------
+    snapshot_file_name : str
+        The name of the snapshot of the sources (as returned by snapshot_station_sources).
+    content_hash : str
+        The content hash of the sources (as returned by snapshot_station_sources).
+    cache_key : str
+        The key the task is cached with (as returned by snapshot_station_sources).
+    temporary_directory : str
+        The path to the temporary directory.
+    log_level : str, optional
+        The log level for logging, by default 'WARN'.
+    max_workers : int, optional
+        The maximum number of stations to read and parse concurrently, by default 1.
+    codec : str, optional
+        The Avro compression codec (null, deflate, snappy or zstd), by default 'null'.
+    partitioned : bool, optional
+        Write the Parquet output as a dataset partitioned by station, by default False.
+    csv_compression : str, optional
+        Stream the CSV file through a compressor (none, gzip or zstd), by default 'none'.
+    feather_compression : str, optional
+        The compression of the Feather file (uncompressed, lz4 or zstd), by default 'uncompressed'.
+    parquet_float32 : bool, optional
+        Store the measurements in the Parquet output as 32 bit floats, by default False.
+
+    Returns
+    -------
+    Tuple[str, str, str, str]
+        The names of the Avro file, Parquet file, CSV file and Feather file generated.
+    """
+    from historical.convert import CSV_COMPRESSION
+    from historical.pipeline import FanOutWriter
+    from historical.station import fetch_stations
+    from historical.validation import Quarantine
+
+    logger = get_logger('single-pass-generator', log_level)
+    avro_file_name = f'{output_base_name(temporary_directory, content_hash)}.avro'
+    parquet_file_name = avro_file_name.replace('.avro', '.parquet')
+    csv_file_name = avro_file_name.replace('.avro', CSV_COMPRESSION.get(csv_compression, '.csv'))
+    feather_file_name = avro_file_name.replace('.avro', '.arrow')
+
+    stations_data = read_snapshot(snapshot_file_name)
+    metrics = Metrics()
+    quarantine = Quarantine()
+    with profiled('single-pass', temporary_directory), FanOutWriter(
+        avro_file_name,
+        parquet_file_name,
+        csv_file_name,
+        codec=codec,
+        partitioned=partitioned,
+        csv_compression=csv_compression,
+        feather_file_name=feather_file_name,
+        feather_compression=feather_compression,
+        parquet_float32=parquet_float32
+    ) as fan_out_writer:
+        for station, batch in fetch_stations(stations_data, max_workers, log_level, None, True, metrics, quarantine):
+            if batch.num_rows:
+                logger.info(
+                    f'Gathered {batch.num_rows:,} observations from {station.name} between '
+                    f'{batch["year"][0].as_py()}-{batch["month"][0].as_py():02} and '
+                    f'{batch["year"][-1].as_py()}-{batch["month"][-1].as_py():02}.'
+                )
+            else:
+                logger.info(f'No observations from {station.name}.')
+
+            with metrics.stage('write', station.name) as write_metrics:
+                fan_out_writer.write_batch(batch)
+                write_metrics['records'] = batch.num_rows
+
+    metrics.save(f'{avro_file_name}.metrics.json')
+    quarantine.write(quarantine_file_name(avro_file_name))
+    logger.info(
+        f'Wrote {fan_out_writer.records_written:,} to {avro_file_name}, {parquet_file_name}, {csv_file_name} '
+        f'and {feather_file_name}.'
+    )
+    logger.info(quarantine.report())
+    return (avro_file_name, parquet_file_name, csv_file_name, feather_file_name)
+
+
+@task(cache=True, cache_version=CACHE_VERSION)
+def write_output_manifest(
+    content_hash: str,
+    cache_key: str,
+    temporary_directory: str,
+    avro_file_name: str,
+    parquet_file_name: str,
+    csv_file_name: str,
+    feather_file_name: str,
+    climatology_directory: str,
+    metrics_file_name: str,
+    log_level: str = 'WARN',
+    codec: str = 'null',
+    incremental: bool = False,
+    partitioned: bool = False
+) -> str:
+    """
+    Write a manifest of the outputs of a run (and its quarantine file), with the checksum of each of their files.
+
+    Parameters
+    ----------
+    content_hash : str
+        The content hash of the sources (as returned by snapshot_station_sources).
+    cache_key : str
+        The key the task is cached with (as returned by snapshot_station_sources).
+    temporary_directory : str
+        The path to the temporary directory.
+    avro_file_name : str
+        The full path to the Avro file.
+    parquet_file_name : str
+        The full path to the Parquet file (or dataset directory).
+    csv_file_name : str
+        The full path to the CSV file.
+    feather_file_name : str
+        The full path to the Feather file.
+    climatology_directory : str
+        The full path to the directory of the climatology Parquet files.
+    metrics_file_name : str
+        The full path to the metrics file.
+    log_level : str, optional
+        The log level (e.g. INFO), by default 'WARN'.
+    codec : str, optional
+        The Avro compression codec (null, deflate, snappy or zstd), by default 'null'.
+    incremental : bool, optional
+        Whether only new or revised observations were appended to the Avro file, by default False.
+    partitioned : bool, optional
+        Whether the Parquet output is a dataset partitioned by station, by default False.
+
+    Returns
+    -------
+    str
+        The full path to the manifest file.
+    """
+    from historical.manifest import write_manifest
+
+    logger = get_logger('manifest-writer', log_level)
+    manifest_file_name = f'{output_base_name(temporary_directory, content_hash)}.manifest.json'
+    write_manifest(
+        manifest_file_name,
+        content_hash,
+        cache_key,
+        {
+            'avro': avro_file_name,
+            'parquet': parquet_file_name,
+            'csv': csv_file_name,
+            'feather': feather_file_name,
+            'climatology': climatology_directory,
+            'metrics': metrics_file_name,
+            'quarantine': quarantine_file_name(avro_file_name)
+        },
+        run_options(codec, incremental, partitioned)
+    )
+    logger.info(f'Wrote the manifest of the outputs to {manifest_file_name}.')
+    return manifest_file_name
+
+
 @workflow
-def wf(temporary_directory: str, log_level: str = 'WARN') -> typing.Tuple[str, str, str]:
+def wf(
+    temporary_directory: str,
+    log_level: str = 'WARN',
+    max_workers: int = 1,
+    codec: str = 'null',
+    cache_directory: str = '',
+    incremental: bool = False,
+    partitioned: bool = False,
+    csv_compression: str = 'none',
+    feather_compression: str = 'uncompressed',
+    parquet_float32: bool = False,
+    decode_workers: int = 1
+) -> typing.Tuple[str, str, str, str, str, str, str]:
     """
     Extract and conversion of the historical data via a Flyte workflow.
 
+    The station sources are snapshotted, then each station is extracted to its own Avro shard by
+    a mapped task, so stations are extracted in parallel (up to HISTORICAL_MAX_CONCURRENCY at a
+    time, if set).  The shards are then merged into a single Avro file, which is converted to
+    Parquet, CSV and Feather.  The climatology rollups are then updated from the Parquet output
+    and a manifest of the outputs is written.  If the sources are unchanged since a run whose
+    outputs still match their manifest, the cached results of that run are returned instead.
+
     Parameters
     ----------
     temporary_directory : str
         The path to the temporary directory.
     log_level : str, optional
         The log level for logging.  Default value is 'WARN'.
+    max_workers : int, optional
+        The maximum number of station sources to download concurrently.  Default value is 1.
+    codec : str, optional
+        The Avro compression codec (null, deflate, snappy or zstd).  Default value is 'null'.
+    cache_directory : str, optional
+        The directory of the source file cache.  Default value is '' (no caching).
+    incremental : bool, optional
+        Only append new or revised observations to the Avro file.  Default value is False.
+    partitioned : bool, optional
+        Write the Parquet output as a dataset partitioned by station.  Default value is False.
+    csv_compression : str, optional
+        The compression of the CSV file (none, gzip or zstd).  Default value is 'none'.
+    feather_compression : str, optional
+        The compression of the Feather file (uncompressed, lz4 or zstd).  Default value is 'uncompressed'.
+    parquet_float32 : bool, optional
+        Store the measurements in the Parquet output as 32 bit floats.  Default value is False.
+    decode_workers : int, optional
+        The number of processes decoding the Avro file in each conversion task.  Default value is 1.
 
     Returns
     -------
-    Tuple[str, str, str]
-        A tuple containing the name of the Avro file, Parquet file and CSV file.
+    Tuple[str, str, str, str, str, str, str]
+        A tuple containing the name of the Avro file, Parquet file, CSV file, Feather file, climatology
+        directory, metrics file and manifest file.
     """
-    avro_file_name = generate_avro_file(temporary_directory=temporary_directory, log_level=log_level)
-    parquet_file_name = generate_parquet_file(avro_file_name=avro_file_name, log_level=log_level)
-    csv_file_name = generate_csv_file(avro_file_name=avro_file_name, log_level=log_level)
-    return (avro_file_name, parquet_file_name, csv_file_name)
+    content_hash, cache_key, snapshot_file_name = snapshot_station_sources(
+        temporary_directory=temporary_directory,
+        log_level=log_level,
+        cache_directory=cache_directory,
+        max_workers=max_workers,
+        codec=codec,
+        incremental=incremental,
+        partitioned=partitioned
+    )
+    shard_plans = plan_station_shards(
+        snapshot_file_name=snapshot_file_name,
+        cache_key=cache_key,
+        temporary_directory=temporary_directory,
+        log_level=log_level,
+        codec=codec
+    )
+    shards = map_task(extract_station_shard, concurrency=MAX_CONCURRENCY)(shard=shard_plans)
+    avro_file_name = merge_shards(
+        shards=shards,
+        content_hash=content_hash,
+        cache_key=cache_key,
+        temporary_directory=temporary_directory,
+        log_level=log_level,
+        codec=codec,
+        incremental=incremental
+    )
+    parquet_file_name = generate_parquet_file(
+        avro_file_name=avro_file_name,
+        cache_key=cache_key,
+        log_level=log_level,
+        partitioned=partitioned,
+        incremental=incremental,
+        float32=parquet_float32,
+        workers=decode_workers
+    )
+    csv_file_name = generate_csv_file(
+        avro_file_name=avro_file_name,
+        cache_key=cache_key,
+        log_level=log_level,
+        compression=csv_compression,
+        workers=decode_workers
+    )
+    feather_file_name = generate_feather_file(
+        avro_file_name=avro_file_name,
+        cache_key=cache_key,
+        log_level=log_level,
+        compression=feather_compression,
+        workers=decode_workers
+    )
+    climatology_directory = generate_climatology(
+        parquet_file_name=parquet_file_name,
+        cache_key=cache_key,
+        temporary_directory=temporary_directory,
+        log_level=log_level
+    )
+    metrics_file_name = collect_metrics(
+        snapshot_file_name=snapshot_file_name,
+        cache_key=cache_key,
+        avro_file_name=avro_file_name,
+        parquet_file_name=parquet_file_name,
+        csv_file_name=csv_file_name,
+        feather_file_name=feather_file_name,
+        climatology_directory=climatology_directory,
+        log_level=log_level
+    )
+    manifest_file_name = write_output_manifest(
+        content_hash=content_hash,
+        cache_key=cache_key,
+        temporary_directory=temporary_directory,
+        avro_file_name=avro_file_name,
+        parquet_file_name=parquet_file_name,
+        csv_file_name=csv_file_name,
+        feather_file_name=feather_file_name,
+        climatology_directory=climatology_directory,
+        metrics_file_name=metrics_file_name,
+        log_level=log_level,
+        codec=codec,
+        incremental=incremental,
+        partitioned=partitioned
+    )
+    return (
+        avro_file_name,
+        parquet_file_name,
+        csv_file_name,
+        feather_file_name,
+        climatology_directory,
+        metrics_file_name,
+        manifest_file_name
+    )
 
 
-if __name__ == '__main__':
-    args = command_line_interface()
+@workflow
+def single_pass_wf(
+    temporary_directory: str,
+    log_level: str = 'WARN',
+    max_workers: int = 1,
+    codec: str = 'null',
+    cache_directory: str = '',
+    partitioned: bool = False,
+    csv_compression: str = 'none',
+    feather_compression: str = 'uncompressed',
+    parquet_float32: bool = False
+) -> typing.Tuple[str, str, str, str, str, str, str]:
+    """
+    Extract the historical data and write all of the output files in a single pass via a Flyte workflow.
 
-    if args.verbose:
+    The climatology rollups are then updated from the Parquet output and a manifest of the outputs
+    is written.  As with wf, the cached results of an earlier run of the same sources are reused.
+
+    Parameters
+    ----------
+    temporary_directory : str
+        The path to the temporary directory.
+    log_level : str, optional
+        The log level for logging.  Default value is 'WARN'.
+    max_workers : int, optional
+        The maximum number of stations to download concurrently.  Default value is 1.
+    codec : str, optional
+        The Avro compression codec (null, deflate, snappy or zstd).  Default value is 'null'.
+    cache_directory : str, optional
+        The directory of the source file cache.  Default value is '' (no caching).
+    partitioned : bool, optional
+        Write the Parquet output as a dataset partitioned by station.  Default value is False.
+    csv_compression : str, optional
+        The compression of the CSV file (none, gzip or zstd).  Default value is 'none'.
+    feather_compression : str, optional
+        The compression of the Feather file (uncompressed, lz4 or zstd).  Default value is 'uncompressed'.
+    parquet_float32 : bool, optional
+        Store the measurements in the Parquet output as 32 bit floats.  Default value is False.
+
+    Returns
+    -------
+    Tuple[str, str, str, str, str, str, str]
+        A tuple containing the name of the Avro file, Parquet file, CSV file, Feather file, climatology
+        directory, metrics file and manifest file.
+    """
+    content_hash, cache_key, snapshot_file_name = snapshot_station_sources(
+        temporary_directory=temporary_directory,
+        log_level=log_level,
+        cache_directory=cache_directory,
+        max_workers=max_workers,
+        codec=codec,
+        partitioned=partitioned
+    )
+    avro_file_name, parquet_file_name, csv_file_name, feather_file_name = generate_all_files(
+        snapshot_file_name=snapshot_file_name,
+        content_hash=content_hash,
+        cache_key=cache_key,
+        temporary_directory=temporary_directory,
+        log_level=log_level,
+        max_workers=max_workers,
+        codec=codec,
+        partitioned=partitioned,
+        csv_compression=csv_compression,
+        feather_compression=feather_compression,
+        parquet_float32=parquet_float32
+    )
+    climatology_directory = generate_climatology(
+        parquet_file_name=parquet_file_name,
+        cache_key=cache_key,
+        temporary_directory=temporary_directory,
+        log_level=log_level
+    )
+    metrics_file_name = collect_metrics(
+        snapshot_file_name=snapshot_file_name,
+        cache_key=cache_key,
+        avro_file_name=avro_file_name,
+        parquet_file_name=parquet_file_name,
+        csv_file_name=csv_file_name,
+        feather_file_name=feather_file_name,
+        climatology_directory=climatology_directory,
+        log_level=log_level
+    )
+    manifest_file_name = write_output_manifest(
+        content_hash=content_hash,
+        cache_key=cache_key,
+        temporary_directory=temporary_directory,
+        avro_file_name=avro_file_name,
+        parquet_file_name=parquet_file_name,
+        csv_file_name=csv_file_name,
+        feather_file_name=feather_file_name,
+        climatology_directory=climatology_directory,
+        metrics_file_name=metrics_file_name,
+        log_level=log_level,
+        codec=codec,
+        partitioned=partitioned
+    )
+    return (
+        avro_file_name,
+        parquet_file_name,
+        csv_file_name,
+        feather_file_name,
+        climatology_directory,
+        metrics_file_name,
+        manifest_file_name
+    )
+
+
+if __name__ == '__main__':
+    if ARGS.verbose:
         log_level = 'INFO'
-    elif args.debug:
+    elif ARGS.debug:
         log_level = 'DEBUG'
     else:
         log_level = 'WARN'
 
-    wf(temporary_directory=TMPDIR, log_level=log_level)
+    # Tasks read these when they run, so they work the same for local and remote executions.
+    if ARGS.profile:
+        os.environ[PROFILE_VARIABLE] = ARGS.profile
+
+    if ARGS.trace_memory:
+        os.environ[TRACE_MEMORY_VARIABLE] = '1'
+
+    if ARGS.single_pass:
+        single_pass_wf(
+            temporary_directory=TMPDIR,
+            log_level=log_level,
+            max_workers=ARGS.workers,
+            codec=ARGS.codec,
+            cache_directory=ARGS.cache_dir,
+            partitioned=ARGS.partitioned,
+            csv_compression=ARGS.csv_compression,
+            feather_compression=ARGS.feather_compression,
+            parquet_float32=ARGS.parquet_float32
+        )
+    else:
+        wf(
+            temporary_directory=TMPDIR,
+            log_level=log_level,
+            max_workers=ARGS.workers,
+            codec=ARGS.codec,
+            cache_directory=ARGS.cache_dir,
+            incremental=ARGS.incremental,
+            partitioned=ARGS.partitioned,
+            csv_compression=ARGS.csv_compression,
+            feather_compression=ARGS.feather_compression,
+            parquet_float32=ARGS.parquet_float32,
+            decode_workers=ARGS.decode_workers
+        )
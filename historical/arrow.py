@@ -0,0 +1,145 @@
+"""arrow.py."""
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from historical.avsc import OBSERVATION_AVRO_SCHEMA
+
+AVRO_TO_ARROW_TYPES = {
+    'boolean': pa.bool_(),
+    'double': pa.float64(),
+    'float': pa.float32(),
+    'int': pa.int32(),
+    'long': pa.int64(),
+    'string': pa.string()
+}
+# The narrowest types that hold every valid value of these fields (after validation).
+COMPACT_TYPES = {
+    'year': pa.int16(),
+    'month': pa.int8(),
+    'af': pa.int8()
+}
+
+
+def arrow_schema(avro_schema: dict = OBSERVATION_AVRO_SCHEMA) -> pa.Schema:
+    """
+    Derive an Arrow schema from an Avro record schema.
+
+    Avro unions with null (e.g. ['double', 'null']) become nullable Arrow fields, all other
+    fields are not nullable.
+
+    Parameters
+    ----------
+    avro_schema : dict, optional
+        The Avro record schema, by default OBSERVATION_AVRO_SCHEMA.
+
+    Returns
+    -------
+    pyarrow.Schema
+        The equivalent Arrow schema with the fields in the same order.
+    """
+    fields = []
+
+    for field in avro_schema['fields']:
+        field_type = field['type']
+        nullable = False
+
+        if isinstance(field_type, list):
+            nullable = 'null' in field_type
+            field_type = [member for member in field_type if member != 'null'][0]
+
+        fields.append(pa.field(field['name'], AVRO_TO_ARROW_TYPES[field_type], nullable=nullable))
+
+    return pa.schema(fields)
+
+
+def compact_arrow_schema(avro_schema: dict = OBSERVATION_AVRO_SCHEMA, float32: bool = False) -> pa.Schema:
+    """
+    Derive a compact Arrow schema from an Avro record schema, for storage.
+
+    The fields are as arrow_schema, but strings are dictionary encoded (so a station name is
+    stored once per batch rather than on every row), the fields in COMPACT_TYPES are narrowed
+    and, optionally, doubles are stored as floats.
+
+    Parameters
+    ----------
+    avro_schema : dict, optional
+        The Avro record schema, by default OBSERVATION_AVRO_SCHEMA.
+    float32 : bool, optional
+        Store doubles as 32 bit floats, by default False.  The measurements have at most one
+        decimal place, but are read back as the nearest float (e.g. 8.6 as 8.600000381) until
+        they are widened by cast_column.
+
+    Returns
+    -------
+    pyarrow.Schema
+        The compact schema with the fields in the same order.
+    """
+    fields = []
+
+    for field in arrow_schema(avro_schema):
+        field_type = COMPACT_TYPES.get(field.name, field.type)
+
+        if pa.types.is_string(field_type):
+            field_type = pa.dictionary(pa.int32(), pa.string())
+        elif float32 and pa.types.is_float64(field_type):
+            field_type = pa.float32()
+
+        fields.append(field.with_type(field_type))
+
+    return pa.schema(fields)
+
+
+def cast_column(column, field_type: pa.DataType):
+    """
+    Cast a column to a type, dictionary encoding it if needed.
+
+    Floats are widened to doubles through their shortest decimal text, so a measurement written
+    as a float is read back with the decimal places it had (e.g. 8.6 rather than 8.600000381).
+
+    Parameters
+    ----------
+    column : pyarrow.Array or pyarrow.ChunkedArray
+        The column to be cast.
+    field_type : pyarrow.DataType
+        The type to cast it to.
+
+    Returns
+    -------
+    pyarrow.Array or pyarrow.ChunkedArray
+        The cast column.
+
+    Raises
+    ------
+    pyarrow.ArrowInvalid
+        If a value does not fit a narrower type.
+    """
+    if pa.types.is_dictionary(field_type) and not pa.types.is_dictionary(column.type):
+        column = pc.dictionary_encode(column)
+    elif pa.types.is_float32(column.type) and pa.types.is_float64(field_type):
+        column = pc.cast(column, pa.string())
+
+    return pc.cast(column, field_type)
+
+
+def cast_batch(batch: pa.RecordBatch, schema: pa.Schema) -> pa.RecordBatch:
+    """
+    Cast a record batch to a schema of the same fields, such as one from compact_arrow_schema.
+
+    Parameters
+    ----------
+    batch : pyarrow.RecordBatch
+        The batch to be cast.
+    schema : pyarrow.Schema
+        The schema to cast it to.  The fields not in the schema are dropped.
+
+    Returns
+    -------
+    pyarrow.RecordBatch
+        The cast batch.
+
+    Raises
+    ------
+    pyarrow.ArrowInvalid
+        If a value does not fit its narrower type.
+    """
+    return pa.RecordBatch.from_arrays([cast_column(batch[field.name], field.type) for field in schema], schema=schema)
@@ -0,0 +1,272 @@
+"""avro.py."""
+import collections
+import io
+import os
+import shutil
+
+from fastavro import parse_schema, reader, schemaless_reader
+from fastavro.write import Writer
+from historical.avsc import OBSERVATION_AVRO_SCHEMA
+
+CODECS = {
+    'null': 'null',
+    'deflate': 'deflate',
+    'snappy': 'snappy',
+    'zstd': 'zstandard'
+}
+# The header of an Avro object container file, from the Avro specification.
+HEADER_SCHEMA = {
+    'type': 'record',
+    'name': 'org.apache.avro.file.Header',
+    'fields': [
+        {'name': 'magic', 'type': {'type': 'fixed', 'name': 'magic', 'size': 4}},
+        {'name': 'meta', 'type': {'type': 'map', 'values': 'bytes'}},
+        {'name': 'sync', 'type': {'type': 'fixed', 'name': 'sync', 'size': 16}}
+    ]
+}
+MAGIC = b'Obj\x01'
+
+
+class AvroWriter:
+    """A streaming writer that buffers records into blocks of an Avro file."""
+
+    def __init__(
+        self,
+        file_name: str,
+        schema: dict = OBSERVATION_AVRO_SCHEMA,
+        codec: str = 'null',
+        block_size: int = 1000,
+        sync_interval: int = 16000,
+        append: bool = False
+    ) -> None:
+        """
+        Create an AvroWriter object.
+
+        Parameters
+        ----------
+        file_name : str
+            The name of the Avro file to be written.
+        schema : dict, optional
+            The Avro schema of the records, by default OBSERVATION_AVRO_SCHEMA.
+        codec : str, optional
+            The compression codec for each block.  One of 'null', 'deflate', 'snappy' or 'zstd',
+            by default 'null'.
+        block_size : int, optional
+            The maximum number of records to be written in each block, by default 1000.
+        sync_interval : int, optional
+            The maximum size (in bytes) of an uncompressed block, by default 16000.
+        append : bool, optional
+            Append to the file if it already exists, by default False.  The schema and codec
+            of the existing file are used.
+
+        Raises
+        ------
+        ValueError
+            If the codec is not supported.
+        """
+        if codec not in CODECS:
+            raise ValueError(f'Unsupported Avro codec "{codec}", must be one of {", ".join(CODECS)}.')
+
+        self.file_name = file_name
+        self.block_size = block_size
+        self.records_written = 0
+
+        if append and os.path.exists(file_name) and os.path.getsize(file_name):
+            self._stream = open(file_name, 'a+b')
+        else:
+            self._stream = open(file_name, 'wb')
+
+        self._writer = Writer(self._stream, parse_schema(schema), codec=CODECS[codec], sync_interval=sync_interval)
+
+    def __enter__(self):
+        """
+        Enter the runtime context of the writer.
+
+        Returns
+        -------
+        AvroWriter
+            This writer.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Flush any buffered records and close the file."""
+        self.close()
+
+    def close(self) -> None:
+        """Flush any buffered records and close the file."""
+        if not self._stream.closed:
+            self._writer.flush()
+            self._stream.close()
+
+    def write(self, record: dict) -> None:
+        """
+        Write a record to the Avro file.
+
+        The record is buffered and only written to disk when the current block is full.
+
+        Parameters
+        ----------
+        record : dict
+            The record to be written.
+        """
+        self._writer.write(record)
+        self.records_written += 1
+
+        if self._writer.block_count >= self.block_size:
+            self._writer.flush()
+
+    def write_many(self, records) -> None:
+        """
+        Write many records to the Avro file.
+
+        Parameters
+        ----------
+        records : iterable of dict
+            The records to be written.
+        """
+        for record in records:
+            self.write(record)
+
+    def write_block(self, block) -> None:
+        """
+        Write a block read from another Avro file with the same schema, without decoding its records.
+
+        Parameters
+        ----------
+        block : fastavro.block_reader.Block
+            The block to be written.  It is compressed with the codec of this writer.
+        """
+        self._writer.write_block(block)
+        self.records_written += block.num_records
+
+
+def replace_revised_records(file_name: str, revisions: dict) -> int:
+    """
+    Replace the rows of revised observations in an Avro file with their latest revision.
+
+    An incremental run appends each revised observation to the Avro file, after the row it
+    revises.  The first row of each revised month is replaced with the latest revision and the
+    later rows are dropped, so the file has one row for each station and month, in the order they
+    were first written.  The file keeps its codec.
+
+    Only provisional observations are revised, and they are the latest of each station, so the
+    blocks are decoded from the end of the file back to the first with a revised row.  Only those
+    blocks are written again, and the blocks before them are copied without being decoded.
+
+    Parameters
+    ----------
+    file_name : str
+        The name of the Avro file.
+    revisions : dict
+        The latest revision of each observation, keyed on (station, year, month).
+
+    Returns
+    -------
+    int
+        The number of rows dropped.
+    """
+    header_size, blocks = avro_blocks(file_name)
+    # Each revised observation is in the file twice, as the row it revises and the revision.
+    rows = collections.Counter()
+    records = []
+
+    with open(file_name, 'rb') as stream:
+        header = stream.read(header_size)
+        codec = {value: key for key, value in CODECS.items()}[reader(io.BytesIO(header)).codec]
+
+        while blocks and any(rows[key] < 2 for key in revisions):
+            offset, end, _ = blocks.pop()
+            stream.seek(offset)
+            block_records = list(reader(io.BytesIO(header + stream.read(end - offset))))
+            rows.update((record['station'], record['year'], record['month']) for record in block_records)
+            records = block_records + records
+
+    temporary_file_name = f'{file_name}.tmp'
+    replaced = set()
+    shutil.copyfile(file_name, temporary_file_name)
+    os.truncate(temporary_file_name, blocks[-1][1] if blocks else header_size)
+
+    with AvroWriter(temporary_file_name, codec=codec, append=True) as avro_writer:
+        for record in records:
+            key = (record['station'], record['year'], record['month'])
+
+            if key not in revisions:
+                avro_writer.write(record)
+            elif key not in replaced:
+                replaced.add(key)
+                avro_writer.write(revisions[key])
+
+    os.replace(temporary_file_name, file_name)
+    return len(records) - avro_writer.records_written
+
+
+def _read_long(stream) -> int:
+    """Read a zig-zag encoded variable length long, or return None at the end of the stream."""
+    shift = 0
+    value = 0
+
+    while True:
+        byte = stream.read(1)
+
+        if not byte:
+            if shift:
+                raise ValueError('Truncated Avro block header.')
+
+            return None
+
+        value |= (byte[0] & 0x7f) << shift
+        shift += 7
+
+        if not byte[0] & 0x80:
+            return (value >> 1) ^ -(value & 1)
+
+
+def avro_blocks(file_name: str) -> tuple:
+    """
+    Find the blocks of an Avro file without decoding (or decompressing) them.
+
+    Only the record count and size at the start of each block are read, and the rest of the
+    block is skipped, so the file can be split at the sync markers between blocks.
+
+    Parameters
+    ----------
+    file_name : str
+        The name of the Avro file.
+
+    Returns
+    -------
+    tuple of (int, list of tuple of (int, int, int))
+        The size of the header, and the offset, end (after its sync marker) and record count of
+        each block.
+
+    Raises
+    ------
+    ValueError
+        If the file is not an Avro file or a block does not end with the sync marker of the file.
+    """
+    blocks = []
+
+    with open(file_name, 'rb') as stream:
+        header = schemaless_reader(stream, HEADER_SCHEMA)
+
+        if header['magic'] != MAGIC:
+            raise ValueError(f'{file_name} is not an Avro file.')
+
+        header_size = stream.tell()
+
+        while True:
+            offset = stream.tell()
+            record_count = _read_long(stream)
+
+            if record_count is None:
+                break
+
+            stream.seek(_read_long(stream), os.SEEK_CUR)
+
+            if stream.read(16) != header['sync']:
+                raise ValueError(f'The block at {offset} of {file_name} does not end with the sync marker.')
+
+            blocks.append((offset, stream.tell(), record_count))
+
+    return (header_size, blocks)
@@ -0,0 +1,325 @@
+"""
+Columnar parsing of station data.
+
+Methods
+-------
+parse_observation_batch - Parse the text of a station data file into an Arrow record batch.
+prepare_threads - Prepare pyarrow for parsing in several threads at once.
+"""
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from historical.arrow import arrow_schema
+from historical.observation import ILLEGAL_PATTERNS
+
+FIELD_COUNT = 7
+MISSING = '---'
+NEWLINE = ord('\n')
+# Built from buffers rather than with pyarrow.array, which would import pandas when this module is imported.
+UNKNOWN_SUN_SUFFIXES = pa.StringArray.from_buffers(2, pa.py_buffer(np.array([0, 1, 2], np.int32)), pa.py_buffer(b'*-'))
+
+
+def get_observation_lines(text: str) -> pa.StringArray:
+    """
+    Extract the observation lines from the text of a station data file.
+
+    Lines are selected and cleaned in the same way as Station.get_observations and
+    Observation.remove_illegal_patterns.
+
+    Parameters
+    ----------
+    text : str
+        The full text of a station data file.
+
+    Returns
+    -------
+    pyarrow.StringArray
+        The clean observation lines.
+    """
+    # Build the array of lines directly over the encoded text rather than from a list of strings.
+    data = text.encode('utf-8')
+    offsets = np.flatnonzero(np.frombuffer(data, np.uint8) == NEWLINE) + 1
+    offsets = np.concatenate(([0], offsets, [len(data)])).astype(np.int64)
+    lines = pa.LargeStringArray.from_buffers(len(offsets) - 1, pa.py_buffer(offsets), pa.py_buffer(data))
+    # Only non-ASCII text can have the other whitespace that str.strip removes.
+    trim_whitespace = pc.ascii_trim_whitespace if text.isascii() else pc.utf8_trim_whitespace
+    lines = trim_whitespace(lines.cast(pa.string()))
+    observation_mask = pc.ascii_is_decimal(pc.utf8_slice_codeunits(lines, 0, 1))
+    lines = lines.filter(observation_mask)
+    positions = pattern_lines(data, offsets)
+    is_observation = observation_mask.to_numpy(zero_copy_only=False)
+    # The positions of the lines with patterns among the observation lines.
+    positions = (np.cumsum(is_observation) - 1)[positions[is_observation[positions]]]
+
+    if not len(positions):
+        return lines
+
+    # The illegal patterns are rare, so only the lines with them are cleaned (in the same way as
+    # Observation.remove_illegal_patterns), rather than replacing each pattern in every line.
+    cleaned = lines.take(indices(positions))
+
+    for pattern in ILLEGAL_PATTERNS:
+        cleaned = pc.replace_substring(cleaned, pattern, '')
+
+    order = np.arange(len(lines))
+    order[positions] = len(lines) + np.arange(len(positions))
+    return pa.concat_arrays([lines, trim_whitespace(cleaned)]).take(indices(order))
+
+
+def pattern_lines(data: bytes, offsets: np.ndarray) -> np.ndarray:
+    """
+    Find the lines of the encoded text of a station data file that have an illegal pattern.
+
+    Parameters
+    ----------
+    data : bytes
+        The encoded text of a station data file.
+    offsets : numpy.ndarray
+        The offset of the start of each line, then the end of the text.
+
+    Returns
+    -------
+    numpy.ndarray
+        The positions of the lines, in order.
+    """
+    starts = []
+
+    for pattern in ILLEGAL_PATTERNS:
+        pattern = pattern.encode('utf-8')
+        # Searching for the first byte is much faster than for the whole of a longer pattern,
+        # and the letters the patterns start with are rare in station data.
+        start = data.find(pattern[:1])
+
+        while start != -1:
+            if data.startswith(pattern, start):
+                starts.append(start)
+
+            start = data.find(pattern[:1], start + 1)
+
+    return np.unique(np.searchsorted(offsets, np.array(starts, np.int64), side='right') - 1)
+
+
+def prepare_threads() -> None:
+    """
+    Prepare pyarrow for parsing in several threads at once.
+
+    The first time pyarrow converts a Python value (e.g. a string compared with a column) it
+    imports pandas, and this is not safe in several threads at once.  It is not done when this
+    module is imported, as pandas is slow to import, so this must be called before the threads
+    are started.
+    """
+    pa.scalar(MISSING)
+
+
+def indices(positions: np.ndarray, absent: np.ndarray = None) -> pa.Int64Array:
+    """
+    Wrap positions as an Arrow array of indices without copying them.
+
+    Unlike pyarrow.array, this never checks whether the positions are a pandas object, which
+    lazily imports pandas and is not safe when stations are parsed in several threads at once.
+
+    Parameters
+    ----------
+    positions : numpy.ndarray
+        The positions.
+    absent : numpy.ndarray, optional
+        Which of the positions are null, by default none of them.
+
+    Returns
+    -------
+    pyarrow.Int64Array
+        The indices.
+    """
+    positions = np.ascontiguousarray(positions, np.int64)
+    validity = None if absent is None else pa.py_buffer(np.packbits(~absent, bitorder='little'))
+    return pa.Array.from_buffers(pa.int64(), len(positions), [validity, pa.py_buffer(positions)])
+
+
+def get_fields(lines: pa.StringArray) -> tuple:
+    """
+    Split each line into whitespace separated fields.
+
+    Parameters
+    ----------
+    lines : pyarrow.StringArray
+        The clean observation lines.
+
+    Returns
+    -------
+    tuple of (list of pyarrow.StringArray, pyarrow.StringArray)
+        The first seven fields of each line (null where a line has fewer fields) and the last field of each line.
+    """
+    tokens = pc.ascii_split_whitespace(lines)
+    values = tokens.flatten()
+    offsets = tokens.offsets.to_numpy()
+    starts = offsets[:-1]
+    lengths = np.diff(offsets)
+    fields = []
+
+    for index in range(FIELD_COUNT):
+        absent = lengths <= index
+        fields.append(values.take(indices(np.where(absent, 0, starts + index), absent)))
+
+    return (fields, values.take(indices(starts + lengths - 1)))
+
+
+def parse_amounts(fields: pa.DictionaryArray) -> tuple:
+    """
+    Parse fields that may be missing ('---'), estimated ('*') or from a Kipp & Zonen sensor ('#').
+
+    Parameters
+    ----------
+    fields : pyarrow.DictionaryArray
+        The raw fields, dictionary encoded so each distinct value is only parsed once.  A null
+        field is treated as a missing value.
+
+    Returns
+    -------
+    tuple of (pyarrow.DoubleArray, pyarrow.BooleanArray)
+        The values (null if missing) and if the values are estimated.
+    """
+    values = fields.dictionary
+    amounts = pc.if_else(pc.equal(values, MISSING), pa.scalar(None, pa.string()), pc.ascii_rtrim(values, '*#'))
+    is_estimated = pc.ends_with(values, '*').take(fields.indices)
+    return (pc.cast(amounts, pa.float64()).take(fields.indices), pc.fill_null(is_estimated, False))
+
+
+def parse_sun_instrument(fields: pa.DictionaryArray) -> pa.StringArray:
+    """
+    Derive the sun recording instrument from the raw sun fields.
+
+    Parameters
+    ----------
+    fields : pyarrow.DictionaryArray
+        The raw sun fields.  A null field is treated as a missing value.
+
+    Returns
+    -------
+    pyarrow.StringArray
+        One of either null, 'Kipp & Zonen' or 'Campbell Stokes' for each field.
+    """
+    values = fields.dictionary
+    last_character = pc.utf8_slice_codeunits(values, -1)
+    instrument = pc.if_else(pc.equal(last_character, '#'), 'Kipp & Zonen', 'Campbell Stokes')
+    unknown = pc.or_(pc.equal(values, MISSING), pc.is_in(last_character, value_set=UNKNOWN_SUN_SUFFIXES))
+    return pc.if_else(unknown, pa.scalar(None, pa.string()), instrument).take(fields.indices)
+
+
+def parse_observation_batch(text: str, station_name: str, quarantine=None) -> pa.RecordBatch:
+    """
+    Parse the text of a station data file into an Arrow record batch.
+
+    The whole text is tokenized at once, giving the same results as parsing each line
+    with Observation, but without creating an object for every line.
+
+    Parameters
+    ----------
+    text : str
+        The full text of a station data file.
+    station_name : str
+        The name of the station.
+    quarantine : historical.validation.Quarantine, optional
+        Check the rows and move those that fail to the quarantine, rather than raising an error
+        for a line that can not be parsed.  By default the rows are not checked.
+
+    Returns
+    -------
+    pyarrow.RecordBatch
+        The observations with the same columns as OBSERVATION_AVRO_SCHEMA.
+
+    Raises
+    ------
+    ValueError
+        If a line starting with a digit can not be parsed (and there is no quarantine).
+    """
+    lines = get_observation_lines(text)
+    fields, last_fields = get_fields(lines)
+
+    if quarantine is None:
+        invalid = fields[5].is_null()
+
+        if pc.any(invalid).as_py():
+            raise ValueError(f'Unable to parse line "{lines.filter(invalid)[0]}" for station {station_name}.')
+
+        return build_observation_batch(station_name, lines, fields, last_fields)
+
+    batch = None
+
+    # Most files parse cleanly, so the lines are only checked field by field if they do not.
+    if fields[5].null_count == 0:
+        try:
+            batch = build_observation_batch(station_name, lines, fields, last_fields)
+        except pa.ArrowInvalid:
+            pass
+
+    if batch is None:
+        valid = quarantine.check_fields(station_name, lines, fields)
+
+        if valid is not None:
+            lines = lines.filter(valid)
+            fields = [field.filter(valid) for field in fields]
+            last_fields = last_fields.filter(valid)
+
+        batch = build_observation_batch(station_name, lines, fields, last_fields)
+
+    return quarantine.check_values(station_name, lines, batch)
+
+
+def build_observation_batch(
+    station_name: str,
+    lines: pa.StringArray,
+    fields: list,
+    last_fields: pa.StringArray
+) -> pa.RecordBatch:
+    """
+    Build an Arrow record batch from the fields of the observation lines.
+
+    Parameters
+    ----------
+    station_name : str
+        The name of the station.
+    lines : pyarrow.StringArray
+        The clean observation lines.
+    fields : list of pyarrow.StringArray
+        The first seven fields of each line, none of the first six of which are null.
+    last_fields : pyarrow.StringArray
+        The last field of each line.
+
+    Returns
+    -------
+    pyarrow.RecordBatch
+        The observations, with the schema of historical.arrow.arrow_schema.
+
+    Raises
+    ------
+    pyarrow.ArrowInvalid
+        If a year, month or amount is not a number.
+    """
+    # The same few values recur throughout a station's data, so each field is dictionary encoded
+    # and each of its distinct values is only parsed once.
+    tmax, tmax_is_estimated = parse_amounts(fields[2].dictionary_encode())
+    tmin, tmin_is_estimated = parse_amounts(fields[3].dictionary_encode())
+    af, af_is_estimated = parse_amounts(fields[4].dictionary_encode())
+    rain, rain_is_estimated = parse_amounts(fields[5].dictionary_encode())
+    sun_fields = fields[6].dictionary_encode()
+    sun, sun_is_estimated = parse_amounts(sun_fields)
+
+    columns = [
+        pa.repeat(station_name, len(lines)),
+        pc.cast(fields[0], pa.int32()),
+        pc.cast(fields[1], pa.int32()),
+        tmax,
+        tmax_is_estimated,
+        tmin,
+        tmin_is_estimated,
+        pc.cast(af, pa.int32(), safe=False),
+        af_is_estimated,
+        rain,
+        rain_is_estimated,
+        sun,
+        sun_is_estimated,
+        parse_sun_instrument(sun_fields),
+        pc.equal(last_fields, 'Provisional')
+    ]
+    return pa.RecordBatch.from_arrays(columns, schema=arrow_schema())
@@ -0,0 +1,203 @@
+"""cache.py."""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import requests
+
+from historical.transport import default_transport
+from historical.utils import get_logger
+
+
+class SourceCache:
+    """A persistent on-disk cache of station source files that uses conditional requests."""
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_age: int = 90 * 24 * 60 * 60,
+        timeout: float = 60.0,
+        log_level: str = 'WARN',
+        transport=None
+    ) -> None:
+        """
+        Create a SourceCache object.
+
+        Parameters
+        ----------
+        directory : str
+            The directory to store the cached files in.  It is created if it does not exist.
+        max_bytes : int, optional
+            The maximum total size of the cached bodies, by default 256MiB.  The least recently
+            used entries are evicted when this is exceeded.
+        max_age : int, optional
+            The maximum age (in seconds) since an entry was last validated with the server, by
+            default 90 days.  Older entries are evicted.
+        timeout : float, optional
+            The read timeout (in seconds) for requests, by default 60.
+        log_level : str, optional
+            The log level for logging, by default 'WARN'.
+        transport : historical.transport.HTTPTransport, optional
+            The transport to make the requests with, by default the one shared by all stations.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.timeout = timeout
+        self.transport = transport if transport is not None else default_transport()
+        self.logger = get_logger('SourceCache', log_level)
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'bytes_downloaded': 0
+        }
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, url: str) -> str:
+        """
+        Get the body of a URL, only downloading it if it has changed since it was cached.
+
+        The cache is not pruned, as a prune in one thread could evict a body that another is about
+        to read, so prune should be called once all of the URLs have been fetched.
+
+        Parameters
+        ----------
+        url : str
+            The URL to be fetched.
+
+        Returns
+        -------
+        str
+            The body of the URL.
+
+        Raises
+        ------
+        requests.exceptions.HTTPError
+            If the final response (after any retries) is not successful.
+        """
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        metadata = self._read_metadata(key)
+        headers = {}
+
+        if metadata is not None:
+            if metadata.get('etag'):
+                headers['If-None-Match'] = metadata['etag']
+
+            if metadata.get('last_modified'):
+                headers['If-Modified-Since'] = metadata['last_modified']
+
+        response = self.transport.get(url, headers=headers, read_timeout=self.timeout)
+        body = self._read_body(key) if response.status_code == 304 and metadata is not None else None
+
+        if response.status_code == 304 and body is None:
+            # Nothing was cached to have not been modified, so the whole body is downloaded instead.
+            self.logger.debug(f'{url} has not been modified, but is not in the cache, downloading it again.')
+            response = self.transport.get(url, read_timeout=self.timeout)
+
+        if body is not None:
+            self.logger.debug(f'{url} has not been modified, reading it from the cache.')
+            self._count('hits')
+        else:
+            if response.status_code == 304:
+                raise requests.exceptions.HTTPError(f'304 Not Modified for an unconditional request of {url}')
+
+            response.raise_for_status()
+            body = response.content
+            metadata = {
+                'url': url,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'size': len(body)
+            }
+            self._write(f'{key}.body', body)
+            self._count('misses')
+            self._count('bytes_downloaded', len(body))
+
+        metadata['validated_at'] = time.time()
+        self._write(f'{key}.json', json.dumps(metadata).encode('utf-8'))
+        return body.decode('utf-8')
+
+    def prune(self) -> None:
+        """
+        Evict entries that are older than max_age, then the least recently used until under max_bytes.
+
+        This should be called once the URLs of a run have been fetched, rather than while they are.
+        """
+        with self._lock:
+            entries = []
+
+            for file_name in os.listdir(self.directory):
+                if file_name.endswith('.json'):
+                    key = file_name[:-len('.json')]
+                    entries.append((key, self._read_metadata(key)))
+
+            entries = [(key, metadata) for key, metadata in entries if metadata is not None]
+            entries.sort(key=lambda entry: entry[1]['validated_at'], reverse=True)
+            now = time.time()
+            total_bytes = 0
+
+            for key, metadata in entries:
+                total_bytes += metadata['size']
+
+                if now - metadata['validated_at'] > self.max_age or total_bytes > self.max_bytes:
+                    self.logger.debug(f'Evicting {metadata["url"]} from the cache.')
+                    self._remove(key)
+                    total_bytes -= metadata['size']
+                    self.stats['evictions'] += 1
+
+    def report(self) -> str:
+        """
+        Summarise the cache statistics.
+
+        Returns
+        -------
+        str
+            A printable summary of the cache hits and misses.
+        """
+        return (
+            f'Source cache {self.directory} had {self.stats["hits"]:,} hits and {self.stats["misses"]:,} misses, '
+            f'downloaded {self.stats["bytes_downloaded"]:,} bytes and evicted {self.stats["evictions"]:,} entries.'
+        )
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[name] += amount
+
+    def _read_body(self, key: str) -> bytes:
+        try:
+            with open(os.path.join(self.directory, f'{key}.body'), 'rb') as stream:
+                return stream.read()
+        except FileNotFoundError:
+            return None
+
+    def _read_metadata(self, key: str) -> dict:
+        metadata_file_name = os.path.join(self.directory, f'{key}.json')
+        body_file_name = os.path.join(self.directory, f'{key}.body')
+
+        if not os.path.exists(metadata_file_name) or not os.path.exists(body_file_name):
+            return None
+
+        with open(metadata_file_name) as stream:
+            return json.load(stream)
+
+    def _remove(self, key: str) -> None:
+        for suffix in ('.json', '.body'):
+            file_name = os.path.join(self.directory, f'{key}{suffix}')
+
+            if os.path.exists(file_name):
+                os.remove(file_name)
+
+    def _write(self, file_name: str, data: bytes) -> None:
+        # Write to a temporary file first so that a partial write never corrupts the cache.
+        descriptor, temporary_file_name = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+
+        with os.fdopen(descriptor, 'wb') as stream:
+            stream.write(data)
+
+        os.replace(temporary_file_name, os.path.join(self.directory, file_name))
@@ -0,0 +1,426 @@
+"""
+Climatology rollups of the monthly observations.
+
+Methods
+-------
+read_observations - Read the observations of a Parquet file or partitioned dataset.
+latest_observations - Keep the last row of each station, year and month.
+station_fingerprints - Get a fingerprint of the observations of each station.
+annual_rollup - Roll the monthly observations up into annual values.
+decadal_rollup - Roll annual values up into decadal means.
+climate_normals - Calculate the monthly climate normals of each station.
+monthly_anomalies - Calculate the anomalies of the monthly observations against the climate normals.
+update_climatology - Update the climatology tables, only recomputing stations whose observations have changed.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from historical.arrow import arrow_schema, cast_column
+from historical.convert import decade
+
+# How each variable is rolled up into an annual value.
+VARIABLES = {'tmax': 'mean', 'tmin': 'mean', 'af': 'sum', 'rain': 'sum', 'sun': 'sum'}
+NORMAL_PERIODS = {'1961-1990': (1961, 1990), '1991-2020': (1991, 2020)}
+# The WMO requires at least 80% of the years of a normal period to have a value.
+NORMAL_MINIMUM_YEARS = 24
+TABLES = ['annual', 'decadal', 'normals', 'anomalies']
+
+
+def read_observations(path: str) -> pa.Table:
+    """
+    Read the observations of a Parquet file or partitioned dataset.
+
+    Parameters
+    ----------
+    path : str
+        The Parquet file or the root directory of a dataset written with partitioned=True.
+
+    Returns
+    -------
+    pyarrow.Table
+        The observations with the columns of OBSERVATION_AVRO_SCHEMA.
+    """
+    schema = arrow_schema()
+
+    if os.path.isdir(path):
+        # pyarrow.dataset is slow to import and is only needed for a partitioned dataset.
+        import pyarrow.dataset as ds
+
+        partitioning = ds.partitioning(pa.schema([schema.field('station')]), flavor='hive')
+        table = ds.dataset(path, format='parquet', partitioning=partitioning).to_table()
+    else:
+        table = pq.read_table(path)
+
+    return pa.table([cast_column(table[field.name], field.type) for field in schema], schema=schema)
+
+
+def latest_observations(table: pa.Table) -> pa.Table:
+    """
+    Keep the last row of each station, year and month.
+
+    A month with more than one row (e.g. a provisional observation followed by its revision)
+    would otherwise be counted more than once by the rollups.
+
+    Parameters
+    ----------
+    table : pyarrow.Table
+        The observations.
+
+    Returns
+    -------
+    pyarrow.Table
+        The observations, in the same order, without the rows superseded by a later row.
+    """
+    indexed = table.select(['station', 'year', 'month']).append_column('row', pa.array(np.arange(table.num_rows)))
+    last_rows = indexed.group_by(['station', 'year', 'month']).aggregate([('row', 'max')])['row_max']
+
+    if len(last_rows) == table.num_rows:
+        return table
+
+    return table.take(pc.take(last_rows, pc.sort_indices(last_rows)))
+
+
+def _station_boundaries(stations: pa.Array) -> list:
+    changes = pc.indices_nonzero(pc.not_equal(stations[1:], stations[:-1])).to_numpy() + 1
+    return [0, *changes.tolist(), len(stations)] if len(stations) else [0]
+
+
+def _row_buffers(column: pa.ChunkedArray) -> list:
+    # Views of the column that can be sliced by row: the validity, then the values, or the
+    # offsets and data of a string column.
+    array = column.combine_chunks()
+    validity = pc.is_valid(array).to_numpy(zero_copy_only=False)
+
+    if pa.types.is_string(array.type):
+        buffers = array.buffers()
+        offsets = np.frombuffer(buffers[1], np.int32)[array.offset:array.offset + len(array) + 1]
+        data = np.frombuffer(buffers[2], np.uint8) if buffers[2] is not None else np.zeros(0, np.uint8)
+        return [validity, offsets, data]
+
+    fill = pa.scalar(False if pa.types.is_boolean(array.type) else 0, array.type)
+    return [validity, pc.fill_null(array, fill).to_numpy(zero_copy_only=False)]
+
+
+def station_fingerprints(table: pa.Table) -> dict:
+    """
+    Get a fingerprint of the observations of each station.
+
+    The fingerprint is a SHA-256 digest of the Arrow buffers of the station's observations in
+    year and month order, so it does not depend on how the observations were stored.  Only the
+    rows of the station are hashed, rather than the whole buffers of the table.
+
+    Parameters
+    ----------
+    table : pyarrow.Table
+        The observations.
+
+    Returns
+    -------
+    dict
+        The fingerprint of each station.
+    """
+    table = table.sort_by([('station', 'ascending'), ('year', 'ascending'), ('month', 'ascending')])
+    stations = table['station'].combine_chunks()
+    boundaries = _station_boundaries(stations)
+    columns = [_row_buffers(table[name]) for name in table.column_names if name != 'station']
+    fingerprints = {}
+
+    for start, stop in zip(boundaries[:-1], boundaries[1:]):
+        digest = hashlib.sha256()
+
+        for buffers in columns:
+            if len(buffers) == 3:
+                validity, offsets, data = buffers
+                digest.update(validity[start:stop].tobytes())
+                digest.update((offsets[start:stop + 1] - offsets[start]).tobytes())
+                digest.update(data[offsets[start]:offsets[stop]].tobytes())
+            else:
+                for values in buffers:
+                    digest.update(values[start:stop].tobytes())
+
+        fingerprints[stations[start].as_py()] = digest.hexdigest()
+
+    return fingerprints
+
+
+def _flag_counts(table: pa.Table) -> pa.Table:
+    # The flags are counted, so are cast to integers for the aggregations.
+    for name in [f'{variable}IsEstimated' for variable in VARIABLES] + ['isProvisional']:
+        table = table.set_column(table.schema.get_field_index(name), name, pc.cast(table[name], pa.int32()))
+
+    return table
+
+
+def _null_unless(values: pa.ChunkedArray, mask: pa.ChunkedArray) -> pa.ChunkedArray:
+    return pc.if_else(mask, values, pa.scalar(None, values.type))
+
+
+def annual_rollup(table: pa.Table) -> pa.Table:
+    """
+    Roll the monthly observations up into annual values.
+
+    The temperatures are the mean of the months, air frost, rain and sun are totals.  An annual
+    value is null unless all twelve months have a value.  The number of months with a value,
+    with an estimated value and that are provisional are given alongside.
+
+    Parameters
+    ----------
+    table : pyarrow.Table
+        The observations.
+
+    Returns
+    -------
+    pyarrow.Table
+        The annual values of each station, by station and year.
+    """
+    aggregations = [('month', 'count'), ('isProvisional', 'sum')]
+
+    for variable, function in VARIABLES.items():
+        aggregations.extend([(variable, function), (variable, 'count'), (f'{variable}IsEstimated', 'sum')])
+
+    grouped = _flag_counts(table).group_by(['station', 'year']).aggregate(aggregations)
+    grouped = grouped.sort_by([('station', 'ascending'), ('year', 'ascending')])
+    columns = {
+        'station': grouped['station'],
+        'year': grouped['year'],
+        'months': pc.cast(grouped['month_count'], pa.int32()),
+        'provisionalMonths': pc.cast(grouped['isProvisional_sum'], pa.int32())
+    }
+
+    for variable, function in VARIABLES.items():
+        months = pc.cast(grouped[f'{variable}_count'], pa.int32())
+        columns[variable] = _null_unless(
+            pc.cast(grouped[f'{variable}_{function}'], pa.float64()),
+            pc.equal(months, 12)
+        )
+        columns[f'{variable}Months'] = months
+        columns[f'{variable}EstimatedMonths'] = pc.cast(grouped[f'{variable}IsEstimated_sum'], pa.int32())
+
+    return pa.table(columns)
+
+
+def decadal_rollup(annual: pa.Table) -> pa.Table:
+    """
+    Roll annual values up into decadal means.
+
+    Years without an annual value (see annual_rollup) are left out of the means.
+
+    Parameters
+    ----------
+    annual : pyarrow.Table
+        The annual values from annual_rollup.
+
+    Returns
+    -------
+    pyarrow.Table
+        The mean annual values of each station over each decade, with the number of years of each
+        variable with a value, by station and decade.
+    """
+    annual = annual.append_column('decade', decade(annual['year']))
+    aggregations = [('year', 'count')]
+
+    for variable in VARIABLES:
+        aggregations.extend([(variable, 'mean'), (variable, 'count')])
+
+    grouped = annual.group_by(['station', 'decade']).aggregate(aggregations)
+    grouped = grouped.sort_by([('station', 'ascending'), ('decade', 'ascending')])
+    columns = {
+        'station': grouped['station'],
+        'decade': grouped['decade'],
+        'years': pc.cast(grouped['year_count'], pa.int32())
+    }
+
+    for variable in VARIABLES:
+        columns[variable] = grouped[f'{variable}_mean']
+        columns[f'{variable}Years'] = pc.cast(grouped[f'{variable}_count'], pa.int32())
+
+    return pa.table(columns)
+
+
+def climate_normals(table: pa.Table) -> pa.Table:
+    """
+    Calculate the monthly climate normals of each station for each of NORMAL_PERIODS.
+
+    Provisional observations are left out.  A normal is null if fewer than NORMAL_MINIMUM_YEARS
+    years of the period have a value for the month.
+
+    Parameters
+    ----------
+    table : pyarrow.Table
+        The observations.
+
+    Returns
+    -------
+    pyarrow.Table
+        The normal of each variable, with the number of years it is from, by station, period and month.
+    """
+    aggregations = []
+
+    for variable in VARIABLES:
+        aggregations.extend([(variable, 'mean'), (variable, 'count')])
+
+    normals = []
+    final = table.filter(pc.invert(table['isProvisional']))
+
+    for period, (first_year, last_year) in NORMAL_PERIODS.items():
+        in_period = pc.and_(pc.greater_equal(final['year'], first_year), pc.less_equal(final['year'], last_year))
+        grouped = final.filter(in_period).group_by(['station', 'month']).aggregate(aggregations)
+        columns = {
+            'station': grouped['station'],
+            'period': pa.array([period] * grouped.num_rows, pa.string()),
+            'month': grouped['month']
+        }
+
+        for variable in VARIABLES:
+            years = pc.cast(grouped[f'{variable}_count'], pa.int32())
+            columns[variable] = _null_unless(grouped[f'{variable}_mean'], pc.greater_equal(years, NORMAL_MINIMUM_YEARS))
+            columns[f'{variable}Years'] = years
+
+        normals.append(pa.table(columns))
+
+    return pa.concat_tables(normals).sort_by(
+        [('station', 'ascending'), ('period', 'ascending'), ('month', 'ascending')]
+    )
+
+
+def monthly_anomalies(table: pa.Table, normals: pa.Table) -> pa.Table:
+    """
+    Calculate the anomalies of the monthly observations against the climate normals.
+
+    There is a row for each observation and period.  An anomaly is null if either the observation
+    or the normal is null.  The estimated and provisional flags of the observation are kept.
+
+    Parameters
+    ----------
+    table : pyarrow.Table
+        The observations.
+    normals : pyarrow.Table
+        The climate normals from climate_normals.
+
+    Returns
+    -------
+    pyarrow.Table
+        The anomalies, by station, year, month and period.
+    """
+    flags = [f'{variable}IsEstimated' for variable in VARIABLES] + ['isProvisional']
+    observations = table.select(['station', 'year', 'month', *VARIABLES, *flags])
+    anomalies = []
+
+    for period in NORMAL_PERIODS:
+        period_normals = normals.filter(pc.equal(normals['period'], period))
+        period_normals = period_normals.select(['station', 'month', *VARIABLES])
+        period_normals = period_normals.rename_columns(['station', 'month', *[f'{name}Normal' for name in VARIABLES]])
+        joined = observations.join(period_normals, ['station', 'month'], join_type='left outer')
+        columns = {
+            'station': joined['station'],
+            'year': joined['year'],
+            'month': joined['month'],
+            'period': pa.array([period] * joined.num_rows, pa.string())
+        }
+
+        for variable in VARIABLES:
+            columns[f'{variable}Anomaly'] = pc.subtract(
+                pc.cast(joined[variable], pa.float64()),
+                joined[f'{variable}Normal']
+            )
+
+        for flag in flags:
+            columns[flag] = joined[flag]
+
+        anomalies.append(pa.table(columns))
+
+    return pa.concat_tables(anomalies).sort_by(
+        [('station', 'ascending'), ('year', 'ascending'), ('month', 'ascending'), ('period', 'ascending')]
+    )
+
+
+def _merge_stations(previous: pa.Table, table: pa.Table) -> pa.Table:
+    # Both tables are sorted by station first and have no stations in common, so the slices of
+    # each station are put in order, rather than sorting all of the rows again.
+    slices = []
+
+    for source in (previous, table):
+        stations = source['station'].combine_chunks()
+        boundaries = _station_boundaries(stations)
+        slices.extend(
+            (stations[start].as_py(), source.slice(start, stop - start))
+            for start, stop in zip(boundaries[:-1], boundaries[1:])
+        )
+
+    ordered = [station_slice for _, station_slice in sorted(slices, key=lambda item: item[0])]
+    return pa.concat_tables(ordered or [previous])
+
+
+def update_climatology(observations_path: str, directory: str, compression: str = 'snappy') -> list:
+    """
+    Update the climatology tables, only recomputing stations whose observations have changed.
+
+    The annual, decadal, normals and anomalies tables are written as Parquet files to the
+    directory, with a fingerprint of the observations of each station.  When the tables are
+    updated, the rollups of stations with the same fingerprint are kept from the previous tables
+    and only those of new or changed stations are computed.  Stations that no longer have any
+    observations are removed.
+
+    Parameters
+    ----------
+    observations_path : str
+        The Parquet file or the root directory of a dataset written with partitioned=True.
+    directory : str
+        The directory of the climatology tables.
+    compression : str, optional
+        The Parquet compression codec, by default 'snappy'.
+
+    Returns
+    -------
+    list of str
+        The names of the stations that were recomputed.
+    """
+    os.makedirs(directory, exist_ok=True)
+    observations = latest_observations(read_observations(observations_path))
+    fingerprints = station_fingerprints(observations)
+    fingerprints_file_name = os.path.join(directory, 'fingerprints.json')
+    table_file_names = {name: os.path.join(directory, f'{name}.parquet') for name in TABLES}
+    previous_fingerprints = {}
+
+    if os.path.exists(fingerprints_file_name) and all(map(os.path.exists, table_file_names.values())):
+        with open(fingerprints_file_name) as stream:
+            previous_fingerprints = json.load(stream)
+
+    changed = sorted(
+        station for station, fingerprint in fingerprints.items() if previous_fingerprints.get(station) != fingerprint
+    )
+    kept = pa.array(sorted(station for station in fingerprints if station not in changed), pa.string())
+
+    if changed or set(previous_fingerprints) != set(fingerprints):
+        observations = observations.filter(pc.is_in(observations['station'], pa.array(changed, pa.string())))
+        annual = annual_rollup(observations)
+        normals = climate_normals(observations)
+        tables = {
+            'annual': annual,
+            'decadal': decadal_rollup(annual),
+            'normals': normals,
+            'anomalies': monthly_anomalies(observations, normals)
+        }
+
+        for name, table in tables.items():
+            if previous_fingerprints:
+                previous = pq.read_table(table_file_names[name])
+                previous = previous.filter(pc.is_in(previous['station'], kept))
+                table = _merge_stations(previous, table.cast(previous.schema))
+
+            temporary_file_name = f'{table_file_names[name]}.tmp'
+            pq.write_table(table, temporary_file_name, compression=compression)
+            os.replace(temporary_file_name, table_file_names[name])
+
+        with open(f'{fingerprints_file_name}.tmp', 'w') as stream:
+            json.dump(fingerprints, stream, indent=2)
+
+        os.replace(f'{fingerprints_file_name}.tmp', fingerprints_file_name)
+
+    return changed
@@ -0,0 +1,637 @@
+"""
+Conversion of Avro files to other formats.
+
+Methods
+-------
+read_avro_batches - Read an Avro file as a sequence of Arrow record batches (optionally decoding in parallel).
+avro_to_parquet - Convert an Avro file to a Parquet file.
+avro_to_parquet_dataset - Convert an Avro file to a Hive partitioned Parquet dataset.
+avro_to_csv - Convert an Avro file to a (optionally compressed) CSV file.
+avro_to_feather - Convert an Avro file to an Arrow IPC (Feather v2) file.
+remove_output - Remove an earlier output, whether it is a file or a dataset directory.
+"""
+import collections
+import concurrent.futures
+import io
+import itertools
+import multiprocessing
+import os
+import shutil
+import urllib.parse
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from fastavro import reader
+from historical.arrow import arrow_schema, cast_batch, compact_arrow_schema
+from historical.avro import avro_blocks
+
+CSV_COMPRESSION = {
+    'none': '.csv',
+    'gzip': '.csv.gz',
+    'zstd': '.csv.zst'
+}
+FEATHER_COMPRESSION = ['uncompressed', 'lz4', 'zstd']
+
+
+def remove_output(path: str) -> None:
+    """
+    Remove an earlier output, whether it is a file or a dataset directory.
+
+    The outputs are named after the content of the sources only, so an earlier run with other
+    options (e.g. without --partitioned) may have left the other kind of output at the path.
+
+    Parameters
+    ----------
+    path : str
+        The full path to the output.
+    """
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+def read_avro_batches(avro_file_name: str, batch_size: int = 65536, schema: pa.Schema = None, workers: int = 1):
+    """
+    Read an Avro file as a sequence of Arrow record batches.
+
+    Only one batch of records is held in memory at a time (or, with workers, a few per worker).
+
+    Parameters
+    ----------
+    avro_file_name : str
+        The full path to the Avro file.
+    batch_size : int, optional
+        The maximum number of records in each batch, by default 65536.
+    schema : pyarrow.Schema, optional
+        The schema of the batches.  By default it is derived from the schema of the Avro file.
+    workers : int, optional
+        The number of processes decoding the blocks of the file, by default 1 (this process).
+        The batches are the same whatever the number of workers.
+
+    Yields
+    ------
+    pyarrow.RecordBatch
+        The records of the Avro file.
+    """
+    if workers > 1:
+        yield from read_avro_batches_parallel(avro_file_name, batch_size, schema, workers)
+        return
+
+    with open(avro_file_name, 'rb') as avro_file_stream:
+        avro_reader = reader(avro_file_stream)
+
+        if schema is None:
+            schema = arrow_schema(avro_reader.writer_schema)
+
+        records = []
+
+        for record in avro_reader:
+            records.append(record)
+
+            if len(records) >= batch_size:
+                yield records_to_batch(records, schema)
+                records = []
+
+        if records:
+            yield records_to_batch(records, schema)
+
+
+def decode_avro_blocks(
+    avro_file_name: str,
+    header_size: int,
+    offset: int,
+    end: int,
+    schema: pa.Schema
+) -> pa.RecordBatch:
+    """
+    Decode a run of the blocks of an Avro file into an Arrow record batch.
+
+    The header of the file and the blocks are read into memory and decoded as an Avro file of
+    their own, so this can run in another process.
+
+    Parameters
+    ----------
+    avro_file_name : str
+        The full path to the Avro file.
+    header_size : int
+        The size of the header of the file.
+    offset : int
+        The offset of the first block.
+    end : int
+        The end of the last block.
+    schema : pyarrow.Schema
+        The schema of the batch.
+
+    Returns
+    -------
+    pyarrow.RecordBatch
+        The records of the blocks.
+    """
+    with open(avro_file_name, 'rb') as avro_file_stream:
+        header = avro_file_stream.read(header_size)
+        avro_file_stream.seek(offset)
+        blocks = avro_file_stream.read(end - offset)
+
+    return records_to_batch(list(reader(io.BytesIO(header + blocks))), schema)
+
+
+def read_avro_batches_parallel(avro_file_name: str, batch_size: int, schema: pa.Schema, workers: int):
+    """
+    Read an Avro file as a sequence of Arrow record batches, decoding its blocks in a process pool.
+
+    The file is split at the sync markers between its blocks into runs of about batch_size
+    records, which are decoded by the workers.  The runs are reassembled in order into batches
+    of batch_size records, so the batches are the same as those of read_avro_batches.  At most
+    two runs per worker are decoded ahead of the batch being yielded.
+
+    Parameters
+    ----------
+    avro_file_name : str
+        The full path to the Avro file.
+    batch_size : int
+        The maximum number of records in each batch.
+    schema : pyarrow.Schema
+        The schema of the batches, or None to derive it from the schema of the Avro file.
+    workers : int
+        The number of worker processes.
+
+    Yields
+    ------
+    pyarrow.RecordBatch
+        The records of the Avro file.
+    """
+    if schema is None:
+        with open(avro_file_name, 'rb') as avro_file_stream:
+            schema = arrow_schema(reader(avro_file_stream).writer_schema)
+
+    header_size, blocks = avro_blocks(avro_file_name)
+    runs = []
+
+    for offset, end, record_count in blocks:
+        if runs and runs[-1][2] < batch_size:
+            runs[-1] = (runs[-1][0], end, runs[-1][2] + record_count)
+        else:
+            runs.append((offset, end, record_count))
+
+    if len(runs) < 2:
+        # There is nothing to decode in parallel, so do not start the workers.
+        yield from read_avro_batches(avro_file_name, batch_size, schema)
+        return
+
+    # The workers are forked from a server process rather than this one, which may be running threads.
+    start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    context = multiprocessing.get_context(start_method)
+    runs = iter(runs)
+    pending = []
+    pending_rows = 0
+
+    with concurrent.futures.ProcessPoolExecutor(workers, mp_context=context) as executor:
+        def submit(count: int) -> list:
+            return [
+                executor.submit(decode_avro_blocks, avro_file_name, header_size, offset, end, schema)
+                for offset, end, _ in itertools.islice(runs, count)
+            ]
+
+        futures = collections.deque(submit(2 * workers))
+
+        while futures:
+            batch = futures.popleft().result()
+            # A run is only submitted when one is done, which bounds the runs held in memory.
+            futures.extend(submit(1))
+            pending.append(batch)
+            pending_rows += batch.num_rows
+
+            while pending_rows >= batch_size or (not futures and pending_rows):
+                table = pa.Table.from_batches(pending, schema).combine_chunks()
+                yield table.slice(0, batch_size).to_batches()[0]
+                pending = table.slice(batch_size).to_batches()
+                pending_rows = max(0, pending_rows - batch_size)
+
+
+def records_to_batch(records: list, schema: pa.Schema) -> pa.RecordBatch:
+    """
+    Convert a list of records into an Arrow record batch.
+
+    Parameters
+    ----------
+    records : list of dict
+        The records to be converted.
+    schema : pyarrow.Schema
+        The schema of the batch.
+
+    Returns
+    -------
+    pyarrow.RecordBatch
+        The records as columns.
+    """
+    # Converting the records as a single struct array is much faster than converting each column in turn.
+    return pa.RecordBatch.from_struct_array(pa.array(records, pa.struct(schema)))
+
+
+def avro_to_parquet(
+    avro_file_name: str,
+    parquet_file_name: str,
+    row_group_size: int = 65536,
+    compression: str = 'snappy',
+    float32: bool = False,
+    workers: int = 1
+) -> int:
+    """
+    Convert an Avro file to a Parquet file, one row group at a time.
+
+    The peak memory used is bounded by the row group size, not by the size of the Avro file.
+    The file has the types of compact_arrow_schema.
+
+    Parameters
+    ----------
+    avro_file_name : str
+        The full path to the Avro file.
+    parquet_file_name : str
+        The full path to the Parquet file to be written.
+    row_group_size : int, optional
+        The maximum number of records in each row group, by default 65536.
+    compression : str, optional
+        The Parquet compression codec (e.g. 'snappy', 'zstd' or 'none'), by default 'snappy'.
+    float32 : bool, optional
+        Store the measurements as 32 bit floats, by default False.
+    workers : int, optional
+        The number of processes decoding the Avro file, by default 1 (this process).
+
+    Returns
+    -------
+    int
+        The number of records written.
+    """
+    record_count = 0
+    schema = compact_arrow_schema(float32=float32)
+    remove_output(parquet_file_name)
+
+    # An empty Parquet file (with the schema) is still written if there are no records.
+    with pq.ParquetWriter(parquet_file_name, schema, compression=compression) as parquet_writer:
+        for batch in read_avro_batches(avro_file_name, row_group_size, workers=workers):
+            parquet_writer.write_batch(cast_batch(batch, schema), row_group_size=row_group_size)
+            record_count += batch.num_rows
+
+    return record_count
+
+
+def decade(years: pa.Array) -> pa.Array:
+    """
+    Get the decade of each year (e.g. 1957 is in the 1950 decade).
+
+    Parameters
+    ----------
+    years : pyarrow.Array
+        The years.
+
+    Returns
+    -------
+    pyarrow.Array
+        The decades.
+    """
+    return pc.multiply(pc.divide(years, 10), 10)
+
+
+def station_runs(batch: pa.RecordBatch) -> list:
+    """
+    Split a record batch into runs of consecutive observations of the same station.
+
+    Parameters
+    ----------
+    batch : pyarrow.RecordBatch
+        The observations.
+
+    Returns
+    -------
+    list of pyarrow.RecordBatch
+        Slices of the batch, each of a single station, in the order of the batch.
+    """
+    stations = batch['station']
+    # The offsets at which the station changes within the batch.
+    boundaries = pc.indices_nonzero(pc.not_equal(stations[1:], stations[:-1])).to_numpy() + 1
+    return [
+        batch.slice(start, end - start)
+        for start, end in zip([0, *boundaries], [*boundaries, batch.num_rows])
+        if end > start
+    ]
+
+
+def write_station_partition(
+    batches: list,
+    dataset_directory: str,
+    part_numbers: dict,
+    compression: str,
+    float32: bool = False
+) -> None:
+    """
+    Write the observations of a station to a Parquet file with a row group for each decade.
+
+    The file is written to a station=<station> directory with the observations sorted by
+    year and month.  The station column is held in the directory name and is not repeated
+    inside the file.  The other columns have the types of compact_arrow_schema.
+
+    Parameters
+    ----------
+    batches : list of pyarrow.RecordBatch
+        The observations of a single station.
+    dataset_directory : str
+        The root directory of the dataset.
+    part_numbers : dict
+        The number of files written so far to each partition.  This is updated.
+    compression : str
+        The Parquet compression codec.
+    float32 : bool, optional
+        Store the measurements as 32 bit floats, by default False.
+    """
+    schema = compact_arrow_schema(float32=float32)
+    schema = schema.remove(schema.get_field_index('station'))
+    table = pa.Table.from_batches(batches).sort_by([('year', 'ascending'), ('month', 'ascending')])
+    partition = os.path.join(dataset_directory, f'station={urllib.parse.quote(table["station"][0].as_py(), safe="")}')
+    part_number = part_numbers.get(partition, 0)
+    part_numbers[partition] = part_number + 1
+    decades = decade(table['year'])
+    # Each batch has its own dictionaries, which are unified so that the Parquet dictionary pages are kept.
+    table = pa.Table.from_batches([cast_batch(batch, schema) for batch in table.to_batches()], schema)
+    table = table.unify_dictionaries()
+    os.makedirs(partition, exist_ok=True)
+
+    with pq.ParquetWriter(
+        os.path.join(partition, f'part-{part_number}.parquet'),
+        table.schema,
+        compression=compression,
+        write_statistics=True,
+        write_page_index=True
+    ) as parquet_writer:
+        for decade_value in pc.unique(decades).to_pylist():
+            parquet_writer.write_table(table.filter(pc.equal(decades, decade_value)))
+
+
+def avro_to_parquet_dataset(
+    avro_file_name: str,
+    dataset_directory: str,
+    batch_size: int = 65536,
+    compression: str = 'snappy',
+    float32: bool = False,
+    workers: int = 1
+) -> int:
+    """
+    Convert an Avro file to a Hive partitioned Parquet dataset (station=...).
+
+    Each station's file is sorted by year and month with a row group for each decade.  The
+    files have column statistics and a page index, so dataset filters on the station skip
+    files and filters on the date skip row groups and pages.  Partitioning by decade as well
+    would make files of only 120 rows, where per file overheads outweigh the pruning.
+
+    As the Avro file is grouped by station, only the observations of one station are held in
+    memory at a time.  A station that occurs again later in the Avro file (e.g. after an
+    incremental run) gets additional part files.
+
+    Parameters
+    ----------
+    avro_file_name : str
+        The full path to the Avro file.
+    dataset_directory : str
+        The root directory of the dataset to be written.  Any existing dataset is replaced.
+    batch_size : int, optional
+        The number of records read from the Avro file at a time, by default 65536.
+    compression : str, optional
+        The Parquet compression codec (e.g. 'snappy', 'zstd' or 'none'), by default 'snappy'.
+    float32 : bool, optional
+        Store the measurements as 32 bit floats, by default False.
+    workers : int, optional
+        The number of processes decoding the Avro file, by default 1 (this process).
+
+    Returns
+    -------
+    int
+        The number of records written.
+    """
+    remove_output(dataset_directory)
+    os.makedirs(dataset_directory)
+    record_count = 0
+    part_numbers = {}
+    station_batches = []
+
+    for batch in read_avro_batches(avro_file_name, batch_size, workers=workers):
+        record_count += batch.num_rows
+
+        for run in station_runs(batch):
+            if station_batches and station_batches[0]['station'][0] != run['station'][0]:
+                write_station_partition(station_batches, dataset_directory, part_numbers, compression, float32)
+                station_batches = []
+
+            station_batches.append(run)
+
+    if station_batches:
+        write_station_partition(station_batches, dataset_directory, part_numbers, compression, float32)
+
+    return record_count
+
+
+def format_doubles(values: pa.Array) -> pa.Array:
+    """
+    Format doubles as strings in the same way as Python's repr (e.g. 236.0 rather than 236).
+
+    Floats are formatted with the fewest digits that identify the float, rather than the double
+    it would be converted to.
+
+    Parameters
+    ----------
+    values : pyarrow.Array
+        The doubles (or floats) to be formatted.
+
+    Returns
+    -------
+    pyarrow.StringArray
+        The formatted values (null where the value is null).
+    """
+    text = pc.cast(values, pa.string())
+    whole = pc.match_substring_regex(text, r'^-?[0-9]+$')
+    text = pc.if_else(whole, pc.binary_join_element_wise(text, '.0', ''), text)
+    magnitude = pc.abs(values)
+    # Arrow and Python switch between fixed and scientific notation at different magnitudes.
+    scientific = pc.fill_null(
+        pc.or_(
+            pc.match_substring(text, 'e'),
+            pc.or_(pc.and_(pc.less(magnitude, 1e-4), pc.not_equal(magnitude, 0)), pc.greater_equal(magnitude, 1e16))
+        ),
+        False
+    )
+
+    if pc.any(scientific).as_py():
+        # These values are rare, so format them individually.
+        to_text = (lambda value: str(np.float32(value))) if pa.types.is_float32(values.type) else repr
+        replacements = pa.array([to_text(value) for value in values.filter(scientific).to_pylist()], pa.string())
+        text = pc.replace_with_mask(text, scientific, replacements)
+
+    return text
+
+
+def format_csv_column(column: pa.Array) -> pa.Array:
+    """
+    Format a column as CSV fields in the same way as csv.DictWriter.
+
+    Parameters
+    ----------
+    column : pyarrow.Array
+        The values of the column.
+
+    Returns
+    -------
+    pyarrow.StringArray
+        The CSV fields, with strings quoted where needed and nulls as empty fields.
+    """
+    if pa.types.is_dictionary(column.type):
+        column = column.dictionary_decode()
+
+    if pa.types.is_boolean(column.type):
+        text = pc.if_else(column, 'True', 'False')
+    elif pa.types.is_float32(column.type):
+        # Formatted as floats, so they are as short as they were written (e.g. 8.6 rather than 8.600000381469727).
+        text = format_doubles(column)
+    elif pa.types.is_floating(column.type):
+        text = format_doubles(pc.cast(column, pa.float64()))
+    elif pa.types.is_string(column.type):
+        needs_quotes = pc.match_substring_regex(column, '[,"\r\n]')
+        quoted = pc.binary_join_element_wise('"', pc.replace_substring(column, '"', '""'), '"', '')
+        text = pc.if_else(needs_quotes, quoted, column)
+    else:
+        text = pc.cast(column, pa.string())
+
+    return pc.fill_null(text, '')
+
+
+def format_csv_rows(batch: pa.RecordBatch) -> pa.Buffer:
+    """
+    Format a record batch as CSV rows terminated by a carriage return and line feed.
+
+    Parameters
+    ----------
+    batch : pyarrow.RecordBatch
+        The records to be formatted.
+
+    Returns
+    -------
+    pyarrow.Buffer
+        The encoded CSV rows.
+    """
+    rows = pc.binary_join_element_wise(*[format_csv_column(column) for column in batch.columns], ',')
+    rows = pc.binary_join_element_wise(rows, '\r\n', '')
+    # The rows are contiguous in the data buffer of the array, so it can be written without copying.
+    offsets = np.frombuffer(rows.buffers()[1], np.int32)[rows.offset:rows.offset + len(rows) + 1]
+    return rows.buffers()[2].slice(int(offsets[0]), int(offsets[-1] - offsets[0]))
+
+
+def avro_to_csv(
+    avro_file_name: str,
+    csv_file_name: str,
+    batch_size: int = 65536,
+    compression: str = 'none',
+    workers: int = 1
+) -> int:
+    """
+    Convert an Avro file to a CSV file, one batch of records at a time.
+
+    The columns are in the order of the Avro schema and, when uncompressed, the file is byte for
+    byte the same as writing each record with csv.DictWriter.
+
+    Parameters
+    ----------
+    avro_file_name : str
+        The full path to the Avro file.
+    csv_file_name : str
+        The full path to the CSV file to be written.
+    batch_size : int, optional
+        The number of records formatted at a time, by default 65536.
+    compression : str, optional
+        Stream the CSV through a compressor.  One of 'none', 'gzip' or 'zstd', by default 'none'.
+    workers : int, optional
+        The number of processes decoding the Avro file, by default 1 (this process).
+
+    Returns
+    -------
+    int
+        The number of records written.
+
+    Raises
+    ------
+    ValueError
+        If the compression is not supported.
+    """
+    if compression not in CSV_COMPRESSION:
+        raise ValueError(f'Unsupported CSV compression "{compression}", must be one of {", ".join(CSV_COMPRESSION)}.')
+
+    record_count = 0
+
+    with open(avro_file_name, 'rb') as avro_file_stream:
+        names = [field['name'] for field in reader(avro_file_stream).writer_schema['fields']]
+
+    with pa.output_stream(csv_file_name, compression=None if compression == 'none' else compression) as csv_stream:
+        csv_stream.write(f'{",".join(names)}\r\n'.encode('utf-8'))
+
+        for batch in read_avro_batches(avro_file_name, batch_size, workers=workers):
+            csv_stream.write(format_csv_rows(batch))
+            record_count += batch.num_rows
+
+    return record_count
+
+
+def avro_to_feather(
+    avro_file_name: str,
+    feather_file_name: str,
+    batch_size: int = 65536,
+    compression: str = 'uncompressed',
+    workers: int = 1
+) -> int:
+    """
+    Convert an Avro file to an Arrow IPC (Feather v2) file, one batch of records at a time.
+
+    An uncompressed file can be opened with pyarrow.memory_map and read with pyarrow.ipc.open_file
+    (or pyarrow.feather.read_table with memory_map=True) without copying or decoding the columns.
+    A compressed file is smaller, but the columns are decompressed when they are read.
+
+    Parameters
+    ----------
+    avro_file_name : str
+        The full path to the Avro file.
+    feather_file_name : str
+        The full path to the Feather file to be written.
+    batch_size : int, optional
+        The maximum number of records in each record batch of the file, by default 65536.
+    compression : str, optional
+        One of 'uncompressed', 'lz4' or 'zstd', by default 'uncompressed'.
+    workers : int, optional
+        The number of processes decoding the Avro file, by default 1 (this process).
+
+    Returns
+    -------
+    int
+        The number of records written.
+
+    Raises
+    ------
+    ValueError
+        If the compression is not supported.
+    """
+    if compression not in FEATHER_COMPRESSION:
+        raise ValueError(
+            f'Unsupported Feather compression "{compression}", must be one of {", ".join(FEATHER_COMPRESSION)}.'
+        )
+
+    record_count = 0
+
+    with open(avro_file_name, 'rb') as avro_file_stream:
+        schema = arrow_schema(reader(avro_file_stream).writer_schema)
+
+    options = pa.ipc.IpcWriteOptions(compression=None if compression == 'uncompressed' else compression)
+
+    with pa.ipc.new_file(feather_file_name, schema, options=options) as feather_writer:
+        for batch in read_avro_batches(avro_file_name, batch_size, schema, workers):
+            feather_writer.write_batch(batch)
+            record_count += batch.num_rows
+
+    return record_count
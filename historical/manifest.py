@@ -0,0 +1,260 @@
+"""
+Content hashes of the station sources and manifests of the outputs made from them.
+
+Methods
+-------
+file_checksum - Get the SHA-256 checksum of a file.
+path_checksums - Get the size and checksum of a file, or of each file in a directory.
+snapshot_sources - Fetch the station sources into content addressed files and hash them.
+write_manifest - Write a manifest of the outputs made from a snapshot of the sources.
+read_manifest - Read a manifest, if the outputs it lists are unchanged.
+reusable_cache_key - Get the cache key of the run that wrote a manifest, if its outputs can be reused.
+"""
+import concurrent.futures
+import hashlib
+import json
+import os
+
+from historical.metrics import Metrics
+from historical.station import Station
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_checksum(file_name: str) -> str:
+    """
+    Get the SHA-256 checksum of a file.
+
+    Parameters
+    ----------
+    file_name : str
+        The name of the file.
+
+    Returns
+    -------
+    str
+        The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+
+    with open(file_name, 'rb') as stream:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def path_checksums(path: str) -> dict:
+    """
+    Get the size and checksum of a file, or of each file in a directory.
+
+    Parameters
+    ----------
+    path : str
+        The file or directory.
+
+    Returns
+    -------
+    dict
+        The bytes and sha256 of each file, by its path relative to the directory ('' for a file).
+    """
+    if os.path.isfile(path):
+        return {'': {'bytes': os.path.getsize(path), 'sha256': file_checksum(path)}}
+
+    checksums = {}
+
+    for directory, _, file_names in os.walk(path):
+        for file_name in file_names:
+            full_name = os.path.join(directory, file_name)
+            checksums[os.path.relpath(full_name, path)] = {
+                'bytes': os.path.getsize(full_name),
+                'sha256': file_checksum(full_name)
+            }
+
+    return dict(sorted(checksums.items()))
+
+
+def snapshot_sources(
+    stations: list,
+    directory: str,
+    log_level: str = 'WARN',
+    cache=None,
+    metrics: Metrics = None,
+    max_workers: int = 1
+) -> tuple:
+    """
+    Fetch the station sources into content addressed files and hash them.
+
+    Each source is written to <directory>/<SHA-256 of the source>.txt, unless the file is already
+    there.  The content hash is a SHA-256 digest of the name, URL and source checksum of every
+    station, so it changes if the station list or any of the sources change.  The snapshot (the
+    stations with the name of their source file) is written to <directory>/<content hash>.json
+    and other source files in the directory are removed.
+
+    Parameters
+    ----------
+    stations : list of dict
+        The stations.  Each element must have a name and url key (as in stations.yml).
+    directory : str
+        The directory of the source files.
+    log_level : str, optional
+        The log level for logging, by default 'WARN'.
+    cache : historical.cache.SourceCache, optional
+        A cache of the source files, by default None.
+    metrics : historical.metrics.Metrics, optional
+        Where to record the snapshot of each station, by default None.
+    max_workers : int, optional
+        The maximum number of sources to fetch at the same time, by default 1.
+
+    Returns
+    -------
+    tuple of (str, str)
+        The content hash and the name of the snapshot file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    metrics = metrics if metrics is not None else Metrics(trace_memory=False)
+
+    def fetch(station_data: dict) -> dict:
+        station = Station(station_data['name'], station_data['url'], log_level, cache)
+
+        with metrics.stage('snapshot', station.name) as snapshot_metrics, station.open() as stream:
+            body = stream.read().encode('utf-8')
+            checksum = hashlib.sha256(body).hexdigest()
+            source_file_name = os.path.join(directory, f'{checksum}.txt')
+
+            if not os.path.exists(source_file_name):
+                # Two stations may have the same source, so each thread writes its own temporary file.
+                temporary_file_name = f'{source_file_name}.{station.name.encode("utf-8").hex()}.tmp'
+
+                with open(temporary_file_name, 'wb') as source_stream:
+                    source_stream.write(body)
+
+                os.replace(temporary_file_name, source_file_name)
+
+            snapshot_metrics['bytes'] = len(body)
+
+        return {'name': station.name, 'url': station.url, 'sha256': checksum, 'source_file_name': source_file_name}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        snapshot = list(executor.map(fetch, stations))
+
+    content = json.dumps([[station['name'], station['url'], station['sha256']] for station in snapshot])
+    content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+    snapshot_file_name = os.path.join(directory, f'{content_hash}.json')
+
+    with open(snapshot_file_name, 'w') as stream:
+        json.dump(snapshot, stream, indent=2)
+
+    current = {snapshot_file_name} | {station['source_file_name'] for station in snapshot}
+
+    for file_name in os.listdir(directory):
+        if os.path.join(directory, file_name) not in current:
+            os.remove(os.path.join(directory, file_name))
+
+    return (content_hash, snapshot_file_name)
+
+
+def write_manifest(
+    manifest_file_name: str,
+    content_hash: str,
+    cache_key: str,
+    outputs: dict,
+    options: dict = None
+) -> dict:
+    """
+    Write a manifest of the outputs made from a snapshot of the sources.
+
+    Parameters
+    ----------
+    manifest_file_name : str
+        The name of the JSON manifest file.
+    content_hash : str
+        The content hash of the sources (from snapshot_sources).
+    cache_key : str
+        The key the tasks that made the outputs were cached with.
+    outputs : dict
+        The name of each output file or directory, by the kind of output (e.g. parquet).
+    options : dict, optional
+        The options of the run that change which tasks write which files (e.g. incremental), by
+        default none.
+
+    Returns
+    -------
+    dict
+        The manifest, with the size and checksum of each file of each output.
+    """
+    manifest = {
+        'content_hash': content_hash,
+        'cache_key': cache_key,
+        'options': options or {},
+        'outputs': {
+            kind: {'path': path, 'files': path_checksums(path)}
+            for kind, path in outputs.items()
+        }
+    }
+    temporary_file_name = f'{manifest_file_name}.tmp'
+
+    with open(temporary_file_name, 'w') as stream:
+        json.dump(manifest, stream, indent=2)
+
+    os.replace(temporary_file_name, manifest_file_name)
+    return manifest
+
+
+def read_manifest(manifest_file_name: str) -> dict:
+    """
+    Read a manifest, if the outputs it lists are unchanged.
+
+    Parameters
+    ----------
+    manifest_file_name : str
+        The name of the JSON manifest file.
+
+    Returns
+    -------
+    dict
+        The manifest, or None if it does not exist or if any of its outputs are missing or have
+        changed since it was written.
+    """
+    if not os.path.exists(manifest_file_name):
+        return None
+
+    with open(manifest_file_name) as stream:
+        manifest = json.load(stream)
+
+    for output in manifest['outputs'].values():
+        if not os.path.exists(output['path']) or path_checksums(output['path']) != output['files']:
+            return None
+
+    return manifest
+
+
+def reusable_cache_key(manifest_file_name: str, content_hash: str, options: dict = None) -> str:
+    """
+    Get the cache key of the run that wrote a manifest, if its outputs can be reused.
+
+    The key is only reused while the manifest is for the same sources and its outputs are
+    unchanged, so cached task results are only returned when the files they name are still there.
+    It is not reused by a run with different options either, as a task with a cached result (e.g.
+    the extraction of a shard) may name a file that a task it was not cached with removed.
+
+    Parameters
+    ----------
+    manifest_file_name : str
+        The name of the JSON manifest file of the outputs of the sources.
+    content_hash : str
+        The content hash of the sources (from snapshot_sources).
+    options : dict, optional
+        The options of the run (as given to write_manifest), by default none.
+
+    Returns
+    -------
+    str
+        The cache key, or None if the outputs must be generated again.
+    """
+    manifest = read_manifest(manifest_file_name)
+
+    if manifest is None or manifest['content_hash'] != content_hash or manifest.get('options', {}) != (options or {}):
+        return None
+
+    return manifest['cache_key']
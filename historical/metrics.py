@@ -0,0 +1,235 @@
+"""
+Metrics and profiling of the stages of a run.
+
+Methods
+-------
+merge_metrics - Merge metrics files into a single metrics file.
+profiled - Profile a block of code if profiling is enabled.
+"""
+import contextlib
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+PROFILE_VARIABLE = 'HISTORICAL_PROFILE'
+PROFILERS = ['cprofile', 'pyinstrument']
+TRACE_MEMORY_VARIABLE = 'HISTORICAL_TRACE_MEMORY'
+
+
+class Metrics:
+    """The wall time, records, bytes and peak memory of each stage of a run, optionally for each station."""
+
+    def __init__(self, trace_memory: bool = None) -> None:
+        """
+        Create a Metrics object.
+
+        Parameters
+        ----------
+        trace_memory : bool, optional
+            Measure the peak memory allocated by Python in each stage with tracemalloc.  This
+            slows down the run, so by default it is only done if the HISTORICAL_TRACE_MEMORY
+            environment variable is set (to anything other than '' or 0).
+        """
+        if trace_memory is None:
+            trace_memory = os.environ.get(TRACE_MEMORY_VARIABLE, '') not in ('', '0')
+
+        self.trace_memory = trace_memory
+        self.stages = []
+        self._lock = threading.Lock()
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, station: str = None):
+        """
+        Measure a stage of the run.
+
+        The wall time is always measured.  The records and bytes processed are set on the yielded
+        dictionary by the caller.  Stages that overlap (e.g. in threads) share the peak memory.
+
+        Parameters
+        ----------
+        name : str
+            The name of the stage (e.g. download).
+        station : str, optional
+            The name of the station the stage is for, by default None (all stations).
+
+        Yields
+        ------
+        dict
+            The metrics of the stage.
+        """
+        metrics = {'stage': name, 'station': station, 'records': 0, 'bytes': 0}
+
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+
+        try:
+            yield metrics
+        finally:
+            metrics['seconds'] = round(time.perf_counter() - start, 6)
+            metrics['records_per_second'] = round(metrics['records'] / metrics['seconds']) if metrics['seconds'] else 0
+            metrics['tracemalloc_peak_bytes'] = tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+
+            with self._lock:
+                self.stages.append(metrics)
+
+    def summary(self) -> dict:
+        """
+        Summarise the stages by name.
+
+        Returns
+        -------
+        dict
+            For each stage name, the total seconds, records and bytes, the overall records per second
+            and the largest peak memory.
+        """
+        summary = {}
+
+        for metrics in self.stages:
+            total = summary.setdefault(
+                metrics['stage'],
+                {'seconds': 0.0, 'records': 0, 'bytes': 0, 'tracemalloc_peak_bytes': None}
+            )
+            total['seconds'] = round(total['seconds'] + metrics['seconds'], 6)
+            total['records'] += metrics['records']
+            total['bytes'] += metrics['bytes']
+
+            if metrics['tracemalloc_peak_bytes'] is not None:
+                peak = max(total['tracemalloc_peak_bytes'] or 0, metrics['tracemalloc_peak_bytes'])
+                total['tracemalloc_peak_bytes'] = peak
+
+        for total in summary.values():
+            total['records_per_second'] = round(total['records'] / total['seconds']) if total['seconds'] else 0
+
+        return summary
+
+    def save(self, file_name: str) -> None:
+        """
+        Save the metrics to a JSON file.
+
+        Parameters
+        ----------
+        file_name : str
+            The name of the metrics file.
+        """
+        with open(file_name, 'w') as stream:
+            json.dump({'summary': self.summary(), 'stages': self.stages}, stream, indent=2)
+
+    @classmethod
+    def load(cls, file_name: str):
+        """
+        Load the metrics saved to a JSON file.
+
+        Parameters
+        ----------
+        file_name : str
+            The name of the metrics file.
+
+        Returns
+        -------
+        Metrics
+            The metrics.
+        """
+        metrics = cls(trace_memory=False)
+
+        with open(file_name) as stream:
+            metrics.stages = json.load(stream)['stages']
+
+        return metrics
+
+
+def merge_metrics(file_names: list, metrics_file_name: str, metrics: Metrics = None, remove: bool = True) -> Metrics:
+    """
+    Merge metrics files into a single metrics file.
+
+    Parameters
+    ----------
+    file_names : list of str
+        The names of the metrics files to be merged.  Files that do not exist are skipped.
+    metrics_file_name : str
+        The name of the merged metrics file.
+    metrics : Metrics, optional
+        Further metrics to follow those of the files, by default none.
+    remove : bool, optional
+        Remove the merged files, by default True.
+
+    Returns
+    -------
+    Metrics
+        The merged metrics.
+    """
+    merged = Metrics(trace_memory=False)
+
+    for file_name in file_names:
+        if os.path.exists(file_name):
+            merged.stages.extend(Metrics.load(file_name).stages)
+
+            if remove:
+                os.remove(file_name)
+
+    if metrics is not None:
+        merged.stages.extend(metrics.stages)
+
+    merged.save(metrics_file_name)
+    return merged
+
+
+@contextlib.contextmanager
+def profiled(name: str, directory: str):
+    """
+    Profile a block of code if profiling is enabled by the HISTORICAL_PROFILE environment variable.
+
+    With HISTORICAL_PROFILE=cprofile the statistics are written to <directory>/<name>.prof, to be
+    read with pstats or snakeviz.  With HISTORICAL_PROFILE=pyinstrument (which must be installed
+    separately) a text report is written to <directory>/<name>.pyinstrument.txt.
+
+    Parameters
+    ----------
+    name : str
+        The name of the profile.
+    directory : str
+        The directory to write the profile to.
+
+    Raises
+    ------
+    ValueError
+        If HISTORICAL_PROFILE is not one of the supported profilers.
+    """
+    profiler_name = os.environ.get(PROFILE_VARIABLE, '')
+
+    if not profiler_name:
+        yield
+        return
+
+    if profiler_name not in PROFILERS:
+        raise ValueError(f'Unsupported profiler "{profiler_name}", must be one of {", ".join(PROFILERS)}.')
+
+    if profiler_name == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(directory, f'{name}.prof'))
+    else:
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+
+        try:
+            yield
+        finally:
+            profiler.stop()
+
+            with open(os.path.join(directory, f'{name}.pyinstrument.txt'), 'w') as stream:
+                stream.write(profiler.output_text())
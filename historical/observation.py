@@ -2,10 +2,41 @@
 import json
 import re
 
+ILLEGAL_PATTERNS = [
+    # Patterns that are non-standard, but have made it into the data.
+    '$',
+    'all data from Whitby',
+    'Change to Monckton Ave'
+]
+SUN_INSTRUMENTS = {
+    '*': None,
+    '-': None,
+    '#': 'Kipp & Zonen'
+}
+TOKENIZER = re.compile('[ \t\n\r]+')
+
 
 class Observation:
     """The Observation class."""
 
+    __slots__ = (
+        '_station_name',
+        'year',
+        'month',
+        'tmax',
+        'tmax_is_estimated',
+        'tmin',
+        'tmin_is_estimated',
+        'af',
+        'af_is_estimated',
+        'rain',
+        'rain_is_estimated',
+        'sun',
+        'sun_is_estimated',
+        'sun_instrument',
+        'is_provisional'
+    )
+
     def __init__(self, line: str) -> None:
         """
         Construct an Observation class.
@@ -15,10 +46,8 @@ class Observation:
         line : str
             A line of data from the Met Office.
         """
-        self.line = self.remove_illegal_patterns(line)
         self._station_name = None
-        prog = re.compile('[ \t\n\r]+')
-        data = prog.split(self.line)
+        data = TOKENIZER.split(self.remove_illegal_patterns(line))
         self.year = int(data[0])
         self.month = int(data[1])
         self.tmax, self.tmax_is_estimated = self.get_possibly_estimated_amount(data[2])
@@ -41,16 +70,16 @@ class Observation:
 
         self.is_provisional = data[-1] == 'Provisional'
 
-    def __str__(self) -> str:
+    def __repr__(self) -> str:
         """
-        Convert the object to a printable string.
+        Convert the object to a printable string without serializing it.
 
         Returns
         -------
         str
             A printable representation of the object.
         """
-        return self.to_json()
+        return f'Observation({self._station_name!r}, {self.year}-{self.month:02})'
 
     def get_possibly_estimated_amount(self, field: str):
         """
@@ -61,22 +90,16 @@ class Observation:
         field : str
             The field to be parsed.  If the value is '---' then not enough data was available for that month.
         """
-        is_estimated = False
-
-        if field == '---':
-            value = None
-            return (value, is_estimated)
+        last_character = field[-1]
 
-        if field[-1] == '*':
-            is_estimated = True
-            value = field[0:-1]
-        elif field[-1] == '#':
-            value = field[0:-1]
-        else:
-            value = field
+        if last_character == '*':
+            return (float(field[:-1]), True)
+        elif last_character == '#':
+            return (float(field[:-1]), False)
+        elif field == '---':
+            return (None, False)
 
-        value = float(value)
-        return (value, is_estimated)
+        return (float(field), False)
 
     def get_sun_instrument(self, field: str) -> str:
         """
@@ -94,18 +117,7 @@ class Observation:
         str
             One of either None, 'Kipp & Zonen' or 'Campbell Stokes'.
         """
-        map = {
-            '*': None,
-            '-': None,
-            '#': 'Kipp & Zonen'
-        }
-
-        last_character = field[-1]
-
-        if last_character not in map:
-            return 'Campbell Stokes'
-
-        return map[last_character]
+        return SUN_INSTRUMENTS.get(field[-1], 'Campbell Stokes')
 
     def remove_illegal_patterns(self, line: str) -> str:
         """
@@ -126,19 +138,13 @@ class Observation:
         Returns
         -------
         str
-            A clean line.
+            A clean line.  Whitespace left at either end by a removed pattern is stripped, so it is not
+            split into an empty field.
         """
-        invalid_patters = [
-            # Patterns that are non-standard, but have made it into the data.
-            '$',
-            'all data from Whitby',
-            'Change to Monckton Ave'
-        ]
-
-        for invalid_pattern in invalid_patters:
+        for invalid_pattern in ILLEGAL_PATTERNS:
             line = line.replace(invalid_pattern, '')
 
-        return line
+        return line.strip()
 
     def station_name(self, station_name: str = None) -> str:
         """
@@ -166,9 +172,9 @@ class Observation:
         Returns
         -------
         dict
-            A dictionary generated from the to_json method.
+            A dictionary generated from the to_record method.
         """
-        return json.loads(self.to_json())
+        return self.to_record()
 
     def to_json(self) -> str:
         """
@@ -179,7 +185,18 @@ class Observation:
         str
             A JSON string.
         """
-        data = {
+        return json.dumps(self.to_record())
+
+    def to_record(self) -> dict:
+        """
+        Convert the contents of the object to a record matching OBSERVATION_AVRO_SCHEMA.
+
+        Returns
+        -------
+        dict
+            The record.  The station is only included if the station name has been set.
+        """
+        record = {
             'year': self.year,
             'month': self.month,
             'tmax': self.tmax,
@@ -197,6 +214,6 @@ class Observation:
         }
 
         if self._station_name:
-            data['station'] = self.station_name()
+            record['station'] = self._station_name
 
-        return json.dumps(data)
+        return record
@@ -0,0 +1,208 @@
+"""pipeline.py."""
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from historical.arrow import arrow_schema, cast_batch, compact_arrow_schema
+from historical.avro import AvroWriter
+from historical.convert import (
+    CSV_COMPRESSION,
+    FEATHER_COMPRESSION,
+    format_csv_rows,
+    remove_output,
+    write_station_partition
+)
+
+
+class FanOutWriter:
+    """A writer that streams batches of observations to Avro, Parquet, CSV and Feather files at the same time."""
+
+    def __init__(
+        self,
+        avro_file_name: str,
+        parquet_file_name: str,
+        csv_file_name: str,
+        codec: str = 'null',
+        block_size: int = 1000,
+        sync_interval: int = 16000,
+        row_group_size: int = 65536,
+        parquet_compression: str = 'snappy',
+        partitioned: bool = False,
+        csv_compression: str = 'none',
+        feather_file_name: str = None,
+        feather_compression: str = 'uncompressed',
+        parquet_float32: bool = False
+    ) -> None:
+        """
+        Create a FanOutWriter object.
+
+        The files are the same as those written by converting the Avro file afterwards, but the
+        observations are only parsed once and the Avro file is never read back.
+
+        Parameters
+        ----------
+        avro_file_name : str
+            The name of the Avro file to be written.
+        parquet_file_name : str
+            The name of the Parquet file (or dataset directory) to be written.
+        csv_file_name : str
+            The name of the CSV file to be written.
+        codec : str, optional
+            The Avro compression codec, by default 'null'.
+        block_size : int, optional
+            The maximum number of records in each Avro block, by default 1000.
+        sync_interval : int, optional
+            The maximum size (in bytes) of an uncompressed Avro block, by default 16000.
+        row_group_size : int, optional
+            The number of records in each Parquet row group, by default 65536.
+        parquet_compression : str, optional
+            The Parquet compression codec, by default 'snappy'.
+        partitioned : bool, optional
+            Write a Hive partitioned Parquet dataset (station=...) rather than a single file,
+            by default False.
+        csv_compression : str, optional
+            Stream the CSV through a compressor.  One of 'none', 'gzip' or 'zstd', by default 'none'.
+        feather_file_name : str, optional
+            The name of the Arrow IPC (Feather v2) file to be written, by default None (no file).
+        feather_compression : str, optional
+            One of 'uncompressed', 'lz4' or 'zstd', by default 'uncompressed'.
+        parquet_float32 : bool, optional
+            Store the measurements in the Parquet output as 32 bit floats, by default False.
+
+        Raises
+        ------
+        ValueError
+            If the Avro codec, CSV compression or Feather compression is not supported.
+        """
+        if csv_compression not in CSV_COMPRESSION:
+            raise ValueError(
+                f'Unsupported CSV compression "{csv_compression}", must be one of {", ".join(CSV_COMPRESSION)}.'
+            )
+
+        if feather_compression not in FEATHER_COMPRESSION:
+            raise ValueError(
+                f'Unsupported Feather compression "{feather_compression}", '
+                f'must be one of {", ".join(FEATHER_COMPRESSION)}.'
+            )
+
+        self.schema = arrow_schema()
+        self.parquet_schema = compact_arrow_schema(float32=parquet_float32)
+        self.row_group_size = row_group_size
+        self.parquet_compression = parquet_compression
+        self.partitioned = partitioned
+        self.parquet_float32 = parquet_float32
+        self.records_written = 0
+        self._avro_writer = AvroWriter(avro_file_name, codec=codec, block_size=block_size, sync_interval=sync_interval)
+        self._parquet_file_name = parquet_file_name
+        self._parquet_writer = None
+        self._pending_batches = []
+        self._pending_rows = 0
+        self._part_numbers = {}
+
+        remove_output(parquet_file_name)
+
+        if partitioned:
+            os.makedirs(parquet_file_name)
+        else:
+            self._parquet_writer = pq.ParquetWriter(
+                parquet_file_name,
+                self.parquet_schema,
+                compression=parquet_compression
+            )
+
+        self._csv_stream = pa.output_stream(
+            csv_file_name,
+            compression=None if csv_compression == 'none' else csv_compression
+        )
+        self._csv_stream.write(f'{",".join(self.schema.names)}\r\n'.encode('utf-8'))
+        self._feather_writer = None
+
+        if feather_file_name is not None:
+            self._feather_writer = pa.ipc.new_file(
+                feather_file_name,
+                self.schema,
+                options=pa.ipc.IpcWriteOptions(
+                    compression=None if feather_compression == 'uncompressed' else feather_compression
+                )
+            )
+
+    def __enter__(self):
+        """
+        Enter the runtime context of the writer.
+
+        Returns
+        -------
+        FanOutWriter
+            This writer.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Flush any buffered records and close the files."""
+        self.close()
+
+    def close(self) -> None:
+        """Flush any buffered records and close the files."""
+        if self._csv_stream.closed:
+            return
+
+        self._avro_writer.close()
+
+        if self._parquet_writer is not None:
+            if self._pending_rows:
+                self._parquet_writer.write_table(pa.Table.from_batches(self._pending_batches).unify_dictionaries())
+
+            self._parquet_writer.close()
+
+        self._csv_stream.close()
+
+        if self._feather_writer is not None:
+            self._feather_writer.close()
+
+    def write_batch(self, batch: pa.RecordBatch) -> None:
+        """
+        Write a batch of observations to all of the files.
+
+        Parameters
+        ----------
+        batch : pyarrow.RecordBatch
+            The observations with the same columns as OBSERVATION_AVRO_SCHEMA.  For a partitioned
+            dataset the batch must hold all of the observations of a single station.
+        """
+        if not batch.num_rows:
+            return
+
+        self._avro_writer.write_many(batch.to_pylist())
+        self._write_parquet(batch)
+        self._csv_stream.write(format_csv_rows(batch))
+
+        if self._feather_writer is not None:
+            self._feather_writer.write_batch(batch)
+
+        self.records_written += batch.num_rows
+
+    def _write_parquet(self, batch: pa.RecordBatch) -> None:
+        if self.partitioned:
+            write_station_partition(
+                [batch],
+                self._parquet_file_name,
+                self._part_numbers,
+                self.parquet_compression,
+                self.parquet_float32
+            )
+            return
+
+        # Batches are buffered so that row groups span stations, as they do when converting the Avro file.
+        self._pending_batches.append(cast_batch(batch, self.parquet_schema))
+        self._pending_rows += batch.num_rows
+
+        if self._pending_rows < self.row_group_size:
+            return
+
+        # Each batch has its own dictionaries, which are unified so that the Parquet dictionary pages are kept.
+        table = pa.Table.from_batches(self._pending_batches).unify_dictionaries()
+        full_rows = self._pending_rows - self._pending_rows % self.row_group_size
+        self._parquet_writer.write_table(table.slice(0, full_rows), row_group_size=self.row_group_size)
+        self._pending_batches = table.slice(full_rows).to_batches()
+        self._pending_rows -= full_rows
@@ -0,0 +1,312 @@
+"""
+Queries of the generated Parquet output.
+
+Methods
+-------
+parse_month - Parse a year or year and month into a month key.
+latest_parquet - Find the newest Parquet output in a directory.
+write_table - Write the result of a query as CSV or JSON lines.
+"""
+import bisect
+import glob
+import json
+import os
+import urllib.parse
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from historical.arrow import arrow_schema, cast_column
+from historical.convert import format_csv_rows
+
+OUTPUT_FORMATS = ['csv', 'json']
+
+
+def parse_month(value: str, end: bool = False) -> int:
+    """
+    Parse a year (e.g. 1990) or a year and month (e.g. 1990-06) into a month key (year * 12 + month - 1).
+
+    Parameters
+    ----------
+    value : str
+        The year or year and month.
+    end : bool, optional
+        If only a year is given, use December rather than January, by default False.
+
+    Returns
+    -------
+    int
+        The month key.
+
+    Raises
+    ------
+    ValueError
+        If the value is not a year or a year and month.
+    """
+    parts = str(value).split('-')
+
+    if len(parts) > 2 or not all(part.isdigit() for part in parts):
+        raise ValueError(f'Unable to parse "{value}" as YYYY or YYYY-MM.')
+
+    year = int(parts[0])
+    month = int(parts[1]) if len(parts) == 2 else (12 if end else 1)
+
+    if not 1 <= month <= 12:
+        raise ValueError(f'Unable to parse "{value}" as YYYY or YYYY-MM.')
+
+    return year * 12 + month - 1
+
+
+def latest_parquet(directory: str) -> str:
+    """
+    Find the newest Parquet output (file or partitioned dataset) in a directory.
+
+    Parameters
+    ----------
+    directory : str
+        The directory the workflow wrote its outputs to.
+
+    Returns
+    -------
+    str
+        The name of the Parquet file or dataset directory.
+
+    Raises
+    ------
+    FileNotFoundError
+        If there is no Parquet output in the directory.
+    """
+    paths = glob.glob(os.path.join(directory, 'historic-station-data*.parquet'))
+
+    if not paths:
+        raise FileNotFoundError(f'No Parquet output found in {directory}.')
+
+    return max(paths, key=os.path.getmtime)
+
+
+class ObservationQuery:
+    """Station, date range and column queries over a Parquet file or a station partitioned Parquet dataset."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Create an ObservationQuery object, building an index of the row ranges of each station.
+
+        The files are memory mapped and only the station, year and month columns are read to build
+        the index.  The index is kept, so later queries find a station by a binary search and the
+        rows of a date range within it by a binary search of its (sorted) months, then read only
+        the row groups that hold those rows.
+
+        Parameters
+        ----------
+        path : str
+            The Parquet file or the root directory of a dataset written with partitioned=True.
+        """
+        self.path = path
+        self._files = []
+        runs = {}
+
+        for file_name, station in self._list_files(path):
+            parquet_file = pq.ParquetFile(file_name, memory_map=True)
+            file_index = len(self._files)
+            row_group_offsets = np.cumsum(
+                [0] + [parquet_file.metadata.row_group(index).num_rows for index in range(parquet_file.num_row_groups)]
+            )
+            self._files.append((parquet_file, station, row_group_offsets))
+            columns = ['year', 'month'] if station is not None else ['station', 'year', 'month']
+            table = parquet_file.read(columns=columns)
+            months = pc.add(pc.multiply(table['year'], 12), pc.subtract(table['month'], 1)).to_numpy()
+
+            if station is not None:
+                boundaries = [0, table.num_rows]
+                stations = [station]
+            else:
+                station_column = table['station'].combine_chunks()
+
+                if pa.types.is_dictionary(station_column.type):
+                    station_column = station_column.dictionary_decode()
+
+                changes = pc.indices_nonzero(pc.not_equal(station_column[1:], station_column[:-1])).to_numpy() + 1
+                boundaries = [0, *changes, table.num_rows]
+                stations = [station_column[int(start)].as_py() for start in boundaries[:-1]]
+
+            for name, start, stop in zip(stations, boundaries[:-1], boundaries[1:]):
+                run_months = months[start:stop]
+                is_sorted = bool(np.all(run_months[1:] >= run_months[:-1]))
+                runs.setdefault(name, []).append((file_index, int(start), int(stop), run_months, is_sorted))
+
+        self.stations = sorted(runs)
+        self._runs = [runs[name] for name in self.stations]
+
+    @staticmethod
+    def _list_files(path: str) -> list:
+        if os.path.isfile(path):
+            return [(path, None)]
+
+        files = []
+
+        for partition in sorted(os.listdir(path)):
+            if not partition.startswith('station='):
+                continue
+
+            station = urllib.parse.unquote(partition[len('station='):])
+
+            for file_name in sorted(os.listdir(os.path.join(path, partition))):
+                if file_name.endswith('.parquet'):
+                    files.append((os.path.join(path, partition, file_name), station))
+
+        return files
+
+    def row_ranges(self, station: str, start: str = None, end: str = None) -> list:
+        """
+        Find the row ranges of a station's observations in a date range from the index.
+
+        Parameters
+        ----------
+        station : str
+            The name of the station.
+        start : str, optional
+            The first year or year and month (e.g. 1990 or 1990-06), by default the first observation.
+        end : str, optional
+            The last year or year and month (e.g. 2000 or 2000-06), by default the last observation.
+
+        Returns
+        -------
+        list of tuple of (int, int, int, numpy.ndarray or None)
+            The file index, first row and end row of each range, with a mask of the rows in the date
+            range where the rows of a range are not sorted by date (otherwise None).
+        """
+        index = bisect.bisect_left(self.stations, station)
+
+        if index == len(self.stations) or self.stations[index] != station:
+            return []
+
+        first = parse_month(start) if start is not None else -1
+        last = parse_month(end, end=True) if end is not None else np.iinfo(np.int64).max
+        ranges = []
+
+        for file_index, run_start, run_stop, months, is_sorted in self._runs[index]:
+            if is_sorted:
+                lower = int(np.searchsorted(months, first, 'left'))
+                upper = int(np.searchsorted(months, last, 'right'))
+
+                if lower < upper:
+                    ranges.append((file_index, run_start + lower, run_start + upper, None))
+            else:
+                mask = (months >= first) & (months <= last)
+
+                if mask.any():
+                    ranges.append((file_index, run_start, run_stop, mask))
+
+        return ranges
+
+    def query(self, station: str, start: str = None, end: str = None, columns: list = None) -> pa.Table:
+        """
+        Get the observations of a station in a date range.
+
+        Parameters
+        ----------
+        station : str
+            The name of the station.
+        start : str, optional
+            The first year or year and month (e.g. 1990 or 1990-06), by default the first observation.
+        end : str, optional
+            The last year or year and month (e.g. 2000 or 2000-06), by default the last observation.
+        columns : list of str, optional
+            The columns to be returned, by default all of them.
+
+        Returns
+        -------
+        pyarrow.Table
+            The observations, in the order they were written.
+
+        Raises
+        ------
+        ValueError
+            If a column does not exist.
+        """
+        schema = self.schema
+        columns = list(columns) if columns else schema.names
+        unknown = [column for column in columns if column not in schema.names]
+
+        if unknown:
+            raise ValueError(f'Unknown columns {", ".join(unknown)}, must be in {", ".join(schema.names)}.')
+
+        tables = []
+
+        for file_index, first_row, end_row, mask in self.row_ranges(station, start, end):
+            parquet_file, partition_station, row_group_offsets = self._files[file_index]
+            first_group = int(np.searchsorted(row_group_offsets, first_row, 'right')) - 1
+            end_group = int(np.searchsorted(row_group_offsets, end_row, 'left'))
+            file_columns = [column for column in columns if column != 'station' or partition_station is None]
+            table = parquet_file.read_row_groups(range(first_group, end_group), columns=file_columns)
+            table = table.slice(first_row - row_group_offsets[first_group], end_row - first_row)
+
+            if mask is not None:
+                table = table.filter(pa.array(mask))
+
+            if partition_station is not None and 'station' in columns:
+                table = table.append_column(
+                    schema.field('station'),
+                    pa.array([partition_station] * table.num_rows, pa.string())
+                )
+
+            # The files may store compact types (see compact_arrow_schema), the result has the standard ones.
+            tables.append(
+                pa.table(
+                    [cast_column(table[column], schema.field(column).type) for column in columns],
+                    schema=pa.schema([schema.field(column) for column in columns])
+                )
+            )
+
+        if not tables:
+            return schema.empty_table().select(columns)
+
+        return pa.concat_tables(tables)
+
+    @property
+    def schema(self) -> pa.Schema:
+        """
+        Get the schema of the observations.
+
+        This is the schema of the query results, which is the same whatever types the files were
+        written with.
+
+        Returns
+        -------
+        pyarrow.Schema
+            The schema, including the station column.
+        """
+        return arrow_schema()
+
+
+def write_table(table: pa.Table, stream, output_format: str = 'csv') -> None:
+    """
+    Write the result of a query as CSV or JSON lines.
+
+    Parameters
+    ----------
+    table : pyarrow.Table
+        The result of a query.
+    stream : io.BufferedIOBase
+        The binary stream to write to.
+    output_format : str, optional
+        Either 'csv' or 'json', by default 'csv'.
+
+    Raises
+    ------
+    ValueError
+        If the output format is not supported.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f'Unsupported output format "{output_format}", must be one of {", ".join(OUTPUT_FORMATS)}.')
+
+    if output_format == 'csv':
+        stream.write(f'{",".join(table.column_names)}\r\n'.encode('utf-8'))
+
+        for batch in table.to_batches():
+            stream.write(format_csv_rows(batch))
+    else:
+        for record in table.to_pylist():
+            stream.write(f'{json.dumps(record)}\n'.encode('utf-8'))
@@ -0,0 +1,336 @@
+"""
+A local HTTP read service over the latest Parquet output.
+
+The newest output is indexed once (see ObservationQuery) and station and date range queries
+are answered from it as JSON, CSV or Arrow IPC.  The most recent responses are kept in a
+bounded LRU cache, and the output is indexed again when the workflow writes a new one.
+
+Methods
+-------
+make_server - Create an HTTP server for an ObservationService.
+"""
+import functools
+import io
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pyarrow as pa
+
+from historical.query import ObservationQuery, latest_parquet, write_table
+from historical.utils import get_logger
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+
+class ObservationService:
+    """Cached station and date range queries over the latest Parquet output of the workflow."""
+
+    def __init__(
+        self,
+        directory: str = None,
+        parquet: str = None,
+        cache_size: int = 256,
+        reload_interval: float = 5.0,
+        log_level: str = 'WARN'
+    ) -> None:
+        """
+        Create an ObservationService object.
+
+        Parameters
+        ----------
+        directory : str, optional
+            The directory the workflow writes its outputs to.  The newest Parquet output in it is
+            served, by default None.
+        parquet : str, optional
+            The Parquet file or partitioned dataset to be served instead of the newest output in
+            the directory, by default None.
+        cache_size : int, optional
+            The maximum number of responses kept in the LRU cache, by default 256.
+        reload_interval : float, optional
+            The minimum number of seconds between checks for a new output, by default 5.
+        log_level : str, optional
+            The log level for logging, by default 'WARN'.
+
+        Raises
+        ------
+        ValueError
+            If neither a directory nor a Parquet output is given.
+        """
+        if directory is None and parquet is None:
+            raise ValueError('Either a directory or a Parquet output must be given.')
+
+        self.directory = directory
+        self.parquet = parquet
+        self.reload_interval = reload_interval
+        self.logger = get_logger('ObservationService', log_level)
+        self.path = None
+        self.reloads = 0
+        self._version = None
+        self._query = None
+        self._checked = None
+        self._lock = threading.Lock()
+        # The query of the output is part of the key, so a response of an old output is never served.
+        self._response = functools.lru_cache(maxsize=cache_size)(self._render)
+
+    def _current(self) -> tuple:
+        path = self.parquet or latest_parquet(self.directory)
+        return (path, os.stat(path).st_mtime_ns)
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Index the output again if a new output has been written since it was last indexed.
+
+        An output is new if it is a different file (or dataset) or if it has been modified, as a
+        partitioned dataset is when observations are upserted into it.  Unless forced, the check
+        is made at most once every reload_interval seconds.
+
+        Parameters
+        ----------
+        force : bool, optional
+            Check for a new output now, by default False.
+
+        Returns
+        -------
+        bool
+            True if the output was indexed again, otherwise False.
+
+        Raises
+        ------
+        FileNotFoundError
+            If there is no output to be served.
+        pyarrow.ArrowInvalid
+            If the first output to be served cannot be read (e.g. it is still being written).  A
+            new output that cannot be read yet is not indexed, and the previous one is served.
+        """
+        now = time.monotonic()
+
+        if not force and self._checked is not None and now - self._checked < self.reload_interval:
+            return False
+
+        with self._lock:
+            try:
+                version = self._current()
+                self._checked = now
+
+                if version == self._version:
+                    return False
+
+                start = time.perf_counter()
+                query = ObservationQuery(version[0])
+            except (pa.ArrowInvalid, OSError) as error:
+                if self._query is None:
+                    raise
+
+                # The version is not recorded, so the output is indexed once it has been written.
+                self.logger.warning(f'Serving {self.path}, as the new output cannot be read yet: {error}')
+                return False
+
+            self._query = query
+            self._version = version
+            self.path = version[0]
+            self.reloads += 1
+            self._response.cache_clear()
+            self.logger.info(
+                f'Indexed {len(self._query.stations):,} stations of {self.path} in {time.perf_counter() - start:.3f}s.'
+            )
+            return True
+
+    @property
+    def stations(self) -> list:
+        """
+        Get the names of the stations in the output.
+
+        Returns
+        -------
+        list of str
+            The names of the stations, sorted.
+        """
+        self.refresh()
+        return self._query.stations
+
+    def response(
+        self,
+        station: str,
+        start: str = None,
+        end: str = None,
+        columns: tuple = None,
+        output_format: str = 'json'
+    ) -> bytes:
+        """
+        Get the body of the response to a query, from the cache if it is there.
+
+        Parameters
+        ----------
+        station : str
+            The name of the station.
+        start : str, optional
+            The first year or year and month (e.g. 1990 or 1990-06), by default the first observation.
+        end : str, optional
+            The last year or year and month (e.g. 2000 or 2000-06), by default the last observation.
+        columns : tuple of str, optional
+            The columns to be returned, by default all of them.
+        output_format : str, optional
+            One of 'json' (an array of records), 'csv' or 'arrow' (an Arrow IPC stream), by default 'json'.
+
+        Returns
+        -------
+        bytes
+            The body of the response.
+
+        Raises
+        ------
+        ValueError
+            If the output format, a column or a date is not valid.
+        """
+        if output_format not in CONTENT_TYPES:
+            raise ValueError(f'Unsupported format "{output_format}", must be one of {", ".join(CONTENT_TYPES)}.')
+
+        self.refresh()
+        return self._response(self._query, station, start, end, columns, output_format)
+
+    @staticmethod
+    def _render(
+        query: ObservationQuery,
+        station: str,
+        start: str,
+        end: str,
+        columns: tuple,
+        output_format: str
+    ) -> bytes:
+        table = query.query(station, start, end, list(columns) if columns else None)
+
+        if output_format == 'json':
+            return json.dumps(table.to_pylist()).encode('utf-8')
+
+        stream = io.BytesIO()
+
+        if output_format == 'arrow':
+            with pa.ipc.new_stream(stream, table.schema) as writer:
+                writer.write_table(table)
+        else:
+            write_table(table, stream, 'csv')
+
+        return stream.getvalue()
+
+    @property
+    def stats(self) -> dict:
+        """
+        Get the statistics of the service.
+
+        Returns
+        -------
+        dict
+            The output served, the number of times it has been indexed and the hits, misses and
+            size of the cache.
+        """
+        cache_info = self._response.cache_info()
+        return {
+            'path': self.path,
+            'reloads': self.reloads,
+            'cache_hits': cache_info.hits,
+            'cache_misses': cache_info.misses,
+            'cache_size': cache_info.currsize,
+            'cache_max_size': cache_info.maxsize
+        }
+
+
+class _ObservationRequestHandler(BaseHTTPRequestHandler):
+    """Answer GET /health, GET /stations and GET /stations/<station> with an ObservationService."""
+
+    protocol_version = 'HTTP/1.1'
+    # The headers and body are written separately, which Nagle's algorithm would delay on a keep-alive connection.
+    disable_nagle_algorithm = True
+    service = None
+
+    def do_GET(self) -> None:
+        """Answer a GET request."""
+        url = urllib.parse.urlsplit(self.path)
+        parameters = urllib.parse.parse_qs(url.query)
+        parts = [urllib.parse.unquote(part) for part in url.path.strip('/').split('/')]
+
+        try:
+            if parts == ['health']:
+                self._send(HTTPStatus.OK, json.dumps(self.service.stats).encode('utf-8'))
+            elif parts == ['stations']:
+                self._send(HTTPStatus.OK, json.dumps(self.service.stations).encode('utf-8'))
+            elif len(parts) == 2 and parts[0] == 'stations':
+                self._send_station(parts[1], parameters)
+            else:
+                self._send_error(HTTPStatus.NOT_FOUND, f'Unknown path {url.path}.')
+        except (FileNotFoundError, pa.ArrowInvalid) as error:
+            self._send_error(HTTPStatus.SERVICE_UNAVAILABLE, str(error))
+
+    def _send_station(self, station: str, parameters: dict) -> None:
+        if station not in self.service.stations:
+            self._send_error(HTTPStatus.NOT_FOUND, f'Unknown station {station}.')
+            return
+
+        output_format = parameters.get('format', ['json'])[0]
+        columns = parameters.get('columns', [''])[0]
+
+        try:
+            body = self.service.response(
+                station,
+                parameters.get('start', [None])[0],
+                parameters.get('end', [None])[0],
+                tuple(columns.split(',')) if columns else None,
+                output_format
+            )
+        except ValueError as error:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(error))
+            return
+
+        self._send(HTTPStatus.OK, body, CONTENT_TYPES[output_format])
+
+    def _send_error(self, status: HTTPStatus, message: str) -> None:
+        self._send(status, json.dumps({'error': message}).encode('utf-8'))
+
+    def _send(self, status: HTTPStatus, body: bytes, content_type: str = 'application/json') -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        """Log requests at the DEBUG level, rather than writing them to stderr."""
+        self.service.logger.debug(format % args)
+
+
+def make_server(service: ObservationService, host: str = '127.0.0.1', port: int = 8080) -> ThreadingHTTPServer:
+    """
+    Create an HTTP server for an ObservationService.
+
+    The server answers GET /stations with the names of the stations, GET /stations/<station>
+    with the station's observations (with optional start, end, columns and format parameters,
+    e.g. /stations/Armagh?start=1990&end=2000&columns=year,month,rain&format=arrow) and
+    GET /health with the statistics of the service.  Each request is answered on its own thread.
+
+    Parameters
+    ----------
+    service : ObservationService
+        The service answering the queries.
+    host : str, optional
+        The address to listen on, by default '127.0.0.1' (only local clients).
+    port : int, optional
+        The port to listen on, by default 8080.  Use 0 for any free port.
+
+    Returns
+    -------
+    http.server.ThreadingHTTPServer
+        The server, which is started with serve_forever.
+    """
+    handler = type('ObservationRequestHandler', (_ObservationRequestHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
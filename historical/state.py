@@ -0,0 +1,78 @@
+"""state.py."""
+import json
+import os
+
+
+class Watermarks:
+    """Per station watermarks of the observations that have already been written."""
+
+    def __init__(self, file_name: str) -> None:
+        """
+        Create a Watermarks object, loading the state file if it exists.
+
+        The state file holds, for each station, the year and month of the latest observation
+        written and the provisional observations that may still be revised.
+
+        Parameters
+        ----------
+        file_name : str
+            The name of the JSON state file.
+        """
+        self.file_name = file_name
+        self.stations = {}
+        # The revised observations accepted since the state was loaded, keyed on (station, year, month).
+        self.revisions = {}
+
+        if os.path.exists(file_name):
+            with open(file_name) as stream:
+                self.stations = json.load(stream)
+
+    def accept(self, record: dict) -> bool:
+        """
+        Check if an observation is new or changed and, if so, record it in the watermarks.
+
+        An observation is new if it is later than the watermark for its station.  An observation
+        is changed if it was provisional when it was last written and it has since been revised.
+        Changed observations are also kept in revisions, so the rows they supersede can be replaced.
+
+        Parameters
+        ----------
+        record : dict
+            The observation as a record matching OBSERVATION_AVRO_SCHEMA.
+
+        Returns
+        -------
+        bool
+            True if the observation is to be written, otherwise False.
+        """
+        state = self.stations.setdefault(record['station'], {'year': 0, 'month': 0, 'provisional': {}})
+        key = f'{record["year"]}-{record["month"]:02}'
+        is_new = (record['year'], record['month']) > (state['year'], state['month'])
+        is_changed = key in state['provisional'] and state['provisional'][key] != record
+
+        if not is_new and not is_changed:
+            return False
+
+        if is_new:
+            state['year'] = record['year']
+            state['month'] = record['month']
+
+        if is_changed:
+            self.revisions[(record['station'], record['year'], record['month'])] = record
+
+        if record['isProvisional']:
+            state['provisional'][key] = record
+        else:
+            state['provisional'].pop(key, None)
+
+        return True
+
+    def save(self) -> None:
+        """Save the watermarks to the state file."""
+        temporary_file_name = f'{self.file_name}.tmp'
+
+        # Without an indent, the state is encoded by the C encoder, which is much faster for many stations.
+        with open(temporary_file_name, 'w') as stream:
+            stream.write(json.dumps(self.stations))
+
+        os.replace(temporary_file_name, self.file_name)
@@ -1,14 +1,28 @@
 """station.py."""
+import collections
+import concurrent.futures
+import io
+
 from curses.ascii import isdigit
+from historical.batch import parse_observation_batch, prepare_threads
+from historical.metrics import Metrics
 from historical.observation import Observation
 from historical.utils import get_logger
-from smart_open import open
 
 
 class Station:
     """The Station class."""
 
-    def __init__(self, name: str, url: str, log_level: str = 'WARN') -> None:
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        log_level: str = 'WARN',
+        cache=None,
+        metrics: Metrics = None,
+        transport=None,
+        quarantine=None
+    ) -> None:
         """
         Create a Station object.
 
@@ -20,9 +34,22 @@ class Station:
             The URL to the historical data for this station.
         log_level : str
             The log level for logging.
+        cache : historical.cache.SourceCache, optional
+            A cache of the source files.  If not provided the data is always read from the URL.
+        metrics : historical.metrics.Metrics, optional
+            Where to record the download and parse stages of get_observation_batch.
+        transport : historical.transport.HTTPTransport, optional
+            The transport to download the data with.  By default the transport shared by all
+            stations is used.
+        quarantine : historical.validation.Quarantine, optional
+            Check the rows parsed by get_observation_batch, moving those that fail to the quarantine.
         """
         self.name = name
         self.url = url
+        self.cache = cache
+        self.transport = transport
+        self.quarantine = quarantine
+        self.metrics = metrics if metrics is not None else Metrics(trace_memory=False)
         self.logger = get_logger(f'Station:{name}', log_level)
 
     def get_observations(self):
@@ -34,8 +61,6 @@ class Station:
         Observation
             The observation data.
         """
-        self.logger.debug(f'Reading data from {self.url} for station {self.name}.')
-
         # invalid_patters = [
         #     # Patterns that are non-standard, but have made it into the data.
         #     '$',
@@ -43,7 +68,7 @@ class Station:
         #     'Change to Monckton Ave'
         # ]
 
-        with open(self.url, 'r') as stream:
+        with self.open() as stream:
             for line in stream:
                 line = line.strip()
 
@@ -56,3 +81,129 @@ class Station:
                 self.logger.debug(line)
                 observation = Observation(line)
                 yield observation
+
+    def open(self):
+        """
+        Open the station data as a text stream.
+
+        HTTP(S) URLs are downloaded with a pooled transport that retries transient failures, or
+        read through the cache if there is one.  Other URLs (e.g. local files) are opened with
+        smart_open, as the cache only revalidates its entries with HTTP requests.
+
+        Returns
+        -------
+        io.TextIOBase
+            The station data.
+        """
+        self.logger.debug(f'Reading data from {self.url} for station {self.name}.')
+
+        if self.url.startswith(('http://', 'https://')):
+            if self.cache is not None:
+                return io.StringIO(self.cache.get(self.url), newline=None)
+
+            # requests is slow to import, so it is only imported when a station is downloaded.
+            from historical.transport import default_transport
+
+            transport = self.transport if self.transport is not None else default_transport()
+            return io.StringIO(transport.read_text(self.url), newline=None)
+
+        # smart_open is slow to import, and is only needed for other URLs.
+        import smart_open
+
+        return smart_open.open(self.url, 'r')
+
+    def get_observation_batch(self):
+        """
+        Get all of the observations from the station data as a single columnar batch.
+
+        This is much faster than get_observations as no Observation objects are created.
+
+        Returns
+        -------
+        pyarrow.RecordBatch
+            The observations with the same columns as OBSERVATION_AVRO_SCHEMA.
+        """
+        with self.metrics.stage('download', self.name) as metrics, self.open() as stream:
+            text = stream.read()
+            metrics['bytes'] = len(text.encode('utf-8'))
+
+        with self.metrics.stage('parse', self.name) as metrics:
+            batch = parse_observation_batch(text, self.name, self.quarantine)
+            metrics['records'] = batch.num_rows
+
+        return batch
+
+
+def fetch_stations(
+    stations: list,
+    max_workers: int = 1,
+    log_level: str = 'WARN',
+    cache=None,
+    batches: bool = False,
+    metrics: Metrics = None,
+    quarantine=None
+):
+    """
+    Download and parse the data for a list of stations, possibly concurrently.
+
+    Up to max_workers stations are fetched at the same time, but the results are
+    always yielded in the same order as the stations list so that output files are
+    deterministic.
+
+    Parameters
+    ----------
+    stations : list of dict
+        The stations to be fetched.  Each element must have a name and url key
+        (as in stations.yml).
+    max_workers : int, optional
+        The maximum number of stations to fetch at the same time, by default 1.
+    log_level : str, optional
+        The log level for logging, by default 'WARN'.
+    cache : historical.cache.SourceCache, optional
+        A cache of the source files, by default None.
+    batches : bool, optional
+        Parse the observations of each station into a single columnar batch rather than a list
+        of Observation objects, by default False.
+    metrics : historical.metrics.Metrics, optional
+        Where to record the download and parse stages of each station, by default None.
+    quarantine : historical.validation.Quarantine, optional
+        Check the rows of each batch, moving those that fail to the quarantine, by default None.
+
+    Yields
+    ------
+    tuple of (Station, list of Observation) or tuple of (Station, pyarrow.RecordBatch)
+        The station and all of the observations parsed from its data.
+    """
+    max_workers = max(1, max_workers)
+
+    if batches:
+        prepare_threads()
+
+    def fetch(station: Station):
+        if batches:
+            return station.get_observation_batch()
+
+        return list(station.get_observations())
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = collections.deque()
+
+        for station_data in stations:
+            station = Station(
+                station_data['name'],
+                station_data['url'],
+                log_level,
+                cache,
+                metrics,
+                quarantine=quarantine
+            )
+            pending.append((station, executor.submit(fetch, station)))
+
+            # Keep a bounded window of stations in flight so memory does not grow with the station list.
+            if len(pending) > max_workers:
+                station, future = pending.popleft()
+                yield (station, future.result())
+
+        while pending:
+            station, future = pending.popleft()
+            yield (station, future.result())
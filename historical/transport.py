@@ -0,0 +1,246 @@
+"""transport.py."""
+import threading
+
+import requests
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from historical.utils import get_logger
+
+# Responses with these statuses are retried, as are connection errors and timeouts.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+class _ConnectionCounter:
+    """A count of the connections opened by a pool, which its connections add to from several threads."""
+
+    def __init__(self) -> None:
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def increment(self) -> None:
+        with self._lock:
+            self.value += 1
+
+
+class _CountedConnection:
+    """Count each time a connection is opened, including when it is reopened after the server closed it."""
+
+    def __init__(self, *args, counter: _ConnectionCounter, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._counter = counter
+
+    def connect(self) -> None:
+        super().connect()
+        self._counter.increment()
+
+
+class _CountedHTTPConnection(_CountedConnection, HTTPConnection):
+    pass
+
+
+class _CountedHTTPSConnection(_CountedConnection, HTTPSConnection):
+    pass
+
+
+class _CountingPool:
+    """A connection pool whose connections count each time they are opened."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.connections = _ConnectionCounter()
+        # The keyword arguments each connection of the pool is created with.
+        self.conn_kw['counter'] = self.connections
+
+
+class _HTTPConnectionPool(_CountingPool, HTTPConnectionPool):
+    ConnectionCls = _CountedHTTPConnection
+
+
+class _HTTPSConnectionPool(_CountingPool, HTTPSConnectionPool):
+    ConnectionCls = _CountedHTTPSConnection
+
+
+class HTTPTransport:
+    """A pooled, keep-alive HTTP session with gzip, timeouts and exponential backoff retries."""
+
+    def __init__(
+        self,
+        pool_size: int = 16,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 60.0,
+        retries: int = 4,
+        backoff_factor: float = 0.5,
+        log_level: str = 'WARN'
+    ) -> None:
+        """
+        Create an HTTPTransport object.
+
+        Parameters
+        ----------
+        pool_size : int, optional
+            The maximum number of connections kept open to each host, by default 16.  This should
+            be at least the number of threads using the transport at the same time.
+        connect_timeout : float, optional
+            The timeout (in seconds) to connect to a host, by default 10.
+        read_timeout : float, optional
+            The timeout (in seconds) between bytes of a response, by default 60.
+        retries : int, optional
+            The maximum number of times a request is retried after a connection error, a timeout
+            or a response with a status in RETRY_STATUSES, by default 4.
+        backoff_factor : float, optional
+            The retries back off exponentially from this many seconds, by default 0.5.  A
+            Retry-After header is respected instead if the server sends one.
+        log_level : str, optional
+            The log level for logging, by default 'WARN'.
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.logger = get_logger('HTTPTransport', log_level)
+        self.stats = {
+            'requests': 0,
+            'retries': 0,
+            'errors': 0,
+            'connections': 0,
+            'connections_reused': 0,
+            'bytes_received': 0,
+            'bytes_decoded': 0
+        }
+        self._lock = threading.Lock()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False
+        )
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self._adapter.poolmanager.pool_classes_by_scheme = {'http': _HTTPConnectionPool, 'https': _HTTPSConnectionPool}
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'gzip'
+        self.session.mount('http://', self._adapter)
+        self.session.mount('https://', self._adapter)
+
+    def get(self, url: str, headers: dict = None, read_timeout: float = None) -> requests.Response:
+        """
+        Get a URL, retrying transient failures.
+
+        Parameters
+        ----------
+        url : str
+            The URL to be fetched.
+        headers : dict, optional
+            Further headers for the request (e.g. If-None-Match), by default none.
+        read_timeout : float, optional
+            The read timeout (in seconds) for this request, by default that of the transport.
+
+        Returns
+        -------
+        requests.Response
+            The response, with its body read and decoded.  Its status is not checked, as a 304
+            response may be expected.
+
+        Raises
+        ------
+        requests.exceptions.ConnectionError
+            If the host could not be reached, or did not respond in time, after all of the retries.
+        """
+        self.logger.debug(f'Getting {url}.')
+
+        try:
+            timeout = self.timeout if read_timeout is None else (self.timeout[0], read_timeout)
+            response = self.session.get(url, headers=headers, timeout=timeout)
+        except requests.exceptions.RequestException:
+            self._count(errors=1, requests=1)
+            raise
+
+        retries = response.raw.retries
+        self._count(
+            requests=1,
+            retries=len(retries.history) if retries is not None else 0,
+            bytes_received=response.raw.tell(),
+            bytes_decoded=len(response.content)
+        )
+        return response
+
+    def read_text(self, url: str) -> str:
+        """
+        Get the body of a URL as text.
+
+        Parameters
+        ----------
+        url : str
+            The URL to be fetched.
+
+        Returns
+        -------
+        str
+            The body of the URL.
+
+        Raises
+        ------
+        requests.exceptions.HTTPError
+            If the final response (after any retries) is not successful.
+        """
+        response = self.get(url)
+
+        if not response.ok:
+            self._count(errors=1)
+
+        response.raise_for_status()
+        return response.content.decode('utf-8')
+
+    def report(self) -> str:
+        """
+        Summarise the transport statistics.
+
+        Returns
+        -------
+        str
+            A printable summary of the requests, retries and connection reuse.
+        """
+        return (
+            f'HTTP transport made {self.stats["requests"]:,} requests ({self.stats["retries"]:,} retries and '
+            f'{self.stats["errors"]:,} errors) over {self.stats["connections"]:,} connections, reusing them '
+            f'{self.stats["connections_reused"]:,} times, and received {self.stats["bytes_received"]:,} bytes '
+            f'({self.stats["bytes_decoded"]:,} decoded).'
+        )
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self.session.close()
+
+    def _count(self, **amounts) -> None:
+        with self._lock:
+            for name, amount in amounts.items():
+                self.stats[name] += amount
+
+            # The pools count the connections they open and the requests made on them (including retries).
+            pools = self._adapter.poolmanager.pools
+            pools = [pools[key] for key in pools.keys()]
+            connections = sum(pool.connections.value for pool in pools)
+            self.stats['connections'] = connections
+            self.stats['connections_reused'] = sum(pool.num_requests for pool in pools) - connections
+
+
+def default_transport() -> HTTPTransport:
+    """
+    Get the transport shared by all stations (and source caches) that are not given one.
+
+    Returns
+    -------
+    HTTPTransport
+        The shared transport, which is created the first time it is needed.
+    """
+    global _default_transport
+
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = HTTPTransport()
+
+        return _default_transport
@@ -0,0 +1,351 @@
+"""
+Upserts of observations into a station partitioned Parquet dataset.
+
+Provisional observations are revised by the Met Office after they are first published.  Rather
+than writing the whole dataset again, the observations are merged into it on their station, year
+and month, and only the files of the stations with new or revised observations are rewritten.
+
+Methods
+-------
+upsert_parquet_dataset - Upsert observations into a station partitioned Parquet dataset.
+upsert_avro_changes - Upsert the observations accepted by incremental runs into a station partitioned Parquet dataset.
+dataset_watermarks - Load the watermarks of a dataset, building them from its files if needed.
+"""
+import glob
+import os
+import urllib.parse
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from historical.batch import indices
+from historical.convert import read_avro_batches, remove_output, station_runs, write_station_partition
+from historical.state import Watermarks
+
+WATERMARKS_FILE_NAME = '_watermarks.json'
+
+
+def month_keys(table) -> np.ndarray:
+    """
+    Get the month key (year * 12 + month - 1) of each observation.
+
+    Parameters
+    ----------
+    table : pyarrow.Table or pyarrow.RecordBatch
+        The observations.
+
+    Returns
+    -------
+    numpy.ndarray
+        The month keys.
+    """
+    years = table['year'].to_numpy().astype(np.int64)
+    return years * 12 + table['month'].to_numpy() - 1
+
+
+def partition_directory(dataset_directory: str, station_name: str) -> str:
+    """
+    Get the directory of a station's partition of a dataset.
+
+    Parameters
+    ----------
+    dataset_directory : str
+        The root directory of the dataset.
+    station_name : str
+        The name of the station.
+
+    Returns
+    -------
+    str
+        The station=<station> directory of the station.
+    """
+    return os.path.join(dataset_directory, f'station={urllib.parse.quote(station_name, safe="")}')
+
+
+def dataset_watermarks(dataset_directory: str) -> Watermarks:
+    """
+    Load the watermarks of a dataset, building them from its files if needed.
+
+    The watermarks are kept in _watermarks.json in the root of the dataset, which is ignored by
+    readers of the dataset.  A dataset written by avro_to_parquet_dataset does not have them yet,
+    so the year and month columns of each station's files are read, with the full rows of the
+    observations that are still provisional.
+
+    Parameters
+    ----------
+    dataset_directory : str
+        The root directory of the dataset.
+
+    Returns
+    -------
+    historical.state.Watermarks
+        The watermarks of the observations in the dataset.
+    """
+    watermarks_file_name = os.path.join(dataset_directory, WATERMARKS_FILE_NAME)
+
+    if os.path.exists(watermarks_file_name) or not os.path.isdir(dataset_directory):
+        return Watermarks(watermarks_file_name)
+
+    watermarks = Watermarks(watermarks_file_name)
+
+    for partition in sorted(os.listdir(dataset_directory)):
+        if not partition.startswith('station='):
+            continue
+
+        station_name = urllib.parse.unquote(partition[len('station='):])
+        table = read_partition(os.path.join(dataset_directory, partition))
+
+        if table is None or not table.num_rows:
+            continue
+
+        latest = int(month_keys(table).max())
+        provisional = table.filter(table['isProvisional']).to_pylist()
+        watermarks.stations[station_name] = {
+            'year': latest // 12,
+            'month': latest % 12 + 1,
+            'provisional': {
+                f'{record["year"]}-{record["month"]:02}': {'station': station_name, **record} for record in provisional
+            }
+        }
+
+    return watermarks
+
+
+def read_partition(partition: str) -> pa.Table:
+    """
+    Read the part files of a station's partition of a dataset (without the station column).
+
+    Parameters
+    ----------
+    partition : str
+        The station=<station> directory of the station.
+
+    Returns
+    -------
+    pyarrow.Table
+        The observations of the station, in the order of the part files, or None if there are none.
+    """
+    tables = [pq.ParquetFile(file_name).read() for file_name in part_files(partition)]
+    return pa.concat_tables(tables) if tables else None
+
+
+def part_files(partition: str) -> list:
+    """
+    List the part files of a station's partition, in the order they were written.
+
+    Parameters
+    ----------
+    partition : str
+        The station=<station> directory of the station.
+
+    Returns
+    -------
+    list of str
+        The full paths of the part-<number>.parquet files.
+    """
+    file_names = glob.glob(os.path.join(partition, 'part-*.parquet'))
+    return sorted(file_names, key=lambda file_name: int(os.path.basename(file_name)[5:-8]))
+
+
+def changed_rows(watermarks: Watermarks, run: pa.RecordBatch) -> pa.RecordBatch:
+    """
+    Find the observations of a station that are new or revised, recording them in the watermarks.
+
+    The observations later than the station's watermark are new.  Only the observations of a
+    month that was provisional when it was last written are compared with what was written, so
+    the cost depends on the number of provisional observations rather than the number written.
+
+    Parameters
+    ----------
+    watermarks : historical.state.Watermarks
+        The watermarks of the dataset.  These are updated.
+    run : pyarrow.RecordBatch
+        Observations of a single station, in date order.
+
+    Returns
+    -------
+    pyarrow.RecordBatch
+        The observations to be written.
+    """
+    station_name = run['station'][0].as_py()
+    state = watermarks.stations.setdefault(station_name, {'year': 0, 'month': 0, 'provisional': {}})
+    keys = month_keys(run)
+    watermark = state['year'] * 12 + state['month'] - 1
+    provisional = np.array(
+        [int(key[:-3]) * 12 + int(key[-2:]) - 1 for key in state['provisional']],
+        np.int64
+    )
+    is_new = keys > watermark
+    candidates = np.flatnonzero(np.isin(keys, provisional) & ~is_new)
+    # A revision may make a provisional observation final, or revise it again.
+    revised = [watermarks.accept(record) for record in run.take(indices(candidates)).to_pylist()]
+    new = np.flatnonzero(is_new)
+
+    if len(new):
+        latest = int(keys[new].max())
+        state['year'] = latest // 12
+        state['month'] = latest % 12 + 1
+        new_provisional = new[run['isProvisional'].to_numpy(zero_copy_only=False)[new]]
+
+        for record in run.take(indices(new_provisional)).to_pylist():
+            state['provisional'][f'{record["year"]}-{record["month"]:02}'] = record
+
+    rows = np.sort(np.concatenate([candidates[np.array(revised, bool)], new]))
+    return run.take(indices(rows))
+
+
+def rewrite_partition(dataset_directory: str, changes: pa.Table, compression: str, float32: bool = False) -> int:
+    """
+    Merge the new and revised observations of a station into its partition and rewrite it.
+
+    The merged observations are written to a single new part file, before the old part files are
+    removed.
+
+    Parameters
+    ----------
+    dataset_directory : str
+        The root directory of the dataset.
+    changes : pyarrow.Table
+        The new and revised observations of a single station.  Of those of the same month, the
+        last is kept.
+    compression : str
+        The Parquet compression codec.
+    float32 : bool, optional
+        Store the measurements as 32 bit floats, by default False.
+
+    Returns
+    -------
+    int
+        The number of observations in the rewritten partition.
+    """
+    station_name = changes['station'][0].as_py()
+    partition = partition_directory(dataset_directory, station_name)
+    old_files = part_files(partition)
+    change_keys = month_keys(changes)
+    # Keep the last change of each month.
+    _, last = np.unique(change_keys[::-1], return_index=True)
+    changes = changes.take(indices(np.sort(len(change_keys) - 1 - last)))
+    tables = [changes]
+
+    if old_files:
+        existing = read_partition(partition)
+        existing = existing.filter(pa.array(~np.isin(month_keys(existing), change_keys)))
+        station_column = pa.repeat(pa.scalar(station_name, changes.schema.field('station').type), existing.num_rows)
+        existing = existing.add_column(0, changes.schema.field('station'), station_column)
+        tables.insert(0, existing.select(changes.schema.names).cast(changes.schema))
+
+    table = pa.concat_tables(tables)
+    part_numbers = {partition: int(os.path.basename(old_files[-1])[5:-8]) + 1 if old_files else 0}
+    write_station_partition(table.to_batches(), dataset_directory, part_numbers, compression, float32)
+
+    for file_name in old_files:
+        os.remove(file_name)
+
+    return table.num_rows
+
+
+def upsert_parquet_dataset(
+    dataset_directory: str,
+    batches,
+    compression: str = 'snappy',
+    float32: bool = False
+) -> dict:
+    """
+    Upsert observations into a station partitioned Parquet dataset, keyed on the station, year and month.
+
+    Observations that are new, or revisions of observations that were provisional when they were
+    written, are merged into the dataset (which is created if it does not exist).  Only the part
+    files of the stations with such observations are rewritten, so the cost scales with the
+    number of changed stations rather than the size of the dataset.  As with an incremental run,
+    observations that were not provisional are not expected to change and are not compared.
+
+    Parameters
+    ----------
+    dataset_directory : str
+        The root directory of the dataset (as written by avro_to_parquet_dataset).
+    batches : iterable of pyarrow.RecordBatch
+        The observations, with the same columns as OBSERVATION_AVRO_SCHEMA and each station's
+        in date order.
+    compression : str, optional
+        The Parquet compression codec (e.g. 'snappy', 'zstd' or 'none'), by default 'snappy'.
+    float32 : bool, optional
+        Store the measurements of the rewritten stations as 32 bit floats, by default False.
+
+    Returns
+    -------
+    dict
+        The number of rows read, the number of new or revised rows, the number of stations whose
+        partition was rewritten and the number of rows rewritten.
+    """
+    if not os.path.isdir(dataset_directory):
+        # An earlier run without partitioning may have left a single Parquet file here.
+        remove_output(dataset_directory)
+
+    watermarks = dataset_watermarks(dataset_directory)
+    os.makedirs(dataset_directory, exist_ok=True)
+    stats = {'rows': 0, 'changed_rows': 0, 'stations_rewritten': 0, 'rows_rewritten': 0}
+    changes = {}
+
+    for batch in batches:
+        stats['rows'] += batch.num_rows
+
+        for run in station_runs(batch):
+            changed = changed_rows(watermarks, run)
+
+            if changed.num_rows:
+                changes.setdefault(run['station'][0].as_py(), []).append(changed)
+
+    for station_batches in changes.values():
+        table = pa.Table.from_batches(station_batches)
+        stats['changed_rows'] += table.num_rows
+        stats['stations_rewritten'] += 1
+        stats['rows_rewritten'] += rewrite_partition(dataset_directory, table, compression, float32)
+
+    watermarks.save()
+    return stats
+
+
+def upsert_avro_changes(
+    dataset_directory: str,
+    avro_file_name: str,
+    changes_file_name: str,
+    compression: str = 'snappy',
+    float32: bool = False,
+    workers: int = 1
+) -> dict:
+    """
+    Upsert the observations accepted by incremental runs into a station partitioned Parquet dataset.
+
+    Each incremental run appends the new and revised observations it accepts to a changes file,
+    as well as to the Avro file.  Only the changes are read and upserted, so the cost of an upsert
+    does not grow with the history in the Avro file, unless the dataset does not exist yet (e.g. it
+    is the first run with --partitioned), when it is built from the whole Avro file.  The changes
+    file is then removed, so the changes of a run whose upsert failed are upserted by the next.
+
+    Parameters
+    ----------
+    dataset_directory : str
+        The root directory of the dataset.
+    avro_file_name : str
+        The full path to the Avro file of all of the observations.
+    changes_file_name : str
+        The full path to the Avro file of the observations accepted since the last upsert.  It
+        need not exist.
+    compression : str, optional
+        The Parquet compression codec (e.g. 'snappy', 'zstd' or 'none'), by default 'snappy'.
+    float32 : bool, optional
+        Store the measurements of the rewritten stations as 32 bit floats, by default False.
+    workers : int, optional
+        The number of processes decoding the Avro file, by default 1.
+
+    Returns
+    -------
+    dict
+        The statistics of the upsert (as returned by upsert_parquet_dataset).
+    """
+    source_file_name = changes_file_name if os.path.isdir(dataset_directory) else avro_file_name
+    batches = read_avro_batches(source_file_name, workers=workers) if os.path.exists(source_file_name) else []
+    stats = upsert_parquet_dataset(dataset_directory, batches, compression, float32)
+    remove_output(changes_file_name)
+    return stats
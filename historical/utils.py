@@ -11,25 +11,116 @@ import sys
 from argparse import ArgumentParser
 
 
-def command_line_interface(args: list = sys.argv):
+def command_line_interface(args: list = None):
     """
     Process arguments provided by the command line.
 
     Parameters
     ----------
-    args : list of str
-        The arguments to be processed.
+    args : list of str, optional
+        The arguments to be processed, by default those of the command line (sys.argv[1:]).
 
     Returns
     -------
     argparse.Namespace
         The command line arguments provided.
     """
-    parser = ArgumentParser(args, description='Import and translate historical meteorological station data.')
+    parser = ArgumentParser(description='Import and translate historical meteorological station data.')
     group = parser.add_mutually_exclusive_group()
     group.add_argument('-d', '--debug', help='Is logging to be DEBUG level?', action='store_true')
     group.add_argument('-v', '--verbose', help='Is logging to be INFO level?', action='store_true')
-    return parser.parse_args()
+    parser.add_argument(
+        '-w', '--workers',
+        help='The maximum number of stations to download concurrently.',
+        type=int,
+        default=1
+    )
+    parser.add_argument(
+        '-c', '--codec',
+        help='The compression codec for the Avro file.',
+        choices=['null', 'deflate', 'snappy', 'zstd'],
+        default='null'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        help='A directory to cache the station source files in, so unchanged files are not downloaded again.',
+        default=''
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        '-i', '--incremental',
+        help='Only append (or, with -p, upsert) new or revised observations since the last incremental run.',
+        action='store_true'
+    )
+    mode.add_argument(
+        '-s', '--single-pass',
+        help='Parse the observations once and write the Avro, Parquet and CSV files at the same time.',
+        action='store_true'
+    )
+    parser.add_argument(
+        '-p', '--partitioned',
+        help='Write the Parquet output as a dataset partitioned by station.',
+        action='store_true'
+    )
+    parser.add_argument(
+        '--csv-compression',
+        help='Stream the CSV output through a compressor.',
+        choices=['none', 'gzip', 'zstd'],
+        default='none'
+    )
+    parser.add_argument(
+        '--feather-compression',
+        help='The compression of the Arrow IPC (Feather) output.  Only uncompressed files can be used without copying.',
+        choices=['uncompressed', 'lz4', 'zstd'],
+        default='uncompressed'
+    )
+    parser.add_argument(
+        '--parquet-float32',
+        help='Store the measurements in the Parquet output as 32 bit floats, for smaller files.',
+        action='store_true'
+    )
+    parser.add_argument(
+        '--decode-workers',
+        help='The number of processes decoding the Avro file in each conversion task.',
+        type=int,
+        default=1
+    )
+    parser.add_argument(
+        '--profile',
+        help='Profile each task, writing the profiles next to the outputs (the same as setting HISTORICAL_PROFILE).',
+        choices=['cprofile', 'pyinstrument']
+    )
+    parser.add_argument(
+        '--trace-memory',
+        help='Measure the peak memory of each stage with tracemalloc (the same as setting HISTORICAL_TRACE_MEMORY).',
+        action='store_true'
+    )
+    commands = parser.add_subparsers(dest='command')
+    query = commands.add_parser('query', help='Query the generated Parquet output rather than generating it.')
+    query.add_argument('station', help='The name of the station (e.g. Armagh).')
+    query.add_argument('--start', help='The first year or month to be returned (e.g. 1990 or 1990-06).')
+    query.add_argument('--end', help='The last year or month to be returned (e.g. 2000 or 2000-06).')
+    query.add_argument('--columns', help='The columns to be returned (by default all of them).', nargs='+')
+    query.add_argument(
+        '--parquet',
+        help='The Parquet file or partitioned dataset to query (by default the newest in the temporary directory).'
+    )
+    query.add_argument('--format', help='The output format.', choices=['csv', 'json'], default='csv')
+    serve = commands.add_parser('serve', help='Serve queries of the newest Parquet output over HTTP.')
+    serve.add_argument('--host', help='The address to listen on.', default='127.0.0.1')
+    serve.add_argument('--port', help='The port to listen on.', type=int, default=8080)
+    serve.add_argument(
+        '--parquet',
+        help='The Parquet file or partitioned dataset to serve (by default the newest in the temporary directory).'
+    )
+    serve.add_argument('--cache-size', help='The number of responses kept in the LRU cache.', type=int, default=256)
+    serve.add_argument(
+        '--reload-interval',
+        help='The minimum number of seconds between checks for a new output.',
+        type=float,
+        default=5.0
+    )
+    return parser.parse_args(sys.argv[1:] if args is None else args)
 
 
 def get_logger(name: str, log_level=logging.WARN) -> logging.Logger:
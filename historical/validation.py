@@ -0,0 +1,337 @@
+"""
+Vectorized data quality checks of station data, quarantining the rows that fail them.
+
+Methods
+-------
+merge_quarantines - Merge quarantine files into a single quarantine file.
+"""
+import datetime
+import os
+import threading
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+
+from historical.batch import indices
+
+# The raw field of each amount column (after the year and month).
+AMOUNT_FIELDS = {'tmax': 2, 'tmin': 3, 'af': 4, 'rain': 5, 'sun': 6}
+# At most four digits, so that the year and month fit the integer columns.
+INTEGER_PATTERN = '^[0-9]{1,4}$'
+# A number, optionally estimated (*) or from a Kipp & Zonen sensor (#), or missing (---).
+AMOUNT = r'(---|-?[0-9]+(\.[0-9]+)?[*#]?)'
+AMOUNT_PATTERN = f'^{AMOUNT}$'
+SUFFIXED_AMOUNT_PATTERN = r'^-?[0-9]+(\.[0-9]+)?[^0-9]+$'
+# A year, a month and four amounts, then either nothing or a sun amount followed by anything (e.g. Provisional).
+LINE_PATTERN = rf'^[0-9]{{1,4}}\s+[0-9]{{1,4}}(\s+{AMOUNT}){{4}}(\s+{AMOUNT}(\s.*)?)?$'
+FIRST_YEAR = 1850
+# The lowest and highest plausible monthly values of each amount.
+PLAUSIBLE_RANGES = {
+    'tmax': (-30.0, 40.0),
+    'tmin': (-40.0, 35.0),
+    'af': (0.0, 31.0),
+    'rain': (0.0, 2000.0),
+    'sun': (0.0, 744.0)
+}
+QUARANTINE_SCHEMA = pa.schema([
+    pa.field('station', pa.string(), nullable=False),
+    pa.field('line', pa.string(), nullable=False),
+    pa.field('reasons', pa.string(), nullable=False)
+])
+
+
+class Quarantine:
+    """Check parsed station data and keep the rows that fail, with the reasons they failed."""
+
+    def __init__(self, last_year: int = None) -> None:
+        """
+        Create a Quarantine object.
+
+        Parameters
+        ----------
+        last_year : int, optional
+            The latest plausible year, by default next year.
+        """
+        self.last_year = last_year if last_year is not None else datetime.date.today().year + 1
+        self.stats = {'rows': 0, 'rejected': 0, 'seconds': 0.0}
+        self._batches = []
+        self._lock = threading.Lock()
+
+    def check_fields(self, station_name: str, lines: pa.StringArray, fields: list) -> pa.BooleanArray:
+        """
+        Check that the raw fields of each line can be parsed.
+
+        A line fails if it has too few fields, if its year or month is not an integer, or if an
+        amount is not a number, with an unknown suffix or otherwise.  Each whole line is matched
+        against a single pattern, and only the lines that do not match are checked field by
+        field to find the reasons.
+
+        Parameters
+        ----------
+        station_name : str
+            The name of the station.
+        lines : pyarrow.StringArray
+            The observation lines.
+        fields : list of pyarrow.StringArray
+            The first seven fields of each line, as returned by historical.batch.get_fields.
+
+        Returns
+        -------
+        pyarrow.BooleanArray
+            Which of the lines passed, or None if they all did.
+        """
+        start = time.perf_counter()
+        rows = np.flatnonzero(is_false(pc.match_substring_regex(lines, LINE_PATTERN)))
+
+        if not len(rows):
+            self._count(seconds=time.perf_counter() - start)
+            return None
+
+        fields = [field.take(indices(rows)) for field in fields]
+        checks = [
+            (is_false(pc.is_valid(fields[5])), 'too few fields'),
+            (is_false(pc.match_substring_regex(fields[0], INTEGER_PATTERN)), 'invalid year'),
+            (is_false(pc.match_substring_regex(fields[1], INTEGER_PATTERN)), 'invalid month')
+        ]
+
+        for name, index in AMOUNT_FIELDS.items():
+            # Absent fields are either too few fields (checked above) or a missing sun field.
+            invalid = is_false(pc.match_substring_regex(fields[index], AMOUNT_PATTERN), True)
+            suffixed = ~is_false(pc.match_substring_regex(fields[index], SUFFIXED_AMOUNT_PATTERN))
+            checks.append((invalid & suffixed, f'unknown suffix on {name}'))
+            checks.append((invalid & ~suffixed, f'invalid {name}'))
+
+        explained = np.zeros(len(rows), bool)
+
+        for mask, _ in checks:
+            explained |= mask
+
+        checks.append((~explained, 'invalid line'))
+        valid = self._reject(station_name, lines, rows, checks, start)
+        # The rows that pass are counted when their values are checked.
+        self._count(rows=valid.false_count)
+        return valid
+
+    def check_values(self, station_name: str, lines: pa.StringArray, batch: pa.RecordBatch) -> pa.RecordBatch:
+        """
+        Check that the parsed values of each row are plausible and that the months are in order.
+
+        A row fails if its month or year is out of range, if an amount is implausible, if its
+        tmin is above its tmax, or if its month is the same as, or before, an earlier row's.
+
+        Parameters
+        ----------
+        station_name : str
+            The name of the station.
+        lines : pyarrow.StringArray
+            The observation line of each row.
+        batch : pyarrow.RecordBatch
+            The parsed rows.
+
+        Returns
+        -------
+        pyarrow.RecordBatch
+            The rows that passed.
+        """
+        start = time.perf_counter()
+        self._count(rows=len(lines))
+        years = batch.column('year').to_numpy(zero_copy_only=False)
+        months = batch.column('month').to_numpy(zero_copy_only=False)
+        checks = [
+            ((months < 1) | (months > 12), 'month out of range'),
+            ((years < FIRST_YEAR) | (years > self.last_year), 'implausible year')
+        ]
+        values = {name: float_values(batch.column(name)) for name in PLAUSIBLE_RANGES}
+
+        for name, (low, high) in PLAUSIBLE_RANGES.items():
+            checks.append(((values[name] < low) | (values[name] > high), f'implausible {name}'))
+
+        checks.append((values['tmin'] > values['tmax'], 'tmin above tmax'))
+
+        # A month that is the same as an earlier one is a duplicate, one before the latest so far is out of
+        # order.  Rows with a month or year out of range are left out, so they do not affect the rows after them.
+        dated = np.flatnonzero(~(checks[0][0] | checks[1][0]))
+        keys = years[dated].astype(np.int64) * 12 + months[dated] - 1
+        order = np.argsort(keys, kind='stable')
+        duplicate = np.zeros(len(years), bool)
+        duplicate[dated[order[1:]]] = keys[order[1:]] == keys[order[:-1]]
+        out_of_order = np.zeros(len(years), bool)
+
+        if len(keys):
+            out_of_order[dated[1:]] = keys[1:] < np.maximum.accumulate(keys)[:-1]
+
+        checks.append((duplicate, 'duplicate month'))
+        checks.append((out_of_order & ~duplicate, 'out of order month'))
+
+        valid = self._reject(station_name, lines, np.arange(len(lines)), checks, start)
+        return batch if valid is None else batch.filter(valid)
+
+    @property
+    def rejected(self) -> pa.Table:
+        """
+        Get the rows that failed.
+
+        Returns
+        -------
+        pyarrow.Table
+            The station, line and reasons of each row that failed, grouped by station (in the order
+            of their names, as stations may be checked in several threads at once).
+        """
+        with self._lock:
+            return pa.Table.from_batches(self._batches, QUARANTINE_SCHEMA).sort_by('station')
+
+    def write(self, file_name: str) -> int:
+        """
+        Write the rows that failed to a CSV file (with a header, even if no rows failed).
+
+        Parameters
+        ----------
+        file_name : str
+            The name of the quarantine file.
+
+        Returns
+        -------
+        int
+            The number of rows written.
+        """
+        rejected = self.rejected
+        pv.write_csv(rejected, file_name)
+        return rejected.num_rows
+
+    def report(self) -> str:
+        """
+        Summarise the validation.
+
+        Returns
+        -------
+        str
+            A printable summary of the rows checked and quarantined.
+        """
+        return (
+            f'Validated {self.stats["rows"]:,} rows in {self.stats["seconds"]:,.3f}s and quarantined '
+            f'{self.stats["rejected"]:,} of them.'
+        )
+
+    def _count(self, **amounts) -> None:
+        with self._lock:
+            for name, amount in amounts.items():
+                self.stats[name] += amount
+
+    def _reject(
+        self,
+        station_name: str,
+        lines: pa.StringArray,
+        rows: np.ndarray,
+        checks: list,
+        start: float
+    ) -> pa.BooleanArray:
+        # The masks of the checks are of the given rows of the lines.
+        failed = np.zeros(len(rows), bool)
+
+        for mask, _ in checks:
+            failed |= mask
+
+        if not failed.any():
+            self._count(seconds=time.perf_counter() - start)
+            return None
+
+        reasons = np.full(int(failed.sum()), '', object)
+
+        for mask, reason in checks:
+            failed_check = mask[failed]
+
+            if failed_check.any():
+                reasons[failed_check] += f'{reason}; '
+
+        rejected = rows[failed]
+        valid = np.ones(len(lines), bool)
+        valid[rejected] = False
+
+        batch = pa.RecordBatch.from_arrays(
+            [
+                pa.array([station_name] * len(rejected), pa.string()),
+                lines.take(indices(rejected)),
+                pc.utf8_rtrim(pa.array(reasons, pa.string()), '; ')
+            ],
+            schema=QUARANTINE_SCHEMA
+        )
+
+        with self._lock:
+            self._batches.append(batch)
+
+        self._count(rejected=len(rejected), seconds=time.perf_counter() - start)
+        return pa.array(valid)
+
+
+def is_false(mask: pa.BooleanArray, null: bool = False) -> np.ndarray:
+    """
+    Get which elements of a boolean array are false.
+
+    Parameters
+    ----------
+    mask : pyarrow.BooleanArray
+        The boolean array.
+    null : bool, optional
+        Treat nulls as true rather than false, by default False.
+
+    Returns
+    -------
+    numpy.ndarray
+        True where the element is false (or null, unless null is True).
+    """
+    return ~pc.fill_null(mask, null).to_numpy(zero_copy_only=False)
+
+
+def float_values(column: pa.Array) -> np.ndarray:
+    """
+    Get the values of a numeric column as floats, with NaN for nulls.
+
+    Parameters
+    ----------
+    column : pyarrow.Array
+        The column.
+
+    Returns
+    -------
+    numpy.ndarray
+        The values.
+    """
+    # A column with nulls is converted to floats (with NaN for the nulls) anyway.
+    return column.to_numpy(zero_copy_only=False).astype(np.float64, copy=False)
+
+
+def merge_quarantines(file_names: list, quarantine_file_name: str, remove: bool = True) -> int:
+    """
+    Merge quarantine files into a single quarantine file.
+
+    Parameters
+    ----------
+    file_names : list of str
+        The names of the quarantine files to be merged.  Files that do not exist are skipped.
+    quarantine_file_name : str
+        The name of the merged quarantine file.
+    remove : bool, optional
+        Remove the merged files, by default True.
+
+    Returns
+    -------
+    int
+        The number of rows in the merged file, which are grouped by station in the same way as
+        Quarantine.rejected.
+    """
+    convert_options = pv.ConvertOptions(column_types=QUARANTINE_SCHEMA, strings_can_be_null=False)
+    tables = [QUARANTINE_SCHEMA.empty_table()]
+
+    for file_name in file_names:
+        if os.path.exists(file_name):
+            tables.append(pv.read_csv(file_name, convert_options=convert_options).cast(QUARANTINE_SCHEMA))
+
+            if remove:
+                os.remove(file_name)
+
+    table = pa.concat_tables(tables).sort_by('station')
+    pv.write_csv(table, quarantine_file_name)
+    return table.num_rows
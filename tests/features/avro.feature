@@ -0,0 +1,67 @@
+Feature: Avro File Writing
+    Scenario Outline: Block Batched Avro Writing
+        Given <record_count> observations
+
+        When the observations are written with the <codec> codec and a block size of <block_size>
+
+        Then the Avro file contains <record_count> observations
+        And the Avro file contains <block_count> blocks
+
+        Examples:
+        | record_count | codec   | block_size | block_count |
+        | 2500         | null    | 1000       | 3           |
+        | 2500         | deflate | 500        | 5           |
+        | 2500         | snappy  | 500        | 5           |
+        | 2500         | zstd    | 500        | 5           |
+        | 10           | null    | 1000       | 1           |
+
+    Scenario: Unsupported Avro Codec
+        Given 1 observations
+
+        Then writing with the lzma codec raises a ValueError
+
+    Scenario: Appending To An Avro File
+        Given 10 observations
+
+        When the observations are written with the deflate codec and a block size of 4
+        And the observations are appended to the Avro file
+
+        Then the Avro file contains the observations twice
+
+    Scenario: Copying Blocks Between Avro Files
+        Given 10 observations
+
+        When the observations are written with the deflate codec and a block size of 4
+        And the blocks are copied to an Avro file with the null codec
+
+        Then the copied Avro file contains the observations in 3 blocks
+
+    Scenario: Finding The Blocks Of An Avro File
+        Given 2500 observations
+
+        When the observations are written with the deflate codec and a block size of 1000
+
+        Then the blocks of the Avro file have 1000, 1000 and 500 records
+        And the blocks of the Avro file are decoded on their own
+        And finding the blocks of the Avro file with a corrupted sync marker raises a ValueError
+
+    Scenario: Replacing Revised Records
+        Given 10 observations
+
+        When the observations are written with the deflate codec and a block size of 4
+        And revisions of the observations 3 and 7 are appended to the Avro file
+        And the revised records are replaced
+
+        Then 2 rows were dropped
+        And the Avro file contains the observations with 3 and 7 revised
+
+    Scenario: Only The Blocks From The First Revised Row Are Written Again
+        Given 10 observations
+
+        When the observations are written with the deflate codec and a block size of 2
+        And revisions of the observations 7 and 9 are appended to the Avro file
+        And the revised records are replaced
+
+        Then 2 rows were dropped
+        And the Avro file contains the observations with 7 and 9 revised
+        And the first 3 blocks of the Avro file are unchanged
@@ -0,0 +1,26 @@
+Feature: Columnar Observation Parsing
+    Scenario Outline: Batch Parsing Matches Observation Parsing
+        Given a station file containing <line>
+
+        When the station file is parsed as a batch
+
+        Then the batch matches the observations parsed line by line
+
+        Examples:
+        | line                                                 |
+        | 1941 1 --- --- --- 74.7 ---                          |
+        | 1957 1 8.6 3.9 2 80.6 55.6                           |
+        | 1945 3 11.8 4.1 1 35.8                               |
+        | 2001 5 15.4 8.6 0 44.4 236.8*                        |
+        | 2022 1 8.6 4.1 1 32.2 56.3# Provisional              |
+        | 2007 9 18.9 11.1 0 36.0* 150.7# $                    |
+        | 1907 9 18.9 11.1 0 36.0* $                           |
+        | 1914 6 16.2* 8.1 0* 61.5 --- all data from Whitby    |
+        | 1945 3 11.8 4.1 1 35.8 all data$ from Whitby         |
+        | 2007 9 18.9 11.1 0 36.0* 150.7# $ $                  |
+        | 1957 1 8.6 3.9 2 80.6 55.6 °                         |
+
+    Scenario: Batch Parsing Of An Invalid Line
+        Given a station file containing 1957 1 8.6 3.9
+
+        Then parsing the station file as a batch raises a ValueError
@@ -0,0 +1,20 @@
+Feature: Benchmarks
+    Scenario Outline: Running A Benchmark On A Small Data Set
+        When the <benchmark> benchmark is run with the arguments <arguments>
+
+        Then the benchmark prints its results as JSON
+
+        Examples:
+        | benchmark      | arguments                                                               |
+        | suite          | --stations 2 --months 120 --output suite.json                           |
+        | observation    | --lines 120                                                             |
+        | csv_export     | --stations 2 --months 120                                               |
+        | import_time    | --output import_time.json                                               |
+        | validation     | --stations 2 --months 120 --repeat 1                                    |
+        | parquet_schema | --stations 2 --months 120                                               |
+        | partitioned    | --stations 2 --months 120 --repeats 1                                   |
+        | avro_decode    | --stations 2 --months 120 --workers 1                                   |
+        | climatology    | --stations 2 --months 120                                               |
+        | upsert         | --stations 2 --changed 1 --months 120                                   |
+        | service_load   | --stations 2 --months 120 --requests 10 --concurrency 2 --queries 5     |
+        | end_to_end     | --stations 2 --months 120 --workers 1                                   |
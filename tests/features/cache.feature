@@ -0,0 +1,59 @@
+Feature: Station Source File Caching
+    Scenario: Unchanged Files Are Served From The Cache
+        Given a station server with 2 station files
+        And a source cache
+
+        When the stations are read through the cache 3 times
+
+        Then the source cache has 4 hits and 2 misses
+        And the server responded with 2 200 and 4 304 statuses
+
+    Scenario: Changed Files Are Downloaded Again
+        Given a station server with 1 station files
+        And a source cache
+
+        When the stations are read through the cache 1 times
+        And the station files change
+        And the stations are read through the cache 1 times
+
+        Then the source cache has 0 hits and 2 misses
+        And the stations return the changed data
+
+    Scenario: Least Recently Used Files Are Evicted When The Cache Is Pruned
+        Given a station server with 3 station files
+        And a source cache limited to 2 files
+
+        When the stations are read through the cache 1 times
+
+        Then the source cache has 0 evictions
+        And the source cache contains 3 files
+
+        When the source cache is pruned
+
+        Then the source cache has 1 evictions
+        And the source cache contains 2 files
+
+    Scenario: Not Modified Files That Are Not Cached Are Downloaded Again
+        Given a station server with 1 station files
+        And a source cache
+        And the server responds to the next request of each file with a 304 status
+
+        When the stations are read through the cache 1 times
+
+        Then the source cache has 0 hits and 1 misses
+        And the server responded with 1 200 and 1 304 statuses
+        And the source cache contains 1 files
+
+    Scenario Outline: Local Files Are Read Without The Cache
+        Given a local station file with a <kind> URL
+        And a source cache
+
+        When the stations are read through the cache 2 times
+
+        Then the source cache has 0 hits and 0 misses
+        And the source cache contains 0 files
+
+        Examples:
+        | kind |
+        | file |
+        | path |
@@ -0,0 +1,46 @@
+Feature: Climatology Rollups
+    Scenario: Annual And Decadal Rollups
+        Given a station with observations from 1961 to 1970
+
+        When the observations are rolled up
+
+        Then the annual rain of 1961 is 120.0 from 12 months
+        And the annual rain of 1962 is null from 11 months
+        And the annual tmax of 1963 is 6.5 with 1 estimated months
+        And 1964 has 2 provisional months
+        And the decadal rain of 1960 is 120.0 from 8 of 9 years
+
+    Scenario Outline: Climate Normals And Anomalies
+        Given a station with observations from <first_year> to <last_year>
+
+        When the observations are rolled up
+
+        Then the <period> <month> rain normal is <normal> from <years> years
+        And the <month> <year> rain anomaly against <period> is <anomaly>
+
+        Examples:
+        | first_year | last_year | period    | month    | normal | years | year | anomaly |
+        | 1961       | 2020      | 1961-1990 | January  | 10.0   | 30    | 1961 | 0.0     |
+        | 1961       | 2020      | 1961-1990 | January  | 10.0   | 30    | 2020 | 5.0     |
+        | 1961       | 2020      | 1961-1990 | December | 10.0   | 29    | 1964 | 0.0     |
+        | 1961       | 2020      | 1991-2020 | December | 10.0   | 30    | 2020 | 0.0     |
+        | 1961       | 1980      | 1961-1990 | January  | null   | 20    | 1961 | null    |
+
+    Scenario: Only Changed Stations Are Recomputed
+        Given 3 stations written to a Parquet file
+
+        When the climatology is updated
+        And the observations of Station 1 are revised and Station 2 is removed
+        And the climatology is updated again
+
+        Then Station 1 is recomputed
+        And the climatology tables are the same as computing them from scratch
+
+    Scenario: Only The Last Row Of A Month Is Rolled Up
+        Given 3 stations written to a Parquet file
+        And a revision of the rain of Station 1 in 1990 6 to 25.0 appended to the Parquet file
+
+        When the climatology is updated
+
+        Then the annual rain of Station 1 in 1990 is 135.0 from 12 months
+        And the decadal rain of Station 1 in 1990 is 123.0 from 5 years
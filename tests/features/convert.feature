@@ -0,0 +1,105 @@
+Feature: Avro File Conversion
+    Scenario Outline: Streaming Avro To Parquet Conversion
+        Given an Avro file with <record_count> observations
+
+        When the Avro file is converted with <compression> compression and a row group size of <row_group_size>
+
+        Then the Parquet file contains the observations
+        And the Parquet file has <row_group_count> row groups
+
+        Examples:
+        | record_count | compression | row_group_size | row_group_count |
+        | 2500         | snappy      | 1000           | 3               |
+        | 2500         | zstd        | 65536          | 1               |
+        | 0            | none        | 1000           | 0               |
+
+    Scenario Outline: Compact Parquet Schema
+        Given an Avro file with 2500 observations
+
+        When the Avro file is converted with float32 <float32>
+
+        Then the Parquet file has a dictionary encoded station column and <measurement_type> measurements
+        And the Parquet file is read into less memory than the standard schema
+        And the Parquet file contains the observations to 1 decimal place
+        And querying Station 1 returns its observations with the standard schema
+
+        Examples:
+        | float32 | measurement_type |
+        | False   | double           |
+        | True    | float            |
+
+    Scenario: Partitioned Parquet Dataset
+        Given an Avro file with 2500 observations
+
+        When the Avro file is converted to a partitioned dataset
+
+        Then the dataset has 3 station partitions
+        And the dataset has 1 files for Station 0
+        And the file for Station 0 has 9 row groups
+        And reading Station 1 from 1990 to 1999 returns 120 sorted observations
+
+    Scenario: Partitioned Parquet Dataset With Appended Observations
+        Given an Avro file with 2500 observations
+        And the observations are appended to the Avro file again
+
+        When the Avro file is converted to a partitioned dataset
+
+        Then the dataset has 3 station partitions
+        And the dataset has 2 files for Station 0
+
+    Scenario Outline: Vectorized CSV Export
+        Given an Avro file with <record_count> observations
+
+        When the Avro file is exported to CSV with <compression> compression
+
+        Then the CSV file is the same as one written by csv.DictWriter
+
+        Examples:
+        | record_count | compression |
+        | 2500         | none        |
+        | 2500         | gzip        |
+        | 2500         | zstd        |
+        | 0            | none        |
+
+    Scenario: Vectorized CSV Export Of Awkward Values
+        Given an Avro file with awkward values
+
+        When the Avro file is exported to CSV with none compression
+
+        Then the CSV file is the same as one written by csv.DictWriter
+
+    Scenario Outline: Arrow IPC (Feather) Export
+        Given an Avro file with <record_count> observations
+
+        When the Avro file is exported to Feather with <compression> compression
+
+        Then the Feather file contains the observations in <batch_count> record batches
+        And the memory mapped Feather file is read without copying is <zero_copy>
+
+        Examples:
+        | record_count | compression  | batch_count | zero_copy |
+        | 2500         | uncompressed | 3           | True      |
+        | 2500         | lz4          | 3           | False     |
+        | 2500         | zstd         | 3           | False     |
+        | 0            | uncompressed | 0           | True      |
+
+    Scenario Outline: Parallel Avro Decoding
+        Given an Avro file with <record_count> observations in blocks of <block_size>
+
+        When the Avro file is read in batches of <batch_size> with <workers> workers
+
+        Then the batches are the same as those read by one process
+
+        Examples:
+        | record_count | block_size | batch_size | workers |
+        | 2500         | 100        | 1000       | 2       |
+        | 2500         | 100        | 250        | 3       |
+        | 2500         | 1000       | 65536      | 2       |
+        | 0            | 100        | 1000       | 2       |
+
+    Scenario: Parallel Avro Decoding Conversion
+        Given an Avro file with 2500 observations in blocks of 100
+
+        When the Avro file is converted to Parquet, CSV and Feather with 2 workers
+
+        Then the outputs are the same as those converted by one process
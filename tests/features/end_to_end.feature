@@ -0,0 +1,65 @@
+Feature: End To End Load Tests
+    Scenario Outline: Simulated Met Office Site
+        Given a simulated Met Office site of 700 months failing every <failure_every> requests
+
+        When Station 1 is downloaded from the site
+
+        Then the station has 700 observations
+        And the site served <requests> requests with <failures> failures
+
+        Examples:
+        | failure_every | requests | failures |
+        | 0             | 1        | 0        |
+        | 1             | 3        | 3        |
+        | 2             | 2        | 1        |
+
+    Scenario: Simulated Latency
+        Given a simulated Met Office site with a latency of 0.2 and a jitter of 0.1
+
+        Then each response is delayed by between 0.2 and 0.3 seconds
+
+    Scenario: Workflow Against The Simulated Site
+        When the workflow is run against a simulated site of 3 stations
+
+        Then the workflow succeeded
+        And the site served 3 requests
+        And the run reports its wall time, peak RSS and outputs
+
+    Scenario: Concurrent Downloads Of The Workflow
+        When the workflow is run with 3 workers against 3 slow stations
+
+        Then the workflow succeeded
+        And the site served 3 requests
+        And the site served more than 1 request at the same time
+
+    Scenario Outline: Switching The Parquet Output Between A File And A Dataset
+        Given a simulated Met Office site of 700 months failing every 0 requests
+
+        When the workflow is run against 2 stations of the site with the options <first>
+        And the workflow is run against 2 stations of the site with the options <second>
+
+        Then the Parquet output is a <kind> of 1400 observations
+
+        Examples:
+        | first    | second      | kind    |
+        | -v       | -v -p       | dataset |
+        | -v -p    | -v          | file    |
+        | -v -i    | -v -i -p    | dataset |
+        | -v -i -p | -v -i       | file    |
+        | -v -s    | -v -s -p    | dataset |
+        | -v -s -p | -v -s       | file    |
+
+    Scenario Outline: Switching Between Full And Incremental Runs Of The Same Sources
+        Given a simulated Met Office site of 700 months failing every 0 requests
+
+        When the workflow is run against 2 stations of the site with the options <first>
+        And the workflow is run against 2 stations of the site with the options <second>
+
+        Then the Parquet output is a <kind> of 1400 observations
+
+        Examples:
+        | first         | second   | kind    |
+        | -v            | -v -i    | file    |
+        | -v -i         | -v       | file    |
+        | -v -p         | -v -i -p | dataset |
+        | -v -c deflate | -v       | file    |
@@ -0,0 +1,20 @@
+Feature: Import Time
+    Scenario Outline: Entry Points Import Within Their Budget
+        When the imports of the <entry_point> entry point are measured with python -X importtime
+
+        Then the entry point does not import any other heavy modules
+        And the entry point is within its budget
+
+        Examples:
+        | entry_point |
+        | help        |
+        | utils       |
+        | metrics     |
+        | station     |
+        | convert     |
+        | query       |
+        | climatology |
+        | manifest    |
+        | validation  |
+        | upsert      |
+        | service     |
@@ -0,0 +1,35 @@
+Feature: Source Content Hashes And Output Manifests
+    Scenario: Unchanged Sources Have The Same Content Hash
+        Given a station server with 3 station files
+
+        When the sources are snapshotted with 2 workers
+        And the sources are snapshotted with 1 workers
+
+        Then the content hashes are the same
+        And the snapshot lists 3 sources in the order of the stations
+
+    Scenario: Changed Sources Have A New Content Hash
+        Given a station server with 3 station files
+
+        When the sources are snapshotted with 1 workers
+        And station file 1 changes
+        And the sources are snapshotted with 1 workers
+
+        Then the content hashes are different
+        And the snapshot directory only holds the latest snapshot
+
+    Scenario Outline: Outputs Are Reused While Their Manifest Verifies
+        Given outputs written with a manifest
+
+        When <change>
+
+        Then the cache key is <reused>
+
+        Examples:
+        | change                        | reused  |
+        | nothing changes               | reused  |
+        | the CSV file changes          | renewed |
+        | a climatology file is removed | renewed |
+        | the sources change            | renewed |
+        | the manifest is removed       | renewed |
+        | the run options change        | renewed |
@@ -0,0 +1,42 @@
+Feature: Run Metrics
+    Scenario: Station Stage Metrics
+        Given a station file with 24 observations
+
+        When the station is fetched as a batch with metrics
+
+        Then there are download and parse metrics for the station
+        And the download metrics have the size of the station file
+        And the parse metrics have 24 records
+
+    Scenario: Merging Metrics Files
+        Given a station file with 24 observations
+
+        When the station is fetched as a batch with metrics
+        And the metrics are saved to 2 files and merged
+
+        Then the merged metrics summarise 48 parse records
+        And the metrics files are removed
+
+    Scenario: Tracing Memory
+        Given memory tracing is enabled
+
+        When a stage allocates memory
+
+        Then the stage has a peak memory of at least 1000000 bytes
+
+    Scenario Outline: Profiling
+        Given the <profiler> profiler is enabled
+
+        When a stage is profiled
+
+        Then <file_count> profile files are written
+
+        Examples:
+        | profiler | file_count |
+        | cprofile | 1          |
+        | none     | 0          |
+
+    Scenario: Unsupported Profiler
+        Given the yappi profiler is enabled
+
+        Then profiling raises a ValueError
@@ -0,0 +1,23 @@
+Feature: Single Pass Output
+    Scenario Outline: Single Pass Output Matches Converting The Avro File
+        Given <station_count> station files with <line_count> observations each
+
+        When the stations are written in a single pass with a row group size of <row_group_size>
+
+        Then the Parquet file is the same as converting the Avro file
+        And the CSV file is the same as converting the Avro file
+        And the Feather file is the same as converting the Avro file
+        And the Avro file has <record_count> records
+
+        Examples:
+        | station_count | line_count | row_group_size | record_count |
+        | 3             | 100        | 1000           | 300          |
+        | 3             | 100        | 128            | 300          |
+        | 0             | 0          | 128            | 0            |
+
+    Scenario: Single Pass Partitioned Output
+        Given 3 station files with 240 observations each
+
+        When the stations are written in a single pass to a partitioned dataset
+
+        Then the partitioned dataset is the same as converting the Avro file
@@ -0,0 +1,38 @@
+Feature: Querying The Parquet Output
+    Scenario Outline: Querying A Station And Date Range
+        Given 3 stations with 240 observations each from 1950 written as <layout>
+
+        When Station <station> is queried from <start> to <end> for the columns <columns>
+
+        Then <row_count> observations are returned
+        And the observations are the same as filtering the whole table
+
+        Examples:
+        | layout              | station | start   | end     | columns          | row_count |
+        | a Parquet file      | 1       | 1955    | 1959    | year month rain  | 60        |
+        | a Parquet file      | 2       | 1955-06 | 1956-05 | all              | 12        |
+        | a Parquet file      | 0       | none    | none    | all              | 240       |
+        | a Parquet file      | 0       | 1990    | none    | all              | 0         |
+        | a Parquet file      | 9       | none    | none    | station          | 0         |
+        | a partitioned set   | 1       | 1955    | 1959    | station year sun | 60        |
+        | a partitioned set   | 2       | none    | 1950-03 | all              | 3         |
+        | an unsorted file    | 1       | 1955    | 1959    | year month rain  | 60        |
+        | an unsorted file    | 2       | 2000    | 2001    | all              | 0         |
+
+    Scenario: Writing Query Results
+        Given 3 stations with 240 observations each from 1950 written as a Parquet file
+
+        When Station 1 is queried from 1950-11 to 1951-02 for the columns year month rain
+
+        Then the CSV output has 5 lines
+        And the JSON output has 4 lines
+
+    Scenario: Rejecting Invalid Queries
+        Given 3 stations with 240 observations each from 1950 written as a Parquet file
+
+        Then querying an unknown column or date is rejected
+
+    Scenario: Parsing The Query Command
+        When the query command is parsed
+
+        Then the query arguments are set
@@ -0,0 +1,74 @@
+Feature: Read Service
+    Scenario Outline: Serving Station Queries
+        Given an output of 3 stations with 240 observations each from 1950
+        And the read service is running
+
+        When Station 1 is requested from 1955 to 1959 as <format>
+
+        Then the response has status 200 and a <content_type> content type
+        And the response has 60 observations
+
+        Examples:
+        | format | content_type                        |
+        | json   | application/json                    |
+        | csv    | text/csv                            |
+        | arrow  | application/vnd.apache.arrow.stream |
+
+    Scenario: Caching Responses
+        Given an output of 3 stations with 240 observations each from 1950
+        And the read service is running
+
+        When Station 1 is requested from 1955 to 1959 as json
+        And Station 1 is requested from 1955 to 1959 as json
+        And Station 2 is requested from 1955 to 1959 as json
+
+        Then the cache has 1 hits and 2 misses
+
+    Scenario: Reloading A New Output
+        Given an output of 3 stations with 240 observations each from 1950
+        And the read service is running
+
+        When Station 1 is requested from 1955 to 1959 as json
+        And a new output of 4 stations is written
+
+        Then the service lists 4 stations
+        And the service has indexed 2 outputs and emptied its cache
+
+    Scenario: Keeping The Previous Output While A New One Is Written
+        Given an output of 3 stations with 240 observations each from 1950
+        And the read service is running
+
+        When Station 1 is requested from 1955 to 1959 as json
+        And a new output is still being written
+
+        Then the service lists 3 stations
+        And the service has indexed 1 outputs
+
+    Scenario Outline: Rejecting Bad Requests
+        Given an output of 3 stations with 240 observations each from 1950
+        And the read service is running
+
+        When <path> is requested
+
+        Then the response has status <status> and a application/json content type
+
+        Examples:
+        | path                            | status |
+        | /stations/Station%209           | 404    |
+        | /stations/Station%201?format=x  | 400    |
+        | /stations/Station%201?columns=x | 400    |
+        | /stations/Station%201?start=x   | 400    |
+        | /observations                   | 404    |
+
+    Scenario: Serving Before There Is An Output
+        Given an empty output directory
+        And the read service is running
+
+        When /stations is requested
+
+        Then the response has status 503 and a application/json content type
+
+    Scenario: Parsing The Serve Command
+        When the serve command is parsed
+
+        Then the serve arguments are set
@@ -0,0 +1,32 @@
+Feature: Incremental Extraction Watermarks
+    Scenario Outline: Only New Or Revised Observations Are Accepted
+        Given watermarks saved after accepting <line>
+
+        When the watermarks are reloaded
+
+        Then the observation <new_line> is <accepted>
+
+        Examples:
+        | line                                    | new_line                                | accepted     |
+        | 2022 1 8.6 4.1 1 32.2 56.3#             | 2022 1 8.6 4.1 1 32.2 56.3#             | not accepted |
+        | 2022 1 8.6 4.1 1 32.2 56.3#             | 2021 12 8.6 4.1 1 32.2 56.3#            | not accepted |
+        | 2022 1 8.6 4.1 1 32.2 56.3#             | 2022 2 8.6 4.1 1 32.2 56.3#             | accepted     |
+        | 2022 1 8.6 4.1 1 32.2 56.3# Provisional | 2022 1 8.6 4.1 1 32.2 56.3# Provisional | not accepted |
+        | 2022 1 8.6 4.1 1 32.2 56.3# Provisional | 2022 1 8.7 4.1 1 32.2 56.3# Provisional | accepted     |
+        | 2022 1 8.6 4.1 1 32.2 56.3# Provisional | 2022 1 8.6 4.1 1 32.2 56.3#             | accepted     |
+
+    Scenario Outline: Revised Observations Replace The Rows They Revise
+        Given a station with 612 observations, the last 6 of them provisional
+
+        When the workflow is run incrementally with the options <options>
+        And the rain of the provisional observation of 1903 10 is revised to 12.3
+        And the workflow is run incrementally with the options <options>
+
+        Then the Parquet and CSV outputs have one row for each of the 612 months
+        And the rain of 1903 10 is 12.3 in the Parquet and CSV outputs
+        And no changes are left to be upserted
+
+        Examples:
+        | options  |
+        | -v -i    |
+        | -v -i -p |
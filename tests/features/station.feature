@@ -0,0 +1,14 @@
+Feature: Station Data Fetching
+    Scenario Outline: Concurrent Station Fetching
+        Given <station_count> station files with <line_count> observations each
+
+        When the stations are fetched with <max_workers> workers
+
+        Then the stations are returned in the order given
+        And each station has <line_count> observations
+
+        Examples:
+        | station_count | line_count | max_workers |
+        | 5             | 24         | 1           |
+        | 5             | 24         | 3           |
+        | 2             | 12         | 8           |
@@ -0,0 +1,76 @@
+Feature: Pooled HTTP Transport
+    Scenario: Connections Are Reused And Responses Compressed
+        Given a station server with 3 station files
+        And an HTTP transport with 0 retries
+
+        When the stations are downloaded 2 times
+
+        Then the transport made 6 requests over 1 connections
+        And every request accepted gzip
+        And the transport received fewer bytes than it decoded
+
+    Scenario: Connections Are Counted Across Threads
+        Given a station server with 4 station files
+        And an HTTP transport with 0 retries
+
+        When the stations are downloaded 5 times by 4 threads
+
+        Then the transport made 20 requests over the connections the server accepted
+
+    Scenario: Connections Closed By The Server Are Counted When Reopened
+        Given a station server with 3 station files
+        And an HTTP transport with 0 retries
+        And the server closes each connection after responding
+
+        When the stations are downloaded 2 times
+
+        Then the transport made 6 requests over 6 connections
+
+    Scenario Outline: Transient Failures Are Retried
+        Given a station server with 1 station files
+        And an HTTP transport with <retries> retries
+        And the next <failures> requests of station file 0 fail with status <status>
+
+        When the stations are downloaded 1 times
+
+        Then the transport made 1 requests with <failures> retries
+        And the server responded with <failures> <status> and 1 200 statuses
+
+        Examples:
+        | retries | failures | status |
+        | 2       | 1        | 503    |
+        | 3       | 3        | 500    |
+        | 1       | 1        | 429    |
+
+    Scenario: Persistent Failures Raise An Error
+        Given a station server with 1 station files
+        And an HTTP transport with 2 retries
+        And the next 3 requests of station file 0 fail with status 503
+
+        When the stations are downloaded expecting an HTTPError
+
+        Then the transport made 1 requests with 2 retries
+        And the transport counted 1 errors
+
+    Scenario: Slow Responses Time Out And Are Retried
+        Given a station server with 1 station files
+        And an HTTP transport with 1 retries and a read timeout of 0.2 seconds
+        And the next 1 requests of station file 0 are delayed by 1.0 seconds
+
+        When the stations are downloaded 1 times
+
+        Then the transport made 1 requests with 1 retries
+
+    Scenario: Stations Share A Transport
+        Given a station server with 2 station files
+
+        When the stations are read without a transport
+
+        Then the shared transport made 2 more requests
+
+    Scenario: Unreachable Hosts Raise An Error
+        Given an HTTP transport with 1 retries
+
+        When an unreachable station is downloaded
+
+        Then the transport counted 1 errors
@@ -0,0 +1,54 @@
+Feature: Parquet Dataset Upserts
+    Scenario Outline: Only Stations With New Or Revised Observations Are Rewritten
+        Given a dataset of 3 stations with provisional observations
+
+        When <change> in station 1
+        And the stations are upserted
+
+        Then <changed_rows> new or revised rows of <stations> stations are upserted
+        And station 1 has <months> months with <provisional> provisional
+        And the dataset matches the latest observations
+
+        Examples:
+        | change                                | changed_rows | stations | months | provisional |
+        | nothing changes                       | 0            | 0        | 4      | 2           |
+        | a provisional observation is revised  | 1            | 1        | 4      | 2           |
+        | a provisional observation is final    | 1            | 1        | 4      | 1           |
+        | a month is added                      | 1            | 1        | 5      | 3           |
+        | a final observation is revised        | 0            | 0        | 4      | 2           |
+
+    Scenario: Watermarks Are Built For A Dataset Written Without Them
+        Given a dataset of 3 stations written from an Avro file
+
+        When a provisional observation is final in station 2
+        And the stations are upserted
+
+        Then 1 new or revised rows of 1 stations are upserted
+        And station 2 has 4 months with 1 provisional
+        And the dataset matches the latest observations
+
+    Scenario: The Last Revision Of A Month Is Kept
+        Given an empty dataset
+
+        When a provisional observation is revised in station 0
+        And the original and revised stations are upserted together
+
+        Then 5 new or revised rows of 1 stations are upserted
+        And the dataset matches the latest observations
+
+    Scenario Outline: Only The Changes Of Incremental Runs Are Read
+        Given a dataset of 3 stations upserted from the changes of an incremental run
+
+        When <change> in station 1
+        And the changes of an incremental run are upserted
+
+        Then <changed_rows> new or revised rows of <stations> stations are upserted
+        And <changed_rows> rows are read
+        And no changes are left to be upserted
+        And the dataset matches the latest observations
+
+        Examples:
+        | change                               | changed_rows | stations |
+        | nothing changes                      | 0            | 0        |
+        | a provisional observation is revised | 1            | 1        |
+        | a month is added                     | 1            | 1        |
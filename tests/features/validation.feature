@@ -0,0 +1,34 @@
+Feature: Data Quality Validation
+    Scenario Outline: Failing Rows Are Quarantined With Their Reasons
+        Given a station file with the line <line> between two valid months
+
+        When the station file is parsed with a quarantine
+
+        Then the batch has <rows> rows
+        And the quarantine has the reasons <reasons>
+
+        Examples:
+        | line                                   | rows | reasons                          |
+        | 1957 2 9.1 2.0 1 60.0 70.0             | 3    | none                             |
+        | 1957 2 9.1 2.0 1 60.0 70.0 Provisional | 3    | none                             |
+        | 1957 13 9.1 2.0 1 60.0 70.0            | 2    | month out of range               |
+        | 1957 2 9.1 2.0 1 60.0 70.0%            | 2    | unknown suffix on sun            |
+        | 1957 2 9.1 2.0 1 60.0z 70.0            | 2    | unknown suffix on rain           |
+        | 1957 2 n/a 2.0 1 60.0 70.0             | 2    | invalid tmax                     |
+        | 1957 2 9.1 2.0 1                       | 2    | too few fields                   |
+        | 19x7 2 9.1 2.0 1 60.0 70.0             | 2    | invalid year                     |
+        | 19570000000 2 9.1 2.0 1 60.0 70.0      | 2    | invalid year                     |
+        | 1957 1 9.1 2.0 1 60.0 70.0             | 2    | duplicate month                  |
+        | 1956 12 9.1 2.0 1 60.0 70.0            | 2    | out of order month               |
+        | 1957 2 61.2 2.0 1 60.0 70.0            | 2    | implausible tmax                 |
+        | 1957 2 9.1 2.0 45 -6.0 70.0            | 2    | implausible af; implausible rain |
+        | 1957 2 1.1 2.0 1 60.0 70.0             | 2    | tmin above tmax                  |
+        | 1066 2 9.1 2.0 1 60.0 70.0             | 2    | implausible year                 |
+
+    Scenario: Quarantine Files Are Merged
+        Given 3 quarantine files of stations with 2 failing rows
+
+        When the quarantine files are merged
+
+        Then the merged quarantine file has 6 rows grouped by station
+        And the quarantine files are removed
@@ -0,0 +1,120 @@
+"""Shared fixtures for the feature tests."""
+import email.utils
+import gzip
+import hashlib
+import http.server
+import threading
+import time
+
+import pytest
+
+
+class StationDataHandler(http.server.BaseHTTPRequestHandler):
+    """Serve station data files from memory, supporting conditional requests, gzip and keep-alive."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):  # noqa: N802
+        """Respond to a GET request, after any delay or failure injected for the path."""
+        server = self.server
+        server.requests.append(self.path)
+        server.accept_encodings.append(self.headers.get('Accept-Encoding'))
+
+        if server.delays.get(self.path):
+            time.sleep(server.delays[self.path].pop(0))
+
+        if server.failures.get(self.path):
+            status = server.failures[self.path].pop(0)
+            server.statuses.append(status)
+            self.send_response(status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = server.files.get(self.path)
+
+        if body is None:
+            self.send_error(404)
+            return
+
+        etag = f'"{hashlib.sha256(body).hexdigest()}"'
+
+        if self.headers.get('If-None-Match') == etag:
+            server.statuses.append(304)
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        server.statuses.append(200)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', email.utils.formatdate(usegmt=True))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def end_headers(self):
+        """Ask the client to close the connection after the response, if the server does not keep them alive."""
+        if self.server.close_connections:
+            self.send_header('Connection', 'close')
+
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        """Do not log requests."""
+
+
+class StationDataServer(http.server.ThreadingHTTPServer):
+    """A local stand-in for the Met Office web site."""
+
+    def __init__(self):
+        """Create a server listening on a free local port."""
+        super().__init__(('127.0.0.1', 0), StationDataHandler)
+        self.files = {}
+        self.requests = []
+        self.statuses = []
+        self.accept_encodings = []
+        # The statuses of failed responses, and the delays (in seconds), of the next requests of each path.
+        self.failures = {}
+        self.delays = {}
+        # The number of connections accepted, and if each is closed after its first response.
+        self.connections = 0
+        self.close_connections = False
+
+    def verify_request(self, request, client_address) -> bool:
+        """Count each connection, which is accepted by the thread serving them all."""
+        self.connections += 1
+        return True
+
+    def url(self, path: str) -> str:
+        """
+        Get the URL of a path on the server.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file (e.g. /fulchesterdata.txt).
+
+        Returns
+        -------
+        str
+            The full URL.
+        """
+        return f'http://127.0.0.1:{self.server_address[1]}{path}'
+
+
+@pytest.fixture
+def station_server():
+    """Run a local station data server for the duration of a test."""
+    server = StationDataServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
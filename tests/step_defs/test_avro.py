@@ -0,0 +1,253 @@
+"""Avro file writing feature tests."""
+import io
+import shutil
+
+import pytest
+
+from fastavro import block_reader, reader
+from pytest_bdd import (
+    given,
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from historical.avro import AvroWriter, avro_blocks, replace_revised_records
+from historical.observation import Observation
+
+
+@scenario('../features/avro.feature', 'Block Batched Avro Writing')
+def test_block_batched_avro_writing():
+    """Block Batched Avro Writing."""
+
+
+@scenario('../features/avro.feature', 'Appending To An Avro File')
+def test_appending_to_an_avro_file():
+    """Appending To An Avro File."""
+
+
+@scenario('../features/avro.feature', 'Copying Blocks Between Avro Files')
+def test_copying_blocks_between_avro_files():
+    """Copying Blocks Between Avro Files."""
+
+
+@scenario('../features/avro.feature', 'Unsupported Avro Codec')
+def test_unsupported_avro_codec():
+    """Unsupported Avro Codec."""
+
+
+@scenario('../features/avro.feature', 'Finding The Blocks Of An Avro File')
+def test_finding_the_blocks_of_an_avro_file():
+    """Finding The Blocks Of An Avro File."""
+
+
+@scenario('../features/avro.feature', 'Replacing Revised Records')
+def test_replacing_revised_records():
+    """Replacing Revised Records."""
+
+
+@scenario('../features/avro.feature', 'Only The Blocks From The First Revised Row Are Written Again')
+def test_only_the_blocks_from_the_first_revised_row_are_written_again():
+    """Only The Blocks From The First Revised Row Are Written Again."""
+
+
+@given(parsers.parse('{record_count:d} observations'), target_fixture='records')
+def observations(record_count):
+    """<record_count> observations."""
+    records = []
+
+    for index in range(record_count):
+        observation = Observation(f'{1900 + index // 12} {index % 12 + 1} 8.6 3.9 2 80.6 55.6#')
+        observation.station_name('Fulchester')
+        records.append(observation.to_dict())
+
+    return records
+
+
+@when(
+    parsers.parse('the observations are written with the {codec} codec and a block size of {block_size:d}'),
+    target_fixture='avro_file_name'
+)
+def observations_are_written(codec, block_size, records, tmp_path):
+    """the observations are written with the <codec> codec and a block size of <block_size>."""
+    avro_file_name = str(tmp_path / 'observations.avro')
+
+    with AvroWriter(avro_file_name, codec=codec, block_size=block_size, sync_interval=1024 * 1024) as avro_writer:
+        avro_writer.write_many(records)
+
+    assert avro_writer.records_written == len(records)
+    return avro_file_name
+
+
+@when('the observations are appended to the Avro file')
+def observations_are_appended(records, avro_file_name):
+    """the observations are appended to the Avro file."""
+    with AvroWriter(avro_file_name, append=True) as avro_writer:
+        avro_writer.write_many(records)
+
+
+@when('the blocks are copied to an Avro file with the null codec', target_fixture='copied_avro_file_name')
+def blocks_are_copied(records, avro_file_name):
+    """the blocks are copied to an Avro file with the null codec."""
+    copied_avro_file_name = avro_file_name.replace('.avro', '-copy.avro')
+
+    with AvroWriter(copied_avro_file_name) as avro_writer, open(avro_file_name, 'rb') as stream:
+        for block in block_reader(stream):
+            avro_writer.write_block(block)
+
+    assert avro_writer.records_written == len(records)
+    return copied_avro_file_name
+
+
+@then(parsers.parse('the copied Avro file contains the observations in {block_count:d} blocks'))
+def copied_avro_file_contains_records(block_count, records, copied_avro_file_name):
+    """the copied Avro file contains the observations in <block_count> blocks."""
+    with open(copied_avro_file_name, 'rb') as stream:
+        avro_reader = reader(stream)
+        assert avro_reader.codec == 'null'
+        assert list(avro_reader) == records
+
+    with open(copied_avro_file_name, 'rb') as stream:
+        assert len(list(block_reader(stream))) == block_count
+
+
+@then('the Avro file contains the observations twice')
+def avro_file_contains_records_twice(records, avro_file_name):
+    """the Avro file contains the observations twice."""
+    with open(avro_file_name, 'rb') as stream:
+        avro_reader = reader(stream)
+        assert avro_reader.codec == 'deflate'
+        assert list(avro_reader) == records + records
+
+
+@then(parsers.parse('the Avro file contains {record_count:d} observations'))
+def avro_file_record_count(record_count, records, avro_file_name):
+    """the Avro file contains <record_count> observations."""
+    with open(avro_file_name, 'rb') as stream:
+        assert list(reader(stream)) == records
+
+
+@then(parsers.parse('the Avro file contains {block_count:d} blocks'))
+def avro_file_block_count(block_count, avro_file_name):
+    """the Avro file contains <block_count> blocks."""
+    with open(avro_file_name, 'rb') as stream:
+        assert len(list(block_reader(stream))) == block_count
+
+
+@then(parsers.parse('writing with the {codec} codec raises a ValueError'))
+def unsupported_codec(codec, tmp_path):
+    """writing with the <codec> codec raises a ValueError."""
+    with pytest.raises(ValueError):
+        AvroWriter(str(tmp_path / 'observations.avro'), codec=codec)
+
+
+@then(parsers.parse('the blocks of the Avro file have {first:d}, {second:d} and {third:d} records'))
+def avro_file_blocks(first, second, third, avro_file_name):
+    """the blocks of the Avro file have <first>, <second> and <third> records."""
+    header_size, blocks = avro_blocks(avro_file_name)
+
+    with open(avro_file_name, 'rb') as stream:
+        assert [block.num_records for block in block_reader(stream)] == [first, second, third]
+
+    assert [record_count for _, _, record_count in blocks] == [first, second, third]
+    assert blocks[0][0] == header_size
+    assert [offset for offset, _, _ in blocks[1:]] == [end for _, end, _ in blocks[:-1]]
+
+
+@then('the blocks of the Avro file are decoded on their own')
+def avro_file_blocks_decoded(records, avro_file_name):
+    """the blocks of the Avro file are decoded on their own."""
+    header_size, blocks = avro_blocks(avro_file_name)
+    decoded = []
+
+    with open(avro_file_name, 'rb') as stream:
+        header = stream.read(header_size)
+
+        for offset, end, _ in reversed(blocks):
+            stream.seek(offset)
+            decoded = list(reader(io.BytesIO(header + stream.read(end - offset)))) + decoded
+
+    assert decoded == records
+
+
+@then('finding the blocks of the Avro file with a corrupted sync marker raises a ValueError')
+def corrupted_sync_marker(avro_file_name):
+    """finding the blocks of the Avro file with a corrupted sync marker raises a ValueError."""
+    corrupted_file_name = avro_file_name.replace('.avro', '-corrupted.avro')
+    shutil.copyfile(avro_file_name, corrupted_file_name)
+    _, blocks = avro_blocks(avro_file_name)
+
+    with open(corrupted_file_name, 'r+b') as stream:
+        stream.seek(blocks[1][1] - 1)
+        byte = stream.read(1)[0]
+        stream.seek(blocks[1][1] - 1)
+        stream.write(bytes([byte ^ 0xff]))
+
+    with pytest.raises(ValueError):
+        avro_blocks(corrupted_file_name)
+
+
+@when(
+    parsers.parse('revisions of the observations {first:d} and {second:d} are appended to the Avro file'),
+    target_fixture='revisions'
+)
+def revisions_are_appended(first, second, records, avro_file_name):
+    """revisions of the observations <first> and <second> are appended to the Avro file."""
+    revisions = {}
+
+    with AvroWriter(avro_file_name, append=True) as avro_writer:
+        for index in (first, second):
+            record = {**records[index], 'rain': 12.3}
+            revisions[(record['station'], record['year'], record['month'])] = record
+            avro_writer.write(record)
+
+    return revisions
+
+
+@when('the revised records are replaced', target_fixture='dropped')
+def revised_records_are_replaced(revisions, avro_file_name, original_blocks):
+    """the revised records are replaced."""
+    return replace_revised_records(avro_file_name, revisions)
+
+
+@pytest.fixture
+def original_blocks(avro_file_name):
+    """The header and blocks of the Avro file before its revised records are replaced."""
+    header_size, blocks = avro_blocks(avro_file_name)
+
+    with open(avro_file_name, 'rb') as stream:
+        data = stream.read()
+
+    return [data[:header_size]] + [data[offset:end] for offset, end, _ in blocks]
+
+
+@then(parsers.parse('{dropped_count:d} rows were dropped'))
+def rows_were_dropped(dropped_count, dropped):
+    """<dropped_count> rows were dropped."""
+    assert dropped == dropped_count
+
+
+@then(parsers.parse('the first {block_count:d} blocks of the Avro file are unchanged'))
+def first_blocks_unchanged(block_count, original_blocks, avro_file_name):
+    """the first <block_count> blocks of the Avro file are unchanged."""
+    expected = b''.join(original_blocks[:block_count + 1])
+
+    with open(avro_file_name, 'rb') as stream:
+        assert stream.read(len(expected)) == expected
+
+    _, blocks = avro_blocks(avro_file_name)
+    assert len(blocks) > block_count
+
+
+@then(parsers.parse('the Avro file contains the observations with {first:d} and {second:d} revised'))
+def avro_file_contains_revisions(first, second, records, avro_file_name):
+    """the Avro file contains the observations with <first> and <second> revised."""
+    expected = [
+        {**record, 'rain': 12.3} if index in (first, second) else record for index, record in enumerate(records)
+    ]
+
+    with open(avro_file_name, 'rb') as stream:
+        avro_reader = reader(stream)
+        assert avro_reader.codec == 'deflate'
+        assert list(avro_reader) == expected
@@ -0,0 +1,62 @@
+"""Columnar observation parsing feature tests."""
+import pytest
+
+from pytest_bdd import (
+    given,
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from historical.station import Station
+
+STATION_HEADER = """Fulchester
+Location: 224100E 252100N, Lat 52.139 Lon -4.570, 133 metres amsl
+   yyyy  mm   tmax    tmin      af    rain     sun
+              degC    degC    days      mm   hours
+"""
+
+
+@scenario('../features/batch.feature', 'Batch Parsing Matches Observation Parsing')
+def test_batch_parsing_matches_observation_parsing():
+    """Batch Parsing Matches Observation Parsing."""
+
+
+@scenario('../features/batch.feature', 'Batch Parsing Of An Invalid Line')
+def test_batch_parsing_of_an_invalid_line():
+    """Batch Parsing Of An Invalid Line."""
+
+
+@given(parsers.parse('a station file containing {line}'), target_fixture='station')
+def station_file(line, tmp_path):
+    """a station file containing <line>."""
+    path = tmp_path / 'fulchesterdata.txt'
+    path.write_text(f'{STATION_HEADER}   1940   12   5.0   1.2   9   50.0\n   {line.strip()}\n')
+    return Station('Fulchester', str(path))
+
+
+@when('the station file is parsed as a batch', target_fixture='batch')
+def station_file_is_parsed(station):
+    """the station file is parsed as a batch."""
+    return station.get_observation_batch()
+
+
+@then('the batch matches the observations parsed line by line')
+def batch_matches_observations(station, batch):
+    """the batch matches the observations parsed line by line."""
+    records = []
+
+    for observation in station.get_observations():
+        observation.station_name(station.name)
+        records.append(observation.to_dict())
+
+    assert batch.num_rows == 2
+    assert batch.to_pylist() == records
+
+
+@then('parsing the station file as a batch raises a ValueError')
+def batch_parsing_raises(station):
+    """parsing the station file as a batch raises a ValueError."""
+    with pytest.raises(ValueError):
+        station.get_observation_batch()
@@ -0,0 +1,29 @@
+"""Benchmarks feature tests."""
+import importlib
+import json
+
+from pytest_bdd import (
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+
+@scenario('../features/benchmarks.feature', 'Running A Benchmark On A Small Data Set')
+def test_running_a_benchmark_on_a_small_data_set():
+    """Running A Benchmark On A Small Data Set."""
+
+
+@when(parsers.parse('the {benchmark} benchmark is run with the arguments {arguments}'))
+def benchmark_is_run(benchmark, arguments, tmp_path, monkeypatch, capsys):
+    """the <benchmark> benchmark is run with the arguments <arguments>."""
+    # Any files the benchmark writes are written to the temporary directory, and what it prints is captured.
+    monkeypatch.chdir(tmp_path)
+    importlib.import_module(f'benchmarks.{benchmark}').main(arguments.split())
+
+
+@then('the benchmark prints its results as JSON')
+def benchmark_prints_results(capsys):
+    """the benchmark prints its results as JSON."""
+    assert json.loads(capsys.readouterr().out)
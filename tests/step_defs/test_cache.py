@@ -0,0 +1,138 @@
+"""Station source file caching feature tests."""
+import os
+
+from pytest_bdd import (
+    given,
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from historical.cache import SourceCache
+from historical.station import Station
+
+STATION_TEXT = """Fulchester
+   yyyy  mm   tmax    tmin      af    rain     sun
+   1957   1    8.6     3.9       2    80.6    55.6
+"""
+
+
+@scenario('../features/cache.feature', 'Unchanged Files Are Served From The Cache')
+def test_unchanged_files_are_served_from_the_cache():
+    """Unchanged Files Are Served From The Cache."""
+
+
+@scenario('../features/cache.feature', 'Changed Files Are Downloaded Again')
+def test_changed_files_are_downloaded_again():
+    """Changed Files Are Downloaded Again."""
+
+
+@scenario('../features/cache.feature', 'Least Recently Used Files Are Evicted When The Cache Is Pruned')
+def test_least_recently_used_files_are_evicted_when_the_cache_is_pruned():
+    """Least Recently Used Files Are Evicted When The Cache Is Pruned."""
+
+
+@scenario('../features/cache.feature', 'Not Modified Files That Are Not Cached Are Downloaded Again')
+def test_not_modified_files_that_are_not_cached_are_downloaded_again():
+    """Not Modified Files That Are Not Cached Are Downloaded Again."""
+
+
+@scenario('../features/cache.feature', 'Local Files Are Read Without The Cache')
+def test_local_files_are_read_without_the_cache():
+    """Local Files Are Read Without The Cache."""
+
+
+@given(parsers.parse('a station server with {file_count:d} station files'), target_fixture='urls')
+def station_files(file_count, station_server):
+    """a station server with <file_count> station files."""
+    urls = []
+
+    for index in range(file_count):
+        station_server.files[f'/station{index}data.txt'] = STATION_TEXT.encode('utf-8')
+        urls.append(station_server.url(f'/station{index}data.txt'))
+
+    return urls
+
+
+@given(parsers.parse('a local station file with a {kind} URL'), target_fixture='urls')
+def local_station_file(kind, tmp_path):
+    """a local station file with a <kind> URL."""
+    station_file = tmp_path / 'fulchesterdata.txt'
+    station_file.write_text(STATION_TEXT)
+    return [station_file.as_uri() if kind == 'file' else str(station_file)]
+
+
+@given('a source cache', target_fixture='cache')
+def source_cache(tmp_path):
+    """a source cache."""
+    return SourceCache(str(tmp_path / 'cache'))
+
+
+@given(parsers.parse('a source cache limited to {file_count:d} files'), target_fixture='cache')
+def limited_source_cache(file_count, tmp_path):
+    """a source cache limited to <file_count> files."""
+    return SourceCache(str(tmp_path / 'cache'), max_bytes=file_count * len(STATION_TEXT))
+
+
+@given(parsers.parse('the server responds to the next request of each file with a {status:d} status'))
+def server_responds_with(status, station_server):
+    """the server responds to the next request of each file with a <status> status."""
+    for path in station_server.files:
+        station_server.failures[path] = [status]
+
+
+@when(parsers.parse('the stations are read through the cache {count:d} times'))
+def stations_are_read(count, urls, cache):
+    """the stations are read through the cache <count> times."""
+    for _ in range(count):
+        for url in urls:
+            observations = list(Station('Fulchester', url, cache=cache).get_observations())
+            assert len(observations) == 1
+
+
+@when('the station files change')
+def station_files_change(station_server):
+    """the station files change."""
+    for path in station_server.files:
+        station_server.files[path] = STATION_TEXT.replace('1957', '1958').encode('utf-8')
+
+
+@when('the source cache is pruned')
+def source_cache_is_pruned(cache):
+    """the source cache is pruned."""
+    cache.prune()
+
+
+@then(parsers.parse('the source cache has {hits:d} hits and {misses:d} misses'))
+def cache_hits_and_misses(hits, misses, cache):
+    """the source cache has <hits> hits and <misses> misses."""
+    assert cache.stats['hits'] == hits
+    assert cache.stats['misses'] == misses
+    assert cache.report()
+
+
+@then(parsers.parse('the server responded with {ok:d} 200 and {not_modified:d} 304 statuses'))
+def server_statuses(ok, not_modified, station_server):
+    """the server responded with <ok> 200 and <not_modified> 304 statuses."""
+    assert station_server.statuses.count(200) == ok
+    assert station_server.statuses.count(304) == not_modified
+
+
+@then('the stations return the changed data')
+def stations_return_changed_data(urls, cache):
+    """the stations return the changed data."""
+    for url in urls:
+        assert Station('Fulchester', url, cache=cache).get_observation_batch()['year'][0].as_py() == 1958
+
+
+@then(parsers.parse('the source cache has {evictions:d} evictions'))
+def cache_evictions(evictions, cache):
+    """the source cache has <evictions> evictions."""
+    assert cache.stats['evictions'] == evictions
+
+
+@then(parsers.parse('the source cache contains {file_count:d} files'))
+def cache_file_count(file_count, cache):
+    """the source cache contains <file_count> files."""
+    assert len([name for name in os.listdir(cache.directory) if name.endswith('.body')]) == file_count
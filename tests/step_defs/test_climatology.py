@@ -0,0 +1,268 @@
+"""Climatology rollups feature tests."""
+import calendar
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from pytest_bdd import (
+    given,
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from historical.arrow import arrow_schema
+from historical.climatology import (
+    TABLES,
+    annual_rollup,
+    climate_normals,
+    decadal_rollup,
+    monthly_anomalies,
+    update_climatology
+)
+
+
+@scenario('../features/climatology.feature', 'Annual And Decadal Rollups')
+def test_annual_and_decadal_rollups():
+    """Annual And Decadal Rollups."""
+
+
+@scenario('../features/climatology.feature', 'Climate Normals And Anomalies')
+def test_climate_normals_and_anomalies():
+    """Climate Normals And Anomalies."""
+
+
+@scenario('../features/climatology.feature', 'Only Changed Stations Are Recomputed')
+def test_only_changed_stations_are_recomputed():
+    """Only Changed Stations Are Recomputed."""
+
+
+@scenario('../features/climatology.feature', 'Only The Last Row Of A Month Is Rolled Up')
+def test_only_the_last_row_of_a_month_is_rolled_up():
+    """Only The Last Row Of A Month Is Rolled Up."""
+
+
+def observation_table(stations: list, first_year: int, last_year: int) -> pa.Table:
+    """
+    Generate observations with 10mm of rain each month.
+
+    The rain of 1962-06 is missing, the tmax of 1963-01 is estimated (and 12 degC rather than 6),
+    1964-11 and 1964-12 are provisional and the rain of 2020-01 is 15mm.
+
+    Parameters
+    ----------
+    stations : list of str
+        The names of the stations.
+    first_year : int
+        The year of the first observation.
+    last_year : int
+        The year of the last observation.
+
+    Returns
+    -------
+    pyarrow.Table
+        The observations.
+    """
+    records = []
+
+    for station in stations:
+        for year in range(first_year, last_year + 1):
+            for month in range(1, 13):
+                records.append({
+                    'station': station,
+                    'year': year,
+                    'month': month,
+                    'tmax': 12.0 if (year, month) == (1963, 1) else 6.0,
+                    'tmaxIsEstimated': (year, month) == (1963, 1),
+                    'tminIsEstimated': False,
+                    'afIsEstimated': False,
+                    'rain': None if (year, month) == (1962, 6) else (15.0 if (year, month) == (2020, 1) else 10.0),
+                    'rainIsEstimated': False,
+                    'sunIsEstimated': False,
+                    'isProvisional': year == 1964 and month > 10
+                })
+
+    return pa.Table.from_pylist(records, arrow_schema())
+
+
+def row(table: pa.Table, **keys) -> dict:
+    """
+    Get the row of a table with the given keys.
+
+    Parameters
+    ----------
+    table : pyarrow.Table
+        The table.
+    **keys
+        The values of the key columns.
+
+    Returns
+    -------
+    dict
+        The row.
+    """
+    for name, value in keys.items():
+        table = table.filter(pc.equal(table[name], value))
+
+    assert table.num_rows == 1
+    return table.to_pylist()[0]
+
+
+@given(
+    parsers.parse('a station with observations from {first_year:d} to {last_year:d}'),
+    target_fixture='observations'
+)
+def station_with_observations(first_year, last_year):
+    """a station with observations from <first_year> to <last_year>."""
+    return observation_table(['Fulchester'], first_year, last_year)
+
+
+@given('3 stations written to a Parquet file', target_fixture='parquet_file_name')
+def stations_written(tmp_path):
+    """3 stations written to a Parquet file."""
+    parquet_file_name = str(tmp_path / 'observations.parquet')
+    pq.write_table(observation_table(['Station 0', 'Station 1', 'Station 2'], 1985, 1994), parquet_file_name)
+    return parquet_file_name
+
+
+@given(
+    parsers.parse(
+        'a revision of the rain of {station} in {year:d} {month:d} to {rain:f} appended to the Parquet file'
+    )
+)
+def revision_appended(station, year, month, rain, parquet_file_name):
+    """a revision of the rain of <station> in <year> <month> to <rain> appended to the Parquet file."""
+    table = pq.read_table(parquet_file_name)
+    revision = row(table, station=station, year=year, month=month)
+    revision['rain'] = rain
+    pq.write_table(pa.concat_tables([table, pa.Table.from_pylist([revision], table.schema)]), parquet_file_name)
+
+
+@when('the observations are rolled up', target_fixture='rollups')
+def observations_rolled_up(observations):
+    """the observations are rolled up."""
+    annual = annual_rollup(observations)
+    normals = climate_normals(observations)
+    return {
+        'annual': annual,
+        'decadal': decadal_rollup(annual),
+        'normals': normals,
+        'anomalies': monthly_anomalies(observations, normals)
+    }
+
+
+@when('the climatology is updated', target_fixture='recomputed')
+def climatology_updated(parquet_file_name, tmp_path):
+    """the climatology is updated."""
+    recomputed = update_climatology(parquet_file_name, str(tmp_path / 'climatology'))
+    assert recomputed == ['Station 0', 'Station 1', 'Station 2']
+    assert update_climatology(parquet_file_name, str(tmp_path / 'climatology')) == []
+    return recomputed
+
+
+@when('the observations of Station 1 are revised and Station 2 is removed')
+def observations_revised(parquet_file_name):
+    """the observations of Station 1 are revised and Station 2 is removed."""
+    table = pq.read_table(parquet_file_name)
+    table = table.filter(pc.not_equal(table['station'], 'Station 2'))
+    rain = pc.if_else(
+        pc.and_(pc.equal(table['station'], 'Station 1'), pc.equal(table['year'], 1990)),
+        pa.scalar(None, pa.float64()),
+        table['rain']
+    )
+    table = table.set_column(table.schema.get_field_index('rain'), table.schema.field('rain'), rain)
+    pq.write_table(table, parquet_file_name)
+
+
+@when('the climatology is updated again', target_fixture='recomputed')
+def climatology_updated_again(parquet_file_name, tmp_path):
+    """the climatology is updated again."""
+    return update_climatology(parquet_file_name, str(tmp_path / 'climatology'))
+
+
+@then(parsers.parse('the annual rain of {year:d} is {rain} from {months:d} months'))
+def annual_rain(year, rain, months, rollups):
+    """the annual rain of <year> is <rain> from <months> months."""
+    annual = row(rollups['annual'], year=year)
+    assert annual['rain'] == (None if rain == 'null' else float(rain))
+    assert annual['rainMonths'] == months
+    assert annual['months'] == 12
+
+
+@then(parsers.parse('the annual tmax of {year:d} is {tmax:g} with {estimated:d} estimated months'))
+def annual_tmax(year, tmax, estimated, rollups):
+    """the annual tmax of <year> is <tmax> with <estimated> estimated months."""
+    annual = row(rollups['annual'], year=year)
+    assert annual['tmax'] == tmax
+    assert annual['tmaxEstimatedMonths'] == estimated
+    assert annual['tmin'] is None
+    assert annual['tminMonths'] == 0
+
+
+@then(parsers.parse('{year:d} has {provisional:d} provisional months'))
+def provisional_months(year, provisional, rollups):
+    """<year> has <provisional> provisional months."""
+    assert row(rollups['annual'], year=year)['provisionalMonths'] == provisional
+
+
+@then(parsers.parse('the decadal rain of {decade:d} is {rain:g} from {rain_years:d} of {years:d} years'))
+def decadal_rain(decade, rain, rain_years, years, rollups):
+    """the decadal rain of <decade> is <rain> from <rain_years> of <years> years."""
+    decadal = row(rollups['decadal'], decade=decade)
+    assert decadal['rain'] == rain
+    assert decadal['rainYears'] == rain_years
+    assert decadal['years'] == years
+
+
+@then(parsers.parse('the {period} {month} rain normal is {normal} from {years:d} years'))
+def rain_normal(period, month, normal, years, rollups):
+    """the <period> <month> rain normal is <normal> from <years> years."""
+    normals = row(rollups['normals'], period=period, month=list(calendar.month_name).index(month))
+    assert normals['rain'] == (None if normal == 'null' else float(normal))
+    assert normals['rainYears'] == years
+
+
+@then(parsers.parse('the {month} {year:d} rain anomaly against {period} is {anomaly}'))
+def rain_anomaly(month, year, period, anomaly, rollups):
+    """the <month> <year> rain anomaly against <period> is <anomaly>."""
+    anomalies = row(rollups['anomalies'], year=year, month=list(calendar.month_name).index(month), period=period)
+    assert anomalies['rainAnomaly'] == (None if anomaly == 'null' else float(anomaly))
+    assert anomalies['rainIsEstimated'] is False
+    assert rollups['anomalies'].num_rows == 2 * rollups['annual']['months'].to_numpy().sum()
+
+
+@then(parsers.parse('{station} is recomputed'))
+def station_is_recomputed(station, recomputed):
+    """<station> is recomputed."""
+    assert recomputed == [station]
+
+
+@then('the climatology tables are the same as computing them from scratch')
+def tables_are_same(parquet_file_name, tmp_path):
+    """the climatology tables are the same as computing them from scratch."""
+    assert update_climatology(parquet_file_name, str(tmp_path / 'scratch')) == ['Station 0', 'Station 1']
+
+    for name in TABLES:
+        updated = pq.read_table(str(tmp_path / 'climatology' / f'{name}.parquet'))
+        scratch = pq.read_table(str(tmp_path / 'scratch' / f'{name}.parquet'))
+        assert updated.equals(scratch)
+        assert 'Station 2' not in updated['station'].to_pylist()
+
+
+@then(parsers.parse('the annual rain of {station} in {year:d} is {rain:f} from {months:d} months'))
+def updated_annual_rain(station, year, rain, months, tmp_path):
+    """the annual rain of <station> in <year> is <rain> from <months> months."""
+    annual = row(pq.read_table(str(tmp_path / 'climatology' / 'annual.parquet')), station=station, year=year)
+    assert annual['rain'] == rain
+    assert annual['months'] == months
+    assert annual['rainMonths'] == months
+
+
+@then(parsers.parse('the decadal rain of {station} in {decade:d} is {rain:f} from {years:d} years'))
+def updated_decadal_rain(station, decade, rain, years, tmp_path):
+    """the decadal rain of <station> in <decade> is <rain> from <years> years."""
+    decadal = row(pq.read_table(str(tmp_path / 'climatology' / 'decadal.parquet')), station=station, decade=decade)
+    assert decadal['rain'] == rain
+    assert decadal['rainYears'] == years
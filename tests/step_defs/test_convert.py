@@ -0,0 +1,391 @@
+"""Avro file conversion feature tests."""
+import csv
+import io
+import os
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import pytest
+
+from fastavro import reader
+from pytest_bdd import (
+    given,
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from historical.arrow import arrow_schema
+from historical.avro import AvroWriter
+from historical.convert import (
+    CSV_COMPRESSION,
+    avro_to_csv,
+    avro_to_feather,
+    avro_to_parquet,
+    avro_to_parquet_dataset,
+    read_avro_batches
+)
+from historical.observation import Observation
+from historical.query import ObservationQuery
+
+
+def observation_records(record_count: int) -> list:
+    """
+    Generate observation records.
+
+    Parameters
+    ----------
+    record_count : int
+        The number of records to generate.
+
+    Returns
+    -------
+    list of dict
+        The records.
+    """
+    lines = ['8.6 3.9 2 80.6 55.6#', '--- --- --- 74.7 ---', '15.4 8.6 0* 44.4 236.8* Provisional', '11.8 4.1 1 35.8']
+    records = []
+
+    for index in range(record_count):
+        observation = Observation(f'{1900 + index // 12} {index % 12 + 1} {lines[index % len(lines)]}')
+        observation.station_name(f'Station {index // 1000}')
+        records.append(observation.to_dict())
+
+    return records
+
+
+@scenario('../features/convert.feature', 'Streaming Avro To Parquet Conversion')
+def test_streaming_avro_to_parquet_conversion():
+    """Streaming Avro To Parquet Conversion."""
+
+
+@scenario('../features/convert.feature', 'Compact Parquet Schema')
+def test_compact_parquet_schema():
+    """Compact Parquet Schema."""
+
+
+@scenario('../features/convert.feature', 'Partitioned Parquet Dataset')
+def test_partitioned_parquet_dataset():
+    """Partitioned Parquet Dataset."""
+
+
+@scenario('../features/convert.feature', 'Partitioned Parquet Dataset With Appended Observations')
+def test_partitioned_parquet_dataset_with_appended_observations():
+    """Partitioned Parquet Dataset With Appended Observations."""
+
+
+@scenario('../features/convert.feature', 'Vectorized CSV Export')
+def test_vectorized_csv_export():
+    """Vectorized CSV Export."""
+
+
+@scenario('../features/convert.feature', 'Vectorized CSV Export Of Awkward Values')
+def test_vectorized_csv_export_of_awkward_values():
+    """Vectorized CSV Export Of Awkward Values."""
+
+
+@scenario('../features/convert.feature', 'Arrow IPC (Feather) Export')
+def test_arrow_ipc_feather_export():
+    """Arrow IPC (Feather) Export."""
+
+
+@scenario('../features/convert.feature', 'Parallel Avro Decoding')
+def test_parallel_avro_decoding():
+    """Parallel Avro Decoding."""
+
+
+@scenario('../features/convert.feature', 'Parallel Avro Decoding Conversion')
+def test_parallel_avro_decoding_conversion():
+    """Parallel Avro Decoding Conversion."""
+
+
+@given(parsers.parse('an Avro file with {record_count:d} observations'), target_fixture='avro_file_name')
+def avro_file(record_count, tmp_path):
+    """an Avro file with <record_count> observations."""
+    avro_file_name = str(tmp_path / 'observations.avro')
+
+    with AvroWriter(avro_file_name) as avro_writer:
+        avro_writer.write_many(observation_records(record_count))
+
+    return avro_file_name
+
+
+@given(
+    parsers.parse('an Avro file with {record_count:d} observations in blocks of {block_size:d}'),
+    target_fixture='avro_file_name'
+)
+def avro_file_in_blocks(record_count, block_size, tmp_path):
+    """an Avro file with <record_count> observations in blocks of <block_size>."""
+    avro_file_name = str(tmp_path / 'observations.avro')
+
+    with AvroWriter(avro_file_name, block_size=block_size) as avro_writer:
+        avro_writer.write_many(observation_records(record_count))
+
+    return avro_file_name
+
+
+@given('an Avro file with awkward values', target_fixture='avro_file_name')
+def avro_file_with_awkward_values(tmp_path):
+    """an Avro file with awkward values."""
+    avro_file_name = str(tmp_path / 'observations.avro')
+    records = observation_records(8)
+    awkward_values = [0.0, -0.0, 1e-05, 1.5e16, 12345678901.0, 0.1 + 0.2, float('inf'), float('nan')]
+
+    for record, value in zip(records, awkward_values):
+        record['tmax'] = value
+
+    records[1]['station'] = 'Ross-on-Wye, "Upper"'
+    records[2]['station'] = 'Line\nBreak'
+
+    with AvroWriter(avro_file_name) as avro_writer:
+        avro_writer.write_many(records)
+
+    return avro_file_name
+
+
+@given('the observations are appended to the Avro file again')
+def observations_are_appended(avro_file_name):
+    """the observations are appended to the Avro file again."""
+    with open(avro_file_name, 'rb') as stream:
+        records = list(reader(stream))
+
+    with AvroWriter(avro_file_name, append=True) as avro_writer:
+        avro_writer.write_many(records)
+
+
+@when('the Avro file is converted to a partitioned dataset', target_fixture='dataset_directory')
+def avro_file_is_converted_to_dataset(avro_file_name):
+    """the Avro file is converted to a partitioned dataset."""
+    dataset_directory = avro_file_name.replace('.avro', '.parquet')
+    avro_to_parquet_dataset(avro_file_name, dataset_directory)
+    return dataset_directory
+
+
+@when(
+    parsers.parse(
+        'the Avro file is converted with {compression} compression and a row group size of {row_group_size:d}'
+    ),
+    target_fixture='parquet_file_name'
+)
+def avro_file_is_converted(compression, row_group_size, avro_file_name):
+    """the Avro file is converted with <compression> compression and a row group size of <row_group_size>."""
+    parquet_file_name = avro_file_name.replace('.avro', '.parquet')
+    avro_to_parquet(avro_file_name, parquet_file_name, row_group_size, compression)
+    return parquet_file_name
+
+
+@when(parsers.parse('the Avro file is converted with float32 {float32}'), target_fixture='parquet_file_name')
+def avro_file_is_converted_with_float32(float32, avro_file_name):
+    """the Avro file is converted with float32 <float32>."""
+    parquet_file_name = avro_file_name.replace('.avro', '.parquet')
+    avro_to_parquet(avro_file_name, parquet_file_name, float32=float32 == 'True')
+    return parquet_file_name
+
+
+@when(parsers.parse('the Avro file is exported to CSV with {compression} compression'), target_fixture='csv_file_name')
+def avro_file_is_exported_to_csv(compression, avro_file_name):
+    """the Avro file is exported to CSV with <compression> compression."""
+    csv_file_name = avro_file_name.replace('.avro', CSV_COMPRESSION[compression])
+    avro_to_csv(avro_file_name, csv_file_name, batch_size=1000, compression=compression)
+    return csv_file_name
+
+
+@when(
+    parsers.parse('the Avro file is exported to Feather with {compression} compression'),
+    target_fixture='feather_file_name'
+)
+def avro_file_is_exported_to_feather(compression, avro_file_name):
+    """the Avro file is exported to Feather with <compression> compression."""
+    feather_file_name = avro_file_name.replace('.avro', '.arrow')
+    avro_to_feather(avro_file_name, feather_file_name, batch_size=1000, compression=compression)
+
+    with pytest.raises(ValueError):
+        avro_to_feather(avro_file_name, feather_file_name, compression='snappy')
+
+    return feather_file_name
+
+
+@when(
+    parsers.parse('the Avro file is read in batches of {batch_size:d} with {workers:d} workers'),
+    target_fixture='batches'
+)
+def avro_file_is_read_in_parallel(batch_size, workers, avro_file_name):
+    """the Avro file is read in batches of <batch_size> with <workers> workers."""
+    return (batch_size, list(read_avro_batches(avro_file_name, batch_size, workers=workers)))
+
+
+@when(
+    parsers.parse('the Avro file is converted to Parquet, CSV and Feather with {workers:d} workers'),
+    target_fixture='output_file_names'
+)
+def avro_file_is_converted_in_parallel(workers, avro_file_name):
+    """the Avro file is converted to Parquet, CSV and Feather with <workers> workers."""
+    output_file_names = {}
+
+    for name, process_count in [('parallel', workers), ('serial', 1)]:
+        parquet_file_name = avro_file_name.replace('.avro', f'-{name}.parquet')
+        csv_file_name = avro_file_name.replace('.avro', f'-{name}.csv')
+        feather_file_name = avro_file_name.replace('.avro', f'-{name}.arrow')
+        avro_to_parquet(avro_file_name, parquet_file_name, 1000, workers=process_count)
+        avro_to_csv(avro_file_name, csv_file_name, 1000, workers=process_count)
+        avro_to_feather(avro_file_name, feather_file_name, 1000, workers=process_count)
+        output_file_names[name] = (parquet_file_name, csv_file_name, feather_file_name)
+
+    return output_file_names
+
+
+@then('the batches are the same as those read by one process')
+def batches_are_same_as_serial(batches, avro_file_name):
+    """the batches are the same as those read by one process."""
+    batch_size, parallel_batches = batches
+    serial_batches = list(read_avro_batches(avro_file_name, batch_size))
+    assert len(parallel_batches) == len(serial_batches)
+
+    for parallel_batch, serial_batch in zip(parallel_batches, serial_batches):
+        assert parallel_batch.equals(serial_batch)
+
+
+@then('the outputs are the same as those converted by one process')
+def outputs_are_same_as_serial(output_file_names):
+    """the outputs are the same as those converted by one process."""
+    parallel_parquet, parallel_csv, parallel_feather = output_file_names['parallel']
+    serial_parquet, serial_csv, serial_feather = output_file_names['serial']
+    assert pq.read_table(parallel_parquet).equals(pq.read_table(serial_parquet))
+    assert pq.ParquetFile(parallel_parquet).num_row_groups == pq.ParquetFile(serial_parquet).num_row_groups
+
+    with open(parallel_csv, 'rb') as parallel_stream, open(serial_csv, 'rb') as serial_stream:
+        assert parallel_stream.read() == serial_stream.read()
+
+    with open(parallel_feather, 'rb') as parallel_stream, open(serial_feather, 'rb') as serial_stream:
+        assert parallel_stream.read() == serial_stream.read()
+
+
+@then('the CSV file is the same as one written by csv.DictWriter')
+def csv_file_is_same_as_dict_writer(avro_file_name, csv_file_name):
+    """the CSV file is the same as one written by csv.DictWriter."""
+    expected = io.StringIO()
+
+    with open(avro_file_name, 'rb') as stream:
+        avro_reader = reader(stream)
+        fieldnames = [field['name'] for field in avro_reader.writer_schema['fields']]
+        csv_writer = csv.DictWriter(expected, fieldnames=fieldnames)
+        csv_writer.writeheader()
+        csv_writer.writerows(avro_reader)
+
+    with pa.input_stream(csv_file_name, compression='detect') as stream:
+        assert stream.read().decode('utf-8') == expected.getvalue()
+
+
+@then('the Parquet file contains the observations')
+def parquet_file_contains_observations(avro_file_name, parquet_file_name):
+    """the Parquet file contains the observations."""
+    records = pq.read_table(parquet_file_name).to_pylist()
+    assert records == observation_records(len(records))
+
+
+@then(
+    parsers.parse(
+        'the Parquet file has a dictionary encoded station column and {measurement_type} measurements'
+    )
+)
+def parquet_file_compact_schema(measurement_type, parquet_file_name):
+    """the Parquet file has a dictionary encoded station column and <measurement_type> measurements."""
+    schema = pq.read_schema(parquet_file_name)
+    assert schema.field('station').type == pa.dictionary(pa.int32(), pa.string())
+    assert schema.field('year').type == pa.int16()
+    assert schema.field('month').type == pa.int8()
+    assert str(schema.field('tmax').type) == measurement_type
+    assert not schema.field('station').nullable
+    assert schema.field('tmax').nullable
+
+
+@then('the Parquet file is read into less memory than the standard schema')
+def parquet_file_less_memory(parquet_file_name):
+    """the Parquet file is read into less memory than the standard schema."""
+    table = pq.read_table(parquet_file_name)
+    assert table.nbytes < 0.75 * table.cast(arrow_schema()).nbytes
+
+
+@then('the Parquet file contains the observations to 1 decimal place')
+def parquet_file_contains_rounded_observations(parquet_file_name):
+    """the Parquet file contains the observations to 1 decimal place."""
+    records = pq.read_table(parquet_file_name).to_pylist()
+
+    for record in records:
+        for name in ('tmax', 'tmin', 'rain', 'sun'):
+            if record[name] is not None:
+                record[name] = round(record[name], 1)
+
+    assert records == observation_records(len(records))
+
+
+@then(parsers.parse('querying {station} returns its observations with the standard schema'))
+def query_returns_observations(station, parquet_file_name):
+    """querying <station> returns its observations with the standard schema."""
+    table = ObservationQuery(parquet_file_name).query(station)
+    assert table.schema.equals(arrow_schema())
+    records = pq.read_table(parquet_file_name).num_rows
+    assert table.to_pylist() == [record for record in observation_records(records) if record['station'] == station]
+
+
+@then(parsers.parse('the Parquet file has {row_group_count:d} row groups'))
+def parquet_file_row_groups(row_group_count, parquet_file_name):
+    """the Parquet file has <row_group_count> row groups."""
+    assert pq.ParquetFile(parquet_file_name).num_row_groups == row_group_count
+
+
+@then(parsers.parse('the dataset has {partition_count:d} station partitions'))
+def dataset_partitions(partition_count, dataset_directory):
+    """the dataset has <partition_count> station partitions."""
+    assert sorted(os.listdir(dataset_directory)) == [f'station=Station%20{index}' for index in range(partition_count)]
+
+
+@then(parsers.parse('the dataset has {file_count:d} files for {station}'))
+def dataset_station_files(file_count, station, dataset_directory):
+    """the dataset has <file_count> files for <station>."""
+    partition = os.path.join(dataset_directory, f'station={station.replace(" ", "%20")}')
+    assert len(os.listdir(partition)) == file_count
+
+
+@then(parsers.parse('the file for {station} has {row_group_count:d} row groups'))
+def dataset_station_row_groups(station, row_group_count, dataset_directory):
+    """the file for <station> has <row_group_count> row groups."""
+    file_name = os.path.join(dataset_directory, f'station={station.replace(" ", "%20")}', 'part-0.parquet')
+    assert pq.ParquetFile(file_name).num_row_groups == row_group_count
+
+
+@then(parsers.parse('reading {station} from {start:d} to {end:d} returns {record_count:d} sorted observations'))
+def dataset_filtered_read(station, start, end, record_count, dataset_directory):
+    """reading <station> from <start> to <end> returns <record_count> sorted observations."""
+    dataset = ds.dataset(dataset_directory, format='parquet', partitioning='hive')
+    expression = (ds.field('station') == station) & (ds.field('year') >= start) & (ds.field('year') <= end)
+    records = dataset.to_table(filter=expression).to_pylist()
+    assert len(records) == record_count
+    assert {record['station'] for record in records} == {station}
+    assert [(record['year'], record['month']) for record in records] == [
+        (year, month) for year in range(start, end + 1) for month in range(1, 13)
+    ]
+
+
+@then(parsers.parse('the Feather file contains the observations in {batch_count:d} record batches'))
+def feather_file_contains_observations(batch_count, feather_file_name):
+    """the Feather file contains the observations in <batch_count> record batches."""
+    records = feather.read_table(feather_file_name).to_pylist()
+    assert records == observation_records(len(records))
+
+    with pa.ipc.open_file(feather_file_name) as feather_reader:
+        assert feather_reader.num_record_batches == batch_count
+
+
+@then(parsers.parse('the memory mapped Feather file is read without copying is {zero_copy}'))
+def feather_file_zero_copy(zero_copy, feather_file_name):
+    """the memory mapped Feather file is read without copying is <zero_copy>."""
+    allocated = pa.total_allocated_bytes()
+
+    with pa.memory_map(feather_file_name) as source:
+        table = pa.ipc.open_file(source).read_all()
+        assert table.schema.names[:3] == ['station', 'year', 'month']
+        assert (pa.total_allocated_bytes() == allocated) == (zero_copy == 'True')
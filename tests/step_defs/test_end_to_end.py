@@ -0,0 +1,166 @@
+"""End to end load test feature tests."""
+import os
+
+import pyarrow.dataset as ds
+
+from pytest_bdd import (
+    given,
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from benchmarks.end_to_end import benchmark, run_workflow
+from benchmarks.fake_met_office import FakeMetOffice
+from historical.batch import parse_observation_batch
+from historical.query import latest_parquet
+from historical.transport import HTTPTransport
+
+
+@scenario('../features/end_to_end.feature', 'Simulated Met Office Site')
+def test_simulated_met_office_site():
+    """Simulated Met Office Site."""
+
+
+@scenario('../features/end_to_end.feature', 'Simulated Latency')
+def test_simulated_latency():
+    """Simulated Latency."""
+
+
+@scenario('../features/end_to_end.feature', 'Workflow Against The Simulated Site')
+def test_workflow_against_the_simulated_site():
+    """Workflow Against The Simulated Site."""
+
+
+@scenario('../features/end_to_end.feature', 'Concurrent Downloads Of The Workflow')
+def test_concurrent_downloads_of_the_workflow():
+    """Concurrent Downloads Of The Workflow."""
+
+
+@scenario('../features/end_to_end.feature', 'Switching The Parquet Output Between A File And A Dataset')
+def test_switching_the_parquet_output_between_a_file_and_a_dataset():
+    """Switching The Parquet Output Between A File And A Dataset."""
+
+
+@scenario('../features/end_to_end.feature', 'Switching Between Full And Incremental Runs Of The Same Sources')
+def test_switching_between_full_and_incremental_runs_of_the_same_sources():
+    """Switching Between Full And Incremental Runs Of The Same Sources."""
+
+
+@given(
+    parsers.parse('a simulated Met Office site of {months:d} months failing every {failure_every:d} requests'),
+    target_fixture='site'
+)
+def simulated_site(months, failure_every):
+    """a simulated Met Office site of <months> months failing every <failure_every> requests."""
+    with FakeMetOffice(months, failure_every=failure_every) as site:
+        yield site
+
+
+@given(
+    parsers.parse('a simulated Met Office site with a latency of {latency:f} and a jitter of {jitter:f}'),
+    target_fixture='site'
+)
+def simulated_site_with_latency(latency, jitter):
+    """a simulated Met Office site with a latency of <latency> and a jitter of <jitter>."""
+    return FakeMetOffice(latency=latency, jitter=jitter)
+
+
+@when(parsers.parse('Station {index:d} is downloaded from the site'), target_fixture='response')
+def station_is_downloaded(index, site):
+    """Station <index> is downloaded from the site."""
+    return HTTPTransport(retries=2, backoff_factor=0).get(site.station_url(index))
+
+
+@when(parsers.parse('the workflow is run against a simulated site of {station_count:d} stations'), target_fixture='run')
+def workflow_is_run(station_count):
+    """the workflow is run against a simulated site of <station_count> stations."""
+    return benchmark([station_count], 700, 0.0, 0.0, 0, ['-v'])['results'][0]
+
+
+@when(
+    parsers.parse('the workflow is run with {workers:d} workers against {station_count:d} slow stations'),
+    target_fixture='run'
+)
+def workflow_is_run_with_workers(workers, station_count):
+    """the workflow is run with <workers> workers against <station_count> slow stations."""
+    return benchmark([station_count], 700, 0.5, 0.0, 0, ['-v', '-w', str(workers)])['results'][0]
+
+
+@when(parsers.parse('the workflow is run against {station_count:d} stations of the site with the options {options}'))
+def workflow_is_run_with_options(station_count, options, site, tmp_path):
+    """the workflow is run against <station_count> stations of the site with the options <options>."""
+    with open(tmp_path / 'stations.yml', 'w') as stream:
+        stream.write(site.stations_yaml(station_count))
+
+    assert run_workflow(str(tmp_path), options.split())[0] == 0
+
+
+@then(parsers.parse('the station has {row_count:d} observations'))
+def station_observations(row_count, response):
+    """the station has <row_count> observations."""
+    if response.status_code == 200:
+        assert parse_observation_batch(response.text, 'Station 1').num_rows == row_count
+    else:
+        assert response.status_code == 503
+
+
+@then(parsers.parse('the site served {requests:d} requests with {failures:d} failures'))
+def site_requests(requests, failures, site):
+    """the site served <requests> requests with <failures> failures."""
+    assert site.stats['requests'] == requests
+    assert site.stats['failures'] == failures
+    assert (site.stats['bytes_sent'] > 0) == (requests > failures)
+
+
+@then(parsers.parse('each response is delayed by between {low:f} and {high:f} seconds'))
+def response_delay(low, high, site):
+    """each response is delayed by between <low> and <high> seconds."""
+    delays = []
+
+    for _ in range(20):
+        delays.append(site.delay())
+        site.count()
+
+    assert all(low <= delay <= high for delay in delays)
+    assert len(set(delays)) > 1
+    site.server.server_close()
+
+
+@then('the workflow succeeded')
+def workflow_succeeded(run):
+    """the workflow succeeded."""
+    assert run['returncode'] == 0
+
+
+@then(parsers.parse('the site served {requests:d} requests'))
+def site_served(requests, run):
+    """the site served <requests> requests."""
+    assert run['requests'] == requests
+    assert run['bytes_transferred'] > 0
+
+
+@then('the run reports its wall time, peak RSS and outputs')
+def run_reported(run):
+    """the run reports its wall time, peak RSS and outputs."""
+    assert run['wall_seconds'] > 0
+    assert run['peak_rss_bytes'] > 0
+    assert {'avro', 'parquet', 'csv'} <= set(run['output_bytes'])
+    assert all(size > 0 for size in run['output_bytes'].values())
+    assert run['stage_seconds']['parse'] > 0
+
+
+@then('the site served more than 1 request at the same time')
+def site_served_concurrently(run):
+    """the site served more than 1 request at the same time."""
+    assert run['max_concurrent_requests'] > 1
+
+
+@then(parsers.parse('the Parquet output is a {kind} of {row_count:d} observations'))
+def parquet_output(kind, row_count, tmp_path):
+    """the Parquet output is a <kind> of <row_count> observations."""
+    # A full and an incremental run of the same sources write Parquet outputs of different names.
+    parquet_path = latest_parquet(os.path.join(tmp_path, 'out'))
+    assert os.path.isdir(parquet_path) == (kind == 'dataset')
+    assert ds.dataset(parquet_path, partitioning='hive').count_rows() == row_count
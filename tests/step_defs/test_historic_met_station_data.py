@@ -59,6 +59,7 @@ def line_is_parsed(observation):
     observation.station_name('Fulchester')
     assert not args.__dict__['verbose']
     assert str(observation)
+    assert observation.to_json()
     assert observation.to_dict()
 
 
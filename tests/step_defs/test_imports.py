@@ -0,0 +1,35 @@
+"""Import time feature tests."""
+from pytest_bdd import (
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from benchmarks.import_time import check_entry_point
+
+
+@scenario('../features/imports.feature', 'Entry Points Import Within Their Budget')
+def test_entry_points_import_within_their_budget():
+    """Entry Points Import Within Their Budget."""
+
+
+@when(
+    parsers.parse('the imports of the {entry_point} entry point are measured with python -X importtime'),
+    target_fixture='result'
+)
+def imports_are_measured(entry_point):
+    """the imports of the <entry_point> entry point are measured with python -X importtime."""
+    return check_entry_point(entry_point)
+
+
+@then('the entry point does not import any other heavy modules')
+def entry_point_heavy_modules(result):
+    """the entry point does not import any other heavy modules."""
+    assert result['unexpected_modules'] == []
+
+
+@then('the entry point is within its budget')
+def entry_point_within_budget(result):
+    """the entry point is within its budget."""
+    assert result['seconds'] <= result['budget'], result
@@ -0,0 +1,181 @@
+"""Source content hash and output manifest feature tests."""
+import json
+import os
+
+import pytest
+
+from pytest_bdd import (
+    given,
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from historical.manifest import read_manifest, reusable_cache_key, snapshot_sources, write_manifest
+
+STATION_TEXT = """Fulchester
+   yyyy  mm   tmax    tmin      af    rain     sun
+   1957   1    8.6     3.9       2    80.6    55.6
+"""
+CONTENT_HASH = '0' * 64
+CACHE_KEY = f'{CONTENT_HASH}-1'
+OPTIONS = {'codec': 'null', 'incremental': False, 'partitioned': False}
+
+
+@scenario('../features/manifest.feature', 'Unchanged Sources Have The Same Content Hash')
+def test_unchanged_sources_have_the_same_content_hash():
+    """Unchanged Sources Have The Same Content Hash."""
+
+
+@scenario('../features/manifest.feature', 'Changed Sources Have A New Content Hash')
+def test_changed_sources_have_a_new_content_hash():
+    """Changed Sources Have A New Content Hash."""
+
+
+@scenario('../features/manifest.feature', 'Outputs Are Reused While Their Manifest Verifies')
+def test_outputs_are_reused_while_their_manifest_verifies():
+    """Outputs Are Reused While Their Manifest Verifies."""
+
+
+@pytest.fixture
+def snapshots():
+    """The content hash and snapshot file name of each snapshot of the sources."""
+    return []
+
+
+@pytest.fixture
+def options():
+    """The options of the run reusing the outputs."""
+    return dict(OPTIONS)
+
+
+@given(parsers.parse('a station server with {file_count:d} station files'), target_fixture='stations')
+def station_files(file_count, station_server):
+    """a station server with <file_count> station files."""
+    stations = []
+
+    for index in range(file_count):
+        station_server.files[f'/station{index}data.txt'] = STATION_TEXT.encode('utf-8')
+        stations.append({'name': f'Station {index}', 'url': station_server.url(f'/station{index}data.txt')})
+
+    return stations
+
+
+@given('outputs written with a manifest', target_fixture='outputs')
+def outputs_written(tmp_path):
+    """outputs written with a manifest."""
+    outputs = {'csv': str(tmp_path / 'observations.csv'), 'climatology': str(tmp_path / 'climatology')}
+    os.makedirs(outputs['climatology'])
+
+    for file_name in (outputs['csv'], os.path.join(outputs['climatology'], 'annual.parquet')):
+        with open(file_name, 'w') as stream:
+            stream.write(STATION_TEXT)
+
+    manifest = write_manifest(str(tmp_path / 'manifest.json'), CONTENT_HASH, CACHE_KEY, outputs, OPTIONS)
+    assert manifest['outputs']['csv']['files'][''] == {
+        'bytes': len(STATION_TEXT),
+        'sha256': manifest['outputs']['climatology']['files']['annual.parquet']['sha256']
+    }
+    assert read_manifest(str(tmp_path / 'manifest.json')) == manifest
+    return outputs
+
+
+@when(parsers.parse('the sources are snapshotted with {max_workers:d} workers'))
+def sources_snapshotted(max_workers, stations, tmp_path, snapshots):
+    """the sources are snapshotted with <max_workers> workers."""
+    snapshots.append(snapshot_sources(stations, str(tmp_path / 'sources'), max_workers=max_workers))
+
+
+@when(parsers.parse('station file {index:d} changes'))
+def station_file_changes(index, station_server):
+    """station file <index> changes."""
+    station_server.files[f'/station{index}data.txt'] = STATION_TEXT.replace('1957', '1958').encode('utf-8')
+
+
+@when('nothing changes', target_fixture='content_hash')
+def nothing_changes():
+    """nothing changes."""
+    return CONTENT_HASH
+
+
+@when('the CSV file changes', target_fixture='content_hash')
+def csv_file_changes(outputs):
+    """the CSV file changes."""
+    with open(outputs['csv'], 'a') as stream:
+        stream.write('\n')
+
+    return CONTENT_HASH
+
+
+@when('a climatology file is removed', target_fixture='content_hash')
+def climatology_file_removed(outputs):
+    """a climatology file is removed."""
+    os.remove(os.path.join(outputs['climatology'], 'annual.parquet'))
+    return CONTENT_HASH
+
+
+@when('the sources change', target_fixture='content_hash')
+def sources_change():
+    """the sources change."""
+    return '1' * 64
+
+
+@when('the manifest is removed', target_fixture='content_hash')
+def manifest_removed(tmp_path):
+    """the manifest is removed."""
+    os.remove(str(tmp_path / 'manifest.json'))
+    return CONTENT_HASH
+
+
+@when('the run options change', target_fixture='content_hash')
+def run_options_change(options):
+    """the run options change."""
+    options['incremental'] = True
+    return CONTENT_HASH
+
+
+@then('the content hashes are the same')
+def content_hashes_are_the_same(snapshots):
+    """the content hashes are the same."""
+    assert snapshots[0] == snapshots[1]
+
+
+@then('the content hashes are different')
+def content_hashes_are_different(snapshots):
+    """the content hashes are different."""
+    assert snapshots[0][0] != snapshots[1][0]
+
+
+@then(parsers.parse('the snapshot lists {count:d} sources in the order of the stations'))
+def snapshot_lists_sources(count, stations, snapshots):
+    """the snapshot lists <count> sources in the order of the stations."""
+    with open(snapshots[-1][1]) as stream:
+        snapshot = json.load(stream)
+
+    assert [station['name'] for station in snapshot] == [station['name'] for station in stations]
+    assert len(snapshot) == count
+
+    for station in snapshot:
+        with open(station['source_file_name']) as stream:
+            assert stream.read() == STATION_TEXT
+
+
+@then('the snapshot directory only holds the latest snapshot')
+def snapshot_directory_holds_latest(tmp_path, snapshots):
+    """the snapshot directory only holds the latest snapshot."""
+    with open(snapshots[-1][1]) as stream:
+        snapshot = json.load(stream)
+
+    expected = {os.path.basename(snapshots[-1][1])} | {
+        os.path.basename(station['source_file_name']) for station in snapshot
+    }
+    assert set(os.listdir(str(tmp_path / 'sources'))) == expected
+    assert len(expected) == 3
+
+
+@then(parsers.parse('the cache key is {reused}'))
+def cache_key_is(reused, content_hash, options, tmp_path):
+    """the cache key is <reused>."""
+    cache_key = reusable_cache_key(str(tmp_path / 'manifest.json'), content_hash, options)
+    assert cache_key == (CACHE_KEY if reused == 'reused' else None)
@@ -0,0 +1,178 @@
+"""Run metrics feature tests."""
+import os
+import tracemalloc
+
+import pytest
+
+from pytest_bdd import (
+    given,
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from historical.metrics import PROFILE_VARIABLE, TRACE_MEMORY_VARIABLE, Metrics, merge_metrics, profiled
+from historical.station import Station
+
+STATION_HEADER = """Fulchester
+Location: 224100E 252100N, Lat 52.139 Lon -4.570, 133 metres amsl
+   yyyy  mm   tmax    tmin      af    rain     sun
+              degC    degC    days      mm   hours
+"""
+
+
+@scenario('../features/metrics.feature', 'Station Stage Metrics')
+def test_station_stage_metrics():
+    """Station Stage Metrics."""
+
+
+@scenario('../features/metrics.feature', 'Merging Metrics Files')
+def test_merging_metrics_files():
+    """Merging Metrics Files."""
+
+
+@scenario('../features/metrics.feature', 'Tracing Memory')
+def test_tracing_memory():
+    """Tracing Memory."""
+
+
+@scenario('../features/metrics.feature', 'Profiling')
+def test_profiling():
+    """Profiling."""
+
+
+@scenario('../features/metrics.feature', 'Unsupported Profiler')
+def test_unsupported_profiler():
+    """Unsupported Profiler."""
+
+
+@pytest.fixture
+def stop_tracing():
+    """Stop tracing memory at the end of a test, so later tests are not slowed down."""
+    yield
+    tracemalloc.stop()
+
+
+@given(parsers.parse('a station file with {line_count:d} observations'), target_fixture='station_file_name')
+def station_file(line_count, tmp_path):
+    """a station file with <line_count> observations."""
+    path = tmp_path / 'fulchesterdata.txt'
+    lines = [STATION_HEADER]
+
+    for index in range(line_count):
+        lines.append(f'   {1950 + index // 12}  {index % 12 + 1:2}   8.6     3.9       2    80.6    55.6\n')
+
+    path.write_text(''.join(lines))
+    return str(path)
+
+
+@given('memory tracing is enabled')
+def memory_tracing_is_enabled(monkeypatch, stop_tracing):
+    """memory tracing is enabled."""
+    monkeypatch.setenv(TRACE_MEMORY_VARIABLE, '1')
+
+
+@given(parsers.parse('the {profiler} profiler is enabled'))
+def profiler_is_enabled(profiler, monkeypatch):
+    """the <profiler> profiler is enabled."""
+    if profiler == 'none':
+        monkeypatch.delenv(PROFILE_VARIABLE, raising=False)
+    else:
+        monkeypatch.setenv(PROFILE_VARIABLE, profiler)
+
+
+@when('the station is fetched as a batch with metrics', target_fixture='metrics')
+def station_is_fetched(station_file_name):
+    """the station is fetched as a batch with metrics."""
+    metrics = Metrics()
+    Station('Fulchester', station_file_name, metrics=metrics).get_observation_batch()
+    return metrics
+
+
+@when(parsers.parse('the metrics are saved to {file_count:d} files and merged'), target_fixture='merged_metrics')
+def metrics_are_merged(file_count, metrics, tmp_path):
+    """the metrics are saved to <file_count> files and merged."""
+    file_names = [str(tmp_path / f'part{index}.metrics.json') for index in range(file_count)]
+
+    for file_name in file_names:
+        metrics.save(file_name)
+
+    merge_metrics(file_names, str(tmp_path / 'merged.metrics.json'))
+    return Metrics.load(str(tmp_path / 'merged.metrics.json'))
+
+
+@when('a stage allocates memory', target_fixture='metrics')
+def stage_allocates_memory():
+    """a stage allocates memory."""
+    metrics = Metrics()
+
+    with metrics.stage('allocate') as stage:
+        stage['records'] = len(bytearray(2000000))
+
+    return metrics
+
+
+@when('a stage is profiled')
+def stage_is_profiled(tmp_path):
+    """a stage is profiled."""
+    with profiled('stage', str(tmp_path)):
+        sum(range(1000))
+
+
+@then('there are download and parse metrics for the station')
+def download_and_parse_metrics(metrics):
+    """there are download and parse metrics for the station."""
+    assert [(stage['stage'], stage['station']) for stage in metrics.stages] == [
+        ('download', 'Fulchester'),
+        ('parse', 'Fulchester')
+    ]
+    assert all(stage['seconds'] >= 0 for stage in metrics.stages)
+
+
+@then('the download metrics have the size of the station file')
+def download_metrics_size(metrics, station_file_name):
+    """the download metrics have the size of the station file."""
+    assert metrics.stages[0]['bytes'] == os.path.getsize(station_file_name)
+
+
+@then(parsers.parse('the parse metrics have {record_count:d} records'))
+def parse_metrics_records(record_count, metrics):
+    """the parse metrics have <record_count> records."""
+    assert metrics.stages[1]['records'] == record_count
+    assert metrics.stages[1]['tracemalloc_peak_bytes'] is None
+
+
+@then(parsers.parse('the merged metrics summarise {record_count:d} parse records'))
+def merged_metrics_summary(record_count, merged_metrics):
+    """the merged metrics summarise <record_count> parse records."""
+    summary = merged_metrics.summary()
+    assert summary['parse']['records'] == record_count
+    assert len(merged_metrics.stages) == 4
+
+
+@then('the metrics files are removed')
+def metrics_files_removed(tmp_path):
+    """the metrics files are removed."""
+    assert sorted(os.listdir(tmp_path)) == ['fulchesterdata.txt', 'merged.metrics.json']
+
+
+@then(parsers.parse('the stage has a peak memory of at least {peak:d} bytes'))
+def stage_peak_memory(peak, metrics):
+    """the stage has a peak memory of at least <peak> bytes."""
+    assert metrics.stages[0]['tracemalloc_peak_bytes'] >= peak
+    assert metrics.summary()['allocate']['tracemalloc_peak_bytes'] >= peak
+
+
+@then(parsers.parse('{file_count:d} profile files are written'))
+def profile_files_written(file_count, tmp_path):
+    """<file_count> profile files are written."""
+    assert len(os.listdir(tmp_path)) == file_count
+
+
+@then('profiling raises a ValueError')
+def profiling_raises(tmp_path):
+    """profiling raises a ValueError."""
+    with pytest.raises(ValueError):
+        with profiled('stage', str(tmp_path)):
+            pass
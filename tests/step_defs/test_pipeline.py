@@ -0,0 +1,148 @@
+"""Single pass output feature tests."""
+import os
+
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from fastavro import reader
+from pytest_bdd import (
+    given,
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from historical.arrow import arrow_schema
+from historical.convert import avro_to_csv, avro_to_feather, avro_to_parquet, avro_to_parquet_dataset
+from historical.pipeline import FanOutWriter
+from historical.station import fetch_stations
+
+STATION_HEADER = """Fulchester
+Location: 224100E 252100N, Lat 52.139 Lon -4.570, 133 metres amsl
+   yyyy  mm   tmax    tmin      af    rain     sun
+              degC    degC    days      mm   hours
+"""
+LINES = [
+    '8.6 3.9 2 80.6 55.6#',
+    '--- --- --- 74.7 ---',
+    '15.4 8.6 0* 44.4 236.8* Provisional',
+    '11.8 4.1 1 35.8',
+    '18.9 11.1 0 36.0* 150.7# $'
+]
+
+
+@scenario('../features/pipeline.feature', 'Single Pass Output Matches Converting The Avro File')
+def test_single_pass_output_matches_converting_the_avro_file():
+    """Single Pass Output Matches Converting The Avro File."""
+
+
+@scenario('../features/pipeline.feature', 'Single Pass Partitioned Output')
+def test_single_pass_partitioned_output():
+    """Single Pass Partitioned Output."""
+
+
+@given(
+    parsers.parse('{station_count:d} station files with {line_count:d} observations each'),
+    target_fixture='stations'
+)
+def station_files(station_count, line_count, tmp_path):
+    """<station_count> station files with <line_count> observations each."""
+    stations = []
+
+    for station_index in range(station_count):
+        path = tmp_path / f'station{station_index}data.txt'
+        lines = [STATION_HEADER]
+
+        for index in range(line_count):
+            line = LINES[(index + station_index) % len(LINES)]
+            lines.append(f'   {1950 + index // 12}  {index % 12 + 1:2}  {line}\n')
+
+        path.write_text(''.join(lines))
+        stations.append({'name': f'Station {station_index}', 'url': str(path)})
+
+    return stations
+
+
+@when(
+    parsers.parse('the stations are written in a single pass with a row group size of {row_group_size:d}'),
+    target_fixture='file_names'
+)
+def stations_are_written(stations, row_group_size, tmp_path):
+    """the stations are written in a single pass with a row group size of <row_group_size>."""
+    file_names = [str(tmp_path / name) for name in ('single.avro', 'single.parquet', 'single.csv')]
+
+    with FanOutWriter(
+        *file_names,
+        row_group_size=row_group_size,
+        feather_file_name=str(tmp_path / 'single.arrow'),
+        feather_compression='zstd'
+    ) as fan_out_writer:
+        for _, batch in fetch_stations(stations, max_workers=2, batches=True):
+            fan_out_writer.write_batch(batch)
+
+    avro_to_parquet(file_names[0], str(tmp_path / 'converted.parquet'), row_group_size)
+    avro_to_csv(file_names[0], str(tmp_path / 'converted.csv'))
+    avro_to_feather(file_names[0], str(tmp_path / 'converted.arrow'))
+    return file_names
+
+
+@when('the stations are written in a single pass to a partitioned dataset', target_fixture='file_names')
+def stations_are_written_partitioned(stations, tmp_path):
+    """the stations are written in a single pass to a partitioned dataset."""
+    file_names = [str(tmp_path / name) for name in ('single.avro', 'single', 'single.csv')]
+
+    with FanOutWriter(*file_names, partitioned=True) as fan_out_writer:
+        for _, batch in fetch_stations(stations, batches=True):
+            fan_out_writer.write_batch(batch)
+
+    avro_to_parquet_dataset(file_names[0], str(tmp_path / 'converted'))
+    return file_names
+
+
+@then('the Parquet file is the same as converting the Avro file')
+def parquet_file_is_same(file_names, tmp_path):
+    """the Parquet file is the same as converting the Avro file."""
+    single = pq.ParquetFile(file_names[1])
+    converted = pq.ParquetFile(str(tmp_path / 'converted.parquet'))
+    # The row groups may hold different dictionaries of the same stations.
+    assert single.schema_arrow.equals(converted.schema_arrow)
+    assert single.read().cast(arrow_schema()).equals(converted.read().cast(arrow_schema()))
+    assert single.num_row_groups == converted.num_row_groups
+
+
+@then('the CSV file is the same as converting the Avro file')
+def csv_file_is_same(file_names, tmp_path):
+    """the CSV file is the same as converting the Avro file."""
+    assert (tmp_path / 'single.csv').read_bytes() == (tmp_path / 'converted.csv').read_bytes()
+
+
+@then('the Feather file is the same as converting the Avro file')
+def feather_file_is_same(tmp_path):
+    """the Feather file is the same as converting the Avro file."""
+    single = feather.read_table(str(tmp_path / 'single.arrow'))
+    assert single.equals(feather.read_table(str(tmp_path / 'converted.arrow')))
+
+
+@then(parsers.parse('the Avro file has {record_count:d} records'))
+def avro_file_records(record_count, file_names):
+    """the Avro file has <record_count> records."""
+    with open(file_names[0], 'rb') as stream:
+        assert len(list(reader(stream))) == record_count
+
+
+@then('the partitioned dataset is the same as converting the Avro file')
+def partitioned_dataset_is_same(file_names, tmp_path):
+    """the partitioned dataset is the same as converting the Avro file."""
+    converted_directory = str(tmp_path / 'converted')
+    assert sorted(os.listdir(file_names[1])) == sorted(os.listdir(converted_directory))
+
+    for partition in os.listdir(converted_directory):
+        for part in os.listdir(os.path.join(converted_directory, partition)):
+            single = pq.ParquetFile(os.path.join(file_names[1], partition, part))
+            converted = pq.ParquetFile(os.path.join(converted_directory, partition, part))
+            assert single.read().equals(converted.read())
+            assert single.num_row_groups == converted.num_row_groups
+
+    assert ds.dataset(file_names[1], partitioning='hive').count_rows() == 720
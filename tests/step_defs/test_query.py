@@ -0,0 +1,199 @@
+"""Querying the Parquet output feature tests."""
+import io
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pytest
+
+from pytest_bdd import (
+    given,
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from historical.arrow import arrow_schema
+from historical.convert import write_station_partition
+from historical.query import ObservationQuery, latest_parquet, parse_month, write_table
+from historical.utils import command_line_interface
+
+
+@scenario('../features/query.feature', 'Querying A Station And Date Range')
+def test_querying_a_station_and_date_range():
+    """Querying A Station And Date Range."""
+
+
+@scenario('../features/query.feature', 'Writing Query Results')
+def test_writing_query_results():
+    """Writing Query Results."""
+
+
+@scenario('../features/query.feature', 'Rejecting Invalid Queries')
+def test_rejecting_invalid_queries():
+    """Rejecting Invalid Queries."""
+
+
+@scenario('../features/query.feature', 'Parsing The Query Command')
+def test_parsing_the_query_command():
+    """Parsing The Query Command."""
+
+
+def observation_table(station_count: int, line_count: int, first_year: int) -> pa.Table:
+    """
+    Generate a table of observations.
+
+    Parameters
+    ----------
+    station_count : int
+        The number of stations.
+    line_count : int
+        The number of monthly observations for each station.
+    first_year : int
+        The year of the first observation.
+
+    Returns
+    -------
+    pyarrow.Table
+        The observations, by station then month.
+    """
+    records = []
+
+    for station_index in range(station_count):
+        for index in range(line_count):
+            records.append({
+                'station': f'Station {station_index}',
+                'year': first_year + index // 12,
+                'month': index % 12 + 1,
+                'tmaxIsEstimated': False,
+                'tminIsEstimated': False,
+                'afIsEstimated': False,
+                'rain': float(index),
+                'rainIsEstimated': False,
+                'sun': None if index % 5 else 1.5,
+                'sunIsEstimated': False,
+                'isProvisional': False
+            })
+
+    return pa.Table.from_pylist(records, arrow_schema())
+
+
+@given(
+    parsers.parse('3 stations with 240 observations each from 1950 written as {layout}'),
+    target_fixture='observations'
+)
+def stations_written(layout, tmp_path):
+    """3 stations with 240 observations each from 1950 written as <layout>."""
+    table = observation_table(3, 240, 1950)
+
+    if layout == 'a partitioned set':
+        path = str(tmp_path / 'historic-station-data.parquet')
+        os.makedirs(path)
+        part_numbers = {}
+
+        for batch in table.to_batches(max_chunksize=240):
+            write_station_partition([batch], path, part_numbers, 'snappy')
+    else:
+        if layout == 'an unsorted file':
+            table = table.take(pa.array(list(range(719, -1, -1))))
+
+        path = str(tmp_path / 'historic-station-data.parquet')
+        pq.write_table(table, path, row_group_size=100)
+
+    assert latest_parquet(str(tmp_path)) == path
+    return {'table': table, 'query': ObservationQuery(path)}
+
+
+@when(
+    parsers.parse('Station {station} is queried from {start} to {end} for the columns {columns}'),
+    target_fixture='result'
+)
+def station_is_queried(station, start, end, columns, observations):
+    """Station <station> is queried from <start> to <end> for the columns <columns>."""
+    start = None if start == 'none' else start
+    end = None if end == 'none' else end
+    columns = None if columns == 'all' else columns.split()
+    result = observations['query'].query(f'Station {station}', start, end, columns)
+    table = observations['table']
+    months = pc.add(pc.multiply(table['year'], 12), pc.subtract(table['month'], 1))
+    mask = pc.equal(table['station'], f'Station {station}')
+
+    if start is not None:
+        mask = pc.and_(mask, pc.greater_equal(months, parse_month(start)))
+
+    if end is not None:
+        mask = pc.and_(mask, pc.less_equal(months, parse_month(end, end=True)))
+
+    return {'table': result, 'expected': table.filter(mask).select(columns or table.column_names)}
+
+
+@when('the query command is parsed', target_fixture='args')
+def query_command_is_parsed():
+    """the query command is parsed."""
+    return command_line_interface(
+        ['-v', 'query', 'Armagh', '--start', '1990', '--end', '2000', '--columns', 'year', 'month', 'rain']
+    )
+
+
+@then(parsers.parse('{row_count:d} observations are returned'))
+def observations_are_returned(row_count, result):
+    """<row_count> observations are returned."""
+    assert result['table'].num_rows == row_count
+
+
+@then('the observations are the same as filtering the whole table')
+def observations_are_same(result):
+    """the observations are the same as filtering the whole table."""
+    assert result['table'].equals(result['expected'])
+
+
+@then(parsers.parse('the CSV output has {line_count:d} lines'))
+def csv_output_lines(line_count, result):
+    """the CSV output has <line_count> lines."""
+    stream = io.BytesIO()
+    write_table(result['table'], stream)
+    lines = stream.getvalue().decode('utf-8').split('\r\n')
+    assert lines[:2] == ['year,month,rain', '1950,11,10.0']
+    assert len(lines) - 1 == line_count
+
+
+@then(parsers.parse('the JSON output has {line_count:d} lines'))
+def json_output_lines(line_count, result):
+    """the JSON output has <line_count> lines."""
+    stream = io.BytesIO()
+    write_table(result['table'], stream, 'json')
+    lines = stream.getvalue().decode('utf-8').splitlines()
+    assert json.loads(lines[-1]) == {'year': 1951, 'month': 2, 'rain': 13.0}
+    assert len(lines) == line_count
+
+    with pytest.raises(ValueError):
+        write_table(result['table'], stream, 'xml')
+
+
+@then('querying an unknown column or date is rejected')
+def invalid_queries_rejected(observations, tmp_path):
+    """querying an unknown column or date is rejected."""
+    with pytest.raises(ValueError):
+        observations['query'].query('Station 0', columns=['snow'])
+
+    for value in ['1990-13', '1990-06-01', 'June']:
+        with pytest.raises(ValueError):
+            observations['query'].query('Station 0', start=value)
+
+    with pytest.raises(FileNotFoundError):
+        latest_parquet(str(tmp_path / 'missing'))
+
+
+@then('the query arguments are set')
+def query_arguments_are_set(args):
+    """the query arguments are set."""
+    assert args.verbose
+    assert args.command == 'query'
+    assert args.station == 'Armagh'
+    assert (args.start, args.end) == ('1990', '2000')
+    assert args.columns == ['year', 'month', 'rain']
+    assert args.format == 'csv'
+    assert args.parquet is None
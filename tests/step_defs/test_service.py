@@ -0,0 +1,261 @@
+"""Read service feature tests."""
+import http.client
+import json
+import os
+import threading
+
+import pyarrow as pa
+import pytest
+
+from pytest_bdd import (
+    given,
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from historical.arrow import arrow_schema
+from historical.convert import write_station_partition
+from historical.service import ObservationService, make_server
+from historical.utils import command_line_interface
+
+
+@scenario('../features/service.feature', 'Serving Station Queries')
+def test_serving_station_queries():
+    """Serving Station Queries."""
+
+
+@scenario('../features/service.feature', 'Caching Responses')
+def test_caching_responses():
+    """Caching Responses."""
+
+
+@scenario('../features/service.feature', 'Reloading A New Output')
+def test_reloading_a_new_output():
+    """Reloading A New Output."""
+
+
+@scenario('../features/service.feature', 'Keeping The Previous Output While A New One Is Written')
+def test_keeping_the_previous_output_while_a_new_one_is_written():
+    """Keeping The Previous Output While A New One Is Written."""
+
+
+@scenario('../features/service.feature', 'Rejecting Bad Requests')
+def test_rejecting_bad_requests():
+    """Rejecting Bad Requests."""
+
+
+@scenario('../features/service.feature', 'Serving Before There Is An Output')
+def test_serving_before_there_is_an_output():
+    """Serving Before There Is An Output."""
+
+
+@scenario('../features/service.feature', 'Parsing The Serve Command')
+def test_parsing_the_serve_command():
+    """Parsing The Serve Command."""
+
+
+def write_output(directory: str, name: str, station_count: int) -> str:
+    """
+    Write a partitioned dataset of 240 monthly observations of each station from 1950.
+
+    Parameters
+    ----------
+    directory : str
+        The output directory.
+    name : str
+        The name of the dataset.
+    station_count : int
+        The number of stations.
+
+    Returns
+    -------
+    str
+        The root directory of the dataset.
+    """
+    path = os.path.join(directory, name)
+    part_numbers = {}
+
+    for station_index in range(station_count):
+        records = [
+            {
+                'station': f'Station {station_index}',
+                'year': 1950 + index // 12,
+                'month': index % 12 + 1,
+                'tmaxIsEstimated': False,
+                'tminIsEstimated': False,
+                'afIsEstimated': False,
+                'rain': float(index),
+                'rainIsEstimated': False,
+                'sunIsEstimated': False,
+                'isProvisional': False
+            }
+            for index in range(240)
+        ]
+        write_station_partition([pa.RecordBatch.from_pylist(records, arrow_schema())], path, part_numbers, 'snappy')
+
+    return path
+
+
+@given('an output of 3 stations with 240 observations each from 1950', target_fixture='output_directory')
+def output_written(tmp_path):
+    """an output of 3 stations with 240 observations each from 1950."""
+    write_output(str(tmp_path), 'historic-station-data-0.parquet', 3)
+    return str(tmp_path)
+
+
+@given('an empty output directory', target_fixture='output_directory')
+def empty_output_directory(tmp_path):
+    """an empty output directory."""
+    return str(tmp_path)
+
+
+@given('the read service is running', target_fixture='service')
+def service_running(output_directory):
+    """the read service is running."""
+    service = ObservationService(output_directory, cache_size=16, reload_interval=0)
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield {'service': service, 'port': server.server_port, 'responses': []}
+    server.shutdown()
+    server.server_close()
+
+
+def get(service: dict, path: str) -> tuple:
+    """
+    Request a path from the read service.
+
+    Parameters
+    ----------
+    service : dict
+        The running service.
+    path : str
+        The path to be requested.
+
+    Returns
+    -------
+    tuple of (int, str, bytes)
+        The status, content type and body of the response.
+    """
+    connection = http.client.HTTPConnection('127.0.0.1', service['port'], timeout=10)
+
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return (response.status, response.getheader('Content-Type'), response.read())
+    finally:
+        connection.close()
+
+
+@when(parsers.parse('Station {station:d} is requested from {start} to {end} as {output_format}'))
+def station_is_requested(station, start, end, output_format, service):
+    """Station <station> is requested from <start> to <end> as <format>."""
+    service['responses'].append(
+        (output_format, get(service, f'/stations/Station%20{station}?start={start}&end={end}&format={output_format}'))
+    )
+
+
+@when(parsers.parse('{path} is requested'))
+def path_is_requested(path, service):
+    """<path> is requested."""
+    service['responses'].append(('json', get(service, path)))
+
+
+@when(parsers.parse('a new output of {station_count:d} stations is written'))
+def new_output_written(station_count, output_directory):
+    """a new output of <station_count> stations is written."""
+    path = write_output(output_directory, 'historic-station-data-1.parquet', station_count)
+    # Make sure the new output is newer, whatever the resolution of the file system's times.
+    os.utime(path, (os.path.getatime(path), os.path.getmtime(path) + 10))
+
+
+@when('a new output is still being written')
+def new_output_being_written(output_directory):
+    """a new output is still being written."""
+    path = os.path.join(output_directory, 'historic-station-data-1.parquet')
+
+    # A Parquet file that has its magic number but not yet its footer.
+    with open(path, 'wb') as stream:
+        stream.write(b'PAR1')
+
+    os.utime(path, (os.path.getatime(path), os.path.getmtime(path) + 10))
+
+
+@then(parsers.parse('the response has status {status:d} and a {content_type} content type'))
+def response_status(status, content_type, service):
+    """the response has status <status> and a <content_type> content type."""
+    _, (response_status, response_content_type, body) = service['responses'][-1]
+    assert response_status == status
+    assert response_content_type == content_type
+
+    if status != 200:
+        assert 'error' in json.loads(body)
+
+
+@then(parsers.parse('the response has {row_count:d} observations'))
+def response_observations(row_count, service):
+    """the response has <row_count> observations."""
+    output_format, (_, _, body) = service['responses'][-1]
+
+    if output_format == 'json':
+        records = json.loads(body)
+        assert len(records) == row_count
+        assert records[0]['station'] == 'Station 1' and records[0]['year'] == 1955
+    elif output_format == 'csv':
+        lines = body.decode('utf-8').split('\r\n')
+        assert lines[0] == ','.join(arrow_schema().names)
+        assert len(lines) - 2 == row_count
+    else:
+        table = pa.ipc.open_stream(body).read_all()
+        assert table.schema.equals(arrow_schema())
+        assert table.num_rows == row_count
+
+
+@then(parsers.parse('the cache has {hits:d} hits and {misses:d} misses'))
+def cache_hits(hits, misses, service):
+    """the cache has <hits> hits and <misses> misses."""
+    stats = json.loads(get(service, '/health')[2])
+    assert (stats['cache_hits'], stats['cache_misses']) == (hits, misses)
+    assert service['responses'][0] == service['responses'][1]
+
+
+@then(parsers.parse('the service lists {station_count:d} stations'))
+def service_stations(station_count, service):
+    """the service lists <station_count> stations."""
+    assert json.loads(get(service, '/stations')[2]) == [f'Station {index}' for index in range(station_count)]
+
+
+@then('the service has indexed 2 outputs and emptied its cache')
+def service_reloaded(service):
+    """the service has indexed 2 outputs and emptied its cache."""
+    stats = service['service'].stats
+    assert stats['reloads'] == 2
+    assert stats['path'].endswith('historic-station-data-1.parquet')
+    assert stats['cache_size'] == 0
+
+
+@then(parsers.parse('the service has indexed {reloads:d} outputs'))
+def service_indexed(reloads, service):
+    """the service has indexed <reloads> outputs."""
+    stats = service['service'].stats
+    assert stats['reloads'] == reloads
+    assert stats['path'].endswith('historic-station-data-0.parquet')
+
+
+@when('the serve command is parsed', target_fixture='args')
+def serve_command_is_parsed():
+    """the serve command is parsed."""
+    return command_line_interface(['-v', 'serve', '--port', '0', '--cache-size', '8', '--reload-interval', '1.5'])
+
+
+@then('the serve arguments are set')
+def serve_arguments_are_set(args):
+    """the serve arguments are set."""
+    assert args.command == 'serve'
+    assert (args.host, args.port, args.cache_size, args.reload_interval) == ('127.0.0.1', 0, 8, 1.5)
+    assert args.parquet is None
+
+    with pytest.raises(ValueError):
+        ObservationService()
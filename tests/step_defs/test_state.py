@@ -0,0 +1,149 @@
+"""Incremental extraction watermarks feature tests."""
+import csv
+import os
+
+import pyarrow.parquet as pq
+
+from pytest_bdd import (
+    given,
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from benchmarks.end_to_end import run_workflow
+from benchmarks.synthetic import station_text
+from historical.observation import Observation
+from historical.state import Watermarks
+
+
+def record(line: str) -> dict:
+    """
+    Parse a line into a record for the Fulchester station.
+
+    Parameters
+    ----------
+    line : str
+        A line of data from the Met Office.
+
+    Returns
+    -------
+    dict
+        The observation as a record.
+    """
+    observation = Observation(line)
+    observation.station_name('Fulchester')
+    return observation.to_dict()
+
+
+@scenario('../features/state.feature', 'Only New Or Revised Observations Are Accepted')
+def test_only_new_or_revised_observations_are_accepted():
+    """Only New Or Revised Observations Are Accepted."""
+
+
+@scenario('../features/state.feature', 'Revised Observations Replace The Rows They Revise')
+def test_revised_observations_replace_the_rows_they_revise():
+    """Revised Observations Replace The Rows They Revise."""
+
+
+@given(parsers.parse('watermarks saved after accepting {line}'), target_fixture='state_file_name')
+def watermarks_saved(line, tmp_path):
+    """watermarks saved after accepting <line>."""
+    state_file_name = str(tmp_path / 'state.json')
+    watermarks = Watermarks(state_file_name)
+    assert watermarks.accept(record(line))
+    watermarks.save()
+    return state_file_name
+
+
+@when('the watermarks are reloaded', target_fixture='watermarks')
+def watermarks_are_reloaded(state_file_name):
+    """the watermarks are reloaded."""
+    return Watermarks(state_file_name)
+
+
+@then(parsers.parse('the observation {new_line} is {accepted}'))
+def observation_is_accepted(new_line, accepted, watermarks):
+    """the observation <new_line> is <accepted>."""
+    assert watermarks.accept(record(new_line)) == (accepted == 'accepted')
+
+
+@given(
+    parsers.parse('a station with {months:d} observations, the last 6 of them provisional'),
+    target_fixture='directory'
+)
+def station_with_provisional_observations(months, station_server, tmp_path):
+    """a station with <months> observations, the last 6 of them provisional."""
+    station_server.files['/fulchesterdata.txt'] = station_text('Fulchester', months).encode('utf-8')
+
+    with open(tmp_path / 'stations.yml', 'w') as stream:
+        stream.write(f'---\nstations:\n  - name: Fulchester\n    url: {station_server.url("/fulchesterdata.txt")}\n')
+
+    return str(tmp_path)
+
+
+@when(parsers.parse('the workflow is run incrementally with the options {options}'))
+def workflow_is_run_incrementally(options, directory):
+    """the workflow is run incrementally with the options <options>."""
+    assert run_workflow(directory, options.split())[0] == 0
+
+
+@when(parsers.parse('the rain of the provisional observation of {year:d} {month:d} is revised to {rain}'))
+def observation_is_revised(year, month, rain, station_server):
+    """the rain of the provisional observation of <year> <month> is revised to <rain>."""
+    lines = station_server.files['/fulchesterdata.txt'].decode('utf-8').splitlines(keepends=True)
+
+    for index, line in enumerate(lines):
+        fields = line.split()
+
+        if fields[:2] == [str(year), str(month)]:
+            assert fields[-1] == 'Provisional'
+            fields[5] = rain
+            lines[index] = f'   {" ".join(fields)}\n'
+
+    station_server.files['/fulchesterdata.txt'] = ''.join(lines).encode('utf-8')
+
+
+def output_rows(directory: str) -> tuple:
+    """
+    Read the rows of the Parquet (file or dataset) and CSV outputs of an incremental run.
+
+    Parameters
+    ----------
+    directory : str
+        The working directory of the workflow.
+
+    Returns
+    -------
+    tuple of (list of dict, list of dict)
+        The rows of the Parquet file and of the CSV file.
+    """
+    base_name = os.path.join(directory, 'out', 'historic-station-data')
+
+    with open(f'{base_name}.csv', newline='') as stream:
+        return (pq.read_table(f'{base_name}.parquet').to_pylist(), list(csv.DictReader(stream)))
+
+
+@then(parsers.parse('the Parquet and CSV outputs have one row for each of the {months:d} months'))
+def one_row_per_month(months, directory):
+    """the Parquet and CSV outputs have one row for each of the <months> months."""
+    for rows in output_rows(directory):
+        keys = [(int(row['year']), int(row['month'])) for row in rows]
+        assert len(keys) == months
+        assert len(set(keys)) == months
+
+
+@then(parsers.parse('the rain of {year:d} {month:d} is {rain:f} in the Parquet and CSV outputs'))
+def revised_rain(year, month, rain, directory):
+    """the rain of <year> <month> is <rain> in the Parquet and CSV outputs."""
+    for rows in output_rows(directory):
+        assert [
+            float(row['rain']) for row in rows if (int(row['year']), int(row['month'])) == (year, month)
+        ] == [rain]
+
+
+@then('no changes are left to be upserted')
+def no_changes_left(directory):
+    """no changes are left to be upserted."""
+    assert not os.path.exists(os.path.join(directory, 'out', 'historic-station-data.changes.avro'))
@@ -0,0 +1,82 @@
+"""Station data fetching feature tests."""
+from pytest_bdd import (
+    given,
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from historical.station import fetch_stations
+
+STATION_HEADER = """Fulchester
+Location: 224100E 252100N, Lat 52.139 Lon -4.570, 133 metres amsl
+Estimated data is marked with a * after the value.
+   yyyy  mm   tmax    tmin      af    rain     sun
+              degC    degC    days      mm   hours
+"""
+
+
+def station_text(line_count: int) -> str:
+    """
+    Generate the text of a station data file.
+
+    Parameters
+    ----------
+    line_count : int
+        The number of observations to generate.
+
+    Returns
+    -------
+    str
+        The contents of a station data file.
+    """
+    lines = [STATION_HEADER]
+
+    for index in range(line_count):
+        year = 1950 + index // 12
+        month = index % 12 + 1
+        lines.append(f'   {year}  {month:2}   8.6     3.9       2    80.6    55.6\n')
+
+    return ''.join(lines)
+
+
+@scenario('../features/station.feature', 'Concurrent Station Fetching')
+def test_concurrent_station_fetching():
+    """Concurrent Station Fetching."""
+
+
+@given(
+    parsers.parse('{station_count:d} station files with {line_count:d} observations each'),
+    target_fixture='stations'
+)
+def station_files(station_count, line_count, tmp_path):
+    """<station_count> station files with <line_count> observations each."""
+    stations = []
+
+    for index in range(station_count):
+        path = tmp_path / f'station{index}data.txt'
+        path.write_text(station_text(line_count))
+        stations.append({'name': f'Station {index}', 'url': str(path)})
+
+    return stations
+
+
+@when(parsers.parse('the stations are fetched with {max_workers:d} workers'), target_fixture='results')
+def stations_are_fetched(stations, max_workers):
+    """the stations are fetched with <max_workers> workers."""
+    return list(fetch_stations(stations, max_workers))
+
+
+@then('the stations are returned in the order given')
+def stations_in_order(stations, results):
+    """the stations are returned in the order given."""
+    assert [station['name'] for station in stations] == [station.name for station, _ in results]
+
+
+@then(parsers.parse('each station has {line_count:d} observations'))
+def station_observation_count(line_count, results):
+    """each station has <line_count> observations."""
+    for _, observations in results:
+        assert len(observations) == line_count
+        assert observations[-1].month == (line_count - 1) % 12 + 1
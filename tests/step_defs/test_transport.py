@@ -0,0 +1,217 @@
+"""Pooled HTTP transport feature tests."""
+import concurrent.futures
+import socket
+
+import pytest
+import requests
+
+from pytest_bdd import (
+    given,
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from historical.station import Station
+from historical.transport import HTTPTransport, default_transport
+
+STATION_TEXT = 'Fulchester\n   yyyy  mm   tmax    tmin      af    rain     sun\n' + ''.join(
+    f'   {year}   1    8.6     3.9       2    80.6    55.6\n' for year in range(1900, 2000)
+)
+
+
+@scenario('../features/transport.feature', 'Connections Are Reused And Responses Compressed')
+def test_connections_are_reused_and_responses_compressed():
+    """Connections Are Reused And Responses Compressed."""
+
+
+@scenario('../features/transport.feature', 'Connections Are Counted Across Threads')
+def test_connections_are_counted_across_threads():
+    """Connections Are Counted Across Threads."""
+
+
+@scenario('../features/transport.feature', 'Connections Closed By The Server Are Counted When Reopened')
+def test_connections_closed_by_the_server_are_counted_when_reopened():
+    """Connections Closed By The Server Are Counted When Reopened."""
+
+
+@scenario('../features/transport.feature', 'Transient Failures Are Retried')
+def test_transient_failures_are_retried():
+    """Transient Failures Are Retried."""
+
+
+@scenario('../features/transport.feature', 'Persistent Failures Raise An Error')
+def test_persistent_failures_raise_an_error():
+    """Persistent Failures Raise An Error."""
+
+
+@scenario('../features/transport.feature', 'Slow Responses Time Out And Are Retried')
+def test_slow_responses_time_out_and_are_retried():
+    """Slow Responses Time Out And Are Retried."""
+
+
+@scenario('../features/transport.feature', 'Stations Share A Transport')
+def test_stations_share_a_transport():
+    """Stations Share A Transport."""
+
+
+@scenario('../features/transport.feature', 'Unreachable Hosts Raise An Error')
+def test_unreachable_hosts_raise_an_error():
+    """Unreachable Hosts Raise An Error."""
+
+
+@given(parsers.parse('a station server with {file_count:d} station files'), target_fixture='urls')
+def station_files(file_count, station_server):
+    """a station server with <file_count> station files."""
+    urls = []
+
+    for index in range(file_count):
+        station_server.files[f'/station{index}data.txt'] = STATION_TEXT.encode('utf-8')
+        urls.append(station_server.url(f'/station{index}data.txt'))
+
+    return urls
+
+
+@given(parsers.parse('an HTTP transport with {retries:d} retries'), target_fixture='transport')
+def http_transport(retries):
+    """an HTTP transport with <retries> retries."""
+    transport = HTTPTransport(retries=retries, backoff_factor=0.01)
+    yield transport
+    transport.close()
+
+
+@given(
+    parsers.parse('an HTTP transport with {retries:d} retries and a read timeout of {read_timeout:g} seconds'),
+    target_fixture='transport'
+)
+def http_transport_with_timeout(retries, read_timeout):
+    """an HTTP transport with <retries> retries and a read timeout of <read_timeout> seconds."""
+    transport = HTTPTransport(read_timeout=read_timeout, retries=retries, backoff_factor=0.01)
+    yield transport
+    transport.close()
+
+
+@given(parsers.parse('the next {count:d} requests of station file {index:d} fail with status {status:d}'))
+def requests_fail(count, index, status, station_server):
+    """the next <count> requests of station file <index> fail with status <status>."""
+    station_server.failures[f'/station{index}data.txt'] = [status] * count
+
+
+@given(parsers.parse('the next {count:d} requests of station file {index:d} are delayed by {delay:g} seconds'))
+def requests_delayed(count, index, delay, station_server):
+    """the next <count> requests of station file <index> are delayed by <delay> seconds."""
+    station_server.delays[f'/station{index}data.txt'] = [delay] * count
+
+
+@given('the server closes each connection after responding')
+def server_closes_connections(station_server):
+    """the server closes each connection after responding."""
+    station_server.close_connections = True
+
+
+@when(parsers.parse('the stations are downloaded {count:d} times'))
+def stations_are_downloaded(count, urls, transport):
+    """the stations are downloaded <count> times."""
+    for _ in range(count):
+        for url in urls:
+            batch = Station('Fulchester', url, transport=transport).get_observation_batch()
+            assert batch.num_rows == 100
+
+
+@when(parsers.parse('the stations are downloaded {count:d} times by {threads:d} threads'))
+def stations_are_downloaded_by_threads(count, threads, urls, transport):
+    """the stations are downloaded <count> times by <threads> threads."""
+    def download(url):
+        return Station('Fulchester', url, transport=transport).get_observation_batch().num_rows
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        assert list(executor.map(download, urls * count)) == [100] * len(urls) * count
+
+
+@when('the stations are downloaded expecting an HTTPError')
+def stations_are_downloaded_expecting_error(urls, transport):
+    """the stations are downloaded expecting an HTTPError."""
+    for url in urls:
+        with pytest.raises(requests.exceptions.HTTPError):
+            Station('Fulchester', url, transport=transport).get_observation_batch()
+
+
+@when('an unreachable station is downloaded')
+def unreachable_station_is_downloaded(transport):
+    """an unreachable station is downloaded."""
+    # Nothing listens on a port that was just released.
+    with socket.socket() as unused_socket:
+        unused_socket.bind(('127.0.0.1', 0))
+        port = unused_socket.getsockname()[1]
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        Station('Fulchester', f'http://127.0.0.1:{port}/station0data.txt', transport=transport).open()
+
+
+@when('the stations are read without a transport', target_fixture='shared_requests')
+def stations_are_read_without_transport(urls):
+    """the stations are read without a transport."""
+    shared_requests = default_transport().stats['requests']
+
+    for url in urls:
+        assert len(list(Station('Fulchester', url).get_observations())) == 100
+
+    return shared_requests
+
+
+@then(parsers.parse('the transport made {count:d} requests over {connections:d} connections'))
+def transport_connections(count, connections, transport):
+    """the transport made <count> requests over <connections> connections."""
+    assert transport.stats['requests'] == count
+    assert transport.stats['connections'] == connections
+    assert transport.stats['connections_reused'] == count - connections
+    assert transport.report()
+
+
+@then(parsers.parse('the transport made {count:d} requests over the connections the server accepted'))
+def transport_server_connections(count, transport, station_server):
+    """the transport made <count> requests over the connections the server accepted."""
+    assert transport.stats['requests'] == count
+    assert transport.stats['connections'] == station_server.connections
+    assert transport.stats['connections_reused'] == count - station_server.connections
+
+
+@then('every request accepted gzip')
+def requests_accepted_gzip(station_server):
+    """every request accepted gzip."""
+    assert station_server.accept_encodings
+    assert all(encoding == 'gzip' for encoding in station_server.accept_encodings)
+
+
+@then('the transport received fewer bytes than it decoded')
+def transport_bytes(transport):
+    """the transport received fewer bytes than it decoded."""
+    assert 0 < transport.stats['bytes_received'] < transport.stats['bytes_decoded']
+    assert transport.stats['bytes_decoded'] == 6 * len(STATION_TEXT)
+
+
+@then(parsers.parse('the transport made {count:d} requests with {retries:d} retries'))
+def transport_retries(count, retries, transport):
+    """the transport made <count> requests with <retries> retries."""
+    assert transport.stats['requests'] == count
+    assert transport.stats['retries'] == retries
+
+
+@then(parsers.parse('the transport counted {errors:d} errors'))
+def transport_errors(errors, transport):
+    """the transport counted <errors> errors."""
+    assert transport.stats['errors'] == errors
+
+
+@then(parsers.parse('the server responded with {failures:d} {status:d} and {ok:d} 200 statuses'))
+def server_statuses(failures, status, ok, station_server):
+    """the server responded with <failures> <status> and <ok> 200 statuses."""
+    assert station_server.statuses.count(status) == failures
+    assert station_server.statuses.count(200) == ok
+
+
+@then(parsers.parse('the shared transport made {count:d} more requests'))
+def shared_transport_requests(count, shared_requests):
+    """the shared transport made <count> more requests."""
+    assert default_transport().stats['requests'] == shared_requests + count
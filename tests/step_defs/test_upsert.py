@@ -0,0 +1,209 @@
+"""Parquet dataset upsert feature tests."""
+import os
+
+import pyarrow as pa
+import pytest
+
+from pytest_bdd import (
+    given,
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from historical.avro import AvroWriter
+from historical.batch import parse_observation_batch
+from historical.convert import avro_to_parquet_dataset
+from historical.query import ObservationQuery
+from historical.state import Watermarks
+from historical.upsert import upsert_avro_changes, upsert_parquet_dataset
+
+STATION_HEADER = """{name}
+   yyyy  mm   tmax    tmin      af    rain     sun
+"""
+STATION_LINES = [
+    '   1957   1    8.6     3.9       2    80.6    55.6',
+    '   1957   2    9.1     2.0       1    60.0    70.0',
+    '   1957   3   10.2     4.1       0    41.0   120.3  Provisional',
+    '   1957   4   12.5     5.0       0    35.5   150.0  Provisional'
+]
+CHANGES = {
+    'nothing changes': lambda lines: lines,
+    'a provisional observation is revised': lambda lines: lines[:2] + [lines[2].replace('41.0', '43.5')] + lines[3:],
+    'a provisional observation is final': lambda lines: lines[:2] + [lines[2].replace('  Provisional', '')] + lines[3:],
+    'a month is added': lambda lines: lines + ['   1957   5   15.0     7.5       0    20.0   200.0  Provisional'],
+    'a final observation is revised': lambda lines: [lines[0].replace('80.6', '81.0')] + lines[1:]
+}
+
+
+@scenario('../features/upsert.feature', 'Only Stations With New Or Revised Observations Are Rewritten')
+def test_only_stations_with_new_or_revised_observations_are_rewritten():
+    """Only Stations With New Or Revised Observations Are Rewritten."""
+
+
+@scenario('../features/upsert.feature', 'Watermarks Are Built For A Dataset Written Without Them')
+def test_watermarks_are_built_for_a_dataset_written_without_them():
+    """Watermarks Are Built For A Dataset Written Without Them."""
+
+
+@scenario('../features/upsert.feature', 'The Last Revision Of A Month Is Kept')
+def test_the_last_revision_of_a_month_is_kept():
+    """The Last Revision Of A Month Is Kept."""
+
+
+@scenario('../features/upsert.feature', 'Only The Changes Of Incremental Runs Are Read')
+def test_only_the_changes_of_incremental_runs_are_read():
+    """Only The Changes Of Incremental Runs Are Read."""
+
+
+def station_batch(index: int, lines: list) -> pa.RecordBatch:
+    """Parse the lines of a station into a batch."""
+    name = f'Station {index}'
+    return parse_observation_batch(STATION_HEADER.format(name=name) + '\n'.join(lines) + '\n', name)
+
+
+def incremental_run(stations: list, directory: str) -> dict:
+    """Append the observations an incremental run accepts to the Avro and changes files, and upsert the changes."""
+    watermarks = Watermarks(os.path.join(directory, 'observations.state.json'))
+    accepted = [
+        record
+        for index, lines in enumerate(stations)
+        for record in station_batch(index, lines).to_pylist()
+        if watermarks.accept(record)
+    ]
+
+    for file_name in ('observations.avro', 'observations.changes.avro'):
+        with AvroWriter(os.path.join(directory, file_name), append=True) as avro_writer:
+            avro_writer.write_many(accepted)
+
+    watermarks.save()
+    return upsert_avro_changes(
+        os.path.join(directory, 'observations.parquet'),
+        os.path.join(directory, 'observations.avro'),
+        os.path.join(directory, 'observations.changes.avro')
+    )
+
+
+@pytest.fixture
+def stations():
+    """The lines of each station."""
+    return [list(STATION_LINES) for _ in range(3)]
+
+
+@given('a dataset of 3 stations with provisional observations', target_fixture='dataset_directory')
+def dataset(stations, tmp_path):
+    """a dataset of 3 stations with provisional observations."""
+    dataset_directory = str(tmp_path / 'observations.parquet')
+    stats = upsert_parquet_dataset(
+        dataset_directory,
+        [station_batch(index, lines) for index, lines in enumerate(stations)]
+    )
+    assert stats == {'rows': 12, 'changed_rows': 12, 'stations_rewritten': 3, 'rows_rewritten': 12}
+    return dataset_directory
+
+
+@given('a dataset of 3 stations written from an Avro file', target_fixture='dataset_directory')
+def dataset_from_avro(stations, tmp_path):
+    """a dataset of 3 stations written from an Avro file."""
+    avro_file_name = str(tmp_path / 'observations.avro')
+    dataset_directory = str(tmp_path / 'observations.parquet')
+
+    with AvroWriter(avro_file_name) as avro_writer:
+        for index, lines in enumerate(stations):
+            avro_writer.write_many(station_batch(index, lines).to_pylist())
+
+    assert avro_to_parquet_dataset(avro_file_name, dataset_directory) == 12
+    return dataset_directory
+
+
+@given(
+    'a dataset of 3 stations upserted from the changes of an incremental run',
+    target_fixture='dataset_directory'
+)
+def dataset_from_changes(stations, tmp_path):
+    """a dataset of 3 stations upserted from the changes of an incremental run."""
+    stats = incremental_run(stations, str(tmp_path))
+    assert stats == {'rows': 12, 'changed_rows': 12, 'stations_rewritten': 3, 'rows_rewritten': 12}
+    return str(tmp_path / 'observations.parquet')
+
+
+@given('an empty dataset', target_fixture='dataset_directory')
+def empty_dataset(tmp_path):
+    """an empty dataset."""
+    return str(tmp_path / 'observations.parquet')
+
+
+@when(parsers.parse('{change} in station {index:d}'), target_fixture='previous')
+def station_changes(change, index, stations):
+    """<change> in station <index>."""
+    previous = list(stations[index])
+    stations[index] = CHANGES[change](stations[index])
+    return {index: previous}
+
+
+@when('the stations are upserted', target_fixture='stats')
+def stations_upserted(stations, dataset_directory):
+    """the stations are upserted."""
+    return upsert_parquet_dataset(
+        dataset_directory,
+        [station_batch(index, lines) for index, lines in enumerate(stations)]
+    )
+
+
+@when('the original and revised stations are upserted together', target_fixture='stats')
+def original_and_revised_upserted(previous, stations, dataset_directory):
+    """the original and revised stations are upserted together."""
+    batches = [station_batch(0, previous[0]), station_batch(0, stations[0])]
+    # Only the revised station is expected in the dataset.
+    del stations[1:]
+    return upsert_parquet_dataset(dataset_directory, batches)
+
+
+@when('the changes of an incremental run are upserted', target_fixture='stats')
+def changes_upserted(stations, tmp_path):
+    """the changes of an incremental run are upserted."""
+    return incremental_run(stations, str(tmp_path))
+
+
+@then(parsers.parse('{changed_rows:d} new or revised rows of {station_count:d} stations are upserted'))
+def rows_upserted(changed_rows, station_count, stats):
+    """<changed_rows> new or revised rows of <station_count> stations are upserted."""
+    assert stats['changed_rows'] == changed_rows
+    assert stats['stations_rewritten'] == station_count
+
+
+@then(parsers.parse('{rows:d} rows are read'))
+def rows_read(rows, stats):
+    """<rows> rows are read."""
+    assert stats['rows'] == rows
+
+
+@then('no changes are left to be upserted')
+def no_changes_left(tmp_path):
+    """no changes are left to be upserted."""
+    assert not os.path.exists(tmp_path / 'observations.changes.avro')
+
+
+@then(parsers.parse('station {index:d} has {months:d} months with {provisional:d} provisional'))
+def station_months(index, months, provisional, dataset_directory):
+    """station <index> has <months> months with <provisional> provisional."""
+    table = ObservationQuery(dataset_directory).query(f'Station {index}')
+    assert table.num_rows == months
+    assert sum(table['isProvisional'].to_pylist()) == provisional
+
+
+@then('the dataset matches the latest observations')
+def dataset_matches(stations, dataset_directory):
+    """the dataset matches the latest observations."""
+    query = ObservationQuery(dataset_directory)
+    assert query.stations == [f'Station {index}' for index in range(len(stations))]
+
+    for index, lines in enumerate(stations):
+        expected = station_batch(index, lines).to_pylist()
+
+        if lines[0] != STATION_LINES[0]:
+            # A final observation is not revised.
+            expected[0] = station_batch(index, STATION_LINES[:1]).to_pylist()[0]
+
+        assert query.query(f'Station {index}').to_pylist() == expected
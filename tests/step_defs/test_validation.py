@@ -0,0 +1,115 @@
+"""Data quality validation feature tests."""
+import os
+
+import pyarrow.csv as pv
+
+from pytest_bdd import (
+    given,
+    scenario,
+    then,
+    when,
+    parsers
+)
+
+from historical.batch import parse_observation_batch
+from historical.validation import Quarantine, merge_quarantines
+
+STATION_HEADER = """Fulchester
+   yyyy  mm   tmax    tmin      af    rain     sun
+              degC    degC    days      mm   hours
+"""
+
+
+@scenario('../features/validation.feature', 'Failing Rows Are Quarantined With Their Reasons')
+def test_failing_rows_are_quarantined_with_their_reasons():
+    """Failing Rows Are Quarantined With Their Reasons."""
+
+
+@scenario('../features/validation.feature', 'Quarantine Files Are Merged')
+def test_quarantine_files_are_merged():
+    """Quarantine Files Are Merged."""
+
+
+@given(parsers.parse('a station file with the line {line} between two valid months'), target_fixture='text')
+def station_file(line):
+    """a station file with the line <line> between two valid months."""
+    first, last = '1957   1   8.6   3.9   2   80.6   55.6', '1957   3   10.2   4.1   0   41.0'
+    return f'{STATION_HEADER}   {first}\n   {line}\n   {last}\n'
+
+
+@given(
+    parsers.parse('{file_count:d} quarantine files of stations with {row_count:d} failing rows'),
+    target_fixture='quarantine_files'
+)
+def quarantine_files(file_count, row_count, tmp_path):
+    """<file_count> quarantine files of stations with <row_count> failing rows."""
+    file_names = []
+
+    # The stations are written in the reverse order of their names.
+    for index in reversed(range(file_count)):
+        quarantine = Quarantine()
+        text = STATION_HEADER + '   1957   13   8.6   3.9   2   80.6   55.6\n' * row_count
+        assert parse_observation_batch(text, f'Station {index}', quarantine).num_rows == 0
+        file_names.append(str(tmp_path / f'station{index}.quarantine.csv'))
+        assert quarantine.write(file_names[-1]) == row_count
+
+    return file_names + [str(tmp_path / 'absent.quarantine.csv')]
+
+
+@when('the station file is parsed with a quarantine', target_fixture='parsed')
+def station_file_is_parsed(text):
+    """the station file is parsed with a quarantine."""
+    quarantine = Quarantine(last_year=2025)
+    return (parse_observation_batch(text, 'Fulchester', quarantine), quarantine)
+
+
+@when('the quarantine files are merged', target_fixture='merged_file_name')
+def quarantine_files_are_merged(quarantine_files, tmp_path):
+    """the quarantine files are merged."""
+    merged_file_name = str(tmp_path / 'merged.quarantine.csv')
+    assert merge_quarantines(quarantine_files, merged_file_name) == 6
+    return merged_file_name
+
+
+@then(parsers.parse('the batch has {rows:d} rows'))
+def batch_rows(rows, parsed):
+    """the batch has <rows> rows."""
+    batch, _ = parsed
+    assert batch.num_rows == rows
+    assert batch['month'].to_pylist() == ([1, 2, 3] if rows == 3 else [1, 3])
+
+
+@then(parsers.parse('the quarantine has the reasons {reasons}'))
+def quarantine_reasons(reasons, parsed, text, tmp_path):
+    """the quarantine has the reasons <reasons>."""
+    _, quarantine = parsed
+    rejected = quarantine.rejected
+    assert quarantine.stats['rows'] == 3
+    assert quarantine.stats['rejected'] == rejected.num_rows
+    assert quarantine.report()
+
+    if reasons == 'none':
+        assert rejected.num_rows == 0
+    else:
+        assert rejected.to_pylist() == [
+            {'station': 'Fulchester', 'line': text.splitlines()[4].strip(), 'reasons': reasons}
+        ]
+
+    file_name = str(tmp_path / 'quarantine.csv')
+    assert quarantine.write(file_name) == rejected.num_rows
+    assert pv.read_csv(file_name).num_rows == rejected.num_rows
+
+
+@then(parsers.parse('the merged quarantine file has {rows:d} rows grouped by station'))
+def merged_quarantine_rows(rows, merged_file_name):
+    """the merged quarantine file has <rows> rows grouped by station."""
+    merged = pv.read_csv(merged_file_name)
+    assert merged.num_rows == rows
+    assert merged['station'].to_pylist() == sorted(merged['station'].to_pylist())
+    assert set(merged['reasons'].to_pylist()) == {'month out of range'}
+
+
+@then('the quarantine files are removed')
+def quarantine_files_removed(quarantine_files):
+    """the quarantine files are removed."""
+    assert not any(os.path.exists(file_name) for file_name in quarantine_files)